@@ -11,7 +11,7 @@ Updated: Использует UI компоненты для сокращени
 import streamlit as st
 import pandas as pd
 import os
-from utils.db_connection import connect_db
+from utils.db_connection_manager import get_cursor
 from utils.config_utils import get_data_filter
 from utils.db_crud import import_data_from_dataframe
 from utils.db_schema import get_table_schema_definition
@@ -36,7 +36,7 @@ st.title("🃏 Cards Matcher - Управление товарными карт
 st.markdown("---")
 
 # --- Database Connection ---
-conn = connect_db()
+conn = get_cursor()
 if not conn:
     st.error("❌ База данных не подключена. Пожалуйста, настройте подключение в настройках.")
     if st.button("Go to Settings"):
@@ -1667,7 +1667,3 @@ if conn:
             st.info("📭 Таблица рейтингов еще не создана. Данные будут доступны после первого импорта.")
         else:
             st.warning(f"⚠️ Не удалось получить статистику: {str(e)}")
-
-# Close connection
-if conn:
-    conn.close() 
\ No newline at end of file
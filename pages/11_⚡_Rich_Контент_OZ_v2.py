@@ -16,7 +16,7 @@ import logging
 from typing import List, Optional
 
 # Импорты наших модулей
-from utils.db_connection import connect_db
+from utils.db_connection_manager import get_cursor
 from utils.rich_content_oz import ScoringConfig, RichContentProcessor
 from utils.rich_content_processor_v2 import BatchProcessorV2
 from utils.csv_exporter import RichContentCSVExporter
@@ -42,10 +42,9 @@ st.title("⚡ Rich Content OZ v2 - Упрощенная пакетная обр
 st.markdown("---")
 
 # --- Подключение к базе данных ---
-@st.cache_resource
 def get_database_connection():
-    """Кэшированное подключение к БД"""
-    return connect_db()
+    """Курсор текущего потока из общего подключения к БД"""
+    return get_cursor()
 
 conn = get_database_connection()
 if not conn:
@@ -12,7 +12,7 @@ from pathlib import Path
 project_root = Path(__file__).parent.parent
 sys.path.insert(0, str(project_root))
 
-from utils.db_connection import connect_db
+from utils.db_connection_manager import get_cursor
 from utils.product_comparison import ProductComparator
 
 def main():
@@ -57,8 +57,8 @@ def main():
         # Show comparison
         with st.spinner("Анализируем товары..."):
             try:
-                # Connect to database using standard method
-                db_conn = connect_db()
+                # Cursor from the shared connection manager
+                db_conn = get_cursor()
                 
                 if not db_conn:
                     st.error("Не удалось подключиться к базе данных. Проверьте настройки.")
@@ -20,7 +20,7 @@ import pandas as pd
 import numpy as np
 from collections import Counter
 from utils.config_utils import get_db_path
-from utils.db_connection import connect_db
+from utils.db_connection_manager import get_cursor
 import re
 
 st.set_page_config(page_title="Анализ проблем карточек Ozon", layout="wide")
@@ -35,7 +35,7 @@ if not db_path:
         st.switch_page("pages/3_Settings.py")
     st.stop()
 
-db_connection = connect_db(db_path)
+db_connection = get_cursor(target=db_path)
 
 if not db_connection:
     st.error(f"Не удалось подключиться к базе данных: {db_path}.")
@@ -1712,6 +1712,3 @@ with tab2:
             """)
         else:
             st.info("💡 Для использования инструмента стандартизации выберите один из доступных режимов обработки выше.")
-
-# Close database connection
-db_connection.close() 
\ No newline at end of file
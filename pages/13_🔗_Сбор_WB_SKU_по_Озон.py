@@ -60,8 +60,7 @@ else:
         **Пример**: `Shuzzi;Nike;Adidas` - будут обработаны только товары этих брендов
         """)
 
-# Инициализация базы данных
-@st.cache_resource
+# Инициализация базы данных (курсор текущего потока, поэтому без st.cache_resource)
 def get_database_connection():
     """Инициализация подключения к базе данных"""
     return get_connection_and_ensure_schema()
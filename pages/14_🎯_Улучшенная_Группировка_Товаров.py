@@ -21,7 +21,7 @@ from typing import List, Optional
 import traceback
 
 # Импорты проекта
-from utils.db_connection import connect_db
+from utils.db_connection_manager import get_cursor
 from utils.advanced_product_grouper import AdvancedProductGrouper, GroupingConfig
 from utils.advanced_grouping_ui_components import (
     render_grouping_configuration,
@@ -56,7 +56,7 @@ st.markdown("""
 
 # Проверка подключения к базе данных
 try:
-    conn = connect_db()
+    conn = get_cursor()
     if conn is None:
         st.error("❌ Не удалось подключиться к базе данных. Перейдите в настройки для настройки подключения.")
         st.stop()
@@ -211,7 +211,3 @@ st.markdown("""
     Исправленная версия с корректной компенсацией рейтинга + итоговая таблица для маркетплейса
 </div>
 """, unsafe_allow_html=True)
-
-# Закрываем соединение с базой данных
-if 'conn' in locals() and conn:
-    conn.close()
\ No newline at end of file
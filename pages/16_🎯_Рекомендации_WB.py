@@ -24,7 +24,7 @@ import logging
 from typing import List, Dict, Any, Optional
 
 # Optimized imports
-from utils.db_connection import connect_db
+from utils.db_connection_manager import get_cursor
 from utils.wb_recommendations import (
     WBRecommendationProcessor, WBScoringConfig, WBProcessingStatus,
     WBProcessingResult, WBBatchResult
@@ -56,12 +56,11 @@ with st.expander("🐛 Debug информация", expanded=False):
     }
     st.json(debug_data)
 
-@st.cache_resource
 def get_database_connection():
-    """Кэшированное подключение к БД"""
+    """Курсор текущего потока из общего подключения к БД"""
     UILogger.log_ui_action("DB connection", "Establishing")
     try:
-        conn = connect_db()
+        conn = get_cursor()
         UILogger.log_ui_action("DB connection", "Success")
         return conn
     except Exception as e:
@@ -13,7 +13,7 @@ This page displays:
 import streamlit as st
 import pandas as pd
 from utils.config_utils import load_config, get_db_path, get_db_mode, get_motherduck_db_name
-from utils.db_connection import connect_db
+from utils.db_connection_manager import get_cursor
 from utils.db_crud import get_db_stats
 from utils.db_migration import auto_migrate_if_needed
 import os
@@ -35,8 +35,8 @@ connection_active = False
 conn = None
 
 if mode == "motherduck":
-    # Connect using MotherDuck settings from config (handled inside connect_db)
-    conn = connect_db()
+    # Connect using MotherDuck settings from config (handled by the connection manager)
+    conn = get_cursor()
     if conn:
         connection_active = True
     else:
@@ -55,7 +55,7 @@ else:
         if st.button("Go to Settings", key="settings_db_not_found"):
             st.switch_page("pages/3_⚙️_Настройки.py")
     else:
-        conn = connect_db(db_path)
+        conn = get_cursor(target=db_path)
         if conn:
             connection_active = True
         else:
@@ -71,7 +71,6 @@ if connection_active and conn:
     
     # stats = db_utils.get_db_stats(conn) # Old call
     stats = get_db_stats(conn) # Corrected call - Fetch stats
-    conn.close() # Important: Close connection after use
 
     st.subheader("Live Database Statistics")
     col1, col2, col3 = st.columns(3)
@@ -10,14 +10,20 @@ This page allows users to:
 - View feedback on the success or failure of each import operation.
 """
 import streamlit as st
-import pandas as pd
-import os
-from utils.config_utils import load_config, get_report_path, get_db_path
-from utils.db_connection import connect_db, get_connection_and_ensure_schema
-from utils.db_crud import import_data_from_dataframe
-from utils.db_schema import get_table_schema_definition, get_defined_table_names, create_tables_from_schema
-from utils.google_sheets_utils import read_google_sheets_as_dataframe, validate_google_sheets_url, test_google_sheets_access
-from utils.excel_utils import read_excel_with_fallback, ExcelReadError
+import pandas as pd
+import os
+from utils.config_utils import load_config, get_report_path, get_db_path
+from utils.db_connection import connect_db, get_connection_and_ensure_schema
+from utils.db_crud import (
+    IMPORT_VALIDATION_ERROR,
+    import_csv_files_native,
+    import_data_from_batches,
+    import_data_from_dataframe,
+)
+from utils.csv_sql_import import csv_source_paths, supports_native_csv_import
+from utils.db_schema import get_table_schema_definition, get_defined_table_names, create_tables_from_schema
+from utils.google_sheets_utils import read_google_sheets_as_dataframe, validate_google_sheets_url, test_google_sheets_access
+from utils.streaming_import import iter_folder_xlsx_batches_parallel, iter_sources_batches, with_string_id_dtypes
 
 # (Keep other imports like ui_utils if they exist)
 # from utils.ui_utils import show_navigation_links
@@ -164,6 +170,16 @@ else:
                     key=f"uploader_{selected_report_key}"
                 )
 
+        natural_key = schema_for_selected_report.get("natural_key")
+        incremental_import = False
+        if natural_key:
+            incremental_import = st.checkbox(
+                f"Инкрементальный импорт (только изменения по ключу: {', '.join(natural_key)})",
+                value=False,
+                key=f"incremental_{selected_report_key}",
+                help="Добавляются новые, обновляются измененные и удаляются отсутствующие в отчете строки вместо полной перезагрузки таблицы"
+            )
+
         if st.button(f"Импортировать {marketplace_specific_tables.get(selected_report_key, '')}"):
             proceed_with_import = False
             if file_type == "google_sheets":
@@ -185,213 +201,141 @@ else:
 
             if proceed_with_import:
                 with st.spinner(f"Импорт данных..."):
-                    all_dfs = []
-                    raw_read_params = schema_for_selected_report.get("read_params", {})
+                    target_table_name = selected_report_key # The key is the table name
+                    raw_read_params = schema_for_selected_report.get("read_params", {})
                     
-                    # Create a mutable copy of read_params for pandas
-                    pd_read_params = raw_read_params.copy()
-                    
-                    # Extract custom parameters and remove them from what's passed to pandas
-                    skip_rows_after_header_count = pd_read_params.pop('skip_rows_after_header', 0)
-                    pd_read_params.pop('data_starts_on_row', None) # Remove old param if present
+                    # Create a mutable copy of read_params; skip_rows_after_header is handled by the streaming readers
+                    read_params = raw_read_params.copy()
+                    read_params.pop('data_starts_on_row', None) # Remove old param if present
+
+                    # Prepare expected source columns for smart header detection
+                    expected_source_columns = []
+                    try:
+                        cols_def = schema_for_selected_report.get("columns", [])
+                        expected_source_columns = [c.get('source_col_name') for c in cols_def if isinstance(c, dict) and c.get('source_col_name')]
+                    except Exception:
+                        expected_source_columns = []
 
-                    # Prepare expected source columns for smart header detection
-                    expected_source_columns = []
-                    try:
-                        cols_def = schema_for_selected_report.get("columns", [])
-                        expected_source_columns = [c.get('source_col_name') for c in cols_def if isinstance(c, dict) and c.get('source_col_name')]
-                    except Exception:
-                        expected_source_columns = []
-
-                    if file_type == "google_sheets":
+                    # Skipped files are also passed to the import: a full reload imports the
+                    # remaining files, an incremental import is cancelled
+                    read_errors = []
+
+                    def report_read_error(file_name, error):
+                        read_errors.append((file_name, error))
+                        st.error(f"Ошибка при чтении файла {file_name}: {error}")
+                        # Try to provide helpful suggestions
+                        if "Value out of range" in str(error) or "overflow" in str(error).lower():
+                            st.warning("💡 Возможная причина: файл содержит очень большие числа. Попробуйте:")
+                            st.write("1. Убедитесь, что в схеме настроены правильные типы данных")
+                            st.write("2. Проверьте, что все SKU и Product ID колонки читаются как строки")
+                            st.write("3. Обратитесь к документации по BIGINT миграции")
+
+                    if file_type == "google_sheets":
+                        current_df = None
                         try:
                             current_df = read_google_sheets_as_dataframe(data_source_path)
-                            if current_df is not None:
-                                all_dfs.append(current_df)
-                            else:
+                            if current_df is None:
                                 st.error("Не удалось загрузить данные из Google Sheets.")
                         except Exception as e_sheets:
                             st.error(f"Ошибка при чтении Google Sheets: {e_sheets}")
-                    
-                    elif file_type == "folder_xlsx":
-                        try:
-                            xlsx_files_found = False
-                            for f_name in os.listdir(data_source_path):
-                                if f_name.endswith(".xlsx"):
-                                    xlsx_files_found = True
-                                    file_path = os.path.join(data_source_path, f_name)
-                                    try:
-                                        current_df = read_excel_with_fallback(
-                                            file_path,
-                                            expected_columns=expected_source_columns,
-                                            skip_rows_after_header=skip_rows_after_header_count,
-                                            **pd_read_params,
-                                        )
-                                        if skip_rows_after_header_count > 0:
-                                            current_df = current_df.iloc[skip_rows_after_header_count:].reset_index(drop=True)
-                                            all_dfs.append(current_df)
-                                    except ExcelReadError as e_read:
-                                        st.error(f"Ошибка при чтении файла {f_name}: {e_read}")
-                            if not xlsx_files_found:
-                                st.warning(f"Не найдено XLSX файлов в папке {data_source_path}.")        
-                            elif not all_dfs and xlsx_files_found : # Files were there, but all failed to read or were empty
-                                st.warning(f"Не удалось прочитать данные из XLSX файлов в папке {data_source_path}, либо файлы пусты.")
-
-                        except Exception as e_folder:
-                             st.error(f"Ошибка при доступе к папке {data_source_path}: {e_folder}")
-                    
-                    elif use_config_path and data_source_path: # Using path from config
-                        try:
-                            if schema_for_selected_report.get("file_type") == "csv":
-                                current_df = pd.read_csv(data_source_path, **pd_read_params)
-                                # CSVs unlikely to have skip_rows_after_header, but if schema allows, it would apply here too
-                                # However, for CSV, skiprows parameter is more direct if needed.
-                                # For now, assuming skip_rows_after_header is excel-specific logic in this context.
-                            elif schema_for_selected_report.get("file_type") == "xlsx":
-                                # Add safety check for large integers in Excel files
-                                safe_read_params = pd_read_params.copy()
-                                
-                                # If no dtype specified, add default string types for known problematic columns
-                                if 'dtype' not in safe_read_params:
-                                    safe_read_params['dtype'] = {}
-                                
-                                # Add string types for columns that might contain large integers
-                                if selected_report_key == "oz_barcodes":
-                                    safe_read_params['dtype'].update({
-                                        'Артикул': 'str',
-                                        'Ozon Product ID': 'str',
-                                        'Штрихкод': 'str'
-                                    })
-                                elif "oz_" in selected_report_key:
-                                    # For other Ozon tables, protect SKU and Product ID columns
-                                    safe_read_params['dtype'].update({
-                                        'OZON id': 'str',
-                                        'SKU': 'str',
-                                        'Ozon Product ID': 'str'
-                                    })
-                                elif "wb_" in selected_report_key:
-                                    # For Wildberries tables, protect SKU columns
-                                    safe_read_params['dtype'].update({
-                                        'Артикул WB': 'str'
-                                    })
-                                
-                                st.info(f"📖 Чтение файла с защитой от больших чисел: {os.path.basename(data_source_path)}")
-                                current_df = read_excel_with_fallback(
-                                    data_source_path,
-                                    expected_columns=expected_source_columns,
-                                    skip_rows_after_header=skip_rows_after_header_count,
-                                    **safe_read_params,
-                                )
-                                
-                                if skip_rows_after_header_count > 0:
-                                    current_df = current_df.iloc[skip_rows_after_header_count:].reset_index(drop=True)
-                                    
-                                st.success(f"✅ Файл успешно прочитан: {len(current_df)} строк")
-                            else:
-                                st.error(f"Неподдерживаемый тип файла для чтения: {schema_for_selected_report.get('file_type')}")
-                                current_df = None # Ensure it's None
-                            if current_df is not None:
-                                all_dfs.append(current_df)
-                        except FileNotFoundError:
-                            st.error(f"Файл не найден по указанному пути: {data_source_path}")
-                        except ExcelReadError as e_read:
-                            st.error(f"Ошибка при чтении файла {os.path.basename(data_source_path)}: {e_read}")
-                            # Try to provide helpful suggestions
-                            if "Value out of range" in str(e_read) or "overflow" in str(e_read).lower():
-                                st.warning("💡 Возможная причина: файл содержит очень большие числа. Попробуйте:")
-                                st.write("1. Убедитесь, что в схеме настроены правильные типы данных")
-                                st.write("2. Проверьте, что все SKU и Product ID колонки читаются как строки")
-                                st.write("3. Обратитесь к документации по BIGINT миграции")
 
-                    else: # Single file upload (or list if accept_multiple_files was True)
-                        files_to_process = uploaded_files
-                        if files_to_process and not isinstance(files_to_process, list):
-                            files_to_process = [files_to_process] # Make it a list for uniform processing
-                        
-                        if files_to_process:
-                            for uploaded_file_obj in files_to_process: # Renamed to avoid conflict
-                                if uploaded_file_obj is not None:
-                                    try:
-                                        if schema_for_selected_report.get("file_type") == "csv":
-                                            current_df = pd.read_csv(uploaded_file_obj, **pd_read_params)
-                                            # Similar to above, skip_rows_after_header is assumed excel-specific here
-                                        elif schema_for_selected_report.get("file_type") == "xlsx":
-                                            # Add safety check for large integers in uploaded Excel files
-                                            safe_read_params = pd_read_params.copy()
-                                            
-                                            # If no dtype specified, add default string types for known problematic columns
-                                            if 'dtype' not in safe_read_params:
-                                                safe_read_params['dtype'] = {}
-                                            
-                                            # Add string types for columns that might contain large integers
-                                            if selected_report_key == "oz_barcodes":
-                                                safe_read_params['dtype'].update({
-                                                    'Артикул': 'str',
-                                                    'Ozon Product ID': 'str',
-                                                    'Штрихкод': 'str'
-                                                })
-                                            elif "oz_" in selected_report_key:
-                                                # For other Ozon tables, protect SKU and Product ID columns
-                                                safe_read_params['dtype'].update({
-                                                    'OZON id': 'str',
-                                                    'SKU': 'str',
-                                                    'Ozon Product ID': 'str'
-                                                })
-                                            elif "wb_" in selected_report_key:
-                                                # For Wildberries tables, protect SKU columns
-                                                safe_read_params['dtype'].update({
-                                                    'Артикул WB': 'str'
-                                                })
-                                            
-                                            st.info(f"📖 Чтение загруженного файла с защитой от больших чисел: {uploaded_file_obj.name}")
-                                            current_df = read_excel_with_fallback(
-                                                uploaded_file_obj,
-                                                expected_columns=expected_source_columns,
-                                                skip_rows_after_header=skip_rows_after_header_count,
-                                                **safe_read_params,
-                                            )
-                                            
-                                            if skip_rows_after_header_count > 0:
-                                                current_df = current_df.iloc[skip_rows_after_header_count:].reset_index(drop=True)
-                                                
-                                            st.success(f"✅ Файл успешно прочитан: {len(current_df)} строк")
-                                        else: 
-                                            st.error(f"Неподдерживаемый тип файла для чтения: {schema_for_selected_report.get('file_type')}")
-                                            continue
-                                        all_dfs.append(current_df)
-                                    except ExcelReadError as e_read:
-                                        st.error(f"Ошибка при чтении файла {uploaded_file_obj.name}: {e_read}")
-                                        # Try to provide helpful suggestions
-                                        if "Value out of range" in str(e_read) or "overflow" in str(e_read).lower():
-                                            st.warning("💡 Возможная причина: файл содержит очень большие числа. Попробуйте:")
-                                            st.write("1. Убедитесь, что в схеме настроены правильные типы данных")
-                                            st.write("2. Проверьте, что все SKU и Product ID колонки читаются как строки")
-                                            st.write("3. Обратитесь к документации по BIGINT миграции")
-                        else: # This case should be caught by proceed_with_import logic, but as a fallback
-                            st.warning("Файлы не были загружены.")
-                    
-                    if all_dfs:
-                        df_combined = pd.concat(all_dfs, ignore_index=True)
-                        if not df_combined.empty:
-                            target_table_name = selected_report_key # The key is the table name
-                            
+                        if current_df is not None and not current_df.empty:
                             st.write(f"Предпросмотр первых 5 строк для импорта в таблицу '{target_table_name}':")
-                            st.dataframe(df_combined.head())
+                            st.dataframe(current_df.head())
 
                             success, count, error_message = import_data_from_dataframe(
                                 db_conn,
-                                df_combined,
+                                current_df,
                                 target_table_name
                             )
                             if success:
                                 st.success(f"Успешно импортировано {count} записей в таблицу '{target_table_name}'.")
-                                # Optionally, clear uploader or refresh stats
                             else:
                                 st.error(f"Ошибка импорта в таблицу '{target_table_name}': {error_message}")
                         else:
                             st.warning("Нет данных для импорта после обработки файлов.")
+                    
                     else:
-                        st.warning("Не выбраны файлы для импорта или файлы не содержат данных.")
+                        # Files are read in row batches and appended batch by batch,
+                        # so memory does not grow with the size of the report or folder
+                        batches = None
+                        if file_type == "folder_xlsx":
+                            try:
+                                if not any(f_name.endswith(".xlsx") for f_name in os.listdir(data_source_path)):
+                                    st.warning(f"Не найдено XLSX файлов в папке {data_source_path}.")
+                                else:
+                                    # Workbooks are parsed concurrently in a process pool and appended as they complete
+                                    file_progress = st.progress(0.0, text="Чтение файлов папки...")
+                                    batches = iter_folder_xlsx_batches_parallel(
+                                        data_source_path,
+                                        read_params,
+                                        expected_columns=expected_source_columns,
+                                        on_error=report_read_error,
+                                        on_file_done=lambda done, total: file_progress.progress(
+                                            done / total, text=f"Прочитано файлов: {done}/{total}"
+                                        ),
+                                    )
+                            except Exception as e_folder:
+                                st.error(f"Ошибка при доступе к папке {data_source_path}: {e_folder}")
+                        else:
+                            report_file_type = schema_for_selected_report.get("file_type")
+                            if use_config_path and data_source_path: # Using path from config
+                                sources = [data_source_path]
+                            else: # Single file upload (or list if accept_multiple_files was True)
+                                sources = uploaded_files if isinstance(uploaded_files, list) else [uploaded_files]
+                                sources = [f for f in sources if f is not None]
+
+                            if report_file_type not in ("csv", "xlsx"):
+                                st.error(f"Неподдерживаемый тип файла для чтения: {report_file_type}")
+                            elif not sources:
+                                st.warning("Файлы не были загружены.")
+                            else:
+                                native_done = False
+                                if report_file_type == "csv" and supports_native_csv_import(target_table_name):
+                                    # Fast path: DuckDB reads the CSV and applies the schema transforms in SQL
+                                    st.info("⚡ Импорт CSV средствами DuckDB (read_csv)")
+                                    with csv_source_paths(sources) as csv_paths:
+                                        success, count, error_message = import_csv_files_native(
+                                            db_conn, csv_paths, target_table_name, incremental=incremental_import
+                                        )
+                                    if success or error_message == IMPORT_VALIDATION_ERROR:
+                                        native_done = True
+                                        if success:
+                                            st.success(f"Успешно импортировано {count} записей в таблицу '{target_table_name}'.")
+                                        else:
+                                            st.error(f"Ошибка импорта в таблицу '{target_table_name}': {error_message}")
+                                    else:
+                                        st.warning(f"⚠️ Быстрый импорт CSV не удался ({error_message}), используется импорт через pandas")
+
+                                if report_file_type == "xlsx":
+                                    # Read SKU / Product ID / barcode columns as strings to avoid overflow
+                                    read_params = with_string_id_dtypes(target_table_name, read_params)
+                                    st.info("📖 Потоковое чтение файла с защитой от больших чисел")
+                                if not native_done:
+                                    batches = iter_sources_batches(
+                                        sources,
+                                        report_file_type,
+                                        read_params,
+                                        expected_columns=expected_source_columns,
+                                        on_error=report_read_error,
+                                    )
+
+                        if batches is not None:
+                            progress_placeholder = st.empty()
+                            success, count, error_message = import_data_from_batches(
+                                db_conn,
+                                batches,
+                                target_table_name,
+                                progress_callback=lambda rows: progress_placeholder.info(f"📥 Импортировано строк: {rows}"),
+                                incremental=incremental_import,
+                                read_errors=read_errors,
+                            )
+                            if success and count > 0:
+                                st.success(f"Успешно импортировано {count} записей в таблицу '{target_table_name}'.")
+                            elif success:
+                                st.warning("Не выбраны файлы для импорта или файлы не содержат данных.")
+                            else:
+                                st.error(f"Ошибка импорта в таблицу '{target_table_name}': {error_message}")
             else:
                 st.warning("Пожалуйста, выберите файл(ы) для импорта или укажите корректный путь.")
 
@@ -421,4 +365,4 @@ if st.sidebar.button("Обновить список отчетов"):
 # Add any other UI elements or logic as needed
 # Example: Displaying last import status or logs
 # with st.expander("Логи последнего импорта"):
-#    st.json(st.session_state.get("last_import_logs", {})) 
+#    st.json(st.session_state.get("last_import_logs", {})) 
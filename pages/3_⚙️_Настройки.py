@@ -14,6 +14,7 @@ import streamlit as st
 import os
 from utils import config_utils
 from utils.db_connection import connect_db, test_db_connection, get_connection_and_ensure_schema
+from utils.db_connection_manager import close_all_connections, resolve_db_target
 from utils.db_schema import create_tables_from_schema
 
 st.set_page_config(page_title="Settings - Marketplace Analyzer", layout="wide")
@@ -503,12 +504,16 @@ if st.button("Save All Settings", key="save_all_settings_button", help="Saves al
         st.info("Paths have been saved, but please double-check the warnings above. You can configure paths for files/directories you intend to create later.")
 
     # Update database mode and connection settings
+    db_target_before = resolve_db_target()
     config_utils.set_db_mode(selected_mode)
     if selected_mode == "local":
         config_utils.set_db_path(db_path_new)
     else:
         config_utils.set_motherduck_db_name(motherduck_db_name_new.strip())
         config_utils.set_motherduck_token(motherduck_token_new)
+    # Shared connections point at the previous database - close them so pages reconnect
+    if resolve_db_target() != db_target_before:
+        close_all_connections()
     
     # Update margin calculation parameters with validation
     try:
@@ -13,7 +13,7 @@ Requires a valid database connection; prompts to configure if not connected.
 import streamlit as st
 import pandas as pd
 from utils.config_utils import get_db_path, load_config
-from utils.db_connection import connect_db
+from utils.db_connection_manager import get_cursor
 from utils.db_crud import get_all_db_tables
 from utils.db_schema import get_table_schema_definition
 from utils.db_search_helpers import search_table_globally, get_searchable_columns
@@ -32,7 +32,8 @@ if not db_path:
         st.switch_page("pages/3_Settings.py")
     st.stop()
 
-db_connection = connect_db(db_path)
+# Курсор текущего потока из общего подключения, только для чтения
+db_connection = get_cursor(read_only=True, target=db_path)
 
 if not db_connection:
     st.error(f"Не удалось подключиться к базе данных: {db_path}.")
@@ -388,7 +389,4 @@ else:
         if all_tables: # Only show if tables exist but none is selected (should not happen with index=0)
             st.info("Пожалуйста, выберите таблицу из списка выше.")
 
-# No need to explicitly close connection here if using Streamlit's connection management or if pages handle it.
-# If db_connection is a raw DuckDB connection, it's good practice to close it when done with the app/session.
-# However, for Streamlit pages, the script reruns, so connection might be re-established anyway.
-# For now, let's assume connect_db handles pooling or re-connection efficiently. 
\ No newline at end of file
+# The cursor belongs to the shared connection manager - do not close it here.
@@ -16,9 +16,9 @@ NEW FEATURES:
 - Added session state support to preserve data when switching between display modes
 """
 import streamlit as st
-from utils.db_connection import connect_db
+from utils.db_connection_manager import get_cursor
 from utils.cross_marketplace_linker import CrossMarketplaceLinker
-from utils.wb_photo_service import get_wb_photo_url
+from utils.wb_photo_service import get_wb_photo_urls
 import pandas as pd
 
 st.set_page_config(page_title="Cross-Marketplace Search - Marketplace Analyzer", layout="wide")
@@ -34,7 +34,8 @@ if 'search_info' not in st.session_state:
     st.session_state.search_info = None
 
 # --- Database Connection ---
-conn = connect_db()
+# Курсор текущего потока из общего подключения, только для чтения
+conn = get_cursor(read_only=True)
 if not conn:
     st.error("Database not connected. Please configure the database in Settings.")
     if st.button("Go to Settings"):
@@ -252,20 +253,12 @@ if st.session_state.search_executed and st.session_state.search_results is not N
                     break
             
             if wb_sku_column and wb_sku_column in df.columns:
-                # Создаем столбец с URL для фотографий
-                def get_photo_url(wb_sku):
-                    if pd.isna(wb_sku) or str(wb_sku).strip() == '':
-                        return None
-                    
-                    try:
-                        photo_url = get_wb_photo_url(str(wb_sku))
-                        return photo_url if photo_url else None
-                    except Exception as e:
-                        return None
+                # Создаем столбец с URL для фотографий (все SKU одним вызовом, пустые -> None)
+                photo_urls = [url or None for url in get_wb_photo_urls(df[wb_sku_column])]
                 
                 # Добавляем столбец с URL фотографий
                 df_with_photos = df.copy()
-                df_with_photos.insert(0, '🖼️ Фото WB', df_with_photos[wb_sku_column].apply(get_photo_url))
+                df_with_photos.insert(0, '🖼️ Фото WB', photo_urls)
                 return df_with_photos
             
             return df
@@ -331,6 +324,3 @@ elif not st.session_state.search_executed:
         - ✅ Можно изменять способ отображения без повторного поиска
         - ✅ Кнопка "Очистить результаты" для сброса всех данных
         """)
-
-if conn:
-    conn.close() 
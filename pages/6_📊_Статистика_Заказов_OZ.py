@@ -7,7 +7,7 @@ This page allows users to:
 - Statistics include a 14-day order sum and daily order counts.
 """
 import streamlit as st
-from utils.db_connection import connect_db
+from utils.db_connection_manager import get_cursor
 import pandas as pd
 from datetime import datetime, timedelta
 # Import necessary functions from db_search_helpers
@@ -18,9 +18,9 @@ st.title("📊 Ozon Order Statistics")
 st.markdown("---")
 
 # --- Database Connection ---
-@st.cache_resource
+# Курсор текущего потока из общего подключения, только для чтения
 def get_connection():
-    conn = connect_db()
+    conn = get_cursor(read_only=True)
     if not conn:
         st.error("Database not connected. Please configure the database in Settings.")
         if st.button("Go to Settings", key="db_settings_button_stats"):
@@ -7,7 +7,7 @@ This page allows users to:
 - Select suitable Ozon SKUs for advertising campaigns based on comprehensive criteria
 """
 import streamlit as st
-from utils.db_connection import connect_db
+from utils.db_connection_manager import get_cursor
 from utils.db_search_helpers import get_normalized_wb_barcodes, get_ozon_barcodes_and_identifiers
 from utils.config_utils import get_margin_config
 import pandas as pd
@@ -18,9 +18,9 @@ st.title("🎯 Ozon RK Manager - Подбор артикулов для рекл
 st.markdown("---")
 
 # --- Database Connection ---
-@st.cache_resource
+# Курсор текущего потока из общего подключения, только для чтения
 def get_connection():
-    conn = connect_db()
+    conn = get_cursor(read_only=True)
     if not conn:
         st.error("Database not connected. Please configure the database in Settings.")
         if st.button("Go to Settings", key="db_settings_button_rk"):
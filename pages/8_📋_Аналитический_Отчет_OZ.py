@@ -9,7 +9,7 @@ This page allows users to:
 """
 import streamlit as st
 import os
-from utils.db_connection import connect_db
+from utils.db_connection_manager import get_cursor
 from utils import config_utils
 from utils.analytic_report_helpers import process_analytic_report, load_analytic_report_file
 import pandas as pd
@@ -46,7 +46,7 @@ st.markdown("""
 """)
 
 # --- Database Connection ---
-conn = connect_db()
+conn = get_cursor()
 if not conn:
     st.error("❌ База данных не подключена. Пожалуйста, настройте подключение в настройках.")
     if st.button("Go to Settings"):
@@ -435,6 +435,3 @@ if selected_file_path and selected_file_path.startswith('temp_') and os.path.exi
         atexit.register(lambda: os.remove(selected_file_path) if os.path.exists(selected_file_path) else None)
     except:
         pass
-
-if conn:
-    conn.close() 
\ No newline at end of file
@@ -9,7 +9,7 @@ This page allows users to:
 """
 import streamlit as st
 import pandas as pd
-from utils.db_connection import connect_db
+from utils.db_connection_manager import get_cursor
 from utils.db_search_helpers import get_normalized_wb_barcodes, get_ozon_barcodes_and_identifiers
 from utils.category_helpers import (
     get_unique_wb_categories, get_unique_oz_categories, suggest_category_mappings,
@@ -25,7 +25,7 @@ st.markdown("---")
 # --- Database Connection ---
 def get_db_connection():
     """Get database connection for category comparison operations."""
-    conn = connect_db()
+    conn = get_cursor()
     if not conn:
         st.error("База данных не подключена. Пожалуйста, настройте базу данных в Settings.")
         if st.button("Перейти в Settings", key="db_settings_button_cat"):
@@ -482,11 +482,7 @@ with tab1:
                     except Exception as e:
                         st.error(f"Ошибка при анализе категорий: {e}")
                         st.error("Попробуйте обновить страницу или обратитесь к администратору")
-                    
-                    finally:
-                        # Close the analysis connection
-                        if analysis_conn:
-                            analysis_conn.close()
+
 
 with tab2:
     st.header("Управление соответствиями категорий")
@@ -0,0 +1,59 @@
+"""
+Unit тесты для групповой выборки остатков и заказов аналитического отчета (utils.analytic_report_helpers).
+"""
+
+from datetime import datetime, timedelta
+
+import pytest
+import duckdb
+
+from utils.analytic_report_helpers import (
+    aggregate_stock_data,
+    generate_order_statistics,
+    get_stock_and_order_statistics,
+)
+
+
+def _day(days_ago):
+    return (datetime.now() - timedelta(days=days_ago)).strftime('%Y-%m-%d')
+
+
+@pytest.fixture
+def conn():
+    conn = duckdb.connect(':memory:')
+    conn.execute("CREATE TABLE oz_products (oz_sku BIGINT, oz_fbo_stock INTEGER)")
+    conn.execute("INSERT INTO oz_products VALUES (11, 5), (12, 3), (21, 7), (31, NULL)")
+    conn.execute("CREATE TABLE oz_orders (oz_sku BIGINT, oz_accepted_date DATE, order_status VARCHAR)")
+    conn.execute(f"""
+        INSERT INTO oz_orders VALUES
+            (11, '{_day(1)}', 'Доставлен'), (11, '{_day(1)}', 'Доставлен'), (12, '{_day(1)}', 'Доставлен'),
+            (12, '{_day(2)}', 'Отменён'), (21, '{_day(3)}', 'Доставлен'), (21, '{_day(40)}', 'Доставлен')
+    """)
+    yield conn
+    conn.close()
+
+
+class TestStockAndOrderStatistics:
+    """Тесты групповой выборки по всем WB SKU отчета"""
+
+    def test_matches_per_sku_functions(self, conn):
+        """Результат совпадает с поштучными aggregate_stock_data и generate_order_statistics"""
+        size_mappings = {
+            '100': {42: ['11'], 44: ['12', '11']},
+            '200': {40: ['21']},
+            '300': {40: ['31', '99']},
+        }
+
+        statistics = get_stock_and_order_statistics(conn, size_mappings, days_back=30)
+
+        for wb_sku, size_mapping in size_mappings.items():
+            oz_skus = [oz_sku for skus in size_mapping.values() for oz_sku in skus]
+            assert statistics[wb_sku]['total_stock'] == aggregate_stock_data(conn, oz_skus)
+            assert statistics[wb_sku]['orders'] == generate_order_statistics(conn, oz_skus, days_back=30)
+        assert statistics['100'] == {'total_stock': 8, 'orders': {_day(1): 3}}
+        assert statistics['300'] == {'total_stock': 0, 'orders': {}}
+
+    def test_skus_without_links(self, conn):
+        """WB SKU без связей с Ozon не попадают в результат"""
+        assert get_stock_and_order_statistics(conn, {'100': {}}) == {}
+        assert get_stock_and_order_statistics(conn, {}) == {}
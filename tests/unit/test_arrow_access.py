@@ -0,0 +1,106 @@
+"""
+Unit тесты для колоночного доступа к результатам запросов (utils.arrow_access).
+"""
+
+import pandas as pd
+import pytest
+import duckdb
+
+from utils import arrow_access
+from utils.arrow_access import query_result, register_input
+from utils.db_search_helpers import get_ozon_barcodes_and_identifiers
+
+
+@pytest.fixture(params=[True, False], ids=['arrow', 'numpy'])
+def arrow_mode(request, monkeypatch):
+    """Оба режима: с pyarrow и без него (колонки numpy)"""
+    if request.param and not arrow_access.ARROW_AVAILABLE:
+        pytest.skip("pyarrow не установлен")
+    monkeypatch.setattr(arrow_access, 'ARROW_AVAILABLE', request.param)
+    return request.param
+
+
+@pytest.fixture
+def products_db():
+    """БД в памяти с NULL-значениями разных типов"""
+    conn = duckdb.connect(':memory:')
+    conn.execute("""
+        CREATE TABLE products (
+            wb_sku BIGINT, name VARCHAR, price DOUBLE, in_stock BOOLEAN, size INTEGER, updated DATE
+        )
+    """)
+    conn.execute("""
+        INSERT INTO products VALUES
+            (1001, 'Кроссовки', 2500.0, true, 38, DATE '2024-05-01'),
+            (1002, NULL, NULL, NULL, NULL, NULL),
+            (1003, 'Ботинки', 4100.5, false, 41, DATE '2024-06-15')
+    """)
+    yield conn
+    conn.close()
+
+
+class TestQueryResult:
+    """Тесты QueryResult в обоих режимах"""
+
+    def test_rows_match_fetchall(self, products_db, arrow_mode):
+        """iter_rows отдает те же значения, что и fetchall (NULL -> None), в том числе пакетами"""
+        query = "SELECT wb_sku, name, price, in_stock, size FROM products WHERE wb_sku >= ? ORDER BY wb_sku"
+        expected = products_db.execute(query, [1000]).fetchall()
+        result = query_result(products_db, query, [1000])
+
+        assert result.is_arrow is arrow_mode
+        assert len(result) == 3
+        assert [tuple(row.values()) for row in result.iter_rows(batch_size=2)] == expected
+        assert result.column('name') == ['Кроссовки', None, 'Ботинки']
+
+    def test_to_pandas_matches_fetchdf(self, products_db, arrow_mode):
+        """to_pandas повторяет типы fetchdf: nullable-целые и логические, NaN, None, даты"""
+        query = "SELECT * FROM products ORDER BY wb_sku"
+        expected = products_db.execute(query).fetchdf()
+        actual = query_result(products_db, query).to_pandas()
+
+        assert list(actual.columns) == list(expected.columns)
+        for column in ['wb_sku', 'size', 'in_stock', 'price', 'name']:
+            assert actual[column].dtype == expected[column].dtype, column
+        assert pd.api.types.is_datetime64_any_dtype(actual['updated'])
+        pd.testing.assert_frame_equal(actual.drop(columns='updated'), expected.drop(columns='updated'))
+
+    def test_empty_result(self, products_db, arrow_mode):
+        """Пустой результат сохраняет колонки"""
+        result = query_result(products_db, "SELECT wb_sku, name FROM products WHERE wb_sku < 0")
+
+        assert result.empty
+        assert result.column_names == ['wb_sku', 'name']
+        assert list(result.iter_rows()) == []
+
+    def test_register_input(self, products_db, arrow_mode):
+        """Зарегистрированные данные (DataFrame или словарь) доступны в запросах"""
+        register_input(products_db, 'input_skus', {'wb_sku': [1001, 1003]})
+        register_input(products_db, 'input_names', pd.DataFrame({'name': ['Ботинки']}))
+
+        joined = products_db.execute("""
+            SELECT p.wb_sku
+            FROM products p
+            JOIN input_skus i ON p.wb_sku = i.wb_sku
+            JOIN input_names n ON p.name = n.name
+        """).fetchall()
+        assert joined == [(1003,)]
+
+
+class TestOzonBarcodesIdentifiers:
+    """get_ozon_barcodes_and_identifiers на колоночном результате"""
+
+    def test_columns_and_positions(self, arrow_mode):
+        """Колонки называются в SQL, позиция штрихкода считается по vendor_code"""
+        conn = duckdb.connect(':memory:')
+        conn.execute("CREATE TABLE oz_products (oz_vendor_code VARCHAR, oz_product_id BIGINT, oz_sku BIGINT)")
+        conn.execute("CREATE TABLE oz_barcodes (oz_vendor_code VARCHAR, oz_product_id BIGINT, oz_barcode VARCHAR)")
+        conn.execute("INSERT INTO oz_products VALUES ('VC-1', 1, 501), ('VC-2', 2, 502)")
+        conn.execute("INSERT INTO oz_barcodes VALUES ('VC-1', 1, '222'), ('VC-1', 1, '111'), ('VC-2', 2, '333')")
+
+        result = get_ozon_barcodes_and_identifiers(conn, oz_vendor_codes=['VC-1'])
+
+        assert list(result.columns) == ['oz_barcode', 'oz_sku', 'oz_vendor_code', 'oz_product_id', 'oz_barcode_position']
+        positions = dict(zip(result['oz_barcode'], result['oz_barcode_position']))
+        assert positions == {'111': 1, '222': 2}
+        conn.close()
@@ -0,0 +1,66 @@
+"""
+Unit тесты для подбора соответствий категорий (utils.category_helpers).
+"""
+
+import random
+
+import pytest
+import duckdb
+
+from utils.category_helpers import calculate_similarity, suggest_category_mappings
+
+WORDS = ["Кроссовки", "Кеды", "Ботинки", "Сапоги", "детские", "женские", "мужские", "летние",
+         "зимние", "Туфли", "Сандалии", "спортивные", "Шлепанцы", "Сабо", "и", "для", "дома"]
+
+
+def _brute_force(wb_categories, oz_categories, threshold):
+    """Исходный полный перебор пар с SequenceMatcher"""
+    suggestions = []
+    for wb_cat in wb_categories:
+        matches = [(oz_cat, calculate_similarity(wb_cat, oz_cat)) for oz_cat in oz_categories]
+        matches = [m for m in matches if m[1] >= threshold]
+        matches.sort(key=lambda x: x[1], reverse=True)
+        suggestions += [(wb_cat, oz_cat, similarity) for oz_cat, similarity in matches[:3]]
+    return suggestions
+
+
+def _random_categories(rng, count):
+    return sorted({" ".join(rng.sample(WORDS, rng.randint(1, 3))) for _ in range(count)})
+
+
+@pytest.fixture
+def conn():
+    conn = duckdb.connect(':memory:')
+    conn.execute("CREATE TABLE wb_products (wb_category VARCHAR)")
+    conn.execute("CREATE TABLE oz_category_products (type VARCHAR)")
+    yield conn
+    conn.close()
+
+
+class TestSuggestCategoryMappings:
+    """Тесты индекса отбора кандидатов"""
+
+    @pytest.mark.parametrize("threshold", [0.5, 0.7, 0.9, 1.0])
+    def test_matches_full_comparison(self, conn, threshold):
+        """Результат совпадает с полным перебором пар"""
+        rng = random.Random(7)
+        wb_categories = _random_categories(rng, 120)
+        oz_categories = _random_categories(rng, 150) + [" кроссовки ", "КЕДЫ"]
+        conn.executemany("INSERT INTO wb_products VALUES (?)", [[c] for c in wb_categories])
+        conn.executemany("INSERT INTO oz_category_products VALUES (?)", [[c] for c in oz_categories])
+
+        suggestions = suggest_category_mappings(conn, threshold)
+
+        expected = _brute_force(sorted(wb_categories), sorted(oz_categories), threshold)
+        assert [(s['wb_category'], s['oz_category'], s['similarity']) for s in suggestions] == expected
+
+    def test_confidence_and_empty(self, conn):
+        """Уровень уверенности по сходству; без категорий - пустой список"""
+        assert suggest_category_mappings(conn) == []
+
+        conn.execute("INSERT INTO wb_products VALUES ('Кроссовки')")
+        conn.execute("INSERT INTO oz_category_products VALUES ('кроссовки'), ('Кроссовк'), ('Сапоги')")
+
+        suggestions = suggest_category_mappings(conn, 0.7)
+
+        assert [(s['oz_category'], s['confidence']) for s in suggestions] == [('кроссовки', 'High'), ('Кроссовк', 'High')]
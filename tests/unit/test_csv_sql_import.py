@@ -0,0 +1,110 @@
+"""
+Unit тесты для импорта CSV средствами DuckDB (utils.csv_sql_import, db_crud.import_csv_files_native).
+"""
+
+import io
+
+import pandas as pd
+import pytest
+import duckdb
+
+from utils.csv_sql_import import build_csv_import_query, csv_source_paths, supports_native_csv_import
+from utils.db_crud import IMPORT_VALIDATION_ERROR, import_csv_files_native, import_data_from_dataframe
+from utils.db_schema import get_table_schema_definition
+
+OZ_PRODUCTS_CSV = (
+    "Артикул;Ozon Product ID;SKU;Бренд;Статус товара;Видимость на Ozon;Причины скрытия;"
+    "Доступно к продаже по схеме FBO, шт.;Текущая цена с учетом скидки, ₽\n"
+    "'VC-1';123456789012;1234567890123;TestBrand;Продается;Видим;;12;1999.5\n"
+    "'VC-2';2;22;TestBrand;Продается;Видим;;5 шт;2000.5\n"
+    "VC-3;abc;33;Other;Готов;Скрыт;Нет фото;;1 500,90\n"
+    "VC-4;4;44;Other;Готов;Скрыт;;7.9;\n"
+)
+
+OZ_ORDERS_CSV = (
+    "Номер заказа;Номер отправления;Принят в обработку;Статус;OZON id;Артикул\n"
+    "1001;1001-1;2024-05-01 10:15:00;Доставлен;1234567890123;VC-1\n"
+    "1002;1002-1;2024-05-02 09:00:00;Отменен;987;VC-2\n"
+    "1003;1003-1;не дата;Доставлен;;VC-3\n"
+)
+
+
+@pytest.fixture
+def conn():
+    conn = duckdb.connect(':memory:')
+    yield conn
+    conn.close()
+
+
+def _import_both_ways(conn, tmp_path, table_name, content):
+    """Импорт одного CSV через pandas и через read_csv; возвращает строки обеих таблиц"""
+    path = tmp_path / f"{table_name}.csv"
+    path.write_text(content, encoding="utf-8")
+    read_params = get_table_schema_definition(table_name)["read_params"]
+
+    success, pandas_count, message = import_data_from_dataframe(conn, pd.read_csv(path, **read_params), table_name)
+    assert success, message
+    expected = conn.execute(f"SELECT * FROM {table_name} ORDER BY ALL").fetchall()
+
+    success, native_count, message = import_csv_files_native(conn, [str(path)], table_name)
+    assert success, message
+    actual = conn.execute(f"SELECT * FROM {table_name} ORDER BY ALL").fetchall()
+
+    assert native_count == pandas_count
+    return expected, actual
+
+
+class TestNativeCsvImport:
+    """Тесты быстрого импорта CSV"""
+
+    def test_oz_products_matches_pandas_import(self, conn, tmp_path):
+        """Очистка чисел, convert_to_bigint, remove_single_quotes, round_to_integer как в pandas"""
+        expected, actual = _import_both_ways(conn, tmp_path, "oz_products", OZ_PRODUCTS_CSV)
+
+        assert actual == expected
+        rows = {row[0]: row for row in actual}
+        assert rows['VC-1'][1] == 123456789012
+        assert rows['VC-1'][8] == 2000.0  # 1999.5 -> к четному
+        assert rows['VC-2'][7] == 5 and rows['VC-2'][8] == 2000.0
+        assert rows['VC-3'][1] is None and rows['VC-3'][8] == 1.0
+        assert rows['VC-4'][7] == 7
+
+    def test_oz_orders_dates_and_ids(self, conn, tmp_path):
+        """Даты и BIGINT совпадают с pandas; текстовые номера не превращаются в '1001.0'"""
+        expected, actual = _import_both_ways(conn, tmp_path, "oz_orders", OZ_ORDERS_CSV)
+
+        assert [row[1:] for row in actual] == [row[1:] for row in expected]
+        assert [row[0] for row in actual] == ['1001', '1002', '1003']
+        assert str(actual[0][2]) == '2024-05-01' and actual[2][2] is None
+
+    def test_missing_column_keeps_table(self, conn, tmp_path):
+        """Без обязательной колонки импорт не начинается, данные таблицы сохраняются"""
+        conn.execute("CREATE TABLE oz_orders (oz_order_number VARCHAR, oz_shipment_number VARCHAR, "
+                     "oz_accepted_date DATE, order_status VARCHAR, oz_sku BIGINT, oz_vendor_code VARCHAR)")
+        conn.execute("INSERT INTO oz_orders (oz_order_number) VALUES ('old')")
+        path = tmp_path / "broken.csv"
+        path.write_text("Номер заказа;Статус\n1;Доставлен\n", encoding="utf-8")
+
+        success, count, message = import_csv_files_native(conn, [str(path)], "oz_orders")
+
+        assert (success, count, message) == (False, 0, IMPORT_VALIDATION_ERROR)
+        assert conn.execute("SELECT oz_order_number FROM oz_orders").fetchall() == [('old',)]
+
+    def test_uploaded_files_and_union(self, conn):
+        """Загруженные файлы сохраняются во временные, несколько файлов объединяются"""
+        first = io.BytesIO(OZ_ORDERS_CSV.encode("utf-8"))
+        second = io.BytesIO(OZ_ORDERS_CSV.replace("100", "200").encode("utf-8"))
+
+        with csv_source_paths([first, second]) as paths:
+            success, count, message = import_csv_files_native(conn, paths, "oz_orders")
+
+        assert success, message
+        assert count == 6
+
+    def test_query_and_support(self):
+        """Запрос строится только для CSV таблиц, отсутствующие колонки -> NULL"""
+        query = build_csv_import_query("oz_orders", ["Номер заказа"])
+
+        assert "read_csv(?" in query and "CAST(NULL AS BIGINT)" in query
+        assert supports_native_csv_import("oz_products")
+        assert not supports_native_csv_import("wb_products")
@@ -0,0 +1,77 @@
+"""
+Unit тесты для векторизованной очистки данных (utils.data_cleaner).
+"""
+
+import numpy as np
+import pandas as pd
+
+from utils.data_cleaner import apply_data_cleaning, clean_double_field, clean_integer_field
+
+
+class TestCleanIntegerField:
+    """Тесты очистки целых"""
+
+    def test_values_and_issues(self):
+        """Прямое преобразование, извлечение первого числа и ошибки в порядке строк"""
+        series = pd.Series(['12', ' 7 ', '12.7', 'рост 146', '', None, 'abc', '3998 - 4114'], dtype=object)
+        identifiers = pd.Series([f"SKU{i}" for i in range(len(series))])
+
+        cleaned, issues = clean_integer_field(series, 'Размер', identifiers, 'Артикул')
+
+        assert cleaned.tolist() == [12, 7, 12, 146, None, None, None, 3998]
+        assert [(i['type'], i['identifier'], i['converted_value']) for i in issues] == [
+            ('conversion_warning', 'SKU3', 146),
+            ('conversion_error', 'SKU6', None),
+            ('conversion_warning', 'SKU7', 3998),
+        ]
+        assert issues[1]['message'] == "Could not convert 'abc' to integer, set to NULL"
+
+    def test_numeric_dtypes(self):
+        """Числовые колонки: целые без изменений, дробные усекаются, NaN сохраняется"""
+        ints, int_issues = clean_integer_field(pd.Series([1, 2, 3]), 'f')
+        floats, float_issues = clean_integer_field(pd.Series([1.9, np.nan, -2.5]), 'f')
+
+        assert ints.tolist() == [1, 2, 3] and int_issues == []
+        assert floats.iloc[0] == 1.0 and np.isnan(floats.iloc[1]) and floats.iloc[2] == -2.0
+        assert float_issues == []
+
+    def test_identifier_defaults_to_row_label(self):
+        """Без колонки идентификатора используется метка строки"""
+        _, issues = clean_integer_field(pd.Series(['x'], index=[5]), 'f')
+
+        assert issues[0]['identifier'] == 'row 5'
+
+
+class TestCleanDoubleField:
+    """Тесты очистки дробных"""
+
+    def test_values_and_issues(self):
+        """Числа с точкой извлекаются из строки, запятая не считается разделителем"""
+        series = pd.Series(['1.5', '1,5', 'цена 99.90 руб', 'нет', 'nan', None], dtype=object)
+
+        cleaned, issues = clean_double_field(series, 'Цена')
+
+        values = cleaned.tolist()
+        assert values[:4] == [1.5, 1.0, 99.9, None]
+        assert np.isnan(values[4]) and values[5] is None
+        assert [i['type'] for i in issues] == ['conversion_warning', 'conversion_warning', 'conversion_error']
+
+
+class TestApplyDataCleaning:
+    """Очистка DataFrame по схеме"""
+
+    def test_columns_by_sql_type(self):
+        """INTEGER/BIGINT и DOUBLE очищаются, строковые колонки не меняются"""
+        df = pd.DataFrame({'Артикул': ['A', 'B'], 'Остаток': ['5 шт', '3'], 'Цена': ['10.5', 'x']})
+        schema = [
+            ('oz_vendor_code', 'VARCHAR', 'Артикул', None),
+            ('oz_fbo_stock', 'INTEGER', 'Остаток', None),
+            ('oz_actual_price', 'DOUBLE', 'Цена', None),
+        ]
+
+        cleaned, issues = apply_data_cleaning(df, 'oz_products', schema)
+
+        assert cleaned['Артикул'].tolist() == ['A', 'B']
+        assert cleaned['Остаток'].tolist() == [5, 3]
+        assert cleaned['Цена'].tolist() == [10.5, None]
+        assert [(i['field'], i['identifier']) for i in issues] == [('Остаток', 'A'), ('Цена', 'B')]
@@ -0,0 +1,133 @@
+"""
+Unit тесты для менеджера общего подключения DuckDB.
+"""
+
+import threading
+
+import duckdb
+import pytest
+
+from utils.db_connection_manager import (
+    ConnectionManager,
+    ReadOnlyViolationError,
+    get_connection_manager,
+    close_all_connections,
+)
+
+
+@pytest.fixture
+def manager(tmp_path):
+    """Менеджер для временного файла DuckDB с тестовой таблицей"""
+    manager = ConnectionManager(str(tmp_path / "test.duckdb"))
+    manager.get_connection().execute("CREATE TABLE items AS SELECT range AS id FROM range(10)")
+    yield manager
+    manager.close()
+
+
+class TestConnectionManager:
+    """Тесты выдачи курсоров, режима чтения и переподключения"""
+
+    def test_cursor_per_thread(self, manager):
+        """В одном потоке курсор переиспользуется, в разных потоках курсоры свои"""
+        main_cursor = manager.cursor()
+        assert manager.cursor() is main_cursor
+
+        results = {}
+
+        def worker(name):
+            cursor = manager.cursor()
+            results[name] = (cursor, cursor.execute("SELECT COUNT(*) FROM items").fetchone()[0])
+
+        threads = [threading.Thread(target=worker, args=(i,)) for i in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        cursors = {id(cursor) for cursor, _ in results.values()}
+        assert len(cursors) == 4
+        assert id(main_cursor) not in cursors
+        assert all(count == 10 for _, count in results.values())
+
+    def test_read_only_cursor_blocks_writes(self, manager):
+        """Курсор только для чтения выполняет SELECT и запрещает изменения"""
+        cursor = manager.cursor(read_only=True)
+
+        assert cursor.execute("\n  -- комментарий\n  SELECT MAX(id) FROM items").fetchone()[0] == 9
+        assert cursor.execute("WITH t AS (SELECT 1 AS x) SELECT x FROM t").fetchone()[0] == 1
+        assert cursor.execute("DESCRIBE items").fetchall()
+        with pytest.raises(ReadOnlyViolationError):
+            cursor.execute("DELETE FROM items")
+        with pytest.raises(ReadOnlyViolationError):
+            cursor.execute("SELECT 1; DELETE FROM items")
+        with pytest.raises(ReadOnlyViolationError):
+            cursor.execute("PRAGMA enable_profiling")
+        with pytest.raises(ReadOnlyViolationError):
+            cursor.execute("EXPLAIN ANALYZE DELETE FROM items")
+        with pytest.raises(ReadOnlyViolationError):
+            cursor.executemany("INSERT INTO items VALUES (?)", [[1]])
+        assert manager.cursor().execute("SELECT COUNT(*) FROM items").fetchone()[0] == 10
+
+    def test_metrics(self, manager):
+        """Метрики учитывают выдачи курсоров и созданные курсоры"""
+        manager.cursor()
+        manager.cursor(read_only=True)
+        manager.cursor()
+
+        metrics = manager.get_metrics()
+        assert metrics['checkouts'] == 3
+        assert metrics['read_only_checkouts'] == 1
+        assert metrics['cursors_created'] == 1
+        assert metrics['checkout_time_max_ms'] >= metrics['checkout_time_avg_ms'] >= 0
+
+    def test_motherduck_health_check_reconnects(self, monkeypatch):
+        """Для md: цели потерянное подключение прозрачно переоткрывается"""
+        opened = []
+
+        def fake_open(self):
+            conn = duckdb.connect(':memory:')
+            opened.append(conn)
+            return conn
+
+        monkeypatch.setattr(ConnectionManager, '_open', fake_open)
+        manager = ConnectionManager("md:test_db", health_check_interval=0)
+
+        first = manager.cursor()
+        opened[0].close()
+        second = manager.cursor()
+
+        assert len(opened) == 2
+        assert second is not first
+        assert second.execute("SELECT 42").fetchone()[0] == 42
+        metrics = manager.get_metrics()
+        assert metrics['reconnects'] == 1
+        assert metrics['health_check_failures'] == 1
+        manager.close()
+
+    def test_single_manager_per_target(self, tmp_path):
+        """get_connection_manager возвращает один менеджер на цель"""
+        target = str(tmp_path / "shared.duckdb")
+        try:
+            assert get_connection_manager(target) is get_connection_manager(target)
+            assert get_connection_manager(target) is not get_connection_manager(str(tmp_path / "other.duckdb"))
+        finally:
+            close_all_connections()
+
+    def test_schema_connection_is_thread_cursor(self, tmp_path, monkeypatch):
+        """get_connection_and_ensure_schema создает схему и отдает курсор потока, а не базовое подключение"""
+        from utils import db_connection_manager
+        from utils.db_connection import get_connection_and_ensure_schema
+
+        target = str(tmp_path / "schema.duckdb")
+        monkeypatch.setattr(db_connection_manager, 'resolve_db_target', lambda: target)
+        try:
+            cursor = get_connection_and_ensure_schema()
+            manager = get_connection_manager(target)
+
+            assert cursor is manager.cursor()
+            assert cursor is not manager.get_connection()
+            assert cursor.execute(
+                "SELECT COUNT(*) FROM duckdb_tables() WHERE table_name = 'wb_products'"
+            ).fetchone()[0] == 1
+        finally:
+            close_all_connections()
@@ -0,0 +1,143 @@
+"""
+Unit тесты для инкрементального импорта (utils.incremental_import и режим incremental в db_crud).
+"""
+
+import io
+
+import pandas as pd
+import pytest
+import duckdb
+
+from utils.csv_sql_import import csv_source_paths
+from utils.db_crud import import_csv_files_native, import_data_from_batches
+from utils.incremental_import import (
+    IMPORT_HISTORY_TABLE,
+    apply_incremental_import,
+    create_staging_table,
+    get_natural_key,
+    staging_table_name,
+)
+
+PRICES_COLUMNS = ["Артикул WB", "Остатки WB", "Текущая цена", "Текущая скидка"]
+
+
+@pytest.fixture
+def conn():
+    conn = duckdb.connect(':memory:')
+    conn.execute("""
+        CREATE TABLE wb_prices (wb_sku BIGINT, wb_fbo_stock INTEGER, wb_full_price INTEGER, wb_discount INTEGER)
+    """)
+    conn.execute("CREATE INDEX idx_test_prices_sku ON wb_prices(wb_sku)")
+    conn.execute("INSERT INTO wb_prices VALUES (1, 5, 1000, 10), (2, 3, 2000, 20), (3, 0, 3000, 30)")
+    yield conn
+    conn.close()
+
+
+def _prices(rows):
+    return pd.DataFrame(rows, columns=PRICES_COLUMNS)
+
+
+def _table(conn):
+    return conn.execute("SELECT * FROM wb_prices ORDER BY wb_sku").fetchall()
+
+
+class TestApplyIncrementalImport:
+    """Тесты сравнения staging с таблицей по естественному ключу"""
+
+    def test_insert_update_delete_counts(self, conn):
+        """Новые строки вставляются, измененные обновляются, отсутствующие удаляются"""
+        create_staging_table(conn, "wb_prices")
+        conn.execute(f"INSERT INTO {staging_table_name('wb_prices')} VALUES (1, 5, 1000, 10), (2, 7, 2000, 20), (4, 1, 4000, 40)")
+
+        stats = apply_incremental_import(conn, "wb_prices", ["wb_sku"])
+
+        assert stats == {'inserted': 1, 'updated': 1, 'deleted': 1, 'unchanged': 1, 'full_reload': 0}
+        assert _table(conn) == [(1, 5, 1000, 10), (2, 7, 2000, 20), (4, 1, 4000, 40)]
+        history = conn.execute(f"SELECT mode, inserted, updated, deleted FROM {IMPORT_HISTORY_TABLE}").fetchall()
+        assert history == [('incremental', 1, 1, 1)]
+        assert conn.execute(
+            "SELECT COUNT(*) FROM duckdb_tables() WHERE table_name = ?", [staging_table_name('wb_prices')]
+        ).fetchone()[0] == 0
+
+    def test_null_values_compared_as_values(self, conn):
+        """NULL в неключевой колонке - изменение; одинаковые NULL - без изменений"""
+        conn.execute("UPDATE wb_prices SET wb_discount = NULL WHERE wb_sku = 1")
+        create_staging_table(conn, "wb_prices")
+        conn.execute(f"INSERT INTO {staging_table_name('wb_prices')} VALUES (1, 5, 1000, NULL), (2, 3, 2000, NULL), (3, 0, 3000, 30)")
+
+        stats = apply_incremental_import(conn, "wb_prices", ["wb_sku"])
+
+        assert (stats['updated'], stats['unchanged']) == (1, 2)
+
+    def test_duplicate_keys_reload_table(self, conn):
+        """Неуникальный ключ в отчете - полная перезагрузка"""
+        create_staging_table(conn, "wb_prices")
+        conn.execute(f"INSERT INTO {staging_table_name('wb_prices')} VALUES (1, 1, 1, 1), (1, 2, 2, 2)")
+
+        stats = apply_incremental_import(conn, "wb_prices", ["wb_sku"])
+
+        assert stats['full_reload'] == 1 and stats['deleted'] == 3
+        assert len(_table(conn)) == 2
+
+    def test_schema_keys(self):
+        """Естественные ключи заданы в схеме"""
+        assert get_natural_key("oz_barcodes") == ['oz_barcode', 'oz_product_id']
+        assert get_natural_key("wb_products") is None
+
+
+class TestIncrementalImportModes:
+    """Режим incremental в функциях импорта db_crud"""
+
+    def test_batches_incremental(self, conn):
+        """Пакетный импорт применяет только изменения"""
+        batches = iter([_prices([["1", 5, 1000, 10], ["2", 9, 2000, 20]]), _prices([["5", 1, 500, 5]])])
+
+        success, count, message = import_data_from_batches(conn, batches, "wb_prices", incremental=True)
+
+        assert success, message
+        assert count == 3
+        assert _table(conn) == [(1, 5, 1000, 10), (2, 9, 2000, 20), (5, 1, 500, 5)]
+
+    def test_failed_batch_keeps_table(self, conn):
+        """Ошибка чтения в инкрементальном режиме не затрагивает таблицу"""
+        def broken_batches():
+            yield _prices([["1", 1, 1, 1]])
+            raise ValueError("broken file")
+
+        success, _, message = import_data_from_batches(conn, broken_batches(), "wb_prices", incremental=True)
+
+        assert not success and "broken file" in message
+        assert _table(conn) == [(1, 5, 1000, 10), (2, 3, 2000, 20), (3, 0, 3000, 30)]
+
+    def test_skipped_file_cancels_incremental(self, conn):
+        """Пропущенный файл отменяет инкрементальный импорт: его строки не удаляются как отсутствующие"""
+        read_errors = [("broken.xlsx", "bad zip")]
+        batches = iter([_prices([["1", 9, 1000, 10]])])
+
+        success, _, message = import_data_from_batches(
+            conn, batches, "wb_prices", incremental=True, read_errors=read_errors
+        )
+
+        assert not success and "broken.xlsx" in message
+        assert _table(conn) == [(1, 5, 1000, 10), (2, 3, 2000, 20), (3, 0, 3000, 30)]
+        assert conn.execute(
+            "SELECT COUNT(*) FROM duckdb_tables() WHERE table_name = ?", [staging_table_name('wb_prices')]
+        ).fetchone()[0] == 0
+
+    def test_native_csv_incremental(self):
+        """Быстрый импорт CSV в инкрементальном режиме"""
+        conn = duckdb.connect(':memory:')
+        header = "Номер заказа;Номер отправления;Принят в обработку;Статус;OZON id;Артикул\n"
+        first = header + "1;1-1;2024-05-01;Доставлен;11;A\n2;2-1;2024-05-01;Доставлен;22;B\n"
+        second = header + "1;1-1;2024-05-01;Отменен;11;A\n3;3-1;2024-05-02;Доставлен;33;C\n"
+
+        for content in (first, second):
+            with csv_source_paths([io.BytesIO(content.encode("utf-8"))]) as paths:
+                success, _, message = import_csv_files_native(conn, paths, "oz_orders", incremental=True)
+            assert success, message
+
+        rows = conn.execute("SELECT oz_order_number, order_status FROM oz_orders ORDER BY ALL").fetchall()
+        assert rows == [('1', 'Отменен'), ('3', 'Доставлен')]
+        modes = conn.execute(f"SELECT inserted, updated, deleted FROM {IMPORT_HISTORY_TABLE}").fetchall()
+        assert modes == [(2, 0, 0), (1, 1, 1)]
+        conn.close()
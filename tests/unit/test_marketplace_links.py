@@ -0,0 +1,143 @@
+"""
+Unit тесты для материализованной таблицы связей marketplace_links.
+"""
+
+import random
+
+import pytest
+import duckdb
+
+from utils.cross_marketplace_linker import CrossMarketplaceLinker
+from utils.marketplace_links import (
+    MARKETPLACE_LINKS_TABLE,
+    get_marketplace_links,
+    marketplace_links_exists,
+    rebuild_marketplace_links,
+)
+
+
+@pytest.fixture
+def links_db():
+    """БД в памяти со случайными пересечениями штрихкодов WB и Ozon"""
+    rng = random.Random(42)
+    conn = duckdb.connect(':memory:')
+    conn.execute("""
+        CREATE TABLE wb_products (
+            wb_sku BIGINT, wb_barcodes VARCHAR, wb_category VARCHAR, wb_brand VARCHAR, wb_size INTEGER
+        )
+    """)
+    conn.execute("""
+        CREATE TABLE oz_products (
+            oz_vendor_code VARCHAR, oz_product_id BIGINT, oz_sku BIGINT, oz_brand VARCHAR,
+            oz_product_status VARCHAR, oz_actual_price DOUBLE, oz_fbo_stock INTEGER
+        )
+    """)
+    conn.execute("CREATE TABLE oz_barcodes (oz_vendor_code VARCHAR, oz_product_id BIGINT, oz_barcode VARCHAR)")
+
+    barcodes = [f"46{i:011d}" for i in range(600)]
+    wb_rows = [
+        (1000 + i, ';'.join(rng.sample(barcodes, rng.randint(1, 4))), 'Обувь', 'TestBrand', 38)
+        for i in range(80)
+    ]
+    conn.executemany("INSERT INTO wb_products VALUES (?, ?, ?, ?, ?)", wb_rows)
+
+    oz_rows = []
+    oz_barcode_rows = []
+    for i in range(120):
+        oz_rows.append((f"VC-{i}", i, 50000 + i, 'TestBrand', 'Продается', 1000.0, i % 3))
+        for barcode in rng.sample(barcodes, rng.randint(1, 5)):
+            oz_barcode_rows.append((f"VC-{i}", i, barcode))
+    conn.executemany("INSERT INTO oz_products VALUES (?, ?, ?, ?, ?, ?, ?)", oz_rows)
+    conn.executemany("INSERT INTO oz_barcodes VALUES (?, ?, ?)", oz_barcode_rows)
+
+    yield conn
+    conn.close()
+
+
+class TestMarketplaceLinks:
+    """Тесты построения marketplace_links и чтения связей линкером"""
+
+    def test_flags_match_linker_loop(self, links_db):
+        """Флаги из оконных функций совпадают с расчетом _normalize_and_merge_barcodes"""
+        expected = CrossMarketplaceLinker(links_db)._normalize_and_merge_barcodes()
+
+        success, rows, _ = rebuild_marketplace_links(links_db)
+        actual = get_marketplace_links(links_db)
+
+        assert success is True
+        assert rows == len(expected) > 0
+
+        columns = ['wb_sku', 'barcode', 'oz_sku', 'oz_vendor_code',
+                   'is_actual_oz_barcode', 'is_primary_barcode']
+        expected = expected[columns].astype(str).sort_values(columns[:4]).reset_index(drop=True)
+        actual = actual[columns].astype(str).sort_values(columns[:4]).reset_index(drop=True)
+        assert expected.equals(actual)
+
+    def test_filtered_flags_match_linker(self, links_db):
+        """С фильтром по wb_sku флаги считаются по отфильтрованным связям, как на лету"""
+        links_db.execute("INSERT INTO wb_products VALUES (9001, '2000000000001', 'Обувь', 'TestBrand', 38)")
+        links_db.execute("INSERT INTO wb_products VALUES (9002, '2000000000002', 'Обувь', 'TestBrand', 38)")
+        links_db.execute("INSERT INTO oz_products VALUES ('VC-X', 900, 59000, 'TestBrand', 'Продается', 1000.0, 1)")
+        links_db.execute("INSERT INTO oz_barcodes VALUES ('VC-X', 900, '2000000000001'), ('VC-X', 900, '2000000000002')")
+        linker = CrossMarketplaceLinker(links_db)
+        expected = linker._normalize_and_merge_barcodes(wb_skus=['9001'])
+
+        rebuild_marketplace_links(links_db)
+        stored = links_db.execute(
+            f"SELECT is_actual_oz_barcode FROM {MARKETPLACE_LINKS_TABLE} WHERE wb_sku = 9001"
+        ).fetchone()[0]
+        actual = get_marketplace_links(links_db, wb_skus=['9001'])
+
+        # По всей базе актуален второй штрихкод VC-X, в выборке по 9001 - единственный совпавший
+        assert stored is False
+        assert actual['is_actual_oz_barcode'].tolist() == expected['is_actual_oz_barcode'].tolist() == [True]
+        assert actual['is_primary_barcode'].tolist() == expected['is_primary_barcode'].tolist() == [True]
+
+    def test_linker_reads_table(self, links_db):
+        """Методы линкера возвращают те же связи при наличии таблицы"""
+        linker = CrossMarketplaceLinker(links_db)
+        wb_skus = [str(1000 + i) for i in range(20)]
+        before = linker.get_bidirectional_links(wb_skus=wb_skus)
+
+        rebuild_marketplace_links(links_db)
+        assert marketplace_links_exists(links_db)
+        after = linker.get_bidirectional_links(wb_skus=wb_skus)
+
+        pairs_before = set(zip(before['wb_sku'], before['oz_sku']))
+        pairs_after = set(zip(after['wb_sku'], after['oz_sku']))
+        assert pairs_before == pairs_after
+        assert list(after.columns) == ['wb_sku', 'oz_sku', 'oz_vendor_code', 'oz_product_id', 'common_barcode']
+
+    def test_extended_links_include_product_details(self, links_db):
+        """get_extended_links добавляет поля oz_products одним запросом к таблице"""
+        rebuild_marketplace_links(links_db)
+        linker = CrossMarketplaceLinker(links_db)
+
+        linked_wb_sku = links_db.execute(
+            f"SELECT CAST(MIN(wb_sku) AS VARCHAR) FROM {MARKETPLACE_LINKS_TABLE}"
+        ).fetchone()[0]
+        result = linker.get_extended_links([linked_wb_sku])
+
+        assert not result.empty
+        assert {'oz_brand', 'oz_product_status', 'oz_actual_price', 'oz_fbo_stock'} <= set(result.columns)
+        assert (result['wb_sku'] == linked_wb_sku).all()
+
+    def test_cleanup_rebuilds_links_and_bumps_version(self, links_db):
+        """Очистка таблицы пересобирает связи и сбрасывает кэш кандидатов WB"""
+        from utils.db_cleanup import clear_table_completely
+        from utils.wb_candidate_cache import get_candidate_data_version
+
+        rebuild_marketplace_links(links_db)
+        version_before = get_candidate_data_version(links_db)
+
+        success, _, _ = clear_table_completely(links_db, 'oz_products')
+
+        assert success is True
+        assert links_db.execute(f"SELECT COUNT(*) FROM {MARKETPLACE_LINKS_TABLE}").fetchone()[0] == 0
+        assert get_candidate_data_version(links_db) > version_before
+
+    def test_invalid_filter_returns_empty(self, links_db):
+        """Фильтр без валидных SKU возвращает пустой результат, а не всю таблицу"""
+        rebuild_marketplace_links(links_db)
+
+        assert get_marketplace_links(links_db, wb_skus=['abc']).empty
@@ -0,0 +1,127 @@
+"""
+Unit тесты колоночного расчета score Ozon рекомендаций.
+"""
+
+import random
+
+import numpy as np
+import pytest
+
+from utils.rich_content_oz import (
+    CandidateMatrix,
+    ProductInfo,
+    RecommendationEngine,
+    RichContentProcessor,
+    ScoringConfig,
+)
+from utils.scoring_config_optimized import get_config_presets
+from utils.vectorized_scoring import top_k_indices
+
+
+def _random_product(rng: random.Random, index: int) -> ProductInfo:
+    """Случайный товар с пустыми значениями и разным регистром"""
+    def pick(values):
+        return rng.choice(values + [None, ''])
+
+    return ProductInfo(
+        oz_vendor_code=f"VC-{index}",
+        type='Сабо',
+        gender='Женский',
+        oz_brand='TestBrand',
+        russian_size=pick(['37', '38', '38,5']),
+        season=pick(['Лето', 'лето', 'Зима']),
+        color=pick(['Белый', 'белый', 'черный']),
+        fastener_type=pick(['Без застёжки', 'без застёжки', 'Липучки']),
+        oz_fbo_stock=rng.choice([0, 1, 2, 3, 5, 6, 40]),
+        material_short=pick(['Экокожа', 'ЭКОКОЖА', 'Текстиль']),
+        new_last=pick(['N1', 'n1', 'N2']),
+        mega_last=pick(['M1', 'M2']),
+        best_last=pick(['B1', 'B2']),
+        model_name=pick(['Модель А', 'модель а', 'Модель Б']),
+    )
+
+
+@pytest.fixture
+def products():
+    rng = random.Random(2025)
+    return [_random_product(rng, i) for i in range(400)]
+
+
+def _all_configs():
+    configs = {name: ScoringConfig.get_preset(name) for name in
+               ['balanced', 'size_focused', 'seasonal', 'material_focused', 'conservative']}
+    configs.update({f"optimized:{name}": config for name, config in get_config_presets().items()})
+    return configs
+
+
+class TestOzonVectorizedScoring:
+    """Сравнение колоночного расчета со скалярными методами RecommendationEngine"""
+
+    @pytest.mark.parametrize('preset', list(_all_configs()))
+    def test_matches_scalar_scores(self, products, preset):
+        """Полный и базовый score совпадают со скалярным расчетом для всех конфигураций"""
+        config = _all_configs()[preset]
+        engine = RecommendationEngine(None, config)
+        matrix = CandidateMatrix(products)
+
+        for source in products[:30]:
+            expected = [engine.calculate_similarity_score(source, c) for c in products]
+            assert matrix.score(source, config).tolist() == expected
+
+            expected_base = [engine._calculate_base_similarity_score(source, c) for c in products]
+            assert matrix.score(source, config, include_punta=False).tolist() == expected_base
+
+    def test_select_matches_full_sort(self, products):
+        """Отбор через argpartition совпадает с фильтром и полной сортировкой"""
+        config = ScoringConfig(max_recommendations=8, min_recommendations=1)
+        processor = RichContentProcessor(None, config)
+        engine = processor.recommendation_engine
+        matrix = CandidateMatrix(products)
+
+        for source in products[:30]:
+            expected = []
+            for candidate in products:
+                if candidate.oz_vendor_code == source.oz_vendor_code:
+                    continue
+                score = engine.calculate_similarity_score(source, candidate)
+                if score >= config.min_score_threshold:
+                    expected.append((candidate.oz_vendor_code, score))
+            expected.sort(key=lambda item: item[1], reverse=True)
+            expected = expected[:config.max_recommendations]
+
+            actual = processor._find_recommendations_from_candidates(source, products, matrix)
+            assert [(r.product_info.oz_vendor_code, r.score) for r in actual] == expected
+            assert all(r.match_details for r in actual)
+
+    def test_engine_switches_mode(self, products):
+        """vectorized_scoring=False возвращает те же score скалярным путем"""
+        source = products[0]
+        vectorized = RecommendationEngine(None, ScoringConfig())
+        scalar = RecommendationEngine(None, ScoringConfig(vectorized_scoring=False))
+
+        assert (vectorized.calculate_similarity_scores(source, products).tolist()
+                == scalar.calculate_similarity_scores(source, products).tolist())
+        assert (vectorized.calculate_similarity_scores(source, products, include_punta=False).tolist()
+                == scalar.calculate_similarity_scores(source, products, include_punta=False).tolist())
+
+
+class TestTopKIndices:
+    """Тесты отбора лучших кандидатов через argpartition"""
+
+    def test_ties_keep_original_order(self):
+        """При равных score порядок как у устойчивой сортировки, в том числе на границе"""
+        rng = np.random.default_rng(7)
+        for _ in range(200):
+            scores = rng.integers(0, 6, size=rng.integers(1, 40)).astype(float)
+            k = int(rng.integers(1, 12))
+            expected = sorted(range(len(scores)), key=lambda i: scores[i], reverse=True)[:k]
+            assert top_k_indices(scores, k).tolist() == expected
+
+    def test_mask_and_empty(self):
+        """Маска исключает кандидатов, пустой выбор возвращает пустой массив"""
+        scores = np.array([5.0, 9.0, 7.0, 9.0])
+        mask = np.array([True, False, True, True])
+
+        assert top_k_indices(scores, 2, mask).tolist() == [3, 2]
+        assert top_k_indices(scores, 0).tolist() == []
+        assert top_k_indices(scores, 3, np.zeros(4, dtype=bool)).tolist() == []
@@ -0,0 +1,117 @@
+"""
+Unit тесты векторного расчета is_primary_barcode в CrossMarketplaceLinker.
+"""
+
+import time
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from utils.cross_marketplace_linker import CrossMarketplaceLinker
+
+
+def _loop_primary_barcodes(linked_df: pd.DataFrame) -> pd.Series:
+    """Эталон: прежний цикл по комбинациям wb_sku + oz_vendor_code"""
+    linked_df = linked_df.copy()
+    wb_oz_combinations = linked_df[['wb_sku', 'oz_vendor_code']].drop_duplicates()
+    linked_df['is_primary_barcode'] = False
+
+    for _, combo in wb_oz_combinations.iterrows():
+        wb_sku = combo['wb_sku']
+        oz_vendor_code = combo['oz_vendor_code']
+        combo_links = linked_df[
+            (linked_df['wb_sku'] == wb_sku) &
+            (linked_df['oz_vendor_code'] == oz_vendor_code)
+        ].copy()
+
+        if combo_links['is_actual_oz_barcode'].any():
+            actual_oz_links = combo_links[combo_links['is_actual_oz_barcode']]
+            min_wb_position = actual_oz_links['barcode_position'].min()
+            mask = (
+                (linked_df['wb_sku'] == wb_sku) &
+                (linked_df['oz_vendor_code'] == oz_vendor_code) &
+                (linked_df['is_actual_oz_barcode']) &
+                (linked_df['barcode_position'] == min_wb_position)
+            )
+            linked_df.loc[mask, 'is_primary_barcode'] = True
+
+    return linked_df['is_primary_barcode']
+
+
+def _make_links(n_links: int, n_combinations: int, seed: int = 7) -> pd.DataFrame:
+    """Синтетические связи с повторяющимися позициями и несколькими актуальными штрихкодами"""
+    rng = np.random.default_rng(seed)
+    combo_ids = rng.integers(0, n_combinations, n_links)
+    return pd.DataFrame({
+        'wb_sku': (100000 + combo_ids // 3).astype(str),
+        'barcode': rng.integers(10**12, 10**13, n_links).astype(str),
+        'barcode_position': rng.integers(1, 6, n_links),
+        'oz_sku': rng.integers(200000, 300000, n_links).astype(str),
+        'oz_vendor_code': np.char.add('VC-', (combo_ids % 997).astype(str)),
+        'is_actual_oz_barcode': rng.random(n_links) < 0.3,
+    })
+
+
+class TestPrimaryBarcodeVectorized:
+    """Сравнение векторного расчета с прежним циклом"""
+
+    def test_matches_loop_exactly(self):
+        """На небольшой выборке результат совпадает с циклом по всей таблице"""
+        links = _make_links(2000, n_combinations=300)
+
+        expected = _loop_primary_barcodes(links)
+        actual = CrossMarketplaceLinker._mark_primary_barcodes(links)
+
+        assert actual.dtype == bool
+        assert actual.tolist() == expected.tolist()
+
+    def test_matches_loop_on_100k_links(self):
+        """На 100k связей результат совпадает с циклом, примененным к каждой комбинации"""
+        links = _make_links(100_000, n_combinations=2000)
+
+        start = time.perf_counter()
+        actual = CrossMarketplaceLinker._mark_primary_barcodes(links)
+        elapsed = time.perf_counter() - start
+
+        # Цикл по всей таблице квадратичен, поэтому эталон считается по группам:
+        # внутри одной комбинации логика цикла та же самая
+        expected = pd.concat([
+            _loop_primary_barcodes(group)
+            for _, group in links.groupby(['wb_sku', 'oz_vendor_code'], sort=False)
+        ]).reindex(links.index)
+
+        assert actual.tolist() == expected.tolist()
+        assert actual.sum() > 0
+        assert elapsed < 2.0
+
+    def test_missing_position_and_no_actual(self):
+        """Комбинации без актуального штрихкода и позиции NaN не помечаются"""
+        links = pd.DataFrame({
+            'wb_sku': ['1', '1', '1', '2', '2'],
+            'oz_vendor_code': ['A', 'A', 'A', 'B', 'B'],
+            'barcode_position': [2, 1, np.nan, 1, 2],
+            'is_actual_oz_barcode': [True, False, True, False, False],
+        })
+
+        result = CrossMarketplaceLinker._mark_primary_barcodes(links)
+
+        assert result.tolist() == _loop_primary_barcodes(links).tolist()
+        assert result.tolist() == [True, False, False, False, False]
+
+    @pytest.mark.parametrize('method', ['link_wb_to_oz', 'link_oz_to_wb'])
+    def test_link_methods_group_in_one_pass(self, method, monkeypatch):
+        """link_wb_to_oz / link_oz_to_wb сохраняют порядок и уникальность SKU"""
+        links = pd.DataFrame({
+            'wb_sku': ['10', '10', '11', '10'],
+            'oz_sku': ['7', '8', '7', '7'],
+        })
+        linker = CrossMarketplaceLinker(connection=None)
+        monkeypatch.setattr(linker, '_get_linked_barcodes', lambda *args, **kwargs: links)
+
+        if method == 'link_wb_to_oz':
+            result = CrossMarketplaceLinker.link_wb_to_oz.__wrapped__(linker, ['11', '10', '12'])
+            assert result == {'11': ['7'], '10': ['7', '8']}
+        else:
+            result = CrossMarketplaceLinker.link_oz_to_wb.__wrapped__(linker, ['8', '7'])
+            assert result == {'8': ['10'], '7': ['10', '11']}
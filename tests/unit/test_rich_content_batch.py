@@ -0,0 +1,365 @@
+"""
+Unit тесты пакетных операций Rich Content: загрузка товаров, разрешение oz_sku
+и сохранение JSON батчем.
+"""
+
+import threading
+
+import pytest
+import duckdb
+from unittest.mock import patch
+
+from utils.rich_content_oz import (
+    ProcessingResult,
+    ProcessingStatus,
+    ProductDataCollector,
+    ProductInfo,
+    Recommendation,
+    RichContentGenerator,
+    RichContentProcessor,
+    ScoringConfig,
+)
+
+
+@pytest.fixture
+def rich_db():
+    """БД в памяти со схемой таблиц, используемой rich_content_oz"""
+    conn = duckdb.connect(':memory:')
+    conn.execute("""
+        CREATE TABLE oz_category_products (
+            oz_vendor_code VARCHAR, product_name VARCHAR, type VARCHAR, gender VARCHAR,
+            oz_brand VARCHAR, russian_size VARCHAR, season VARCHAR, color VARCHAR,
+            fastener_type VARCHAR, main_photo_url VARCHAR, rich_content_json VARCHAR
+        )
+    """)
+    conn.execute("""
+        CREATE TABLE oz_products (
+            oz_vendor_code VARCHAR, oz_product_id BIGINT, oz_sku BIGINT, oz_fbo_stock INTEGER
+        )
+    """)
+    conn.execute("CREATE TABLE oz_barcodes (oz_vendor_code VARCHAR, oz_product_id BIGINT, oz_barcode VARCHAR)")
+    conn.execute("CREATE TABLE wb_products (wb_sku BIGINT, wb_barcodes VARCHAR)")
+    conn.execute("""
+        CREATE TABLE punta_table (
+            wb_sku BIGINT, material_short VARCHAR, new_last VARCHAR,
+            mega_last VARCHAR, best_last VARCHAR, model_name VARCHAR
+        )
+    """)
+
+    products = [
+        # vendor_code, size, color, stock
+        ('BASE-001', '38', 'белый', 5),
+        ('SIM-001', '38', 'черный', 10),
+        ('SIM-002', '38,0', 'белый', 15),
+        ('SIM-003', '38', 'белый', 3),
+        ('SIM-004', '38', 'бежевый', 7),
+    ]
+    for i, (code, size, color, stock) in enumerate(products):
+        conn.execute(
+            "INSERT INTO oz_category_products VALUES (?, ?, 'Сабо', 'Женский', 'TestBrand', ?, 'Лето', ?, 'Без застёжки', ?, NULL)",
+            [code, f"Сабо {code}", size, color, f"https://example.com/{code}.jpg"]
+        )
+        conn.execute("INSERT INTO oz_products VALUES (?, ?, ?, ?)", [code, i, 900000 + i, stock])
+        conn.execute("INSERT INTO oz_barcodes VALUES (?, ?, ?)", [code, i, f"46000000000{i}"])
+        if i < 3:
+            conn.execute("INSERT INTO wb_products VALUES (?, ?)", [10000 + i, f"46000000000{i}"])
+            conn.execute(
+                "INSERT INTO punta_table VALUES (?, 'Экокожа', 'Standard', NULL, NULL, ?)",
+                [10000 + i, f"Model-{i}"]
+            )
+
+    yield conn
+    conn.close()
+
+
+class CountingConnection:
+    """Прокси подключения, считающий выполненные запросы"""
+
+    def __init__(self, conn):
+        self._conn = conn
+        self.queries = []
+
+    def execute(self, query, *args):
+        self.queries.append(query)
+        return self._conn.execute(query, *args)
+
+    def __getattr__(self, name):
+        return getattr(self._conn, name)
+
+
+class TestBulkProductInfo:
+    """Тесты пакетной загрузки ProductInfo"""
+
+    def test_bulk_matches_single(self, rich_db):
+        """Пакетная загрузка возвращает те же данные, что и поштучная, включая punta"""
+        codes = ['BASE-001', 'SIM-001', 'SIM-002', 'SIM-004', 'MISSING-001', 'SIM-001']
+
+        bulk = ProductDataCollector(rich_db).get_full_product_info_bulk(codes)
+        single_collector = ProductDataCollector(rich_db)
+
+        assert set(bulk) == {'BASE-001', 'SIM-001', 'SIM-002', 'SIM-004'}
+        for code, product in bulk.items():
+            assert product == single_collector.get_full_product_info(code)
+        assert bulk['SIM-002'].russian_size == '38'
+        assert bulk['BASE-001'].has_punta_data is True
+        assert bulk['BASE-001'].wb_sku == 10000
+        assert bulk['SIM-004'].has_punta_data is False
+
+    def test_bulk_uses_cache(self, rich_db):
+        """Пакетная загрузка берет из кэша уже загруженные товары и наполняет кэш"""
+        collector = ProductDataCollector(rich_db)
+        cached = collector.get_full_product_info('BASE-001')
+
+        bulk = collector.get_full_product_info_bulk(['BASE-001', 'SIM-003'])
+
+        assert bulk['BASE-001'] is cached
+        assert collector.get_full_product_info('SIM-003') is bulk['SIM-003']
+
+    def test_process_batch_chunk_uses_bulk_loading(self, rich_db):
+        """Батч обработки загружает товары одним пакетным запросом"""
+        processor = RichContentProcessor(rich_db)
+        collector = processor.recommendation_engine.data_collector
+
+        with patch.object(collector, 'get_full_product_info', wraps=collector.get_full_product_info) as single, \
+             patch.object(collector, 'get_full_product_info_bulk', wraps=collector.get_full_product_info_bulk) as bulk:
+            results = processor._process_batch_chunk(['BASE-001', 'SIM-001', 'MISSING-001'])
+
+        bulk.assert_called_once()
+        single.assert_not_called()
+        assert {r.oz_vendor_code for r in results} == {'BASE-001', 'SIM-001'}
+
+
+def _result(vendor_code, status=ProcessingStatus.SUCCESS, payload='{"content": []}'):
+    return ProcessingResult(
+        oz_vendor_code=vendor_code,
+        status=status,
+        recommendations=[],
+        rich_content_json=payload
+    )
+
+
+class TestBatchRichContentSave:
+    """Тесты пакетного сохранения Rich Content JSON"""
+
+    def test_batch_save_updates_rows(self, rich_db):
+        """Успешные результаты сохраняются, неуспешные пропускаются"""
+        processor = RichContentProcessor(rich_db)
+        results = [
+            _result('BASE-001', payload='{"v": 1}'),
+            _result('SIM-001', payload='{"v": 2}'),
+            _result('SIM-002', status=ProcessingStatus.NO_SIMILAR),
+            _result('MISSING-001'),
+            _result('BASE-001', payload='{"v": 3}'),
+        ]
+
+        stats = processor.save_rich_content_batch(results, chunk_size=2)
+
+        assert stats['success'] is True
+        assert stats['staged'] == 3
+        assert stats['skipped'] == 2
+        assert stats['updated_rows'] == 2
+        assert stats['chunks'] == 2
+        assert stats['total_time'] >= stats['stage_time'] + stats['update_time'] - 1e-6
+        saved = dict(rich_db.execute("""
+            SELECT oz_vendor_code, rich_content_json FROM oz_category_products
+            WHERE rich_content_json IS NOT NULL
+        """).fetchall())
+        assert saved == {'BASE-001': '{"v": 3}', 'SIM-001': '{"v": 2}'}
+
+    def test_batch_save_rolls_back_on_error(self, rich_db):
+        """При ошибке изменения всех чанков откатываются"""
+        processor = RichContentProcessor(rich_db)
+        results = [_result('BASE-001'), _result('SIM-001')]
+        original_execute = rich_db.execute
+        update_calls = []
+
+        class FailingConnection:
+            def __getattr__(self, name):
+                return getattr(rich_db, name)
+
+            def execute(self, query, *args):
+                if query.strip().startswith('UPDATE'):
+                    update_calls.append(query)
+                    if len(update_calls) == 2:
+                        raise RuntimeError("disk full")
+                return original_execute(query, *args)
+
+        processor.db_conn = FailingConnection()
+        stats = processor.save_rich_content_batch(results, chunk_size=1)
+
+        assert stats['success'] is False
+        assert 'disk full' in stats['error']
+        assert rich_db.execute(
+            "SELECT COUNT(*) FROM oz_category_products WHERE rich_content_json IS NOT NULL"
+        ).fetchone()[0] == 0
+
+    def test_single_save_uses_batch(self, rich_db):
+        """save_rich_content_to_database сохраняет один результат через пакетный путь"""
+        processor = RichContentProcessor(rich_db)
+
+        assert processor.save_rich_content_to_database(_result('SIM-001', payload='{"v": 5}')) is True
+        assert processor.save_rich_content_to_database(_result('SIM-002', status=ProcessingStatus.ERROR)) is False
+        assert rich_db.execute(
+            "SELECT oz_vendor_code, rich_content_json FROM oz_category_products WHERE rich_content_json IS NOT NULL"
+        ).fetchall() == [('SIM-001', '{"v": 5}')]
+
+    def test_batch_save_empty(self, rich_db):
+        """Без успешных результатов запросы к БД не выполняются"""
+        processor = RichContentProcessor(rich_db)
+
+        stats = processor.save_rich_content_batch([_result('BASE-001', status=ProcessingStatus.ERROR)])
+
+        assert stats['staged'] == 0
+        assert stats['chunks'] == 0
+
+
+class TestOzSkuResolver:
+    """Тесты кэшированного разрешения oz_sku в RichContentGenerator"""
+
+    def _recommendations(self, codes):
+        return [
+            Recommendation(
+                product_info=ProductInfo(oz_vendor_code=code, type='Сабо', gender='Женский', oz_brand='TestBrand'),
+                score=100.0,
+                match_details=''
+            )
+            for code in codes
+        ]
+
+    def test_json_generation_uses_one_query(self, rich_db):
+        """Генерация JSON разрешает oz_sku всех блоков одним запросом"""
+        conn = CountingConnection(rich_db)
+        generator = RichContentGenerator(db_conn=conn)
+        recommendations = self._recommendations(['SIM-001', 'SIM-002', 'SIM-003', 'MISSING-001'])
+
+        first = generator.generate_rich_content_json(recommendations, template_type="ozon_showcase")
+        second = generator.generate_rich_content_json(recommendations, template_type="ozon_showcase")
+
+        assert len(conn.queries) == 1
+        assert first == second
+        assert 'https://www.ozon.ru/product/900001' in first
+        assert 'https://www.ozon.ru/brand/shuzzi-149479977/' in first
+
+    def test_resolver_matches_point_lookup(self, rich_db):
+        """Предзагруженные значения совпадают с точечными запросами"""
+        codes = ['BASE-001', 'SIM-004', 'MISSING-001']
+        preloaded = RichContentGenerator(db_conn=rich_db)
+        preloaded.preload_oz_skus(codes)
+        point = RichContentGenerator(db_conn=rich_db)
+
+        for code in codes:
+            assert preloaded._get_ozon_sku(code) == point._get_ozon_sku(code)
+            assert preloaded._get_ozon_product_url(code) == point._get_ozon_product_url(code)
+        assert preloaded._get_ozon_sku('MISSING-001') == 'MISSING-001'
+
+    def test_cache_refreshed_after_reimport(self, rich_db):
+        """После импорта oz_products (новая версия данных) кэш oz_sku сбрасывается при следующем пакете"""
+        from utils.wb_candidate_cache import bump_data_version
+        generator = RichContentGenerator(db_conn=rich_db)
+        generator.refresh_oz_sku_cache()
+        generator.preload_oz_skus(['SIM-001'])
+        old_sku = generator._get_ozon_sku('SIM-001')
+
+        rich_db.execute("UPDATE oz_products SET oz_sku = 777777 WHERE oz_vendor_code = 'SIM-001'")
+        generator.refresh_oz_sku_cache()
+        assert generator._get_ozon_sku('SIM-001') == old_sku
+
+        bump_data_version(rich_db, "oz_products")
+        generator.refresh_oz_sku_cache()
+        assert generator._get_ozon_sku('SIM-001') == '777777'
+
+    def test_cache_size_bounded(self, rich_db, monkeypatch):
+        """Кэш oz_sku не растет сверх OZ_SKU_CACHE_MAX_SIZE: вытесняются самые старые записи"""
+        import utils.rich_content_oz as rich_content_oz
+        monkeypatch.setattr(rich_content_oz, 'OZ_SKU_CACHE_MAX_SIZE', 2)
+        generator = RichContentGenerator(db_conn=rich_db)
+
+        generator.preload_oz_skus(['BASE-001', 'SIM-001', 'SIM-002'])
+
+        assert list(generator._oz_sku_cache) == ['SIM-001', 'SIM-002']
+
+    def test_without_connection_falls_back(self):
+        """Без подключения используются fallback значения"""
+        generator = RichContentGenerator()
+
+        assert generator._get_ozon_sku('ANY-001') == 'ANY-001'
+        assert generator._get_ozon_product_url('ANY-001') == 'https://www.ozon.ru/brand/shuzzi-149479977/'
+
+
+def _summary(results):
+    return [
+        (r.oz_vendor_code, r.status, [rec.product_info.oz_vendor_code for rec in r.recommendations], r.rich_content_json)
+        for r in results
+    ]
+
+
+class TestParallelChunks:
+    """Тесты параллельной обработки батчей process_batch_optimized"""
+
+    CODES = ['BASE-001', 'SIM-001', 'SIM-002', 'SIM-003', 'SIM-004']
+
+    def test_parallel_matches_sequential(self, rich_db):
+        """Параллельные батчи дают те же результаты в том же порядке"""
+        config = ScoringConfig(min_recommendations=1, max_recommendations=3)
+        progress = []
+
+        sequential = RichContentProcessor(rich_db, config).process_batch_optimized(self.CODES, batch_size=2)
+        parallel = RichContentProcessor(rich_db, config).process_batch_optimized(
+            self.CODES, lambda current, total, message: progress.append(current),
+            batch_size=2, max_workers=3
+        )
+
+        assert _summary(parallel.processed_items) == _summary(sequential.processed_items)
+        assert [r.oz_vendor_code for r in parallel.processed_items] == self.CODES
+        assert any(r.status == ProcessingStatus.SUCCESS for r in parallel.processed_items)
+        assert progress == sorted(progress) and progress[-1] == len(self.CODES)
+
+    def test_chunk_timeout(self, rich_db):
+        """Батч, превысивший chunk_timeout, получает статус ERROR и останавливается, остальные обрабатываются"""
+        original = RichContentProcessor._process_batch_chunk
+        cancelled = []
+
+        def slow_chunk(self, oz_vendor_codes, *args, cancel_event=None, **kwargs):
+            if 'SIM-001' not in oz_vendor_codes:
+                return original(self, oz_vendor_codes, *args, cancel_event=cancel_event, **kwargs)
+            # Батч "зависает" до отмены и затем завершается по флагу
+            cancelled.append(cancel_event.wait(5))
+            return original(self, oz_vendor_codes, *args, cancel_event=cancel_event, **kwargs)
+
+        with patch.object(RichContentProcessor, '_process_batch_chunk', slow_chunk):
+            result = RichContentProcessor(rich_db).process_batch_optimized(
+                self.CODES, batch_size=2, max_workers=2, chunk_timeout=0.3
+            )
+
+        # Прерванный батч завершился до возврата из process_batch_optimized
+        assert cancelled == [True]
+        by_code = {r.oz_vendor_code: r for r in result.processed_items}
+        assert [r.oz_vendor_code for r in result.processed_items] == self.CODES
+        assert by_code['SIM-001'].status == ProcessingStatus.ERROR
+        assert 'Превышено время' in by_code['SIM-001'].error_message
+        assert by_code['SIM-003'].status != ProcessingStatus.ERROR
+
+    def test_cancelled_chunk_stops_between_products(self, rich_db):
+        """После установки флага отмены батч не обрабатывает оставшиеся товары"""
+        cancel_event = threading.Event()
+        cancel_event.set()
+
+        results = RichContentProcessor(rich_db)._process_batch_chunk(
+            self.CODES, cancel_event=cancel_event
+        )
+
+        assert results == []
+
+    def test_workers_use_read_only_cursors(self, rich_db):
+        """Рабочие потоки не могут изменять данные"""
+        def writing_chunk(self, oz_vendor_codes, *args, **kwargs):
+            self.db_conn.execute("DELETE FROM oz_category_products")
+            return []
+
+        with patch.object(RichContentProcessor, '_process_batch_chunk', writing_chunk):
+            result = RichContentProcessor(rich_db).process_batch_optimized(
+                self.CODES, batch_size=2, max_workers=2
+            )
+
+        assert all(r.status == ProcessingStatus.ERROR for r in result.processed_items)
+        assert rich_db.execute("SELECT COUNT(*) FROM oz_category_products").fetchone()[0] == 5
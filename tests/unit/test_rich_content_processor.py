@@ -228,22 +228,20 @@ class TestRichContentProcessor:
             processing_time=1.0
         )
         
+        processor.db_conn.execute.return_value.fetchone.return_value = (1,)
+        
         # Сохранение в БД
         success = processor.save_rich_content_to_database(processing_result)
         
         # Проверяем результат
         assert success is True
         
-        # Проверяем, что была выполнена команда UPDATE
-        processor.db_conn.execute.assert_called_once()
-        call_args = processor.db_conn.execute.call_args
-        sql, params = call_args[0]
-        
-        assert "UPDATE oz_category_products" in sql
-        assert "SET rich_content_json = ?" in sql
-        assert "WHERE oz_vendor_code = ?" in sql
-        assert params[0] == '{"content": [], "version": 0.3}'
-        assert params[1] == "TEST-001"
+        # Проверяем, что сохранение прошло через пакетный UPDATE ... FROM временной таблицы
+        executed = [call[0][0] for call in processor.db_conn.execute.call_args_list]
+        assert any("UPDATE oz_category_products" in sql and "FROM rich_content_staging" in sql for sql in executed)
+        assert executed[-1] == "COMMIT"
+        staged_df = processor.db_conn.register.call_args[0][1]
+        assert staged_df.values.tolist() == [["TEST-001", '{"content": [], "version": 0.3}']]
     
     def test_save_rich_content_to_database_unsuccessful_result(self, processor):
         """Тест сохранения неуспешного результата (должно быть отклонено)"""
@@ -0,0 +1,343 @@
+"""
+Unit тесты для потокового импорта отчетов (utils.streaming_import, db_crud.import_data_from_batches).
+"""
+
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+import pytest
+import duckdb
+
+openpyxl = pytest.importorskip("openpyxl")
+
+from utils.db_crud import import_data_from_batches
+from utils.db_schema import get_table_schema_definition
+from utils import streaming_import
+from utils.streaming_import import (
+    iter_csv_batches,
+    iter_folder_xlsx_batches,
+    iter_folder_xlsx_batches_parallel,
+    iter_sources_batches,
+    iter_xlsx_batches,
+)
+
+WB_READ_PARAMS = get_table_schema_definition("wb_products")["read_params"]
+WB_COLUMNS = ["Артикул WB", "Категория продавца", "Бренд", "Баркод", "Размер"]
+
+
+def _write_wb_report(path, rows_count, start_sku=12345678901, title_rows=2):
+    """Отчет WB: служебные строки, заголовок (строка header), строка описания, данные"""
+    workbook = openpyxl.Workbook()
+    sheet = workbook.active
+    sheet.title = WB_READ_PARAMS['sheet_name']
+    for i in range(title_rows):
+        sheet.append([f"Служебная строка {i}"])
+    sheet.append(WB_COLUMNS)
+    sheet.append(["описание"] * len(WB_COLUMNS))
+    for i in range(rows_count):
+        sheet.append([start_sku + i, "Обувь", "TestBrand", f"46{i:011d};47{i:011d}", 36 + i % 6])
+        if i == 2:
+            sheet.append([])  # пустая строка посреди данных
+    workbook.save(path)
+
+
+class TestReaders:
+    """Тесты чтения пакетами"""
+
+    def test_xlsx_batches_match_read_excel(self, tmp_path):
+        """Пакеты XLSX совпадают с pandas.read_excel + пропуск строк после заголовка"""
+        path = tmp_path / "wb.xlsx"
+        _write_wb_report(path, 7)
+
+        batches = list(iter_xlsx_batches(path, WB_READ_PARAMS, WB_COLUMNS, batch_rows=3))
+
+        params = dict(WB_READ_PARAMS)
+        skip = params.pop('skip_rows_after_header')
+        expected = pd.read_excel(path, engine="openpyxl", **params).iloc[skip:].dropna(how='all')
+        actual = pd.concat(batches, ignore_index=True)
+
+        assert [len(b) for b in batches] == [3, 3, 1]
+        assert list(actual.columns) == WB_COLUMNS
+        assert actual["Артикул WB"].tolist() == expected["Артикул WB"].tolist()
+        assert actual["Артикул WB"].iloc[0] == "12345678901"
+        assert actual["Баркод"].tolist() == expected["Баркод"].tolist()
+
+    def test_xlsx_header_detection(self, tmp_path):
+        """Заголовок находится по ожидаемым колонкам, если он не в строке header"""
+        path = tmp_path / "wb_shifted.xlsx"
+        _write_wb_report(path, 4, title_rows=4)
+
+        actual = pd.concat(iter_xlsx_batches(path, WB_READ_PARAMS, WB_COLUMNS), ignore_index=True)
+
+        assert list(actual.columns) == WB_COLUMNS
+        assert len(actual) == 4
+
+    def test_csv_batches(self, tmp_path):
+        """CSV читается пакетами с параметрами из схемы"""
+        path = tmp_path / "orders.csv"
+        pd.DataFrame({"OZON id": [str(10**12 + i) for i in range(5)], "Статус": ["Доставлен"] * 5}).to_csv(
+            path, sep=";", index=False
+        )
+
+        batches = list(iter_csv_batches(path, {'delimiter': ';', 'header': 0, 'dtype': {'OZON id': 'str'}}, batch_rows=2))
+
+        assert [len(b) for b in batches] == [2, 2, 1]
+        assert batches[2]["OZON id"].iloc[0] == "1000000000004"
+
+    def test_folder_skips_broken_file(self, tmp_path):
+        """Нечитаемый файл папки передается в on_error, остальные файлы читаются"""
+        _write_wb_report(tmp_path / "a.xlsx", 3)
+        (tmp_path / "b.xlsx").write_bytes(b"not an xlsx")
+        _write_wb_report(tmp_path / "c.xlsx", 2, start_sku=22345678901)
+        errors = []
+
+        batches = list(iter_folder_xlsx_batches(
+            str(tmp_path), WB_READ_PARAMS, WB_COLUMNS, on_error=lambda name, e: errors.append(name)
+        ))
+
+        assert [name for name in errors] == ["b.xlsx"]
+        assert sum(len(b) for b in batches) == 5
+
+
+class TestParallelFolder:
+    """Тесты параллельного чтения папки"""
+
+    def _folder(self, tmp_path):
+        _write_wb_report(tmp_path / "a.xlsx", 5)
+        (tmp_path / "b.xlsx").write_bytes(b"not an xlsx")
+        _write_wb_report(tmp_path / "c.xlsx", 4, start_sku=22345678901)
+        _write_wb_report(tmp_path / "d.xlsx", 3, start_sku=32345678901)
+        return str(tmp_path)
+
+    def _read(self, folder, **kwargs):
+        errors, progress = [], []
+        batches = list(iter_folder_xlsx_batches_parallel(
+            folder, WB_READ_PARAMS, WB_COLUMNS, batch_rows=2,
+            on_error=lambda name, e: errors.append(name),
+            on_file_done=lambda done, total: progress.append((done, total)),
+            **kwargs
+        ))
+        return batches, errors, progress
+
+    def test_matches_sequential_read(self, tmp_path):
+        """Пул процессов дает те же строки, что и последовательное чтение; ошибки и прогресс по файлам"""
+        folder = self._folder(tmp_path)
+        expected = pd.concat(iter_folder_xlsx_batches(folder, WB_READ_PARAMS, WB_COLUMNS, on_error=lambda n, e: None))
+
+        batches, errors, progress = self._read(folder, max_workers=2)
+        actual = pd.concat(batches)
+
+        assert errors == ["b.xlsx"]
+        assert progress == [(1, 4), (2, 4), (3, 4), (4, 4)]
+        assert all(len(b) <= 2 for b in batches)
+        assert actual["Артикул WB"].tolist() == expected["Артикул WB"].tolist()
+        assert list(actual.columns) == WB_COLUMNS
+
+    def test_bad_file_finishing_late_is_skipped_in_order(self, tmp_path, monkeypatch):
+        """Нечитаемый файл, разобранный позже следующего, пропускается; файлы отдаются по порядку имен"""
+        _write_wb_report(tmp_path / "a.xlsx", 3)
+        (tmp_path / "b.xlsx").write_bytes(b"not an xlsx")
+        _write_wb_report(tmp_path / "c.xlsx", 2, start_sku=22345678901)
+        finished = []
+
+        class SlowBadFilePool(ThreadPoolExecutor):
+            """Пул потоков вместо процессов: файлы заканчиваются в порядке c, a, b"""
+            delays = {"a.xlsx": 0.2, "b.xlsx": 0.5}
+
+            def __init__(self, max_workers, mp_context=None):
+                super().__init__(max_workers=max_workers)
+
+            def submit(self, fn, file_path, *args):
+                def run():
+                    time.sleep(self.delays.get(os.path.basename(file_path), 0))
+                    try:
+                        return fn(file_path, *args)
+                    finally:
+                        finished.append(os.path.basename(file_path))
+                return super().submit(run)
+
+        monkeypatch.setattr(streaming_import, 'ProcessPoolExecutor', SlowBadFilePool)
+        batches, errors, progress = self._read(str(tmp_path), max_workers=3)
+
+        assert finished == ["c.xlsx", "a.xlsx", "b.xlsx"]
+        assert errors == ["b.xlsx"]
+        assert progress == [(1, 3), (2, 3), (3, 3)]
+        assert pd.concat(batches)["Артикул WB"].tolist() == [str(12345678901 + i) for i in range(3)] + [
+            str(22345678901 + i) for i in range(2)
+        ]
+
+        conn = duckdb.connect(':memory:')
+        read_errors = []
+        success, count, message = import_data_from_batches(
+            conn,
+            iter_folder_xlsx_batches_parallel(
+                str(tmp_path), WB_READ_PARAMS, WB_COLUMNS, batch_rows=2, max_workers=3,
+                on_error=lambda name, e: read_errors.append((name, e)),
+            ),
+            "wb_products",
+            read_errors=read_errors,
+        )
+        conn.close()
+
+        assert success, message
+        assert count == 5
+
+    def test_worker_spills_bounded_batches(self, tmp_path):
+        """Воркер записывает пакеты по batch_rows строк на диск; после чтения файлы удаляются"""
+        _write_wb_report(tmp_path / "a.xlsx", 5)
+        spill_dir = tmp_path / "spill"
+
+        paths = streaming_import._read_xlsx_file_worker(
+            str(tmp_path / "a.xlsx"), WB_READ_PARAMS, WB_COLUMNS, 2, str(spill_dir)
+        )
+        batches = list(streaming_import._iter_spilled_batches(paths))
+
+        assert [len(b) for b in batches] == [2, 2, 1]
+        assert list(spill_dir.iterdir()) == []
+
+    def test_pool_unavailable_falls_back(self, tmp_path, monkeypatch):
+        """Если пул процессов не создается, файлы читаются последовательно"""
+        def broken_pool(*args, **kwargs):
+            raise OSError("no processes")
+
+        monkeypatch.setattr(streaming_import, 'ProcessPoolExecutor', broken_pool)
+        batches, errors, progress = self._read(self._folder(tmp_path), max_workers=4)
+
+        assert errors == ["b.xlsx"]
+        assert sum(len(b) for b in batches) == 12
+        assert progress[-1] == (4, 4)
+
+
+class TestImportFromBatches:
+    """Тесты пакетного импорта в таблицу"""
+
+    @pytest.fixture
+    def conn(self):
+        conn = duckdb.connect(':memory:')
+        yield conn
+        conn.close()
+
+    def test_batches_appended_after_single_pre_update(self, conn, tmp_path):
+        """Предварительная очистка выполняется один раз, все пакеты дописываются в таблицу"""
+        conn.execute("""
+            CREATE TABLE wb_products (
+                wb_sku BIGINT, wb_category VARCHAR, wb_brand VARCHAR, wb_barcodes VARCHAR, wb_size INTEGER
+            )
+        """)
+        conn.execute("INSERT INTO wb_products VALUES (1, 'old', 'old', '0', 1)")
+        _write_wb_report(tmp_path / "a.xlsx", 5)
+        _write_wb_report(tmp_path / "b.xlsx", 4, start_sku=22345678901)
+        progress = []
+
+        success, count, message = import_data_from_batches(
+            conn,
+            iter_folder_xlsx_batches(str(tmp_path), WB_READ_PARAMS, WB_COLUMNS, batch_rows=2),
+            "wb_products",
+            progress_callback=progress.append,
+        )
+
+        assert success, message
+        assert count == 9
+        assert progress[-1] == 9 and len(progress) == 5
+        rows = conn.execute("SELECT COUNT(*), MIN(wb_sku), MAX(wb_size) FROM wb_products").fetchone()
+        assert rows == (9, 12345678901, 40)
+
+    def test_missing_columns_fail_validation(self, conn):
+        """Первый пакет без обязательных колонок прерывает импорт до очистки таблицы"""
+        batches = iter([pd.DataFrame({"Артикул WB": ["1"]})])
+
+        success, count, _ = import_data_from_batches(conn, batches, "wb_products")
+
+        assert not success
+        assert count == 0
+
+    def test_empty_input(self, conn):
+        """Пустой источник - успешный импорт нуля строк"""
+        assert import_data_from_batches(conn, iter([]), "wb_products")[:2] == (True, 0)
+
+    def _prices_table(self, conn):
+        conn.execute("CREATE TABLE wb_prices (wb_sku BIGINT, wb_fbo_stock INTEGER, wb_full_price INTEGER, wb_discount INTEGER)")
+        conn.execute("INSERT INTO wb_prices SELECT i, 1, 100, 10 FROM range(1, 11) t(i)")
+
+    def _price_batches(self, conn, seen_counts, fail=False):
+        for start in (100, 200):
+            # Между пакетами таблица еще не очищена: транзакция не открыта на время чтения
+            seen_counts.append(conn.execute("SELECT COUNT(*) FROM wb_prices").fetchone()[0])
+            yield pd.DataFrame({
+                "Артикул WB": [str(start), str(start + 1)], "Остатки WB": [1, 2],
+                "Текущая цена": [500, 600], "Текущая скидка": [5, 6],
+            })
+        if fail:
+            raise ValueError("broken file")
+
+    def test_motherduck_stages_batches(self, conn, monkeypatch):
+        """MotherDuck: пакеты копятся в staging, таблица заменяется одной короткой транзакцией в конце"""
+        import utils.db_crud as db_crud
+        monkeypatch.setattr(db_crud, '_is_motherduck_connection', lambda con: True)
+        self._prices_table(conn)
+        seen_counts = []
+
+        success, count, message = import_data_from_batches(conn, self._price_batches(conn, seen_counts), "wb_prices")
+
+        assert success, message
+        assert count == 4
+        assert seen_counts == [10, 10]
+        assert conn.execute("SELECT wb_sku FROM wb_prices ORDER BY wb_sku").fetchall() == [(100,), (101,), (200,), (201,)]
+        assert conn.execute("SELECT COUNT(*) FROM duckdb_tables() WHERE table_name = '_staging_wb_prices'").fetchone()[0] == 0
+
+    def test_motherduck_read_error_keeps_table(self, conn, monkeypatch):
+        """MotherDuck: ошибка чтения до замены таблицы оставляет ее без изменений"""
+        import utils.db_crud as db_crud
+        monkeypatch.setattr(db_crud, '_is_motherduck_connection', lambda con: True)
+        self._prices_table(conn)
+
+        success, _, message = import_data_from_batches(conn, self._price_batches(conn, [], fail=True), "wb_prices")
+
+        assert not success and "broken file" in message
+        assert conn.execute("SELECT COUNT(*) FROM wb_prices").fetchone()[0] == 10
+        assert conn.execute("SELECT COUNT(*) FROM duckdb_tables() WHERE table_name = '_staging_wb_prices'").fetchone()[0] == 0
+
+    def test_partly_read_file_keeps_table(self, conn, tmp_path):
+        """Файл, сломанный после первого пакета, отменяет импорт даже с on_error: очистка таблицы откатывается"""
+        conn.execute("CREATE TABLE wb_prices (wb_sku BIGINT, wb_fbo_stock INTEGER, wb_full_price INTEGER, wb_discount INTEGER)")
+        conn.execute("INSERT INTO wb_prices SELECT i, 1, 100, 10 FROM range(1, 11) t(i)")
+        lines = ["Артикул WB;Остатки WB;Текущая цена;Текущая скидка"]
+        lines += [f"{100 + i};1;100;10" for i in range(8)]
+        lines[5] = '"104;1;100;10'  # строка 5 - незакрытая кавычка
+        csv_path = tmp_path / "prices.csv"
+        csv_path.write_text("\n".join(lines) + "\n", encoding="utf-8")
+        errors = []
+
+        batches = iter_sources_batches(
+            [str(csv_path)], "csv", {"delimiter": ";"}, batch_rows=2,
+            on_error=lambda file_name, error: errors.append((file_name, error)),
+        )
+        success, count, message = import_data_from_batches(conn, batches, "wb_prices", read_errors=errors)
+
+        assert not success and "prices.csv" in message
+        assert count == 0
+        assert errors == []
+        assert conn.execute("SELECT COUNT(*) FROM wb_prices").fetchone()[0] == 10
+
+    def test_unreadable_files_are_skipped(self, conn, tmp_path):
+        """Нечитаемые файлы пропускаются и до, и после прочитанного файла; остальные импортируются"""
+        (tmp_path / "a.xlsx").write_bytes(b"not a workbook")
+        _write_wb_report(tmp_path / "b.xlsx", 3)
+        (tmp_path / "c.xlsx").write_bytes(b"not a workbook either")
+        errors = []
+
+        success, count, message = import_data_from_batches(
+            conn,
+            iter_folder_xlsx_batches(
+                str(tmp_path), WB_READ_PARAMS, WB_COLUMNS,
+                on_error=lambda file_name, error: errors.append((file_name, error)),
+            ),
+            "wb_products",
+            read_errors=errors,
+        )
+
+        assert success, message
+        assert count == 3
+        assert [file_name for file_name, _ in errors] == ["a.xlsx", "c.xlsx"]
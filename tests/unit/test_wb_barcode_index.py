@@ -0,0 +1,94 @@
+"""
+Unit тесты для материализованной таблицы нормализованных штрихкодов WB.
+"""
+
+import pytest
+import duckdb
+
+from utils.wb_barcode_index import (
+    WB_BARCODES_NORMALIZED_TABLE,
+    rebuild_wb_barcode_index,
+    wb_barcode_index_exists,
+    wb_barcodes_source,
+)
+from utils.db_search_helpers import get_normalized_wb_barcodes
+
+
+@pytest.fixture
+def wb_db():
+    """БД в памяти с товарами WB и штрихкодами через ';'"""
+    conn = duckdb.connect(':memory:')
+    conn.execute("CREATE TABLE wb_products (wb_sku BIGINT, wb_barcodes VARCHAR)")
+    conn.execute("""
+        INSERT INTO wb_products VALUES
+        (101, '111;222;333'),
+        (102, ' 444 ; ;555'),
+        (103, ''),
+        (104, NULL)
+    """)
+    yield conn
+    conn.close()
+
+
+class TestWbBarcodeIndex:
+    """Тесты построения и использования wb_barcodes_normalized"""
+
+    def test_rebuild_creates_table_with_positions(self, wb_db):
+        """Штрихкоды разбиваются, очищаются и сохраняют позицию в исходной строке"""
+        success, rows, _ = rebuild_wb_barcode_index(wb_db)
+
+        assert success is True
+        assert rows == 5
+        assert wb_barcode_index_exists(wb_db)
+
+        result = wb_db.execute(f"""
+            SELECT wb_sku, barcode, position
+            FROM {WB_BARCODES_NORMALIZED_TABLE}
+            ORDER BY wb_sku, position
+        """).fetchall()
+        assert result == [
+            (101, '111', 1), (101, '222', 2), (101, '333', 3),
+            (102, '444', 1), (102, '555', 3),
+        ]
+
+    def test_barcode_index_created(self, wb_db):
+        """После построения таблицы создается индекс по barcode"""
+        rebuild_wb_barcode_index(wb_db)
+
+        indexes = wb_db.execute("""
+            SELECT index_name FROM duckdb_indexes()
+            WHERE table_name = ?
+        """, [WB_BARCODES_NORMALIZED_TABLE]).fetchall()
+        assert ('idx_wb_barcodes_normalized_barcode',) in indexes
+
+    def test_failed_rebuild_keeps_previous_table(self, wb_db):
+        """Если пересборка упала, прежняя таблица сохраняется"""
+        rebuild_wb_barcode_index(wb_db)
+        wb_db.execute("ALTER TABLE wb_products RENAME COLUMN wb_barcodes TO wb_barcodes_old")
+
+        success, _, _ = rebuild_wb_barcode_index(wb_db)
+
+        assert success is False
+        assert wb_barcode_index_exists(wb_db)
+        count = wb_db.execute(f"SELECT COUNT(*) FROM {WB_BARCODES_NORMALIZED_TABLE}").fetchone()[0]
+        assert count == 5
+
+    def test_source_falls_back_without_table(self, wb_db):
+        """Без материализованной таблицы источник разбивает штрихкоды на лету"""
+        source = wb_barcodes_source(wb_db)
+
+        assert source != WB_BARCODES_NORMALIZED_TABLE
+        count = wb_db.execute(f"SELECT COUNT(*) FROM {source} s").fetchone()[0]
+        assert count == 5
+
+    def test_normalized_wb_barcodes_same_with_and_without_table(self, wb_db):
+        """get_normalized_wb_barcodes возвращает одинаковые данные из таблицы и на лету"""
+        before = get_normalized_wb_barcodes(wb_db, wb_skus=['101', '102'])
+        rebuild_wb_barcode_index(wb_db)
+        after = get_normalized_wb_barcodes(wb_db, wb_skus=['101', '102'])
+
+        sort_cols = ['wb_sku', 'barcode_position']
+        before = before.sort_values(sort_cols).reset_index(drop=True)
+        after = after.sort_values(sort_cols).reset_index(drop=True)
+        assert list(after.columns) == ['wb_sku', 'individual_barcode_wb', 'barcode_position']
+        assert before.values.tolist() == after.values.tolist()
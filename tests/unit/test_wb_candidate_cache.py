@@ -0,0 +1,150 @@
+"""
+Unit тесты для постоянного кэша кандидатов WB рекомендаций.
+"""
+
+from unittest.mock import patch
+
+import pytest
+import duckdb
+
+from utils.db_connection_manager import ReadOnlyCursor
+from utils.wb_candidate_cache import (
+    WB_CANDIDATE_CACHE_TABLE,
+    bump_data_version,
+    get_candidate_data_version,
+    load_wb_candidates,
+)
+from utils.wb_recommendations import WBDataCollector
+
+CRITERIA = ('Кроссовки', 'Женский', 'TestBrand')
+
+
+@pytest.fixture
+def candidates_db():
+    """БД в памяти: 6 WB товаров, связанных штрихкодами с Ozon товарами одной категории"""
+    conn = duckdb.connect(':memory:')
+    conn.execute("""
+        CREATE TABLE wb_products (
+            wb_sku BIGINT, wb_category VARCHAR, wb_brand VARCHAR, wb_barcodes VARCHAR, wb_size INTEGER
+        )
+    """)
+    conn.execute("""
+        CREATE TABLE wb_prices (
+            wb_sku BIGINT, wb_fbo_stock INTEGER, wb_full_price DOUBLE, wb_discount DOUBLE
+        )
+    """)
+    conn.execute("""
+        CREATE TABLE oz_category_products (
+            oz_vendor_code VARCHAR, type VARCHAR, gender VARCHAR, oz_brand VARCHAR,
+            season VARCHAR, color VARCHAR, fastener_type VARCHAR
+        )
+    """)
+    conn.execute("CREATE TABLE oz_products (oz_vendor_code VARCHAR, oz_fbo_stock INTEGER)")
+    conn.execute("CREATE TABLE oz_barcodes (oz_vendor_code VARCHAR, oz_barcode VARCHAR)")
+    conn.execute("""
+        CREATE TABLE punta_table (
+            wb_sku BIGINT, material_short VARCHAR, new_last VARCHAR, mega_last VARCHAR,
+            best_last VARCHAR, heel_type VARCHAR, sole_type VARCHAR, heel_up_type VARCHAR,
+            lacing_type VARCHAR, nose_type VARCHAR
+        )
+    """)
+
+    for i in range(6):
+        wb_sku = 1000 + i
+        barcode = f"4600000000{i:03d}"
+        vendor_code = f"VC-{i}"
+        conn.execute("INSERT INTO wb_products VALUES (?, 'Кроссовки', 'TestBrand', ?, ?)",
+                     [wb_sku, barcode, 36 + i])
+        conn.execute("INSERT INTO wb_prices VALUES (?, ?, 3000.0, 10.0)", [wb_sku, 5 + i])
+        conn.execute("INSERT INTO oz_category_products VALUES (?, ?, ?, ?, 'Лето', 'белый', 'шнурки')",
+                     [vendor_code, *CRITERIA])
+        conn.execute("INSERT INTO oz_products VALUES (?, 3)", [vendor_code])
+        conn.execute("INSERT INTO oz_barcodes VALUES (?, ?)", [vendor_code, barcode])
+        conn.execute("""
+            INSERT INTO punta_table VALUES (?, 'Кожа', 'L1', 'M1', 'B1', 'низкий', 'резина', 'нет', 'шнурки', 'круглый')
+        """, [wb_sku])
+
+    yield conn
+    conn.close()
+
+
+class TestWBCandidateCache:
+    """Тесты кэширования кандидатов по тройке (тип, пол, бренд)"""
+
+    def test_second_call_served_from_cache(self, candidates_db):
+        """Повторный поиск не выполняет многоэтапный запрос и исключает исходный товар"""
+        collector = WBDataCollector(candidates_db)
+        first = collector._find_wb_candidates_by_criteria(*CRITERIA, '1000')
+
+        with patch.object(collector, '_discover_wb_candidates') as discover:
+            second = collector._find_wb_candidates_by_criteria(*CRITERIA, '1001')
+            discover.assert_not_called()
+
+        assert sorted(c.wb_sku for c in first) == ['1001', '1002', '1003', '1004', '1005']
+        assert sorted(c.wb_sku for c in second) == ['1000', '1002', '1003', '1004', '1005']
+
+        cached = {c.wb_sku: c for c in second}
+        original = {c.wb_sku: c for c in first}
+        assert cached['1002'].wb_sizes == original['1002'].wb_sizes
+        assert cached['1002'].size_mask == original['1002'].size_mask
+        assert cached['1002'].punta_material_short == original['1002'].punta_material_short
+
+    def test_import_invalidates_cache(self, candidates_db):
+        """Импорт исходной таблицы увеличивает версию и очищает кэш"""
+        collector = WBDataCollector(candidates_db)
+        collector._find_wb_candidates_by_criteria(*CRITERIA, '1000')
+        version = get_candidate_data_version(candidates_db)
+
+        assert bump_data_version(candidates_db, 'wb_prices') == 1
+        assert get_candidate_data_version(candidates_db) > version
+        assert candidates_db.execute(f"SELECT COUNT(*) FROM {WB_CANDIDATE_CACHE_TABLE}").fetchone()[0] == 0
+        assert load_wb_candidates(candidates_db, CRITERIA) is None
+
+        with patch.object(collector, '_discover_wb_candidates', return_value=[]) as discover:
+            assert collector._find_wb_candidates_by_criteria(*CRITERIA, '1000') == []
+            discover.assert_called_once_with(*CRITERIA)
+
+    def test_unrelated_table_keeps_cache(self, candidates_db):
+        """Импорт таблицы вне CANDIDATE_CACHE_SOURCE_TABLES не сбрасывает кэш"""
+        WBDataCollector(candidates_db)._find_wb_candidates_by_criteria(*CRITERIA, '1000')
+
+        bump_data_version(candidates_db, 'oz_orders')
+
+        assert load_wb_candidates(candidates_db, CRITERIA) is not None
+
+    def test_read_only_cursor_skips_store(self, candidates_db):
+        """Через курсор только для чтения кандидаты возвращаются без записи в кэш"""
+        collector = WBDataCollector(ReadOnlyCursor(candidates_db.cursor()))
+        candidates = collector._find_wb_candidates_by_criteria(*CRITERIA, '1000')
+
+        assert len(candidates) == 5
+        assert load_wb_candidates(candidates_db, CRITERIA) is None
+
+
+class TestWBCandidateDiscovery:
+    """Тесты set-based поиска кандидатов (этапы 1-4 одним запросом)"""
+
+    def test_single_query_with_sizes_and_stock_filter(self, candidates_db):
+        """Все размеры собираются в список, товары без остатков отбрасываются, без запросов на кандидата"""
+        candidates_db.execute("INSERT INTO wb_products VALUES (1002, 'Кроссовки', 'TestBrand', '4600000000002', 40)")
+        candidates_db.execute("INSERT INTO wb_products VALUES (1002, 'Кроссовки', 'TestBrand', '4600000000002', NULL)")
+        candidates_db.execute("UPDATE wb_prices SET wb_fbo_stock = 0 WHERE wb_sku = 1004")
+        # Штрихкод OZ товара без остатков не должен приводить к кандидатам
+        candidates_db.execute("UPDATE oz_products SET oz_fbo_stock = 0 WHERE oz_vendor_code = 'VC-5'")
+
+        collector = WBDataCollector(candidates_db, use_candidate_cache=False)
+        with patch.object(collector, '_get_wb_base_data') as per_row:
+            candidates = collector._discover_wb_candidates(*CRITERIA)
+            per_row.assert_not_called()
+
+        by_sku = {c.wb_sku: c for c in candidates}
+        assert sorted(by_sku) == ['1000', '1001', '1002', '1003']
+        assert by_sku['1002'].wb_sizes == [38, 40]
+        assert by_sku['1003'].wb_fbo_stock == 8
+        assert by_sku['1003'].wb_full_price == 3000.0
+
+    def test_no_matches_returns_empty(self, candidates_db):
+        """Критерии без OZ товаров дают пустой список"""
+        collector = WBDataCollector(candidates_db, use_candidate_cache=False)
+
+        assert collector._discover_wb_candidates('Туфли', 'Мужской', 'TestBrand') == []
@@ -0,0 +1,106 @@
+"""
+Unit тесты для параллельной загрузки изображений WB (utils.wb_image_fetcher).
+"""
+
+import os
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from io import BytesIO
+
+import pytest
+from openpyxl import Workbook
+from PIL import Image as PILImage
+
+from utils.analytic_report_helpers import insert_wb_image_to_cell
+from utils.wb_image_fetcher import WBImageFetcher, create_session
+
+
+def _webp_bytes(size=(400, 300)):
+    buffer = BytesIO()
+    PILImage.new("RGBA", size, (255, 0, 0, 255)).save(buffer, "WEBP")
+    return buffer.getvalue()
+
+
+@pytest.fixture
+def server():
+    """Локальный сервер: /<sku>.webp - изображение, /404.webp - ошибка, /text.webp - не изображение"""
+    requests_seen = []
+    image = _webp_bytes()
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            requests_seen.append(self.path)
+            if self.path == "/404.webp":
+                self.send_response(404)
+                self.end_headers()
+                return
+            body, content_type = (b"oops", "text/html") if self.path == "/text.webp" else (image, "image/webp")
+            self.send_response(200)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{httpd.server_address[1]}", requests_seen
+    httpd.shutdown()
+    httpd.server_close()
+
+
+def _fetcher(server, tmp_path, **kwargs):
+    base_url, _ = server
+    special = {"404": "404", "500": "text"}
+    return WBImageFetcher(
+        session=create_session(4),
+        cache_dir=str(tmp_path),
+        max_workers=4,
+        url_builder=lambda sku: f"{base_url}/{special.get(sku, sku)}.webp",
+        **kwargs
+    )
+
+
+class TestWBImageFetcher:
+    """Тесты загрузки миниатюр и кэша"""
+
+    def test_fetch_many_thumbnails_and_errors(self, server, tmp_path):
+        """Изображения уменьшаются до миниатюр, ошибки возвращаются по артикулу"""
+        progress = []
+        paths, errors = _fetcher(server, tmp_path).fetch_many(
+            ["101", "102", "101", "404", "500", "abc"], on_done=lambda done, total: progress.append((done, total))
+        )
+
+        assert set(paths) == {"101", "102"}
+        assert set(errors) == {"404", "500", "abc"}
+        assert "404" in errors["404"] and "text/html" in errors["500"]
+        with PILImage.open(paths["101"]) as thumbnail:
+            assert thumbnail.format == "PNG" and thumbnail.size == (128, 96)
+        assert progress[-1] == (5, 5)
+
+    def test_cache_and_ttl(self, server, tmp_path):
+        """Повторная загрузка берется из кэша, устаревший файл загружается заново"""
+        _, requests_seen = server
+        fetcher = _fetcher(server, tmp_path)
+
+        fetcher.fetch_many(["101"])
+        fetcher.fetch_many(["101"])
+        assert requests_seen == ["/101.webp"]
+
+        path = fetcher.cache_path("101")
+        os.utime(path, (0, 0))
+        fetcher.fetch_many(["101"])
+        assert requests_seen == ["/101.webp", "/101.webp"]
+
+    def test_insert_cached_image(self, server, tmp_path):
+        """Миниатюра из кэша вставляется в ячейку без временных файлов"""
+        paths, _ = _fetcher(server, tmp_path).fetch_many(["101"])
+        ws = Workbook().active
+
+        success, temp_file = insert_wb_image_to_cell(ws, 9, 2, "101", image_path=paths["101"])
+
+        assert success and temp_file is None
+        assert len(ws._images) == 1
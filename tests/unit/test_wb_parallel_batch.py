@@ -0,0 +1,106 @@
+"""
+Unit тесты параллельной обработки групп WB рекомендаций.
+"""
+
+import random
+
+import pytest
+
+import utils.wb_recommendations as wb_recommendations
+from utils.manual_recommendations_manager import ManualRecommendationsManager
+from utils.wb_recommendations import (
+    WBProcessingStatus,
+    WBProductInfo,
+    WBRecommendationProcessor,
+    WBScoringConfig,
+)
+
+
+def _make_products(count: int, seed: int = 11):
+    """Товары нескольких групп тип+пол+бренд, часть без обогащения"""
+    rng = random.Random(seed)
+    products = {}
+    for i in range(count):
+        wb_sku = str(200000 + i)
+        enriched = i % 17 != 0
+        start = rng.randint(35, 40)
+        products[wb_sku] = WBProductInfo(
+            wb_sku=wb_sku,
+            wb_sizes=list(range(start, start + rng.randint(1, 5))),
+            wb_fbo_stock=rng.choice([0, 1, 3, 10]),
+            enriched_type=rng.choice(['Сабо', 'Кроссовки']) if enriched else None,
+            enriched_gender='Женский' if enriched else None,
+            enriched_brand=rng.choice(['Alpha', 'Beta']) if enriched else None,
+            enriched_season=rng.choice(['Лето', 'Зима', None]),
+            enriched_color=rng.choice(['белый', 'черный', None]),
+            punta_mega_last=rng.choice(['M1', 'M2', None]),
+        )
+    return products
+
+
+def _summary(results):
+    return [
+        (r.wb_sku, r.status, [(rec.product_info.wb_sku, rec.score, rec.is_manual) for rec in r.recommendations])
+        for r in results
+    ]
+
+
+@pytest.fixture
+def batch():
+    config = WBScoringConfig(parallel_workers=2, parallel_chunk_size=7, min_recommendations=2)
+    manual = ManualRecommendationsManager()
+    manual.load_from_csv_string("target_wb_sku,position_1,recommended_1\n200001,1,200002\n")
+    processor = WBRecommendationProcessor(None, config, manual)
+    products = _make_products(120)
+    groups = processor._group_products_by_criteria(products)
+    return processor, products, groups
+
+
+class TestWBParallelBatch:
+    """Сравнение параллельной обработки групп с последовательной"""
+
+    def test_parallel_matches_serial(self, batch):
+        """Результаты и их порядок совпадают с последовательной обработкой"""
+        processor, products, groups = batch
+        progress = []
+
+        serial = processor._process_groups_serial(groups, products, len(products))
+        parallel = processor._process_groups_parallel(
+            groups, products, len(products), lambda current, total, message: progress.append(current)
+        )
+
+        assert _summary(parallel) == _summary(serial)
+        assert [r.wb_sku for r in parallel] == [p.wb_sku for group in groups.values() for p in group]
+        assert any(r.status == WBProcessingStatus.NO_DATA for r in parallel)
+        assert any(rec.is_manual for r in parallel for rec in r.recommendations)
+        assert progress == sorted(progress) and progress[-1] == 100
+
+    def test_falls_back_when_pool_unavailable(self, batch, monkeypatch):
+        """При недоступном пуле процессов задачи выполняются в текущем процессе"""
+        processor, products, groups = batch
+
+        def broken_pool(*args, **kwargs):
+            raise OSError("process pool is not available")
+
+        monkeypatch.setattr(wb_recommendations, 'ProcessPoolExecutor', broken_pool)
+        serial = processor._process_groups_serial(groups, products, len(products))
+        parallel = processor._process_groups_parallel(groups, products, len(products))
+
+        assert _summary(parallel) == _summary(serial)
+
+    def test_worker_returns_candidate_indexes(self, batch):
+        """Воркер возвращает индексы кандидатов, а не копии товаров"""
+        processor, products, groups = batch
+        group_key = next(key for key in groups if key != 'no_enrichment')
+        candidates = processor._find_group_candidates(group_key, products)
+
+        worker_results = wb_recommendations._rank_wb_products_worker(
+            processor.config, groups[group_key], candidates
+        )
+
+        assert len(worker_results) == len(groups[group_key])
+        for early_status, ranked, elapsed, error in worker_results:
+            assert error is None and elapsed >= 0
+            assert all(0 <= index < len(candidates) for index, _, _ in ranked)
+            scores = [score for _, score, _ in ranked]
+            assert scores == sorted(scores, reverse=True)
@@ -0,0 +1,157 @@
+"""
+Unit тесты для пакетной проверки ссылок на фото WB (utils.wb_photo_service).
+"""
+
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+import pytest
+import duckdb
+import requests
+
+from utils.wb_photo_service import (
+    VOLUME_UPPER_BOUNDS,
+    WB_PHOTO_CACHE_TABLE,
+    get_wb_photo_url,
+    get_wb_photo_urls,
+    validate_wb_photo_urls_batch,
+)
+
+
+class _Response:
+    def __init__(self, status_code, content_type):
+        self.status_code = status_code
+        self.headers = {'content-type': content_type}
+
+
+class FakeSession:
+    """HEAD ответы по последнему сегменту URL; считает одновременные запросы к хосту"""
+
+    def __init__(self, delay=0.0):
+        self.delay = delay
+        self.calls = []
+        self.active = {}
+        self.max_active = {}
+        self.lock = threading.Lock()
+
+    def head(self, url, timeout=None):
+        host = url.split('/')[2]
+        with self.lock:
+            self.calls.append(url)
+            self.active[host] = self.active.get(host, 0) + 1
+            self.max_active[host] = max(self.max_active.get(host, 0), self.active[host])
+        try:
+            time.sleep(self.delay)
+            name = url.rsplit('/', 1)[-1]
+            if name == 'missing':
+                return _Response(404, 'text/html')
+            if name == 'busy':
+                return _Response(429, 'text/html')
+            if name == 'down':
+                return _Response(503, 'text/html')
+            if name == 'timeout':
+                raise requests.exceptions.Timeout()
+            return _Response(200, 'image/webp')
+        finally:
+            with self.lock:
+                self.active[host] -= 1
+
+
+def _url(wb_sku):
+    return f"https://host-{len(wb_sku) % 2}/{wb_sku}" if wb_sku != 'bad' else ""
+
+
+@pytest.fixture
+def conn():
+    conn = duckdb.connect(':memory:')
+    yield conn
+    conn.close()
+
+
+class TestValidateWbPhotoUrlsBatch:
+    """Тесты пакетной проверки с кэшем"""
+
+    def test_results_and_cache(self, conn):
+        """Результаты как у validate_wb_photo_url; повторная проверка в пределах TTL без запросов"""
+        session = FakeSession()
+        skus = ['101', 'missing', 'timeout', 'bad', '101']
+
+        first = validate_wb_photo_urls_batch(skus, conn=conn, session=session, url_builder=_url)
+        second = validate_wb_photo_urls_batch(skus, conn=conn, session=session, url_builder=_url)
+
+        assert first == second
+        assert first['101'] == (True, 'https://host-1/101')
+        assert first['missing'] == (False, 'HTTP 404')
+        assert first['timeout'][0] is False and 'Таймаут' in first['timeout'][1]
+        assert first['bad'] == (False, 'Не удалось сгенерировать URL')
+        # Таймаут не кэшируется и проверяется повторно
+        assert sorted(session.calls) == sorted(['https://host-1/101', 'https://host-1/missing',
+                                                'https://host-1/timeout', 'https://host-1/timeout'])
+        assert conn.execute(f"SELECT COUNT(*) FROM {WB_PHOTO_CACHE_TABLE}").fetchone()[0] == 2
+
+    def test_expired_cache_rechecked(self, conn):
+        """Просроченные записи кэша проверяются заново"""
+        session = FakeSession()
+        validate_wb_photo_urls_batch(['101'], conn=conn, session=session, url_builder=_url)
+        conn.execute(f"UPDATE {WB_PHOTO_CACHE_TABLE} SET checked_at = TIMESTAMP '2000-01-01'")
+
+        validate_wb_photo_urls_batch(['101'], conn=conn, session=session, url_builder=_url)
+
+        assert len(session.calls) == 2
+
+    def test_transient_statuses_not_cached(self, conn):
+        """429 и 5xx не кэшируются (как сетевые ошибки) и проверяются заново"""
+        session = FakeSession()
+        skus = ['busy', 'down', 'missing']
+
+        first = validate_wb_photo_urls_batch(skus, conn=conn, session=session, url_builder=_url)
+        validate_wb_photo_urls_batch(skus, conn=conn, session=session, url_builder=_url)
+
+        assert first['busy'] == (False, 'HTTP 429') and first['down'] == (False, 'HTTP 503')
+        assert sorted(session.calls) == sorted(['https://host-0/busy', 'https://host-0/busy',
+                                                'https://host-0/down', 'https://host-0/down',
+                                                'https://host-1/missing'])
+        assert conn.execute(f"SELECT wb_sku FROM {WB_PHOTO_CACHE_TABLE}").fetchall() == [('missing',)]
+
+    def test_per_host_limit(self):
+        """Число одновременных запросов к одному хосту не превышает max_per_host"""
+        session = FakeSession(delay=0.02)
+        skus = [str(1000 + i) for i in range(20)] + [str(10000 + i) for i in range(20)]
+
+        results = validate_wb_photo_urls_batch(skus, session=session, url_builder=_url,
+                                               max_workers=16, max_per_host=3)
+
+        assert all(available for available, _ in results.values())
+        assert max(session.max_active.values()) <= 3
+        assert set(session.max_active) == {'host-0', 'host-1'}
+
+
+class TestGetWbPhotoUrls:
+    """Тесты векторного построения ссылок"""
+
+    def test_volume_boundaries(self):
+        """Границы томов: значение на границе относится к тому, следующее - к следующему"""
+        skus = [bound * 100000 + offset for bound in VOLUME_UPPER_BOUNDS for offset in (0, 99999, 100000)]
+
+        urls = get_wb_photo_urls(np.array(skus))
+
+        assert urls == [get_wb_photo_url(str(sku)) for sku in skus]
+        assert urls[0].startswith("https://basket-01.") and urls[-1].startswith("https://basket-25.")
+
+    def test_invalid_and_mixed_values(self):
+        """Некорректные артикулы дают пустую строку, числа и строки с пробелами обрабатываются"""
+        urls = get_wb_photo_urls(pd.Series(['297266982', ' 297266982 ', 297266982.0, 'abc', '', None]))
+
+        expected = 'https://basket-18.wbbasket.ru/vol2972/part297266/297266982/images/tm/1.webp'
+        assert urls == [expected, expected, expected, '', '', '']
+
+    def test_out_of_int64_range_matches_scalar(self):
+        """Числа за пределами int64 не переполняются и дают ту же ссылку, что get_wb_photo_url"""
+        skus = ['1e20', str(2 ** 63), '-1e19', '297266982']
+
+        urls = get_wb_photo_urls(skus)
+
+        assert urls == [get_wb_photo_url(sku) for sku in skus]
+        assert urls[0].startswith("https://basket-25.") and '-9223372036854775808' not in urls[0]
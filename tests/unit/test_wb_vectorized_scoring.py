@@ -0,0 +1,129 @@
+"""
+Unit тесты колоночного расчета score WB рекомендаций.
+"""
+
+import random
+
+import numpy as np
+import pytest
+
+from utils.vectorized_scoring import popcount
+from utils.wb_recommendations import (
+    WBCandidateMatrix,
+    WBProductInfo,
+    WBRecommendationEngine,
+    WBScoringConfig,
+)
+
+
+def _random_product(rng: random.Random, wb_sku: int) -> WBProductInfo:
+    """Случайный товар с пустыми значениями, разным регистром и пересечениями размеров"""
+    def pick(values):
+        return rng.choice(values + [None, ''])
+
+    start = rng.randint(30, 42)
+    sizes = rng.sample(range(start, start + 8), rng.randint(0, 6))
+    return WBProductInfo(
+        wb_sku=str(wb_sku),
+        wb_sizes=sizes,
+        wb_fbo_stock=rng.choice([0, 1, 2, 3, 4, 10, 11, 50]),
+        wb_full_price=rng.choice([None, 0, 1000, 1100, 1500, 2999]),
+        enriched_type='Сабо',
+        enriched_gender=pick(['Женский']),
+        enriched_brand=pick(['TestBrand']),
+        enriched_season=pick(['Лето', 'лето', 'Зима', 'Демисезон']),
+        enriched_color=pick(['Белый', 'белый', 'черный']),
+        enriched_material=pick(['Кожа']),
+        enriched_fastener_type=pick(['Без застёжки', 'без застёжки', 'Липучки']),
+        punta_material_short=pick(['Экокожа', 'ЭКОКОЖА', 'Текстиль']),
+        punta_new_last=pick(['N1', 'n1', 'N2']),
+        punta_mega_last=pick(['M1', 'M2']),
+        punta_best_last=pick(['B1', 'B2']),
+        punta_heel_type=pick(['Плоский', 'Танкетка']),
+        punta_sole_type=pick(['ТЭП', 'ЭВА']),
+        punta_heel_up_type=pick(['Жесткий', 'Мягкий']),
+        punta_lacing_type=pick(['Нет', 'Шнурки']),
+        punta_nose_type=pick(['Круглый', 'Острый']),
+    )
+
+
+@pytest.fixture
+def products():
+    rng = random.Random(2024)
+    return [_random_product(rng, 100000 + i) for i in range(400)]
+
+
+class TestWBVectorizedScoring:
+    """Сравнение колоночного расчета со скалярным calculate_similarity_score"""
+
+    @pytest.mark.parametrize('preset', ['balanced', 'size_focused', 'price_focused', 'quality_focused', 'conservative'])
+    def test_matches_scalar_scores(self, products, preset):
+        """Score совпадают со скалярным расчетом для всех пресетов"""
+        config = WBScoringConfig.get_preset(preset)
+        engine = WBRecommendationEngine(None, config)
+        matrix = WBCandidateMatrix(products)
+
+        for source in products[:40]:
+            expected = [engine.calculate_similarity_score(source, c) for c in products]
+            actual = matrix.score(source, config)
+            assert actual.tolist() == expected
+
+    def test_matches_scalar_with_price_bonus(self, products):
+        """Ценовой бонус считается так же, как в скалярном расчете"""
+        config = WBScoringConfig(price_similarity_bonus=25, price_diff_threshold=0.1)
+        engine = WBRecommendationEngine(None, config)
+        matrix = WBCandidateMatrix(products)
+
+        for source in products[:40]:
+            expected = [engine.calculate_similarity_score(source, c) for c in products]
+            assert matrix.score(source, config).tolist() == expected
+
+    def test_engine_switches_mode(self, products):
+        """calculate_similarity_scores дает одинаковый результат в обоих режимах"""
+        vectorized = WBRecommendationEngine(None, WBScoringConfig())
+        scalar = WBRecommendationEngine(None, WBScoringConfig(vectorized_scoring=False))
+        source = products[0]
+
+        assert np.array_equal(
+            vectorized.calculate_similarity_scores(source, products),
+            scalar.calculate_similarity_scores(source, products)
+        )
+
+    def test_empty_candidates(self, products):
+        """Пустой список кандидатов дает пустой массив"""
+        engine = WBRecommendationEngine(None, WBScoringConfig())
+
+        assert len(engine.calculate_similarity_scores(products[0], [])) == 0
+
+
+class TestWBSizeMask:
+    """Тесты битовой маски размеров WBProductInfo"""
+
+    def test_overlap_matches_sets(self, products):
+        """Пересечение по маскам совпадает с расчетом через множества"""
+        for source in products[:40]:
+            for candidate in products:
+                source_sizes, candidate_sizes = set(source.wb_sizes), set(candidate.wb_sizes)
+                common = source_sizes & candidate_sizes
+                expected = len(common) / min(len(source_sizes), len(candidate_sizes)) if common else 0.0
+
+                assert source.calculate_size_overlap_percentage(candidate) == expected
+                assert source.has_size_overlap(candidate) == bool(common)
+
+    def test_mask_from_normalized_sizes(self):
+        """Маска строится по нормализованным размерам, невалидные значения отбрасываются"""
+        product = WBProductInfo(wb_sku='1', wb_sizes=['38', 10, 60, 38, 5, 'abc', 61])
+
+        assert product.wb_sizes == [10, 38, 60]
+        assert product.size_count == 3
+        assert product.size_mask == (1 << 0) | (1 << 28) | (1 << 50)
+        assert WBProductInfo(wb_sku='2').size_mask == 0
+
+    def test_popcount_fallback(self, monkeypatch):
+        """popcount без numpy.bitwise_count (numpy < 2.0) дает тот же результат"""
+        values = np.array([0, 1, (1 << 51) - 1, 0b1011], dtype=np.uint64)
+        expected = [0, 1, 51, 3]
+
+        assert popcount(values).tolist() == expected
+        monkeypatch.delattr(np, 'bitwise_count', raising=False)
+        assert popcount(values).tolist() == expected
@@ -11,7 +11,7 @@ import streamlit as st
 import pandas as pd
 from typing import List, Dict, Any, Optional
 from utils.advanced_product_grouper import GroupingConfig, GroupingResult
-from utils.wb_photo_service import get_wb_photo_url
+from utils.wb_photo_service import get_wb_photo_urls
 
 
 def get_table_css() -> str:
@@ -79,21 +79,16 @@ def get_photo_urls_batch(wb_skus: List[str]) -> List[str]:
     Returns:
         List[str]: Список HTML элементов с фотографиями
     """
-    photo_urls = []
-    for sku in wb_skus:
-        try:
-            photo_url = get_wb_photo_url(sku)
-            if photo_url:
-                # Создаем HTML для изображения с lazy loading
-                img_html = (f'<img src="{photo_url}" width="60" height="60" '
-                          f'style="object-fit: cover; border-radius: 5px; '
-                          f'border: 1px solid #ddd;" loading="lazy" '
-                          f'alt="Товар {sku}" title="WB SKU: {sku}">')
-                photo_urls.append(img_html)
-            else:
-                photo_urls.append('<div style="width:60px;height:60px;background:#f0f0f0;border-radius:5px;display:flex;align-items:center;justify-content:center;font-size:10px;">🚫 Нет фото</div>')
-        except Exception as e:
-            photo_urls.append('<div style="width:60px;height:60px;background:#ffe6e6;border-radius:5px;display:flex;align-items:center;justify-content:center;font-size:10px;">❌ Ошибка</div>')
+    no_photo_html = '<div style="width:60px;height:60px;background:#f0f0f0;border-radius:5px;display:flex;align-items:center;justify-content:center;font-size:10px;">🚫 Нет фото</div>'
+    
+    # URL для всех SKU одним вызовом
+    photo_urls = [
+        (f'<img src="{photo_url}" width="60" height="60" '
+         f'style="object-fit: cover; border-radius: 5px; '
+         f'border: 1px solid #ddd;" loading="lazy" '
+         f'alt="Товар {sku}" title="WB SKU: {sku}">') if photo_url else no_photo_html
+        for sku, photo_url in zip(wb_skus, get_wb_photo_urls(wb_skus))
+    ]
     
     return photo_urls
 
@@ -19,6 +19,7 @@ from collections import defaultdict
 import logging
 from utils.cross_marketplace_linker import CrossMarketplaceLinker
 from utils.config_utils import get_data_filter
+from utils.wb_barcode_index import wb_barcodes_source
 
 
 @dataclass
@@ -441,6 +442,9 @@ class AdvancedProductGrouper:
             conditions = self._parse_pool_key(pool_key)
             self._log(f"Ищем компенсаторы для пула {pool_key} с условиями: {conditions}")
             
+            # Нормализованные штрихкоды WB (материализованная таблица wb_barcodes_normalized)
+            wb_barcodes_table = wb_barcodes_source(self.connection)
+            
             # Строим SQL запрос для поиска компенсаторов БЕЗ остатка
             query = f"""
             SELECT DISTINCT 
@@ -457,16 +461,8 @@ class AdvancedProductGrouper:
                     p2.wb_sku, 
                     AVG(ocr.rating) as avg_rating
                 FROM wb_products p2
-                INNER JOIN (
-                    SELECT wb_sku, TRIM(value) as barcode 
-                    FROM (
-                        SELECT wb_sku, UNNEST(string_split(wb_barcodes, ';')) as value
-                        FROM wb_products
-                        WHERE wb_barcodes IS NOT NULL AND wb_barcodes != ''
-                    )
-                    WHERE TRIM(value) != ''
-                ) wb_normalized ON p2.wb_sku = wb_normalized.wb_sku
-                INNER JOIN oz_barcodes ob ON TRIM(wb_normalized.barcode) = TRIM(ob.oz_barcode)
+                INNER JOIN {wb_barcodes_table} wb_normalized ON p2.wb_sku = wb_normalized.wb_sku
+                INNER JOIN oz_barcodes ob ON wb_normalized.barcode = TRIM(ob.oz_barcode)
                 INNER JOIN oz_products op_link ON ob.oz_product_id = op_link.oz_product_id
                 INNER JOIN oz_card_rating ocr ON op_link.oz_sku = ocr.oz_sku
                 WHERE ocr.rating IS NOT NULL AND ocr.rating > 0
@@ -477,16 +473,8 @@ class AdvancedProductGrouper:
                     p3.wb_sku,
                     SUM(COALESCE(op.oz_fbo_stock, 0)) as total_stock
                 FROM wb_products p3
-                INNER JOIN (
-                    SELECT wb_sku, TRIM(value) as barcode 
-                    FROM (
-                        SELECT wb_sku, UNNEST(string_split(wb_barcodes, ';')) as value
-                        FROM wb_products
-                        WHERE wb_barcodes IS NOT NULL AND wb_barcodes != ''
-                    )
-                    WHERE TRIM(value) != ''
-                ) wb_normalized_stock ON p3.wb_sku = wb_normalized_stock.wb_sku
-                INNER JOIN oz_barcodes ob_stock ON TRIM(wb_normalized_stock.barcode) = TRIM(ob_stock.oz_barcode)
+                INNER JOIN {wb_barcodes_table} wb_normalized_stock ON p3.wb_sku = wb_normalized_stock.wb_sku
+                INNER JOIN oz_barcodes ob_stock ON wb_normalized_stock.barcode = TRIM(ob_stock.oz_barcode)
                 INNER JOIN oz_products op ON ob_stock.oz_product_id = op.oz_product_id
                 GROUP BY p3.wb_sku
             ) stock_summary ON p.wb_sku = stock_summary.wb_sku
@@ -495,16 +483,8 @@ class AdvancedProductGrouper:
             AND COALESCE(stock_summary.total_stock, 0) = 0
             AND NOT EXISTS (
                 SELECT 1 FROM wb_products wb_defective
-                INNER JOIN (
-                    SELECT wb_sku, TRIM(value) as barcode 
-                    FROM (
-                        SELECT wb_sku, UNNEST(string_split(wb_barcodes, ';')) as value
-                        FROM wb_products
-                        WHERE wb_barcodes IS NOT NULL AND wb_barcodes != ''
-                    )
-                    WHERE TRIM(value) != ''
-                ) wb_norm_def ON wb_defective.wb_sku = wb_norm_def.wb_sku
-                INNER JOIN oz_barcodes ob_def ON TRIM(wb_norm_def.barcode) = TRIM(ob_def.oz_barcode)
+                INNER JOIN {wb_barcodes_table} wb_norm_def ON wb_defective.wb_sku = wb_norm_def.wb_sku
+                INNER JOIN oz_barcodes ob_def ON wb_norm_def.barcode = TRIM(ob_def.oz_barcode)
                 INNER JOIN oz_products op_def ON ob_def.oz_product_id = op_def.oz_product_id
                 WHERE wb_defective.wb_sku = p.wb_sku
                 AND op_def.oz_vendor_code LIKE 'БракSH%'
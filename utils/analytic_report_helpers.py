@@ -18,9 +18,10 @@ import streamlit as st
 from typing import Dict, List, Tuple, Optional
 import requests
 from io import BytesIO
-import tempfile
-from PIL import Image as PILImage
 from utils.db_search_helpers import get_normalized_wb_barcodes, get_ozon_barcodes_and_identifiers
+from utils.arrow_access import query_result, register_input
+from utils.wb_image_fetcher import WBImageFetcher
+from utils.wb_photo_service import get_wb_photo_url
 
 def load_analytic_report_file(file_path: str) -> Tuple[Optional[pd.DataFrame], Optional[openpyxl.Workbook], str]:
     """
@@ -188,6 +189,89 @@ def generate_order_statistics(db_conn, oz_sku_list: List[str], days_back: int =
         st.error(f"Ошибка при получении статистики заказов: {e}")
         return {}
 
+def get_stock_and_order_statistics(
+    db_conn,
+    size_mappings: Dict[str, Dict[int, List[str]]],
+    days_back: int = 30
+) -> Dict[str, Dict]:
+    """
+    Aggregates stock and per-day order counts for all WB SKUs of the report with one query.
+
+    Set-based replacement for calling aggregate_stock_data and generate_order_statistics
+    per WB SKU: the WB -> Ozon links are registered as an input table and joined with
+    oz_products and oz_orders, grouped by wb_sku (and order date). Each Ozon SKU is
+    counted once per WB SKU, even if it is linked through several sizes.
+
+    Args:
+        db_conn: Database connection
+        size_mappings: Dict mapping wb_sku -> size -> [list of oz_skus] (map_wb_to_ozon_by_size)
+        days_back: Number of days to look back for orders
+
+    Returns:
+        Dict mapping wb_sku -> {'total_stock': int, 'orders': {date_string (YYYY-MM-DD): order_count}}.
+        WB SKUs without Ozon links are omitted.
+    """
+    wb_sku_keys = {str(wb_sku): wb_sku for wb_sku in size_mappings}
+    links = [
+        (str(wb_sku), str(oz_sku))
+        for wb_sku, size_mapping in size_mappings.items()
+        for oz_skus_list in size_mapping.values()
+        for oz_sku in oz_skus_list
+    ]
+    if not links:
+        return {}
+
+    start_date = (datetime.now() - timedelta(days=days_back)).strftime('%Y-%m-%d')
+    statistics_query = """
+    WITH links AS (
+        SELECT DISTINCT wb_sku, TRY_CAST(oz_sku AS BIGINT) AS oz_sku
+        FROM analytic_report_links
+    ),
+    stock AS (
+        SELECT l.wb_sku, SUM(p.oz_fbo_stock) AS total_stock
+        FROM links l
+        JOIN oz_products p ON p.oz_sku = l.oz_sku
+        GROUP BY l.wb_sku
+    ),
+    orders AS (
+        SELECT l.wb_sku, o.oz_accepted_date AS order_date, COUNT(*) AS order_count
+        FROM links l
+        JOIN oz_orders o ON o.oz_sku = l.oz_sku
+        WHERE o.oz_accepted_date >= ?
+            AND o.order_status != 'Отменён'
+        GROUP BY l.wb_sku, o.oz_accepted_date
+    )
+    SELECT
+        w.wb_sku,
+        COALESCE(s.total_stock, 0) AS total_stock,
+        strftime(o.order_date, '%Y-%m-%d') AS order_date,
+        o.order_count
+    FROM (SELECT DISTINCT wb_sku FROM links) w
+    LEFT JOIN stock s ON s.wb_sku = w.wb_sku
+    LEFT JOIN orders o ON o.wb_sku = w.wb_sku
+    ORDER BY w.wb_sku, o.order_date DESC
+    """
+
+    try:
+        register_input(db_conn, 'analytic_report_links', {
+            'wb_sku': [wb_sku for wb_sku, _ in links],
+            'oz_sku': [oz_sku for _, oz_sku in links],
+        })
+        try:
+            result = query_result(db_conn, statistics_query, [start_date])
+        finally:
+            db_conn.unregister('analytic_report_links')
+    except Exception as e:
+        st.error(f"Ошибка при получении данных об остатках и заказах: {e}")
+        return {}
+
+    statistics: Dict[str, Dict] = {}
+    for row in result.iter_rows():
+        entry = statistics.setdefault(wb_sku_keys[row['wb_sku']], {'total_stock': int(row['total_stock']), 'orders': {}})
+        if row['order_date'] is not None:
+            entry['orders'][row['order_date']] = int(row['order_count'])
+    return statistics
+
 def create_backup_file(file_path: str) -> str:
     """
     Creates a backup of the original file with timestamp.
@@ -215,7 +299,7 @@ def create_backup_file(file_path: str) -> str:
 def get_wb_image_url(wb_sku: str) -> str:
     """
     Генерирует URL изображения WB на основе артикула.
-    Реализует алгоритм из Google Sheets для определения правильного URL.
+    Номер тома CDN определяется общей таблицей границ (utils.wb_photo_service).
     
     Args:
         wb_sku: Артикул WB (строка или число)
@@ -223,73 +307,10 @@ def get_wb_image_url(wb_sku: str) -> str:
     Returns:
         URL изображения или пустая строка если не удалось сгенерировать
     """
-    try:
-        # Конвертируем в целое число
-        a = int(float(wb_sku))
-        
-        # Вычисляем b и c
-        b = a // 100000
-        c = a // 1000
-        
-        # Определяем volNum по алгоритму из Google Sheets
-        if b <= 143:
-            vol_num = "01"
-        elif b <= 287:
-            vol_num = "02"
-        elif b <= 431:
-            vol_num = "03"
-        elif b <= 719:
-            vol_num = "04"
-        elif b <= 1007:
-            vol_num = "05"
-        elif b <= 1061:
-            vol_num = "06"
-        elif b <= 1115:
-            vol_num = "07"
-        elif b <= 1169:
-            vol_num = "08"
-        elif b <= 1313:
-            vol_num = "09"
-        elif b <= 1601:
-            vol_num = "10"
-        elif b <= 1655:
-            vol_num = "11"
-        elif b <= 1919:
-            vol_num = "12"
-        elif b <= 2045:
-            vol_num = "13"
-        elif b <= 2189:
-            vol_num = "14"
-        elif b <= 2405:
-            vol_num = "15"
-        elif b <= 2621:
-            vol_num = "16"
-        elif b <= 2837:
-            vol_num = "17"
-        elif b <= 3053:
-            vol_num = "18"
-        elif b <= 3269:
-            vol_num = "19"
-        elif b <= 3485:
-            vol_num = "20"
-        elif b <= 3701:
-            vol_num = "21"
-        elif b <= 3917:
-            vol_num = "22"
-        elif b <= 4133:
-            vol_num = "23"
-        elif b <= 4349:
-            vol_num = "24"
-        else:
-            vol_num = "25"
-        
-        # Формируем URL
-        image_url = f"https://basket-{vol_num}.wbbasket.ru/vol{b}/part{c}/{a}/images/tm/1.webp"
-        return image_url
-        
-    except (ValueError, TypeError) as e:
-        st.warning(f"Не удалось сгенерировать URL изображения для WB_SKU {wb_sku}: {e}")
-        return ""
+    image_url = get_wb_photo_url(wb_sku)
+    if not image_url:
+        st.warning(f"Не удалось сгенерировать URL изображения для WB_SKU {wb_sku}")
+    return image_url
 
 def download_wb_image(wb_sku: str, timeout: int = 30) -> Optional[BytesIO]:
     """
@@ -335,10 +356,11 @@ def download_wb_image(wb_sku: str, timeout: int = 30) -> Optional[BytesIO]:
         st.warning(f"Неожиданная ошибка при загрузке изображения для WB_SKU {wb_sku}: {e}")
         return None
 
-def insert_wb_image_to_cell(ws, row_num: int, col_num: int, wb_sku: str, cell_width: float = 64, cell_height: float = 64) -> Tuple[bool, Optional[str]]:
+def insert_wb_image_to_cell(ws, row_num: int, col_num: int, wb_sku: str, cell_width: float = 64, cell_height: float = 64,
+                            image_path: Optional[str] = None) -> Tuple[bool, Optional[str]]:
     """
-    Загружает и вставляет изображение WB в ячейку Excel.
-    Конвертирует WebP в PNG для совместимости с Excel.
+    Вставляет изображение WB в ячейку Excel.
+    Использует PNG миниатюру из кэша WBImageFetcher (WebP конвертируется при загрузке).
     Привязывает изображение к ячейке для правильного поведения при изменении размеров.
     
     Args:
@@ -348,46 +370,22 @@ def insert_wb_image_to_cell(ws, row_num: int, col_num: int, wb_sku: str, cell_wi
         wb_sku: Артикул WB
         cell_width: Ширина изображения в пикселях
         cell_height: Высота изображения в пикселях
+        image_path: Путь к уже загруженной миниатюре; если не задан, изображение загружается
         
     Returns:
         Tuple: (успех, путь_к_временному_файлу_для_очистки)
-        Возвращает путь к временному файлу, который нужно удалить позже
+        Миниатюры хранятся в кэше, поэтому временный файл не создается (None)
     """
     try:
-        # Загружаем изображение
-        image_data = download_wb_image(wb_sku)
-        if not image_data:
-            return False, None
-        
-        # Создаем временный файл для изображения в формате PNG
-        try:
-            temp_file = tempfile.NamedTemporaryFile(suffix='.png', delete=False)
-            temp_file_path = temp_file.name
-            temp_file.close()  # Закрываем файл для записи через PIL
-            
-            # Открываем WebP изображение из BytesIO
-            image_data.seek(0)
-            pil_image = PILImage.open(image_data)
-            
-            # Конвертируем в RGB если необходимо (для PNG)
-            if pil_image.mode in ("RGBA", "P"):
-                pil_image = pil_image.convert("RGB")
-            
-            # Сохраняем как PNG
-            pil_image.save(temp_file_path, "PNG")
-            
-            # Дополнительная проверка что файл существует
-            if not os.path.exists(temp_file_path):
-                st.error(f"❌ Не удалось создать временный файл для WB_SKU {wb_sku}")
+        if not image_path:
+            image_path, error = WBImageFetcher(max_workers=1).fetch(wb_sku)
+            if not image_path:
+                st.warning(f"Ошибка при загрузке изображения для WB_SKU {wb_sku}: {error}")
                 return False, None
-            
-        except Exception as temp_error:
-            st.error(f"❌ Ошибка конвертации изображения для WB_SKU {wb_sku}: {temp_error}")
-            return False, None
         
         try:
             # Создаем объект изображения openpyxl
-            img = Image(temp_file_path)
+            img = Image(image_path)
             
             # Устанавливаем размер изображения
             img.width = cell_width
@@ -416,23 +414,18 @@ def insert_wb_image_to_cell(ws, row_num: int, col_num: int, wb_sku: str, cell_wi
             # Оставляем ячейку пустой (без текста гиперссылки)
             # Если нужна гиперссылка, её можно добавить через комментарий к изображению
             
-            return True, temp_file_path
+            return True, None
             
         except Exception as e_insert:
             st.error(f"❌ Ошибка вставки изображения для WB_SKU {wb_sku}: {e_insert}")
-            # Если вставка не удалась, удаляем временный файл сразу
-            try:
-                if os.path.exists(temp_file_path):
-                    os.unlink(temp_file_path)
-            except Exception as cleanup_error:
-                pass  # Тихо игнорируем ошибки очистки
             raise e_insert
                 
     except Exception as e:
         st.error(f"❌ Общая ошибка при обработке изображения для WB_SKU {wb_sku}: {e}")
         return False, None
 
-def update_analytic_report(file_path: str, wb_sku_data: Dict[str, Dict], include_images: bool = False) -> Tuple[bool, str]:
+def update_analytic_report(file_path: str, wb_sku_data: Dict[str, Dict], include_images: bool = False,
+                           image_fetcher: Optional[WBImageFetcher] = None) -> Tuple[bool, str]:
     """
     Updates the analytic report Excel file with calculated data.
     Now includes support for PHOTO_FROM_WB column with image insertion.
@@ -441,6 +434,7 @@ def update_analytic_report(file_path: str, wb_sku_data: Dict[str, Dict], include
         file_path: Path to the Excel file
         wb_sku_data: Dict containing calculated data for each WB SKU
         include_images: Whether to download and insert product images from WB
+        image_fetcher: Image loader (concurrent, cached); created with defaults if not given
         
     Returns:
         Tuple of (success, error_message)
@@ -490,9 +484,16 @@ def update_analytic_report(file_path: str, wb_sku_data: Dict[str, Dict], include
             if wb_sku and wb_sku in wb_sku_data:
                 wb_skus_to_process.append((row_num, wb_sku))
         
-        # Show compact processing info
+        # Download all images concurrently before filling rows
+        image_paths, image_errors = {}, {}
         if has_photo_column and wb_skus_to_process:
             st.info(f"🔄 Обработка {len(wb_skus_to_process)} изображений товаров...")
+            image_progress = st.progress(0.0)
+            fetcher = image_fetcher or WBImageFetcher()
+            image_paths, image_errors = fetcher.fetch_many(
+                [wb_sku for _, wb_sku in wb_skus_to_process],
+                on_done=lambda done, total: image_progress.progress(done / total)
+            )
         
         # Process each row
         for row_num, wb_sku in wb_skus_to_process:
@@ -529,25 +530,25 @@ def update_analytic_report(file_path: str, wb_sku_data: Dict[str, Dict], include
                 photo_total_count += 1
                 col_num = column_map["PHOTO_FROM_WB"]
                 
-                # Генерируем URL для проверки доступности изображения
-                image_url = get_wb_image_url(wb_sku)
+                image_path = image_paths.get(wb_sku)
                 
-                if image_url:
+                if image_path:
                     # Не добавляем никакого текста в ячейку - только изображение
                     
                     # Пытаемся вставить изображение
                     try:
-                        success, temp_file_path = insert_wb_image_to_cell(ws, row_num, col_num, wb_sku)
+                        success, temp_file_path = insert_wb_image_to_cell(ws, row_num, col_num, wb_sku, image_path=image_path)
                         if success:
                             photo_success_count += 1
                             if temp_file_path:
                                 temp_image_files.append(temp_file_path)
                         else:
-                            failed_images.append(f"WB_SKU {wb_sku} (строка {row_num}): Не удалось загрузить изображение")
+                            failed_images.append(f"WB_SKU {wb_sku} (строка {row_num}): Не удалось вставить изображение")
                     except Exception as image_error:
                         failed_images.append(f"WB_SKU {wb_sku} (строка {row_num}): {str(image_error)}")
                 else:
-                    failed_images.append(f"WB_SKU {wb_sku} (строка {row_num}): Не удалось сгенерировать URL")
+                    error = image_errors.get(wb_sku, "Не удалось загрузить изображение")
+                    failed_images.append(f"WB_SKU {wb_sku} (строка {row_num}): {error}")
         
         # Update all PUNTA_ columns dynamically
         punta_columns = {col_name: col_num for col_name, col_num in column_map.items() 
@@ -638,22 +639,19 @@ def process_analytic_report(db_conn, file_path: str, include_images: bool = Fals
     # Get Punta data for all WB SKUs at once
     punta_mappings = get_punta_data(db_conn, wb_sku_list)
     
+    # Get stock and order statistics for all WB SKUs at once
+    sku_statistics = get_stock_and_order_statistics(db_conn, size_mappings, days_back=30)
+    
     for wb_sku in wb_sku_list:
         size_mapping = size_mappings.get(wb_sku, {})
         
-        # Get all oz_skus for this wb_sku
-        all_oz_skus = []
-        for oz_skus_list in size_mapping.values():
-            all_oz_skus.extend(oz_skus_list)
-        
         # Calculate size range
         size_range = calculate_size_range(size_mapping)
         
-        # Get stock data
-        total_stock = aggregate_stock_data(db_conn, all_oz_skus)
-        
-        # Get order statistics
-        orders_data = generate_order_statistics(db_conn, all_oz_skus, days_back=30)
+        # Stock and order statistics from the bulk query
+        statistics = sku_statistics.get(wb_sku, {})
+        total_stock = statistics.get('total_stock', 0)
+        orders_data = statistics.get('orders', {})
         
         # Get Punta data
         punta_data = punta_mappings.get(wb_sku, {})
@@ -747,17 +745,18 @@ def get_punta_data(db_conn, wb_sku_list: List[str]) -> Dict[str, Dict[str, str]]
             WHERE rn = 1
             """
             
-            punta_df = db_conn.execute(punta_query, wb_skus_int).fetchdf()
+            # Columnar result: rows are materialized lazily, without a pandas copy
+            punta_result = query_result(db_conn, punta_query, wb_skus_int)
             
-            if punta_df.empty:
+            if punta_result.empty:
                 st.info(f"📭 Данные Punta не найдены для {len(wb_skus_int)} WB SKU")
                 return {}
             
-            st.success(f"✅ Найдены данные Punta для {len(punta_df)} из {len(wb_skus_int)} WB SKU (первые вхождения)")
+            st.success(f"✅ Найдены данные Punta для {len(punta_result)} из {len(wb_skus_int)} WB SKU (первые вхождения)")
             
             # Convert to dict format with Excel-friendly formatting
             result_map = {}
-            for _, row in punta_df.iterrows():
+            for row in punta_result.iter_rows():
                 wb_sku = str(row['wb_sku'])  # Convert back to string for consistency with input
                 result_map[wb_sku] = {}
                 
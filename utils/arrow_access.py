@@ -0,0 +1,210 @@
+"""
+Колоночный доступ к результатам запросов DuckDB без промежуточного pandas.
+
+Запросы с последующим .fetchdf() и iterrows() копируют результат в DataFrame
+(строки - в object-массивы Python), а затем еще раз - в Series на каждую строку.
+Модуль возвращает результат в колоночном виде и преобразует его лениво:
+- при установленном pyarrow - таблица Arrow (строки остаются в буферах Arrow,
+  строки отдаются пакетами по RecordBatch)
+- без pyarrow - колонки numpy из DuckDB (fetchnumpy), без создания DataFrame
+  (значения DATE в этом режиме отдаются как datetime)
+
+pyarrow - необязательная зависимость: все функции работают и без него.
+
+Основные функции:
+- query_result: выполнение запроса и ленивый доступ к колонкам и строкам
+- register_input: регистрация входных данных в DuckDB (Arrow без копирования)
+
+Автор: DataFox SL Project
+Версия: 1.0.0
+"""
+
+import duckdb
+import numpy as np
+import pandas as pd
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Union
+
+try:
+    import pyarrow as pa
+    ARROW_AVAILABLE = True
+except ImportError:
+    pa = None
+    ARROW_AVAILABLE = False
+
+# Размер пакета строк при итерации по результату
+DEFAULT_BATCH_SIZE = 10_000
+
+
+def _unmask(values: np.ndarray) -> Any:
+    """Колонка fetchnumpy -> массив для pandas с NULL как в fetchdf (NaN, NaT, <NA>, None)"""
+    if not np.ma.isMaskedArray(values):
+        return values
+    if values.dtype.kind == 'f':
+        return values.filled(np.nan)
+    if values.dtype.kind in 'iu':
+        return pd.arrays.IntegerArray(np.asarray(values.data), np.ma.getmaskarray(values))
+    if values.dtype.kind == 'b':
+        return pd.arrays.BooleanArray(np.asarray(values.data), np.ma.getmaskarray(values))
+    if values.dtype.kind in 'mM':
+        return values.filled(np.array('NaT', dtype=values.dtype))
+    result = np.asarray(values.data, dtype=object)
+    result[np.ma.getmaskarray(values)] = None
+    return result
+
+
+def _nullable_dtype(arrow_type: Any) -> Any:
+    """Тип Arrow -> nullable-тип pandas (Int64, UInt8, boolean и т.д.)"""
+    if pa.types.is_boolean(arrow_type):
+        return pd.BooleanDtype()
+    if pa.types.is_integer(arrow_type):
+        return pd.api.types.pandas_dtype(str(arrow_type).capitalize().replace('Uint', 'UInt'))
+    return None
+
+
+class QueryResult:
+    """
+    Результат запроса в колоночном виде с ленивым преобразованием.
+
+    Хранит таблицу Arrow (если доступен pyarrow) или словарь колонок numpy.
+    Значения Python создаются только при обращении к колонке или строкам;
+    NULL возвращается как None.
+    """
+
+    def __init__(self, table: Any = None, columns: Optional[Dict[str, np.ndarray]] = None):
+        self._table = table
+        self._columns = columns if columns is not None else {}
+
+    @property
+    def is_arrow(self) -> bool:
+        return self._table is not None
+
+    @property
+    def column_names(self) -> List[str]:
+        if self.is_arrow:
+            return list(self._table.column_names)
+        return list(self._columns.keys())
+
+    @property
+    def num_rows(self) -> int:
+        if self.is_arrow:
+            return self._table.num_rows
+        if not self._columns:
+            return 0
+        return len(next(iter(self._columns.values())))
+
+    def __len__(self) -> int:
+        return self.num_rows
+
+    @property
+    def empty(self) -> bool:
+        return self.num_rows == 0
+
+    def column(self, name: str) -> List[Any]:
+        """
+        Значения одной колонки.
+
+        Args:
+            name: Имя колонки
+
+        Returns:
+            Список значений Python
+        """
+        if self.is_arrow:
+            return self._table.column(name).to_pylist()
+        return self._columns[name].tolist()
+
+    def iter_rows(self, batch_size: int = DEFAULT_BATCH_SIZE) -> Iterator[Dict[str, Any]]:
+        """
+        Построчный обход результата (замена DataFrame.iterrows()).
+
+        Строки материализуются пакетами по batch_size, а не все сразу.
+
+        Yields:
+            Словарь {колонка: значение}
+        """
+        if self.is_arrow:
+            for batch in self._table.to_batches(max_chunksize=batch_size):
+                yield from batch.to_pylist()
+            return
+
+        names = self.column_names
+        for start in range(0, self.num_rows, batch_size):
+            chunk = [self._columns[name][start:start + batch_size].tolist() for name in names]
+            for values in zip(*chunk):
+                yield dict(zip(names, values))
+
+    def to_pandas(self, arrow_strings: bool = False) -> pd.DataFrame:
+        """
+        Преобразование в DataFrame (для кода, которому нужен pandas).
+
+        Args:
+            arrow_strings: Хранить строковые колонки в pd.ArrowDtype вместо object
+                (только при установленном pyarrow)
+
+        Returns:
+            DataFrame с колонками результата
+        """
+        if self.is_arrow:
+            string_types = (pa.string(), pa.large_string())
+            frame = self._table.to_pandas(
+                date_as_object=False,
+                types_mapper=(lambda t: pd.ArrowDtype(t) if t in string_types else None) if arrow_strings else None
+            )
+            # Целые и логические колонки с NULL - nullable-типы pandas, как в fetchdf (а не float/object)
+            for name, column in zip(self._table.column_names, self._table.columns):
+                if column.null_count and (pa.types.is_integer(column.type) or pa.types.is_boolean(column.type)):
+                    frame[name] = column.to_pandas(types_mapper=_nullable_dtype)
+            return frame
+
+        return pd.DataFrame({name: _unmask(values) for name, values in self._columns.items()})
+
+
+def query_result(
+    conn: duckdb.DuckDBPyConnection,
+    query: str,
+    params: Optional[Sequence[Any]] = None
+) -> QueryResult:
+    """
+    Выполняет запрос и возвращает результат в колоночном виде.
+
+    Args:
+        conn: Соединение с базой данных (или курсор)
+        query: SQL запрос
+        params: Параметры запроса
+
+    Returns:
+        QueryResult поверх таблицы Arrow или колонок numpy
+    """
+    relation = conn.execute(query, list(params)) if params else conn.execute(query)
+    if ARROW_AVAILABLE:
+        # to_arrow_table - новое имя fetch_arrow_table (DuckDB >= 1.4)
+        fetch_arrow = getattr(relation, 'to_arrow_table', None) or relation.fetch_arrow_table
+        return QueryResult(table=fetch_arrow())
+    return QueryResult(columns=relation.fetchnumpy())
+
+
+def register_input(
+    conn: duckdb.DuckDBPyConnection,
+    name: str,
+    data: Union[pd.DataFrame, Dict[str, Sequence[Any]]]
+) -> None:
+    """
+    Регистрирует входные данные как виртуальную таблицу DuckDB.
+
+    При установленном pyarrow данные передаются таблицей Arrow: DuckDB читает
+    ее буферы без копирования и без сканирования object-колонок pandas.
+
+    Args:
+        conn: Соединение с базой данных
+        name: Имя виртуальной таблицы
+        data: DataFrame или словарь {колонка: значения}
+    """
+    if ARROW_AVAILABLE:
+        if isinstance(data, pd.DataFrame):
+            table = pa.Table.from_pandas(data, preserve_index=False)
+        else:
+            table = pa.table(dict(data))
+        conn.register(name, table)
+        return
+
+    conn.register(name, data if isinstance(data, pd.DataFrame) else pd.DataFrame(dict(data)))
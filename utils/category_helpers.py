@@ -7,11 +7,15 @@ This module provides functionality to:
 - Validate category mappings
 - Generate category analytics reports
 """
+import numpy as np
 import pandas as pd
 import streamlit as st
 from difflib import SequenceMatcher
 from typing import Dict, List, Tuple, Optional
 
+# Upper limit of (WB x Ozon x alphabet) elements per numpy block of character-overlap bounds
+_BOUND_BLOCK_ELEMENTS = 8_000_000
+
 def get_unique_wb_categories(db_conn) -> List[str]:
     """
     Gets all unique WB categories from wb_products table.
@@ -73,10 +77,120 @@ def calculate_similarity(str1: str, str2: str) -> float:
     """
     return SequenceMatcher(None, str1.lower().strip(), str2.lower().strip()).ratio()
 
+def _normalize_category(category: str) -> str:
+    return category.lower().strip()
+
+def _candidate_pairs(wb_norm: List[str], oz_norm: List[str], similarity_threshold: float) -> Dict[int, List[int]]:
+    """
+    Prunes WB x Ozon pairs that cannot reach the similarity threshold.
+    
+    SequenceMatcher.ratio() is 2*M/(len_a + len_b), where the number of matched
+    characters M never exceeds the character multiset overlap of the strings
+    (the bound behind SequenceMatcher.quick_ratio). Categories are indexed by
+    length (a pair with very different lengths is skipped by a sorted-length window)
+    and by character counts (the overlap bound is computed for all remaining
+    pairs at once with numpy). Pruning is exact: no pair that reaches the
+    threshold is dropped.
+    
+    Args:
+        wb_norm: Normalized WB categories
+        oz_norm: Normalized Ozon categories
+        similarity_threshold: Minimum similarity threshold
+        
+    Returns:
+        Dictionary mapping Ozon category index -> WB category indexes to score exactly
+    """
+    alphabet = {char: idx for idx, char in enumerate(sorted(set(''.join(wb_norm + oz_norm))))}
+    
+    def char_counts(strings: List[str]) -> np.ndarray:
+        counts = np.zeros((len(strings), max(len(alphabet), 1)), dtype=np.uint16)
+        for row, value in enumerate(strings):
+            for char in value:
+                counts[row, alphabet[char]] += 1
+        return counts
+    
+    wb_counts = char_counts(wb_norm)
+    oz_counts = char_counts(oz_norm)
+    wb_lengths = np.array([len(value) for value in wb_norm], dtype=np.int64)
+    oz_lengths = np.array([len(value) for value in oz_norm], dtype=np.int64)
+    
+    # Length index: ratio <= 2*min(la, lb)/(la + lb) limits the Ozon length window for each WB length;
+    # WB categories are processed in length order so each block has a narrow window
+    oz_order = np.argsort(oz_lengths, kind='stable')
+    sorted_oz_lengths = oz_lengths[oz_order]
+    wb_order = np.argsort(wb_lengths, kind='stable')
+    block_size = max(1, _BOUND_BLOCK_ELEMENTS // max(1, len(oz_norm) * wb_counts.shape[1]))
+    
+    candidates: Dict[int, List[int]] = {}
+    for block_start in range(0, len(wb_norm), block_size):
+        block = wb_order[block_start:block_start + block_size]
+        if similarity_threshold > 0:
+            min_length = int(np.floor(wb_lengths[block].min() * similarity_threshold / (2 - similarity_threshold)))
+            max_length = int(np.ceil(wb_lengths[block].max() * (2 - similarity_threshold) / similarity_threshold))
+            lo = np.searchsorted(sorted_oz_lengths, min_length, side='left')
+            hi = np.searchsorted(sorted_oz_lengths, max_length, side='right')
+            oz_window = oz_order[lo:hi]
+        else:
+            oz_window = oz_order
+        if len(oz_window) == 0:
+            continue
+        
+        # Character overlap bound for the block: (block x window)
+        overlap = np.minimum(wb_counts[block][:, None, :], oz_counts[oz_window][None, :, :]).sum(axis=2)
+        total_length = wb_lengths[block][:, None] + oz_lengths[oz_window][None, :]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            bound = np.where(total_length > 0, 2.0 * overlap / total_length, 1.0)
+        
+        wb_idx, window_idx = np.nonzero(bound >= similarity_threshold)
+        for wb_pos, oz_pos in zip(block[wb_idx].tolist(), oz_window[window_idx].tolist()):
+            candidates.setdefault(oz_pos, []).append(wb_pos)
+    
+    return candidates
+
+@st.cache_data(show_spinner=False)
+def _score_category_pairs(wb_categories: Tuple[str, ...], oz_categories: Tuple[str, ...],
+                          similarity_threshold: float) -> List[Dict]:
+    """
+    Scores plausible category pairs with SequenceMatcher and keeps the top 3 per WB category.
+    Cached by the category lists: results are recomputed only when categories change.
+    """
+    wb_norm = [_normalize_category(cat) for cat in wb_categories]
+    oz_norm = [_normalize_category(cat) for cat in oz_categories]
+    
+    matches_by_wb: Dict[int, List[Tuple[int, float]]] = {}
+    matcher = SequenceMatcher(None)
+    for oz_idx, wb_indexes in _candidate_pairs(wb_norm, oz_norm, similarity_threshold).items():
+        # set_seq2 caches the analysis of the Ozon category for all its WB candidates
+        matcher.set_seq2(oz_norm[oz_idx])
+        for wb_idx in wb_indexes:
+            matcher.set_seq1(wb_norm[wb_idx])
+            similarity = matcher.ratio()
+            if similarity >= similarity_threshold:
+                matches_by_wb.setdefault(wb_idx, []).append((oz_idx, similarity))
+    
+    suggestions = []
+    for wb_idx in sorted(matches_by_wb):
+        # Sort by similarity (ties in Ozon category order) and take top matches
+        best_matches = sorted(matches_by_wb[wb_idx])
+        best_matches.sort(key=lambda x: x[1], reverse=True)
+        
+        for oz_idx, similarity in best_matches[:3]:  # Top 3 matches
+            suggestions.append({
+                'wb_category': wb_categories[wb_idx],
+                'oz_category': oz_categories[oz_idx],
+                'similarity': similarity,
+                'confidence': 'High' if similarity > 0.9 else 'Medium' if similarity > 0.8 else 'Low'
+            })
+    
+    return suggestions
+
 def suggest_category_mappings(db_conn, similarity_threshold: float = 0.7) -> List[Dict]:
     """
     Suggests category mappings based on string similarity.
     
+    Only pairs that pass the length and character-overlap index are scored
+    with SequenceMatcher; results are cached until the category lists change.
+    
     Args:
         db_conn: Database connection
         similarity_threshold: Minimum similarity threshold for suggestions
@@ -88,31 +202,7 @@ def suggest_category_mappings(db_conn, similarity_threshold: float = 0.7) -> Lis
         wb_categories = get_unique_wb_categories(db_conn)
         oz_categories = get_unique_oz_categories(db_conn)
         
-        suggestions = []
-        
-        for wb_cat in wb_categories:
-            best_matches = []
-            
-            for oz_cat in oz_categories:
-                similarity = calculate_similarity(wb_cat, oz_cat)
-                if similarity >= similarity_threshold:
-                    best_matches.append({
-                        'oz_category': oz_cat,
-                        'similarity': similarity
-                    })
-            
-            # Sort by similarity and take top matches
-            best_matches.sort(key=lambda x: x['similarity'], reverse=True)
-            
-            for match in best_matches[:3]:  # Top 3 matches
-                suggestions.append({
-                    'wb_category': wb_cat,
-                    'oz_category': match['oz_category'],
-                    'similarity': match['similarity'],
-                    'confidence': 'High' if match['similarity'] > 0.9 else 'Medium' if match['similarity'] > 0.8 else 'Low'
-                })
-        
-        return suggestions
+        return list(_score_category_pairs(tuple(wb_categories), tuple(oz_categories), similarity_threshold))
         
     except Exception as e:
         st.error(f"Ошибка при генерации предложений: {e}")
@@ -13,6 +13,11 @@ import streamlit as st
 import duckdb
 from typing import List, Dict, Optional, Tuple, Any
 from utils.db_search_helpers import get_normalized_wb_barcodes, get_ozon_barcodes_and_identifiers
+from utils.marketplace_links import (
+    marketplace_links_exists,
+    get_marketplace_links,
+    get_bidirectional_links_from_table,
+)
 
 
 class CrossMarketplaceLinker:
@@ -29,6 +34,36 @@ class CrossMarketplaceLinker:
             connection: Активное соединение с базой данных DuckDB
         """
         self.connection = connection
+    
+    def _get_linked_barcodes(
+        self,
+        wb_skus: Optional[List[str]] = None,
+        oz_skus: Optional[List[str]] = None,
+        oz_vendor_codes: Optional[List[str]] = None
+    ) -> pd.DataFrame:
+        """
+        Возвращает связи по общим штрихкодам из таблицы marketplace_links,
+        а если она еще не построена - через _normalize_and_merge_barcodes.
+        
+        Returns:
+            DataFrame в формате _normalize_and_merge_barcodes
+        """
+        if marketplace_links_exists(self.connection):
+            try:
+                return get_marketplace_links(
+                    self.connection,
+                    wb_skus=wb_skus,
+                    oz_skus=oz_skus,
+                    oz_vendor_codes=oz_vendor_codes
+                )
+            except Exception as e:
+                st.warning(f"Не удалось прочитать marketplace_links, используем расчет на лету: {e}")
+        
+        return self._normalize_and_merge_barcodes(
+            wb_skus=wb_skus,
+            oz_skus=oz_skus,
+            oz_vendor_codes=oz_vendor_codes
+        )
         
     def _normalize_and_merge_barcodes(
         self, 
@@ -125,37 +160,10 @@ class CrossMarketplaceLinker:
                 
                 # Шаг 3: Определяем актуальность для каждой связи wb_sku-oz_vendor_code
                 if 'barcode_position' in linked_df.columns:
-                    # Для каждой комбинации wb_sku + oz_vendor_code определяем актуальность
-                    wb_oz_combinations = linked_df[['wb_sku', 'oz_vendor_code']].drop_duplicates()
-                    
-                    linked_df['is_primary_barcode'] = False  # Инициализация
-                    
-                    for _, combo in wb_oz_combinations.iterrows():
-                        wb_sku = combo['wb_sku']
-                        oz_vendor_code = combo['oz_vendor_code']
-                        
-                        # Фильтруем связи для этой комбинации
-                        combo_links = linked_df[
-                            (linked_df['wb_sku'] == wb_sku) & 
-                            (linked_df['oz_vendor_code'] == oz_vendor_code)
-                        ].copy()
-                        
-                        # Проверяем, есть ли среди связей актуальный штрихкод Ozon
-                        has_actual_oz = combo_links['is_actual_oz_barcode'].any()
-                        
-                        if has_actual_oz:
-                            # Если есть актуальный штрихкод Ozon, находим первый в WB среди актуальных
-                            actual_oz_links = combo_links[combo_links['is_actual_oz_barcode']]
-                            min_wb_position = actual_oz_links['barcode_position'].min()
-                            
-                            # Помечаем как актуальные только связи с актуальным штрихкодом Ozon и минимальной позицией WB
-                            mask = (
-                                (linked_df['wb_sku'] == wb_sku) & 
-                                (linked_df['oz_vendor_code'] == oz_vendor_code) &
-                                (linked_df['is_actual_oz_barcode']) &
-                                (linked_df['barcode_position'] == min_wb_position)
-                            )
-                            linked_df.loc[mask, 'is_primary_barcode'] = True
+                    # Внутри каждой комбинации wb_sku + oz_vendor_code актуальна связь с актуальным
+                    # штрихкодом Ozon и минимальной позицией WB среди таких связей.
+                    # Считается одним groupby/transform вместо цикла по комбинациям.
+                    linked_df['is_primary_barcode'] = self._mark_primary_barcodes(linked_df)
                 else:
                     # Если нет информации о позиции WB, учитываем только актуальность Ozon
                     linked_df['is_primary_barcode'] = linked_df['is_actual_oz_barcode']
@@ -169,6 +177,28 @@ class CrossMarketplaceLinker:
             st.error(f"Ошибка при объединении штрихкодов: {e}")
             return pd.DataFrame()
     
+    @staticmethod
+    def _mark_primary_barcodes(linked_df: pd.DataFrame) -> pd.Series:
+        """
+        Векторно вычисляет флаг is_primary_barcode.
+        
+        Для каждой пары wb_sku + oz_vendor_code помечаются связи, у которых штрихкод Ozon
+        актуален (is_actual_oz_barcode) и позиция в wb_barcodes минимальна среди актуальных.
+        Пары без актуального штрихкода Ozon не помечаются.
+        
+        Args:
+            linked_df: DataFrame с колонками wb_sku, oz_vendor_code, barcode_position, is_actual_oz_barcode
+            
+        Returns:
+            Булева Series, выровненная по индексу linked_df
+        """
+        is_actual = linked_df['is_actual_oz_barcode'].astype(bool)
+        actual_positions = linked_df['barcode_position'].where(is_actual)
+        min_actual_position = actual_positions.groupby(
+            [linked_df['wb_sku'], linked_df['oz_vendor_code']]
+        ).transform('min')
+        return is_actual & (linked_df['barcode_position'] == min_actual_position)
+    
     @st.cache_data(ttl=300)  # Кэш на 5 минут
     def link_wb_to_oz(_self, wb_skus: List[str]) -> Dict[str, List[str]]:
         """
@@ -188,16 +218,16 @@ class CrossMarketplaceLinker:
         if not wb_skus_clean:
             return {}
         
-        linked_df = _self._normalize_and_merge_barcodes(wb_skus=wb_skus_clean)
+        linked_df = _self._get_linked_barcodes(wb_skus=wb_skus_clean)
         if linked_df.empty:
             return {}
         
-        # Группируем по wb_sku и собираем уникальные oz_sku
+        # Группируем по wb_sku и собираем уникальные oz_sku (один проход groupby)
+        oz_skus_by_wb = linked_df.groupby('wb_sku', sort=False)['oz_sku'].unique()
         result = {}
         for wb_sku in wb_skus_clean:
-            oz_skus = linked_df[linked_df['wb_sku'] == wb_sku]['oz_sku'].unique().tolist()
-            if oz_skus:
-                result[wb_sku] = oz_skus
+            if wb_sku in oz_skus_by_wb.index:
+                result[wb_sku] = oz_skus_by_wb[wb_sku].tolist()
                 
         return result
     
@@ -219,15 +249,15 @@ class CrossMarketplaceLinker:
         if not oz_skus_clean:
             return {}
         
-        linked_df = _self._normalize_and_merge_barcodes(oz_skus=oz_skus_clean)
+        linked_df = _self._get_linked_barcodes(oz_skus=oz_skus_clean)
         if linked_df.empty:
             return {}
         
+        wb_skus_by_oz = linked_df.groupby('oz_sku', sort=False)['wb_sku'].unique()
         result = {}
         for oz_sku in oz_skus_clean:
-            wb_skus = linked_df[linked_df['oz_sku'] == oz_sku]['wb_sku'].unique().tolist()
-            if wb_skus:
-                result[oz_sku] = wb_skus
+            if oz_sku in wb_skus_by_oz.index:
+                result[oz_sku] = wb_skus_by_oz[oz_sku].tolist()
                 
         return result
     
@@ -254,6 +284,17 @@ class CrossMarketplaceLinker:
         if oz_skus:
             oz_skus_clean = [str(sku).strip() for sku in oz_skus if str(sku).strip()]
         
+        # Быстрый путь: готовые связи из marketplace_links
+        if marketplace_links_exists(self.connection):
+            try:
+                return get_bidirectional_links_from_table(
+                    self.connection,
+                    wb_skus=wb_skus_clean,
+                    oz_skus=oz_skus_clean
+                )
+            except Exception as e:
+                st.warning(f"Не удалось прочитать marketplace_links, используем расчет на лету: {e}")
+        
         linked_df = self._normalize_and_merge_barcodes(
             wb_skus=wb_skus_clean,
             oz_skus=oz_skus_clean
@@ -674,6 +715,18 @@ class CrossMarketplaceLinker:
         if not wb_skus:
             return pd.DataFrame()
         
+        # Быстрый путь: связи и данные oz_products одним запросом к marketplace_links
+        if marketplace_links_exists(self.connection):
+            try:
+                wb_skus_clean = [str(sku).strip() for sku in wb_skus if str(sku).strip()]
+                return get_bidirectional_links_from_table(
+                    self.connection,
+                    wb_skus=wb_skus_clean,
+                    include_product_details=include_product_details
+                )
+            except Exception as e:
+                st.warning(f"Не удалось прочитать marketplace_links, используем расчет на лету: {e}")
+        
         # Получаем базовые связи
         linked_df = self.get_bidirectional_links(wb_skus=wb_skus)
         if linked_df.empty:
@@ -0,0 +1,240 @@
+"""
+Импорт CSV отчетов средствами DuckDB (read_csv) без промежуточного pandas.
+
+Для таблиц HARDCODED_SCHEMA с file_type "csv" (oz_orders, oz_products) обычный
+импорт проходит цепочку pandas.read_csv -> data_cleaner (построчно) ->
+преобразования колонок в Python -> register -> INSERT. Модуль строит по колонкам
+схемы один запрос INSERT ... SELECT ... FROM read_csv(...): файл читает
+параллельный CSV-ридер DuckDB, а очистка и notes схемы выражены в SQL:
+- INTEGER/BIGINT: как clean_integer_field (целое, целая часть числа, первое число в строке)
+- DOUBLE/NUMERIC: как clean_double_field (число или первое число в строке)
+- convert_to_bigint: только цифры очищенного значения
+- round_to_integer: округление как round() в Python (к четному)
+- convert to date: дата из ISO или ДД.ММ.ГГГГ (с временем или без)
+- remove_single_quotes: удаление одинарных кавычек (NULL остается NULL)
+
+Все колонки читаются как VARCHAR (all_varchar), поэтому большие идентификаторы
+не теряют точность, а текстовые колонки не превращаются в "1.0".
+
+Автор: DataFox SL Project
+Версия: 1.0.0
+"""
+
+import os
+import tempfile
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional, Sequence
+
+import duckdb
+
+from .db_schema import get_table_columns_from_schema, get_table_schema_definition
+
+# Форматы дат, которые пробуются после ISO (TRY_CAST AS TIMESTAMP)
+DATE_FORMATS = ['%d.%m.%Y %H:%M:%S', '%d.%m.%Y %H:%M', '%d.%m.%Y']
+
+
+def _quote_ident(name: str) -> str:
+    return '"' + name.replace('"', '""') + '"'
+
+
+def _quote_literal(value: str) -> str:
+    return "'" + value.replace("'", "''") + "'"
+
+
+def _integer_expr(raw: str) -> str:
+    """Очистка целого как clean_integer_field: целое -> int(float) -> первое число в строке"""
+    value = f"trim({raw})"
+    return (
+        f"COALESCE("
+        f"CASE WHEN regexp_full_match({value}, '[+-]?[0-9]+') THEN TRY_CAST({value} AS BIGINT) END, "
+        f"TRY_CAST(trunc(TRY_CAST({value} AS DOUBLE)) AS BIGINT), "
+        f"TRY_CAST(regexp_extract({value}, '([0-9]+)', 1) AS BIGINT))"
+    )
+
+
+def _double_expr(raw: str) -> str:
+    """Очистка дробного как clean_double_field: число -> первое число (с точкой) в строке"""
+    value = f"trim({raw})"
+    return (
+        f"COALESCE("
+        f"TRY_CAST({value} AS DOUBLE), "
+        f"TRY_CAST(regexp_extract({value}, '([0-9]+\\.?[0-9]*)', 1) AS DOUBLE))"
+    )
+
+
+def _date_expr(raw: str) -> str:
+    value = f"trim({raw})"
+    parsers = [f"TRY_CAST({value} AS TIMESTAMP)"]
+    parsers += [f"try_strptime({value}, {_quote_literal(fmt)})" for fmt in DATE_FORMATS]
+    return f"CAST(COALESCE({', '.join(parsers)}) AS DATE)"
+
+
+def column_expression(source_col: str, sql_type: str, notes: Optional[str]) -> str:
+    """
+    SQL выражение целевой колонки из исходной (VARCHAR) колонки CSV.
+
+    Args:
+        source_col: Имя колонки в CSV
+        sql_type: Тип целевой колонки из схемы
+        notes: Примечание схемы (convert_to_bigint, round_to_integer, ...)
+
+    Returns:
+        SQL выражение, приведенное к sql_type
+    """
+    raw = _quote_ident(source_col)
+    base_type = sql_type.upper()
+
+    if base_type in ('INTEGER', 'BIGINT'):
+        expr = _integer_expr(raw)
+    elif base_type in ('DOUBLE', 'NUMERIC'):
+        expr = _double_expr(raw)
+    else:
+        expr = raw
+
+    if notes == "remove_single_quotes":
+        expr = f"replace({expr}, '''', '')"
+    elif notes == "convert to date":
+        expr = _date_expr(raw)
+    elif notes == "round_to_integer":
+        expr = f"TRY_CAST(round_even(TRY_CAST({expr} AS DOUBLE), 0) AS BIGINT)"
+    elif notes == "convert_to_integer":
+        expr = f"TRY_CAST({expr} AS BIGINT)"
+    elif notes == "convert_to_bigint":
+        expr = f"TRY_CAST(NULLIF(regexp_replace(CAST({expr} AS VARCHAR), '[^0-9]', '', 'g'), '') AS BIGINT)"
+
+    return f"TRY_CAST({expr} AS {sql_type})"
+
+
+def read_csv_call(read_params: Optional[Dict[str, Any]] = None, union_by_name: bool = False) -> str:
+    """
+    Вызов read_csv с параметрами из read_params схемы; пути передаются параметром запроса (?).
+
+    Args:
+        read_params: delimiter/sep, header (индекс строки заголовков или None), encoding
+        union_by_name: Объединять несколько файлов по именам колонок
+    """
+    params = read_params or {}
+    delimiter = params.get('delimiter', params.get('sep', ','))
+    header = params.get('header', 0)
+    options = [
+        f"delim={_quote_literal(delimiter)}",
+        f"header={'false' if header is None else 'true'}",
+        "all_varchar=true",
+        "quote='\"'",
+        "escape='\"'",
+    ]
+    if header:
+        options.append(f"skip={int(header)}")
+    if params.get('encoding'):
+        options.append(f"encoding={_quote_literal(params['encoding'])}")
+    if union_by_name:
+        options.append("union_by_name=true")
+    return f"read_csv(?, {', '.join(options)})"
+
+
+def supports_native_csv_import(table_name: str) -> bool:
+    """Таблица импортируется из CSV и имеет фиксированную схему колонок"""
+    schema = get_table_schema_definition(table_name)
+    return bool(schema) and schema.get("file_type") == "csv" and schema.get("columns") != "DYNAMIC"
+
+
+def read_csv_columns(
+    con: duckdb.DuckDBPyConnection,
+    csv_paths: Sequence[str],
+    read_params: Optional[Dict[str, Any]] = None
+) -> List[str]:
+    """Имена колонок CSV файлов (по заголовку, без чтения данных)"""
+    query = f"DESCRIBE SELECT * FROM {read_csv_call(read_params, len(csv_paths) > 1)}"
+    return [row[0] for row in con.execute(query, [list(csv_paths)]).fetchall()]
+
+
+def build_csv_import_query(
+    table_name: str,
+    csv_columns: Sequence[str],
+    union_by_name: bool = False,
+    target_table: Optional[str] = None
+) -> str:
+    """
+    Запрос INSERT ... SELECT ... FROM read_csv(?) для таблицы из HARDCODED_SCHEMA.
+
+    Args:
+        table_name: Целевая таблица
+        csv_columns: Колонки, присутствующие в CSV (отсутствующие импортируются как NULL)
+        union_by_name: Несколько файлов объединяются по именам колонок
+        target_table: Таблица для вставки (по умолчанию table_name, например staging при инкрементальном импорте)
+
+    Returns:
+        SQL с одним параметром - списком путей к файлам
+    """
+    schema = get_table_schema_definition(table_name)
+    available = set(csv_columns)
+    target_columns = []
+    expressions = []
+    for target_col, sql_type, source_col, notes in get_table_columns_from_schema(table_name):
+        target_columns.append(_quote_ident(target_col))
+        if source_col in available:
+            expressions.append(f"{column_expression(source_col, sql_type, notes)} AS {_quote_ident(target_col)}")
+        else:
+            expressions.append(f"CAST(NULL AS {sql_type}) AS {_quote_ident(target_col)}")
+
+    return (
+        f"INSERT INTO {_quote_ident(target_table or table_name)} ({', '.join(target_columns)})\n"
+        f"SELECT {', '.join(expressions)}\n"
+        f"FROM {read_csv_call(schema.get('read_params'), union_by_name)}"
+    )
+
+
+def build_conversion_issues_query(table_name: str, csv_columns: Sequence[str], union_by_name: bool = False) -> Optional[str]:
+    """
+    Запрос числа непустых значений, которые не удалось преобразовать (стали NULL), по колонкам.
+
+    Returns:
+        SQL с одним параметром - списком путей, или None если преобразуемых колонок нет
+    """
+    schema = get_table_schema_definition(table_name)
+    available = set(csv_columns)
+    counters = []
+    for target_col, sql_type, source_col, notes in get_table_columns_from_schema(table_name):
+        if source_col not in available:
+            continue
+        if sql_type.upper() not in ('INTEGER', 'BIGINT', 'DOUBLE', 'NUMERIC', 'DATE') and not notes:
+            continue
+        raw = _quote_ident(source_col)
+        counters.append(
+            f"COUNT(*) FILTER (WHERE trim({raw}) <> '' AND {column_expression(source_col, sql_type, notes)} IS NULL)"
+            f" AS {_quote_ident(target_col)}"
+        )
+    if not counters:
+        return None
+    return f"SELECT {', '.join(counters)}\nFROM {read_csv_call(schema.get('read_params'), union_by_name)}"
+
+
+@contextmanager
+def csv_source_paths(sources: Sequence[Any]) -> Iterator[List[str]]:
+    """
+    Пути к CSV файлам для read_csv: пути передаются как есть, загруженные файлы
+    (UploadedFile, BytesIO) сохраняются во временные файлы, удаляемые на выходе.
+    """
+    paths = []
+    temp_paths = []
+    try:
+        for source in sources:
+            if isinstance(source, (str, os.PathLike)):
+                paths.append(os.fspath(source))
+                continue
+            if hasattr(source, 'getvalue'):
+                data = source.getvalue()
+            else:
+                data = source.read()
+                source.seek(0)
+            with tempfile.NamedTemporaryFile(suffix=".csv", delete=False) as temp_file:
+                temp_file.write(data)
+            temp_paths.append(temp_file.name)
+            paths.append(temp_file.name)
+        yield paths
+    finally:
+        for path in temp_paths:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
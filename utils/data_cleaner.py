@@ -5,12 +5,88 @@ This module provides functions to clean and validate data before import,
 handling type conversion errors gracefully and logging problematic records.
 """
 
+import numpy as np
 import pandas as pd
-import re
 import streamlit as st
 from typing import Tuple, List, Dict, Any
 
 
+def _prepare_values(series: pd.Series) -> Tuple[np.ndarray, pd.Series, pd.Series]:
+    """
+    Common first step of the vectorized cleaners.
+
+    Returns:
+        Tuple of (null_mask, stripped string values, directly parsed numbers)
+    """
+    null_mask = (series.isna() | (series.astype(object) == '')).to_numpy()
+    str_values = series.astype(str).str.strip()
+    parsed = pd.to_numeric(str_values.where(~null_mask), errors='coerce')
+    return null_mask, str_values, parsed
+
+
+def _collect_issues(
+    positions: np.ndarray,
+    str_values: pd.Series,
+    extracted: pd.Series,
+    field_name: str,
+    identifier_series: pd.Series,
+    identifier_name: str,
+    target_label: str
+) -> List[Dict[str, Any]]:
+    """
+    Builds issue records for the rows selected by the warning/error masks, in row order.
+
+    Args:
+        positions: Row positions of values that needed extraction or could not be converted
+        extracted: Extracted numbers aligned with the series (NaN/None where nothing was found)
+        target_label: Type name used in error messages ('integer' or 'float')
+    """
+    issues = []
+    if len(positions) == 0:
+        return issues
+
+    index_labels = str_values.index[positions]
+    original_values = str_values.to_numpy()[positions]
+    extracted_values = extracted.to_numpy()[positions]
+    if identifier_series is not None:
+        identifiers = identifier_series.to_numpy()[positions]
+    else:
+        identifiers = [f"row {label}" for label in index_labels]
+
+    for identifier, str_value, extracted_number in zip(identifiers, original_values, extracted_values):
+        if extracted_number is not None and not pd.isna(extracted_number):
+            issues.append({
+                'type': 'conversion_warning',
+                'field': field_name,
+                'identifier': identifier,
+                'identifier_name': identifier_name,
+                'original_value': str_value,
+                'converted_value': extracted_number,
+                'message': f"Extracted number {extracted_number} from '{str_value}'"
+            })
+        else:
+            issues.append({
+                'type': 'conversion_error',
+                'field': field_name,
+                'identifier': identifier,
+                'identifier_name': identifier_name,
+                'original_value': str_value,
+                'converted_value': None,
+                'message': f"Could not convert '{str_value}' to {target_label}, set to NULL"
+            })
+    return issues
+
+
+def _to_python_ints(values: np.ndarray) -> np.ndarray:
+    """Truncates numbers to Python ints (object array); values beyond int64 are converted one by one."""
+    values = np.trunc(np.asarray(values, dtype=float)) if values.dtype.kind == 'f' else values
+    in_range = np.abs(values) < 2 ** 63
+    result = np.empty(len(values), dtype=object)
+    result[in_range] = values[in_range].astype('int64').astype(object)
+    result[~in_range] = [int(v) for v in values[~in_range]]
+    return result
+
+
 def clean_integer_field(
     series: pd.Series, 
     field_name: str, 
@@ -20,6 +96,10 @@ def clean_integer_field(
     """
     Clean a pandas series to convert values to integers, handling problematic values.
     
+    Vectorized: empty values, direct conversions, extracted numbers (e.g. "рост 146"
+    or "3998 - 4114" -> first number) and failures are selected with boolean masks;
+    issue records are built only for the affected rows.
+    
     Args:
         series: The pandas series to clean
         field_name: Name of the field being cleaned (for logging)
@@ -29,59 +109,38 @@ def clean_integer_field(
     Returns:
         Tuple of (cleaned_series, list_of_issues)
     """
-    issues = []
-    cleaned_series = series.copy()
+    if pd.api.types.is_integer_dtype(series) and not pd.api.types.is_bool_dtype(series):
+        return series.copy(), []
     
-    for idx, value in series.items():
-        if pd.isna(value) or value == '' or value is None:
-            cleaned_series.loc[idx] = None
-            continue
-            
-        # Convert to string for processing
-        str_value = str(value).strip()
-        
-        # Try direct conversion first
-        try:
-            cleaned_series.loc[idx] = int(float(str_value))
-            continue
-        except (ValueError, TypeError):
-            pass
-        
-        # Try to extract first number from string like "рост 146" or "3998 - 4114"
-        number_match = re.search(r'(\d+)', str_value)
-        if number_match:
-            try:
-                extracted_number = int(number_match.group(1))
-                cleaned_series.loc[idx] = extracted_number
-                
-                # Log the conversion
-                identifier = identifier_series.loc[idx] if identifier_series is not None else f"row {idx}"
-                issues.append({
-                    'type': 'conversion_warning',
-                    'field': field_name,
-                    'identifier': identifier,
-                    'identifier_name': identifier_name,
-                    'original_value': str_value,
-                    'converted_value': extracted_number,
-                    'message': f"Extracted number {extracted_number} from '{str_value}'"
-                })
-                continue
-            except (ValueError, TypeError):
-                pass
-        
-        # If we can't convert, set to None and log the issue
-        cleaned_series.loc[idx] = None
-        identifier = identifier_series.loc[idx] if identifier_series is not None else f"row {idx}"
-        issues.append({
-            'type': 'conversion_error',
-            'field': field_name,
-            'identifier': identifier,
-            'identifier_name': identifier_name,
-            'original_value': str_value,
-            'converted_value': None,
-            'message': f"Could not convert '{str_value}' to integer, set to NULL"
-        })
+    null_mask, str_values, parsed = _prepare_values(series)
+    parsed_values = parsed.to_numpy(dtype=float, na_value=np.nan)
+    direct_mask = ~null_mask & np.isfinite(parsed_values)
+    
+    # Try to extract first number from string like "рост 146" or "3998 - 4114"
+    rest_mask = ~null_mask & ~direct_mask
+    extracted = pd.Series(None, index=series.index, dtype=object)
+    if rest_mask.any():
+        digits = str_values[rest_mask].str.extract(r'(\d+)', expand=False)
+        found = digits.notna().to_numpy()
+        if found.any():
+            extracted.iloc[np.flatnonzero(rest_mask)[found]] = [int(d) for d in digits[found]]
+    extracted_mask = extracted.notna().to_numpy()
+    
+    if pd.api.types.is_float_dtype(series):
+        cleaned_values = np.full(len(series), np.nan)
+        cleaned_values[direct_mask] = np.trunc(parsed_values[direct_mask])
+        cleaned_values[extracted_mask] = extracted[extracted_mask].astype(float)
+        cleaned_series = pd.Series(cleaned_values, index=series.index, name=series.name)
+    else:
+        cleaned_values = np.full(len(series), None, dtype=object)
+        cleaned_values[direct_mask] = _to_python_ints(parsed.to_numpy()[direct_mask])
+        cleaned_values[extracted_mask] = extracted.to_numpy()[extracted_mask]
+        cleaned_series = pd.Series(cleaned_values, index=series.index, name=series.name, dtype=object)
     
+    issues = _collect_issues(
+        np.flatnonzero(rest_mask), str_values, extracted,
+        field_name, identifier_series, identifier_name, "integer"
+    )
     return cleaned_series, issues
 
 
@@ -94,6 +153,9 @@ def clean_double_field(
     """
     Clean a pandas series to convert values to floats, handling problematic values.
     
+    Vectorized in the same way as clean_integer_field; the first number may
+    contain a decimal point.
+    
     Args:
         series: The pandas series to clean
         field_name: Name of the field being cleaned (for logging)
@@ -103,59 +165,33 @@ def clean_double_field(
     Returns:
         Tuple of (cleaned_series, list_of_issues)
     """
-    issues = []
-    cleaned_series = series.copy()
+    if pd.api.types.is_numeric_dtype(series) and not pd.api.types.is_bool_dtype(series):
+        return series.copy(), []
     
-    for idx, value in series.items():
-        if pd.isna(value) or value == '' or value is None:
-            cleaned_series.loc[idx] = None
-            continue
-            
-        # Convert to string for processing
-        str_value = str(value).strip()
-        
-        # Try direct conversion first
-        try:
-            cleaned_series.loc[idx] = float(str_value)
-            continue
-        except (ValueError, TypeError):
-            pass
-        
-        # Try to extract first number (including decimals) from string
-        number_match = re.search(r'(\d+\.?\d*)', str_value)
-        if number_match:
-            try:
-                extracted_number = float(number_match.group(1))
-                cleaned_series.loc[idx] = extracted_number
-                
-                # Log the conversion
-                identifier = identifier_series.loc[idx] if identifier_series is not None else f"row {idx}"
-                issues.append({
-                    'type': 'conversion_warning',
-                    'field': field_name,
-                    'identifier': identifier,
-                    'identifier_name': identifier_name,
-                    'original_value': str_value,
-                    'converted_value': extracted_number,
-                    'message': f"Extracted number {extracted_number} from '{str_value}'"
-                })
-                continue
-            except (ValueError, TypeError):
-                pass
-        
-        # If we can't convert, set to None and log the issue
-        cleaned_series.loc[idx] = None
-        identifier = identifier_series.loc[idx] if identifier_series is not None else f"row {idx}"
-        issues.append({
-            'type': 'conversion_error',
-            'field': field_name,
-            'identifier': identifier,
-            'identifier_name': identifier_name,
-            'original_value': str_value,
-            'converted_value': None,
-            'message': f"Could not convert '{str_value}' to float, set to NULL"
-        })
+    null_mask, str_values, parsed = _prepare_values(series)
+    # float('nan') is a valid direct conversion, like any other number
+    nan_literal = str_values.str.lower().isin(['nan', '+nan', '-nan']).to_numpy()
+    direct_mask = ~null_mask & (parsed.notna().to_numpy() | nan_literal)
+    
+    # Try to extract first number (including decimals) from string
+    rest_mask = ~null_mask & ~direct_mask
+    extracted = pd.Series(None, index=series.index, dtype=object)
+    if rest_mask.any():
+        numbers = str_values[rest_mask].str.extract(r'(\d+\.?\d*)', expand=False)
+        found = numbers.notna().to_numpy()
+        if found.any():
+            extracted.iloc[np.flatnonzero(rest_mask)[found]] = [float(n) for n in numbers[found]]
+    extracted_mask = extracted.notna().to_numpy()
+    
+    cleaned_values = np.full(len(series), None, dtype=object)
+    cleaned_values[direct_mask] = parsed.to_numpy(dtype=float, na_value=np.nan)[direct_mask].astype(object)
+    cleaned_values[extracted_mask] = extracted.to_numpy()[extracted_mask]
+    cleaned_series = pd.Series(cleaned_values, index=series.index, name=series.name, dtype=object)
     
+    issues = _collect_issues(
+        np.flatnonzero(rest_mask), str_values, extracted,
+        field_name, identifier_series, identifier_name, "float"
+    )
     return cleaned_series, issues
 
 
@@ -61,7 +61,11 @@ def cleanup_duplicate_barcodes(db_connection: duckdb.DuckDBPyConnection) -> Tupl
         except Exception:
             # Индексы не критичны для завершения очистки; проглотим, но не мешаем ходу
             pass
-        
+
+        # Производные таблицы (связи WB <-> Ozon) и версия данных зависят от oz_barcodes
+        from .db_crud import rebuild_derived_tables_after_import
+        rebuild_derived_tables_after_import(db_connection, 'oz_barcodes')
+
         # Get statistics after cleanup
         post_count = db_connection.execute("SELECT COUNT(*) FROM oz_barcodes").fetchone()[0]
         removed_count = pre_count - post_count
@@ -111,6 +115,9 @@ def cleanup_future_dated_orders(db_connection: duckdb.DuckDBPyConnection, cutoff
         """
         
         db_connection.execute(cleanup_query)
+
+        from .db_crud import rebuild_derived_tables_after_import
+        rebuild_derived_tables_after_import(db_connection, 'oz_orders')
         
         # Get statistics after cleanup
         post_count = db_connection.execute("SELECT COUNT(*) FROM oz_orders").fetchone()[0]
@@ -170,6 +177,10 @@ def cleanup_orphaned_products(db_connection: duckdb.DuckDBPyConnection) -> Tuple
         """
         
         db_connection.execute(cleanup_query)
+
+        # Связи WB <-> Ozon и кэш кандидатов не должны ссылаться на удаленные товары
+        from .db_crud import rebuild_derived_tables_after_import
+        rebuild_derived_tables_after_import(db_connection, 'oz_products')
         
         # Get statistics after cleanup
         post_count = db_connection.execute("SELECT COUNT(*) FROM oz_products").fetchone()[0]
@@ -219,6 +230,9 @@ def cleanup_empty_text_fields(db_connection: duckdb.DuckDBPyConnection, table_na
             # Clear the field
             cleanup_query = f"UPDATE {table_name} SET {field_name} = NULL"
             db_connection.execute(cleanup_query)
+
+            from .db_crud import rebuild_derived_tables_after_import
+            rebuild_derived_tables_after_import(db_connection, table_name)
             
             stats = {
                 'total_records': total_records,
@@ -263,6 +277,10 @@ def clear_table_completely(db_connection: duckdb.DuckDBPyConnection, table_name:
         
         # Clear the table
         db_connection.execute(f"DELETE FROM {table_name}")
+
+        # Пересобираем производные таблицы и сбрасываем кэш кандидатов WB
+        from .db_crud import rebuild_derived_tables_after_import
+        rebuild_derived_tables_after_import(db_connection, table_name)
         
         # Verify deletion
         post_count = db_connection.execute(f"SELECT COUNT(*) FROM {table_name}").fetchone()[0]
@@ -124,20 +124,18 @@ def test_db_connection(db_path: str = None) -> bool:
             return False
     return False 
 
-@st.cache_resource 
-def get_connection_and_ensure_schema():
-    """
-    Get database connection and ensure schema exists.
-    This function is cached by Streamlit to avoid repeated connections.
-    
-    Returns:
-        DuckDB connection object or None if connection fails
-    """
+@st.cache_resource
+def _ensure_schema(target: str) -> bool:
+    """
+    Creates tables, indexes and derived link tables on the base connection of the
+    shared connection manager. Cached by Streamlit: runs once per database target.
+    """
     from utils.db_schema import create_tables_from_schema, create_performance_indexes
+    from utils.db_connection_manager import get_connection_manager
+    from utils.wb_barcode_index import ensure_wb_barcode_index
+    from utils.marketplace_links import ensure_marketplace_links
 
-    conn = connect_db()
-    if not conn:
-        return None
+    conn = get_connection_manager(target).get_connection()
 
     # Создаем таблицы
     tables_created = create_tables_from_schema(conn)
@@ -146,4 +144,25 @@ def get_connection_and_ensure_schema():
     if tables_created:
         create_performance_indexes(conn)
 
-    return conn 
+    # Строим производные таблицы связей для баз, импортированных до их появления
+    ensure_wb_barcode_index(conn)
+    ensure_marketplace_links(conn)
+    return tables_created
+
+def get_connection_and_ensure_schema():
+    """
+    Get database connection and ensure schema exists.
+    The schema is created once per database; the caller gets the cursor of the
+    current thread from the shared connection manager, not the shared connection.
+    
+    Returns:
+        DuckDB cursor object or None if connection fails
+    """
+    from utils.db_connection_manager import get_connection_manager
+
+    manager = get_connection_manager()
+    if manager is None or manager.get_connection() is None:
+        return None
+
+    _ensure_schema(manager.target)
+    return manager.cursor()
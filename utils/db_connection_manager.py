@@ -0,0 +1,317 @@
+"""
+Менеджер общего подключения к DuckDB / MotherDuck.
+
+Страницы и вспомогательные классы раньше открывали собственные подключения через
+connect_db(). Менеджер держит одно подключение (один экземпляр DuckDB) на каждую
+цель - файл или md:<db> - и выдает каждому потоку собственный курсор
+(DuckDBPyConnection.cursor()). Курсоры одного экземпляра разделяют каталог и
+буферный пул, но могут выполнять запросы параллельно из разных потоков Streamlit.
+
+Основные функции:
+- Курсор на поток из общего экземпляра DuckDB
+- Режим только для чтения для аналитических страниц (проверка на уровне курсора:
+  DuckDB не позволяет открыть один файл с разной конфигурацией в одном процессе)
+- Проверка состояния и прозрачное переподключение для целей md:
+- Метрики выдачи курсоров (количество, время, переподключения)
+
+Автор: DataFox SL Project
+Версия: 1.0.0
+"""
+
+import duckdb
+import logging
+import threading
+import time
+from typing import Any, Dict, Optional
+
+from .config_utils import get_db_mode, get_db_path, get_motherduck_db_name
+
+# Настройка логирования
+logger = logging.getLogger(__name__)
+
+# Интервал между проверками состояния подключения MotherDuck (секунды)
+DEFAULT_HEALTH_CHECK_INTERVAL = 60.0
+
+# Типы операторов, допустимые для курсора только для чтения.
+# DuckDB сам относит к SELECT запросы WITH/FROM/VALUES, SHOW, DESCRIBE, SUMMARIZE
+# и читающие PRAGMA (table_info, database_size); PRAGMA/SET, меняющие настройки,
+# и EXPLAIN (EXPLAIN ANALYZE выполняет запрос) сюда не входят.
+_READ_ONLY_STATEMENT_TYPES = frozenset({duckdb.StatementType.SELECT})
+
+
+class ReadOnlyViolationError(RuntimeError):
+    """Попытка изменить данные через курсор только для чтения"""
+
+
+class ReadOnlyCursor:
+    """
+    Обертка над курсором DuckDB, пропускающая только читающие запросы.
+
+    Все остальные атрибуты (fetchdf, fetchall, description и т.д.) делегируются курсору.
+    """
+
+    def __init__(self, cursor: duckdb.DuckDBPyConnection):
+        self._cursor = cursor
+
+    def _check(self, query: str) -> None:
+        """Проверяет каждый оператор запроса (строка может содержать несколько через ';')"""
+        statements = duckdb.extract_statements(query or "")
+        if not statements or any(
+            statement.type not in _READ_ONLY_STATEMENT_TYPES for statement in statements
+        ):
+            raise ReadOnlyViolationError(
+                f"Запрос запрещен в режиме только для чтения: {str(query).strip()[:80]}"
+            )
+
+    def execute(self, query: str, parameters: Any = None):
+        self._check(query)
+        if parameters is None:
+            return self._cursor.execute(query)
+        return self._cursor.execute(query, parameters)
+
+    def sql(self, query: str, *args, **kwargs):
+        self._check(query)
+        return self._cursor.sql(query, *args, **kwargs)
+
+    def query(self, query: str, *args, **kwargs):
+        self._check(query)
+        return self._cursor.query(query, *args, **kwargs)
+
+    def executemany(self, query: str, parameters: Any = None):
+        raise ReadOnlyViolationError("executemany запрещен в режиме только для чтения")
+
+    def cursor(self) -> "ReadOnlyCursor":
+        return ReadOnlyCursor(self._cursor.cursor())
+
+    def __getattr__(self, name: str):
+        return getattr(self._cursor, name)
+
+
+class ConnectionManager:
+    """
+    Общее подключение к одной базе данных с курсорами на поток.
+
+    Экземпляры создаются через get_connection_manager(), который гарантирует
+    один менеджер на цель подключения в рамках процесса.
+    """
+
+    def __init__(self, target: str, health_check_interval: float = DEFAULT_HEALTH_CHECK_INTERVAL):
+        """
+        Args:
+            target: Путь к файлу DuckDB или md:<db_name>
+            health_check_interval: Минимальный интервал между проверками md: подключения
+        """
+        self.target = target
+        self.health_check_interval = health_check_interval
+        self._lock = threading.RLock()
+        self._local = threading.local()
+        self._connection: Optional[duckdb.DuckDBPyConnection] = None
+        # Поколение подключения: после переподключения курсоры потоков пересоздаются
+        self._generation = 0
+        self._last_health_check = 0.0
+        self._metrics = {
+            'checkouts': 0,
+            'read_only_checkouts': 0,
+            'cursors_created': 0,
+            'checkout_time_total': 0.0,
+            'checkout_time_max': 0.0,
+            'health_checks': 0,
+            'health_check_failures': 0,
+            'reconnects': 0,
+        }
+
+    @property
+    def is_motherduck(self) -> bool:
+        return isinstance(self.target, str) and self.target.startswith("md:")
+
+    def _open(self) -> Optional[duckdb.DuckDBPyConnection]:
+        from .db_connection import connect_db
+        return connect_db(self.target)
+
+    def get_connection(self) -> Optional[duckdb.DuckDBPyConnection]:
+        """
+        Возвращает базовое подключение, открывая его при первом обращении.
+
+        Returns:
+            Подключение DuckDB или None, если подключиться не удалось
+        """
+        with self._lock:
+            if self._connection is None:
+                self._connection = self._open()
+                if self._connection is not None:
+                    self._generation += 1
+                    self._last_health_check = time.monotonic()
+            return self._connection
+
+    def _health_check(self) -> None:
+        """Проверяет md: подключение не чаще health_check_interval и переподключается при ошибке"""
+        if not self.is_motherduck or self._connection is None:
+            return
+        now = time.monotonic()
+        if now - self._last_health_check < self.health_check_interval:
+            return
+
+        with self._lock:
+            if now - self._last_health_check < self.health_check_interval:
+                return
+            self._metrics['health_checks'] += 1
+            try:
+                self._connection.execute("SELECT 1").fetchone()
+            except Exception as e:
+                self._metrics['health_check_failures'] += 1
+                logger.warning(f"Подключение к {self.target} потеряно, переподключение: {e}")
+                self.reconnect()
+            self._last_health_check = time.monotonic()
+
+    def reconnect(self) -> Optional[duckdb.DuckDBPyConnection]:
+        """
+        Закрывает текущее подключение и открывает новое.
+        Курсоры потоков будут пересозданы при следующем обращении.
+
+        Returns:
+            Новое подключение или None
+        """
+        with self._lock:
+            if self._connection is not None:
+                try:
+                    self._connection.close()
+                except Exception:
+                    pass
+            self._connection = None
+            self._metrics['reconnects'] += 1
+            return self.get_connection()
+
+    def cursor(self, read_only: bool = False):
+        """
+        Возвращает курсор текущего потока.
+
+        Args:
+            read_only: Вернуть обертку, запрещающую изменяющие запросы
+
+        Returns:
+            Курсор DuckDB (или ReadOnlyCursor) либо None, если подключения нет
+        """
+        start = time.perf_counter()
+        self._health_check()
+
+        connection = self.get_connection()
+        if connection is None:
+            return None
+
+        local = self._local
+        cursor = getattr(local, 'cursor', None)
+        if cursor is None or getattr(local, 'generation', None) != self._generation:
+            with self._lock:
+                cursor = connection.cursor()
+                self._metrics['cursors_created'] += 1
+            local.cursor = cursor
+            local.generation = self._generation
+            local.read_only_cursor = None
+
+        result = cursor
+        if read_only:
+            if local.read_only_cursor is None:
+                local.read_only_cursor = ReadOnlyCursor(cursor)
+            result = local.read_only_cursor
+
+        elapsed = time.perf_counter() - start
+        with self._lock:
+            self._metrics['checkouts'] += 1
+            if read_only:
+                self._metrics['read_only_checkouts'] += 1
+            self._metrics['checkout_time_total'] += elapsed
+            self._metrics['checkout_time_max'] = max(self._metrics['checkout_time_max'], elapsed)
+        return result
+
+    def get_metrics(self) -> Dict[str, Any]:
+        """
+        Возвращает метрики выдачи курсоров.
+
+        Returns:
+            Словарь с количеством выдач, созданных курсоров, временем выдачи
+            (суммарным, средним и максимальным, в мс) и числом переподключений
+        """
+        with self._lock:
+            metrics = dict(self._metrics)
+        checkouts = metrics['checkouts']
+        metrics['checkout_time_avg_ms'] = (
+            metrics['checkout_time_total'] / checkouts * 1000 if checkouts else 0.0
+        )
+        metrics['checkout_time_max_ms'] = metrics.pop('checkout_time_max') * 1000
+        metrics['checkout_time_total_ms'] = metrics.pop('checkout_time_total') * 1000
+        metrics['target'] = self.target
+        return metrics
+
+    def close(self) -> None:
+        """Закрывает базовое подключение (курсоры потоков становятся недействительными)"""
+        with self._lock:
+            if self._connection is not None:
+                try:
+                    self._connection.close()
+                except Exception:
+                    pass
+            self._connection = None
+            self._generation += 1
+
+
+_managers: Dict[str, ConnectionManager] = {}
+_managers_lock = threading.Lock()
+
+
+def resolve_db_target() -> Optional[str]:
+    """
+    Определяет цель подключения по настройкам так же, как connect_db().
+
+    Returns:
+        md:<db_name>, путь к файлу или None, если база не настроена
+    """
+    if get_db_mode() == "motherduck":
+        md_name = (get_motherduck_db_name() or "").strip()
+        return f"md:{md_name}" if md_name else None
+    return get_db_path() or None
+
+
+def get_connection_manager(target: Optional[str] = None) -> Optional[ConnectionManager]:
+    """
+    Возвращает общий менеджер подключения для цели (по умолчанию - из настроек).
+
+    Args:
+        target: Путь к файлу DuckDB или md:<db_name>
+
+    Returns:
+        ConnectionManager или None, если база не настроена
+    """
+    target = target or resolve_db_target()
+    if not target:
+        return None
+    with _managers_lock:
+        manager = _managers.get(target)
+        if manager is None:
+            manager = ConnectionManager(target)
+            _managers[target] = manager
+        return manager
+
+
+def get_cursor(read_only: bool = False, target: Optional[str] = None):
+    """
+    Возвращает курсор текущего потока из общего подключения.
+
+    Args:
+        read_only: Запретить изменяющие запросы (для аналитических страниц)
+        target: Путь к файлу DuckDB или md:<db_name> (по умолчанию - из настроек)
+
+    Returns:
+        Курсор DuckDB (или ReadOnlyCursor) либо None, если подключиться не удалось
+    """
+    manager = get_connection_manager(target)
+    if manager is None:
+        return None
+    return manager.cursor(read_only=read_only)
+
+
+def close_all_connections() -> None:
+    """Закрывает все общие подключения (например, при смене базы в настройках)"""
+    with _managers_lock:
+        for manager in _managers.values():
+            manager.close()
+        _managers.clear()
@@ -2,15 +2,27 @@ import duckdb
 import streamlit as st
 import os
 import pandas as pd
+from typing import Callable, Iterable, Optional
 
 # Import from other new utility modules
 from .db_schema import get_table_schema_definition, get_table_columns_from_schema, get_defined_table_names
-from .config_utils import get_db_path # For get_db_stats
+from .config_utils import get_db_path # For get_db_stats
 from . import config_utils # For brand filtering
 from .data_cleaner import apply_data_cleaning, display_cleaning_report, validate_required_fields
+from .incremental_import import (
+    apply_incremental_import,
+    create_staging_table,
+    drop_staging_table,
+    get_natural_key,
+    has_changes,
+    staging_table_name,
+)
 
 # --- Data Import Functions ---
 
+# Returned when required source columns are missing (details are shown in the UI)
+IMPORT_VALIDATION_ERROR = "Data validation failed. See details above."
+
 def import_data_from_dataframe(
     con: duckdb.DuckDBPyConnection,
     df: pd.DataFrame,
@@ -35,26 +47,13 @@ def import_data_from_dataframe(
     if table_name == "punta_table":
         return import_dynamic_punta_table(con, df)
     
-    table_schema_def = get_table_schema_definition(table_name)
-    if not table_schema_def:
-        return False, 0, f"No schema definition found for table '{table_name}' via db_schema.py."
-
-    # Check if table uses dynamic schema
-    columns_info = table_schema_def.get("columns")
-    if columns_info == "DYNAMIC":
-        return False, 0, f"Table '{table_name}' uses dynamic schema but special handling is not implemented. Please add specific logic."
-
-    schema_columns_info = get_table_columns_from_schema(table_name)
-    if not schema_columns_info:
-        return False, 0, f"No column schema information found for table '{table_name}' via db_schema.py."
+    table_schema_def, schema_columns_info, schema_error = _get_import_schema(table_name)
+    if schema_error:
+        return False, 0, schema_error
 
     # 0. Validate required fields
-    validation_issues = validate_required_fields(df, schema_columns_info)
-    if validation_issues:
-        st.error("❌ Проблемы валидации данных:")
-        for issue in validation_issues:
-            st.write(f"• {issue['message']}")
-        return False, 0, "Data validation failed. See details above."
+    if not _validate_import_frame(df, schema_columns_info):
+        return False, 0, IMPORT_VALIDATION_ERROR
 
     # 0.5. Apply data cleaning BEFORE other transformations
     st.info("🧹 Очистка и проверка данных...")
@@ -70,7 +69,450 @@ def import_data_from_dataframe(
     if cleaned_df.empty:
         return False, 0, f"No data remains after applying brand filter for table '{table_name}'. Check your brand filter settings."
 
-    # 0.8. Ensure table exists before pre-update action
+    # 0.8-1. Ensure table exists, then run the pre-update action
+    prepare_error = _prepare_import_table(con, table_name, table_schema_def, schema_columns_info)
+    if prepare_error:
+        return False, 0, prepare_error
+
+    # 2. Prepare DataFrame: Select and rename columns, apply transformations
+    try:
+        df_to_import = _transform_import_frame(cleaned_df, table_name, schema_columns_info)
+    except Exception as e_prep:
+        return False, 0, f"Error preparing DataFrame for table '{table_name}': {e_prep}"
+
+    # 3. Final check: show preview of data to be imported
+    _show_import_preview(df_to_import)
+
+    # 4. Import data into DuckDB table (with MotherDuck-friendly chunking)
+    try:
+        total_rows = len(df_to_import)
+
+        # Decide chunk size: for MD or large datasets, use chunks to avoid long leases
+        if _is_motherduck_connection(con) or total_rows > 100_000:
+            chunk_size = 50_000 if total_rows > 50_000 else 25_000
+            st.info(f"🚚 Импорт с пакетированием: {total_rows} строк, размер пакета {chunk_size}")
+            progress_bar = st.progress(0.0)
+            imported = 0
+            batch_idx = 0
+            while imported < total_rows:
+                batch_idx += 1
+                end = min(imported + chunk_size, total_rows)
+                chunk = df_to_import.iloc[imported:end].copy()
+                try:
+                    _insert_import_frame(con, table_name, chunk)
+                    imported = end
+                    progress_bar.progress(imported / total_rows)
+                    # Keep-alive ping between batches for long-running cloud sessions
+                    try:
+                        con.execute('SELECT 1;')
+                    except Exception:
+                        pass
+                except Exception as batch_err:
+                    return False, imported, f"Error importing data into table '{table_name}' on batch {batch_idx}: {batch_err}"
+
+            records_imported = imported
+        else:
+            # Single-shot import for small/local datasets
+            _insert_import_frame(con, table_name, df_to_import)
+            records_imported = total_rows
+
+        # 5-6. Recreate indexes and rebuild derived lookup tables that depend on the imported table
+        _finalize_import(con, table_name)
+
+        return True, records_imported, ""
+    except Exception as e_import:
+        return False, 0, f"Error importing data into table '{table_name}': {e_import}"
+
+def import_data_from_batches(
+    con: duckdb.DuckDBPyConnection,
+    batches: Iterable[pd.DataFrame],
+    table_name: str,
+    progress_callback: Optional[Callable[[int], None]] = None,
+    incremental: bool = False,
+    read_errors: Optional[list] = None,
+) -> tuple[bool, int, str]:
+    """
+    Streaming variant of import_data_from_dataframe for oversized reports.
+
+    Batches (e.g. from utils.streaming_import) are pulled one at a time: each one is
+    cleaned, brand-filtered, transformed according to HARDCODED_SCHEMA and appended
+    to the table before the next one is read, so peak memory is bounded by the
+    batch size rather than by the size of the source files.
+    Required columns are validated on the first batch; columns missing in later
+    batches are imported as NULL (as pd.concat of several files would do).
+    The pre-update action runs once before the first batch, indexes and derived
+    tables are rebuilt once after the last one. The pre-update action and all batch
+    inserts run in one transaction: a read or insert error rolls it back and leaves
+    the table unchanged.
+    On MotherDuck no transaction is held open while the files are read: batches go to
+    a local staging table, and the pre-update action plus one INSERT ... SELECT from
+    staging run in a short transaction after the last batch.
+    In incremental mode batches go to a staging table and only the differences are
+    applied to the target table (see utils.incremental_import).
+
+    Args:
+        con: Database connection
+        batches: Iterable of raw DataFrames with source column names
+        table_name: Target table from HARDCODED_SCHEMA
+        progress_callback: Called with the number of rows imported so far after each batch
+        incremental: Upsert by the table's natural_key instead of DELETE-and-reload
+        read_errors: List the readers' on_error callback appends (file name, error) to
+            for files skipped as unreadable. A full reload skips them as before (with a
+            warning); an incremental import is cancelled, since rows of a skipped file
+            would be deleted as missing. A file that fails after some of its batches were
+            read (the readers raise PartialFileReadError) always cancels the import
+
+    Returns:
+        Tuple[success: bool, rows_imported: int, error_message: str]
+    """
+    if not con:
+        return False, 0, "No database connection."
+    if table_name == "punta_table":
+        return False, 0, "Table 'punta_table' uses dynamic schema and is imported from Google Sheets only."
+
+    table_schema_def, schema_columns_info, schema_error = _get_import_schema(table_name)
+    if schema_error:
+        return False, 0, schema_error
+
+    key_columns = _resolve_incremental_key(table_name, incremental)
+    stage_batches = bool(key_columns) or _is_motherduck_connection(con)
+    try:
+        return _import_batches(
+            con, batches, table_name, table_schema_def, schema_columns_info, key_columns, progress_callback,
+            read_errors if read_errors is not None else [], stage_batches,
+        )
+    finally:
+        if stage_batches:
+            drop_staging_table(con, table_name)
+
+def _import_batches(
+    con: duckdb.DuckDBPyConnection,
+    batches: Iterable[pd.DataFrame],
+    table_name: str,
+    table_schema_def: dict,
+    schema_columns_info: list,
+    key_columns: Optional[list[str]],
+    progress_callback: Optional[Callable[[int], None]],
+    read_errors: list,
+    stage_batches: bool,
+) -> tuple[bool, int, str]:
+    """
+    Body of import_data_from_batches; key_columns switches to the incremental mode.
+    With stage_batches the batches go to the staging table instead of one open transaction.
+    """
+    records_imported = 0
+    rows_read = 0
+    batch_idx = 0
+    cleaning_issues = []
+    table_prepared = False
+    in_transaction = False
+    insert_table = table_name
+
+    def skipped_file_cancels() -> bool:
+        # The incremental mode deletes rows missing from staging: a skipped file would wipe its rows
+        return bool(key_columns) and bool(read_errors)
+
+    def fail(message: str) -> tuple[bool, int, str]:
+        if in_transaction:
+            _rollback_import(con)
+        return False, 0, message
+
+    def read_error_message() -> str:
+        file_name, error = read_errors[-1]
+        return (
+            f"Error reading file '{file_name}' for table '{table_name}': {error}. "
+            f"Incremental import cancelled, the table is left unchanged."
+        )
+
+    try:
+        for batch in batches:
+            if skipped_file_cancels():
+                return fail(read_error_message())
+            if batch is None or batch.empty:
+                continue
+            batch_idx += 1
+            rows_read += len(batch)
+
+            if not table_prepared:
+                # Validation, table creation and pre-update action - once, on the first batch
+                if not _validate_import_frame(batch, schema_columns_info):
+                    return False, 0, IMPORT_VALIDATION_ERROR
+                if not stage_batches:
+                    con.execute("BEGIN TRANSACTION")
+                    in_transaction = True
+                table_prepared = True
+                prepare_error = _prepare_import_table(
+                    con, table_name, table_schema_def, schema_columns_info, run_pre_update=not stage_batches
+                )
+                if prepare_error:
+                    return fail(prepare_error)
+                if stage_batches:
+                    insert_table = create_staging_table(con, table_name)
+
+            cleaned_batch, batch_issues = apply_data_cleaning(batch, table_name, schema_columns_info)
+            cleaning_issues.extend(batch_issues)
+            cleaned_batch = apply_brand_filter(cleaned_batch, table_name, verbose=(batch_idx == 1))
+            if cleaned_batch.empty:
+                continue
+
+            try:
+                df_to_import = _transform_import_frame(cleaned_batch, table_name, schema_columns_info, verbose=False)
+            except Exception as e_prep:
+                return fail(f"Error preparing batch {batch_idx} for table '{table_name}': {e_prep}")
+
+            if records_imported == 0:
+                _show_import_preview(df_to_import)
+
+            try:
+                _insert_import_frame(con, insert_table, df_to_import)
+            except Exception as batch_err:
+                return fail(f"Error importing data into table '{table_name}' on batch {batch_idx}: {batch_err}")
+            records_imported += len(df_to_import)
+
+            if progress_callback:
+                progress_callback(records_imported)
+    except Exception as e_read:
+        return fail(f"Error reading batch {batch_idx + 1} for table '{table_name}': {e_read}")
+
+    if not table_prepared:
+        return True, 0, "Input data is empty. Nothing to import."
+    if skipped_file_cancels():
+        return fail(read_error_message())
+    if read_errors:
+        skipped = ", ".join(str(file_name) for file_name, _ in read_errors)
+        st.warning(f"⚠️ Нечитаемые файлы пропущены при импорте в '{table_name}': {skipped}")
+
+    display_cleaning_report(cleaning_issues, table_name)
+    st.info(f"📦 Обработано пакетов: {batch_idx}, прочитано строк: {rows_read}")
+
+    if records_imported == 0:
+        return fail(f"No data remains after applying brand filter for table '{table_name}'. Check your brand filter settings.")
+
+    if in_transaction:
+        try:
+            con.execute("COMMIT")
+        except Exception as e_commit:
+            return fail(f"Error committing import into table '{table_name}': {e_commit}")
+    elif not key_columns:
+        reload_error = _apply_staged_reload(con, table_name, table_schema_def, schema_columns_info)
+        if reload_error:
+            return False, 0, reload_error
+
+    return _complete_import(con, table_name, key_columns, records_imported)
+
+def _apply_staged_reload(
+    con: duckdb.DuckDBPyConnection,
+    table_name: str,
+    table_schema_def: dict,
+    schema_columns_info: list,
+) -> str:
+    """
+    Replaces the table contents with the staged rows: the pre-update action and one
+    INSERT ... SELECT from the staging table run in a single short transaction.
+
+    Returns:
+        Error message, or an empty string on success
+    """
+    con.execute("BEGIN TRANSACTION")
+    prepare_error = _prepare_import_table(con, table_name, table_schema_def, schema_columns_info)
+    if prepare_error:
+        _rollback_import(con)
+        return prepare_error
+    try:
+        con.execute(f'INSERT INTO "{table_name}" SELECT * FROM "{staging_table_name(table_name)}"')
+        con.execute("COMMIT")
+    except Exception as e_insert:
+        _rollback_import(con)
+        return f"Error importing data into table '{table_name}': {e_insert}"
+    return ""
+
+def _rollback_import(con: duckdb.DuckDBPyConnection) -> None:
+    """Rolls back the import transaction (the table keeps its previous rows)."""
+    try:
+        con.execute("ROLLBACK")
+    except Exception:
+        pass
+
+def import_csv_files_native(
+    con: duckdb.DuckDBPyConnection,
+    csv_paths: list[str],
+    table_name: str,
+    incremental: bool = False,
+) -> tuple[bool, int, str]:
+    """
+    Fast path for CSV reports: one INSERT ... SELECT ... FROM read_csv(...) statement.
+
+    DuckDB's parallel CSV reader loads the files directly; cleaning and schema notes
+    are applied as SQL expressions generated by utils.csv_sql_import, so no pandas
+    DataFrame is built. The pre-update action and the insert run in one transaction:
+    on failure the table is left unchanged and the caller can fall back to
+    import_data_from_batches. In incremental mode the files are loaded into a
+    staging table and only the differences are applied.
+
+    Args:
+        con: Database connection
+        csv_paths: Paths to CSV files of the same report
+        table_name: Target table from HARDCODED_SCHEMA with file_type "csv"
+        incremental: Upsert by the table's natural_key instead of DELETE-and-reload
+
+    Returns:
+        Tuple[success: bool, rows_imported: int, error_message: str]
+    """
+    from .csv_sql_import import (
+        build_conversion_issues_query,
+        build_csv_import_query,
+        read_csv_columns,
+        supports_native_csv_import,
+    )
+
+    if not con:
+        return False, 0, "No database connection."
+    if not csv_paths:
+        return True, 0, "No files to import."
+    if not supports_native_csv_import(table_name):
+        return False, 0, f"Table '{table_name}' is not imported from CSV."
+
+    table_schema_def, schema_columns_info, schema_error = _get_import_schema(table_name)
+    if schema_error:
+        return False, 0, schema_error
+
+    union_by_name = len(csv_paths) > 1
+    try:
+        csv_columns = read_csv_columns(con, csv_paths, table_schema_def.get("read_params"))
+    except Exception as e_read:
+        return False, 0, f"Error reading CSV header for table '{table_name}': {e_read}"
+
+    if not _validate_import_frame(pd.DataFrame(columns=csv_columns), schema_columns_info):
+        return False, 0, IMPORT_VALIDATION_ERROR
+
+    issues_query = build_conversion_issues_query(table_name, csv_columns, union_by_name)
+    if issues_query:
+        try:
+            issue_counts = con.execute(issues_query, [list(csv_paths)]).fetchdf().iloc[0]
+            for target_col, null_count in issue_counts.items():
+                if null_count > 0:
+                    st.warning(f"Внимание: {null_count} значений в колонке {target_col} не удалось конвертировать и были заменены на NULL")
+        except Exception as e_issues:
+            return False, 0, f"Error checking CSV values for table '{table_name}': {e_issues}"
+
+    key_columns = _resolve_incremental_key(table_name, incremental)
+    con.execute("BEGIN TRANSACTION")
+    try:
+        prepare_error = _prepare_import_table(
+            con, table_name, table_schema_def, schema_columns_info, run_pre_update=not key_columns
+        )
+        if prepare_error:
+            con.execute("ROLLBACK")
+            return False, 0, prepare_error
+        insert_table = create_staging_table(con, table_name) if key_columns else table_name
+        records_imported = con.execute(
+            build_csv_import_query(table_name, csv_columns, union_by_name, target_table=insert_table),
+            [list(csv_paths)]
+        ).fetchone()[0]
+        con.execute("COMMIT")
+    except Exception as e_import:
+        try:
+            con.execute("ROLLBACK")
+        except Exception:
+            pass
+        if key_columns:
+            drop_staging_table(con, table_name)
+        return False, 0, f"Error importing CSV into table '{table_name}': {e_import}"
+
+    preview_table = staging_table_name(table_name) if key_columns else table_name
+    st.info("📊 Предпросмотр импортированных данных:")
+    st.dataframe(con.execute(f'SELECT * FROM "{preview_table}" LIMIT 10').fetchdf())
+
+    try:
+        return _complete_import(con, table_name, key_columns, records_imported)
+    finally:
+        if key_columns:
+            drop_staging_table(con, table_name)
+
+def _resolve_incremental_key(table_name: str, incremental: bool) -> Optional[list[str]]:
+    """Natural key for an incremental import, or None for the DELETE-and-reload mode."""
+    if not incremental:
+        return None
+    key_columns = get_natural_key(table_name)
+    if not key_columns:
+        st.warning(f"⚠️ Для таблицы '{table_name}' не задан естественный ключ - выполняется полная перезагрузка")
+    return key_columns
+
+def _complete_import(
+    con: duckdb.DuckDBPyConnection,
+    table_name: str,
+    key_columns: Optional[list[str]],
+    records_imported: int,
+) -> tuple[bool, int, str]:
+    """
+    Applies the staged rows (incremental mode) and rebuilds indexes / derived tables.
+
+    In incremental mode indexes are maintained by DuckDB during the upsert and
+    derived tables are rebuilt only when something actually changed.
+    """
+    if key_columns:
+        try:
+            stats = apply_incremental_import(con, table_name, key_columns)
+        except Exception as e_merge:
+            return False, 0, f"Error applying incremental import to table '{table_name}': {e_merge}"
+
+        if stats['full_reload']:
+            st.warning(f"⚠️ Ключ {', '.join(key_columns)} не уникален - таблица '{table_name}' перезагружена целиком")
+        st.info(
+            f"🔁 Инкрементальный импорт: добавлено {stats['inserted']}, обновлено {stats['updated']}, "
+            f"удалено {stats['deleted']}, без изменений {stats['unchanged']}"
+        )
+        if not has_changes(stats):
+            return True, records_imported, ""
+
+    try:
+        _finalize_import(con, table_name, silent_indexes=bool(key_columns))
+    except Exception as e_finalize:
+        return False, records_imported, f"Error finalizing import into table '{table_name}': {e_finalize}"
+
+    return True, records_imported, ""
+
+def _get_import_schema(table_name: str) -> tuple[dict | None, list, str]:
+    """Returns (table_schema_def, schema_columns_info, error_message) for a HARDCODED_SCHEMA table."""
+    table_schema_def = get_table_schema_definition(table_name)
+    if not table_schema_def:
+        return None, [], f"No schema definition found for table '{table_name}' via db_schema.py."
+
+    # Check if table uses dynamic schema
+    columns_info = table_schema_def.get("columns")
+    if columns_info == "DYNAMIC":
+        return None, [], f"Table '{table_name}' uses dynamic schema but special handling is not implemented. Please add specific logic."
+
+    schema_columns_info = get_table_columns_from_schema(table_name)
+    if not schema_columns_info:
+        return None, [], f"No column schema information found for table '{table_name}' via db_schema.py."
+
+    return table_schema_def, schema_columns_info, ""
+
+def _validate_import_frame(df: pd.DataFrame, schema_columns_info: list) -> bool:
+    """Checks required source columns and reports problems in the UI."""
+    validation_issues = validate_required_fields(df, schema_columns_info)
+    if validation_issues:
+        st.error("❌ Проблемы валидации данных:")
+        for issue in validation_issues:
+            st.write(f"• {issue['message']}")
+        return False
+    return True
+
+def _prepare_import_table(
+    con: duckdb.DuckDBPyConnection,
+    table_name: str,
+    table_schema_def: dict,
+    schema_columns_info: list,
+    run_pre_update: bool = True,
+) -> str:
+    """
+    Creates the target table if needed and runs its pre-update action
+    (skipped for incremental imports, which keep the existing rows).
+
+    Returns:
+        Error message, or an empty string on success
+    """
     table_exists_query = f"""
         SELECT COUNT(*) 
         FROM information_schema.tables 
@@ -95,96 +537,107 @@ def import_data_from_dataframe(
                     con.execute(create_table_sql)
                     st.success(f"✅ Таблица '{table_name}' успешно создана")
                 except Exception as e_create:
-                    return False, 0, f"Error creating table '{table_name}': {e_create}. SQL: {create_table_sql}"
+                    return f"Error creating table '{table_name}': {e_create}. SQL: {create_table_sql}"
             else:
-                return False, 0, f"No column definitions found for table '{table_name}'"
+                return f"No column definitions found for table '{table_name}'"
         
     except Exception as e_check:
-        return False, 0, f"Error checking table existence for '{table_name}': {e_check}"
+        return f"Error checking table existence for '{table_name}': {e_check}"
 
-    # 1. Pre-Update Action
     pre_update_sql = table_schema_def.get("pre_update_action")
-    if pre_update_sql:
+    if pre_update_sql and run_pre_update:
         try:
             con.execute(pre_update_sql)
         except Exception as e:
-            return False, 0, f"Error executing pre-update action for table '{table_name}': {e}. SQL: {pre_update_sql}"
+            return f"Error executing pre-update action for table '{table_name}': {e}. SQL: {pre_update_sql}"
 
-    # 2. Prepare DataFrame: Select and rename columns, apply transformations
+    return ""
+
+def _transform_import_frame(
+    cleaned_df: pd.DataFrame,
+    table_name: str,
+    schema_columns_info: list,
+    verbose: bool = True,
+) -> pd.DataFrame:
+    """
+    Selects and renames source columns to target columns and applies the schema notes
+    (remove_single_quotes, convert to date, round_to_integer, convert_to_integer, convert_to_bigint).
+    Columns missing in the input are created as NULL.
+
+    Args:
+        verbose: Show per-column success messages (disabled for streamed batches)
+    """
     df_to_import = pd.DataFrame()
     expected_target_columns = []
-    try:
-        for target_col, sql_type, source_col, notes in schema_columns_info:
-            expected_target_columns.append(target_col)
-            if source_col in cleaned_df.columns:
-                df_to_import[target_col] = cleaned_df[source_col].copy()
-
-                if notes == "remove_single_quotes":
-                    df_to_import[target_col] = df_to_import[target_col].astype(str).str.replace("'", "", regex=False)
-                elif notes == "convert to date":
-                    try:
-                        df_to_import[target_col] = pd.to_datetime(df_to_import[target_col], errors='coerce').dt.date
-                    except Exception as e_date:
-                        st.warning(f"Could not convert column {target_col} to date for table {table_name}. Error: {e_date}. Leaving as is.")
-                elif notes == "round_to_integer":
-                    try:
-                        # The data should already be cleaned by data_cleaner, but apply final rounding
-                        numeric_col = pd.to_numeric(df_to_import[target_col], errors='coerce')
-                        df_to_import[target_col] = numeric_col.apply(lambda x: int(round(x)) if pd.notnull(x) else pd.NA)
-                        df_to_import[target_col] = df_to_import[target_col].astype('Int64') # Convert to nullable integer type
-                    except Exception as e_price:
-                        st.warning(f"Could not convert column {target_col} to rounded integer for table {table_name}. Error: {e_price}. Leaving as is.")
-                elif notes == "convert_to_integer":
+    for target_col, sql_type, source_col, notes in schema_columns_info:
+        expected_target_columns.append(target_col)
+        if source_col in cleaned_df.columns:
+            df_to_import[target_col] = cleaned_df[source_col].copy()
+
+            if notes == "remove_single_quotes":
+                df_to_import[target_col] = df_to_import[target_col].astype(str).str.replace("'", "", regex=False)
+            elif notes == "convert to date":
+                try:
+                    df_to_import[target_col] = pd.to_datetime(df_to_import[target_col], errors='coerce').dt.date
+                except Exception as e_date:
+                    st.warning(f"Could not convert column {target_col} to date for table {table_name}. Error: {e_date}. Leaving as is.")
+            elif notes == "round_to_integer":
+                try:
+                    # The data should already be cleaned by data_cleaner, but apply final rounding
+                    numeric_col = pd.to_numeric(df_to_import[target_col], errors='coerce')
+                    df_to_import[target_col] = numeric_col.apply(lambda x: int(round(x)) if pd.notnull(x) else pd.NA)
+                    df_to_import[target_col] = df_to_import[target_col].astype('Int64') # Convert to nullable integer type
+                except Exception as e_price:
+                    st.warning(f"Could not convert column {target_col} to rounded integer for table {table_name}. Error: {e_price}. Leaving as is.")
+            elif notes == "convert_to_integer":
+                try:
+                    # Convert string/varchar wb_sku to integer
+                    numeric_col = pd.to_numeric(df_to_import[target_col], errors='coerce')
+                    df_to_import[target_col] = numeric_col.astype('Int64') # Convert to nullable integer type
+                    
+                    # Count and log conversion issues
+                    null_count = df_to_import[target_col].isna().sum()
+                    if null_count > 0:
+                        st.warning(f"Внимание: {null_count} значений в колонке {target_col} не удалось конвертировать в числа и были заменены на NULL")
+                except Exception as e_conv:
+                    st.warning(f"Could not convert column {target_col} to integer for table {table_name}. Error: {e_conv}. Leaving as is.")
+            elif notes == "convert_to_bigint":
+                try:
+                    # Convert string to BIGINT (for large SKU/Product ID values)
+                    # First, clean the data - remove any non-numeric characters except digits
+                    cleaned_series = df_to_import[target_col].astype(str).str.replace(r'[^\d]', '', regex=True)
+                    # Convert empty strings to NaN
+                    cleaned_series = cleaned_series.replace('', pd.NA)
+                    # Convert to numeric, handling large integers
+                    numeric_col = pd.to_numeric(cleaned_series, errors='coerce')
+                    df_to_import[target_col] = numeric_col.astype('Int64') # Use nullable Int64 for BIGINT
+                    
+                    # Count and log conversion issues
+                    null_count = df_to_import[target_col].isna().sum()
+                    if null_count > 0:
+                        st.warning(f"Внимание: {null_count} значений в колонке {target_col} не удалось конвертировать в BIGINT и были заменены на NULL")
+                    elif verbose:
+                        st.info(f"✅ Успешно конвертировано {len(df_to_import)} значений в колонке {target_col} в BIGINT")
+                except Exception as e_conv:
+                    st.error(f"Ошибка конвертации колонки {target_col} в BIGINT для таблицы {table_name}. Error: {e_conv}. Оставляем как есть.")
+                    # Fallback - try basic numeric conversion
                     try:
-                        # Convert string/varchar wb_sku to integer
                         numeric_col = pd.to_numeric(df_to_import[target_col], errors='coerce')
-                        df_to_import[target_col] = numeric_col.astype('Int64') # Convert to nullable integer type
-                        
-                        # Count and log conversion issues
-                        null_count = df_to_import[target_col].isna().sum()
-                        if null_count > 0:
-                            st.warning(f"Внимание: {null_count} значений в колонке {target_col} не удалось конвертировать в числа и были заменены на NULL")
-                    except Exception as e_conv:
-                        st.warning(f"Could not convert column {target_col} to integer for table {table_name}. Error: {e_conv}. Leaving as is.")
-                elif notes == "convert_to_bigint":
-                    try:
-                        # Convert string to BIGINT (for large SKU/Product ID values)
-                        # First, clean the data - remove any non-numeric characters except digits
-                        cleaned_series = df_to_import[target_col].astype(str).str.replace(r'[^\d]', '', regex=True)
-                        # Convert empty strings to NaN
-                        cleaned_series = cleaned_series.replace('', pd.NA)
-                        # Convert to numeric, handling large integers
-                        numeric_col = pd.to_numeric(cleaned_series, errors='coerce')
-                        df_to_import[target_col] = numeric_col.astype('Int64') # Use nullable Int64 for BIGINT
-                        
-                        # Count and log conversion issues
-                        null_count = df_to_import[target_col].isna().sum()
-                        if null_count > 0:
-                            st.warning(f"Внимание: {null_count} значений в колонке {target_col} не удалось конвертировать в BIGINT и были заменены на NULL")
-                        else:
-                            st.info(f"✅ Успешно конвертировано {len(df_to_import)} значений в колонке {target_col} в BIGINT")
-                    except Exception as e_conv:
-                        st.error(f"Ошибка конвертации колонки {target_col} в BIGINT для таблицы {table_name}. Error: {e_conv}. Оставляем как есть.")
-                        # Fallback - try basic numeric conversion
-                        try:
-                            numeric_col = pd.to_numeric(df_to_import[target_col], errors='coerce')
-                            df_to_import[target_col] = numeric_col.astype('Int64')
-                        except:
-                            pass  # Keep original data if all conversions fail
-            else:
-                # Column is missing in input data - create it as NULL column
-                df_to_import[target_col] = pd.NA
-    
-        for target_col, _, _, _ in schema_columns_info:
-            if target_col not in df_to_import.columns:
-                df_to_import[target_col] = pd.NA
-        
-        df_to_import = df_to_import[expected_target_columns]
+                        df_to_import[target_col] = numeric_col.astype('Int64')
+                    except:
+                        pass  # Keep original data if all conversions fail
+        else:
+            # Column is missing in input data - create it as NULL column
+            df_to_import[target_col] = pd.NA
 
-    except Exception as e_prep:
-        return False, 0, f"Error preparing DataFrame for table '{table_name}': {e_prep}"
+    for target_col, _, _, _ in schema_columns_info:
+        if target_col not in df_to_import.columns:
+            df_to_import[target_col] = pd.NA
+    
+    return df_to_import[expected_target_columns]
 
-    # 3. Final check: show preview of data to be imported
+def _show_import_preview(df_to_import: pd.DataFrame) -> None:
+    """Shows the first rows of the prepared data and a summary of empty values."""
     st.info("📊 Предпросмотр данных для импорта:")
     st.dataframe(df_to_import.head(10))
     
@@ -201,66 +654,66 @@ def import_data_from_dataframe(
         for col, count in null_summary.items():
             st.write(f"• **{col}**: {count} пустых значений из {total_rows} ({count/total_rows*100:.1f}%)")
 
-    # 4. Import data into DuckDB table (with MotherDuck-friendly chunking)
-    try:
-        total_rows = len(df_to_import)
-        # Detect if connected to MotherDuck (main database path starts with md:)
-        is_motherduck = False
-        try:
-            db_info = con.execute("SELECT path FROM duckdb_databases() WHERE name = 'main'").fetchone()
-            if db_info and isinstance(db_info[0], str) and db_info[0].startswith('md:'):
-                is_motherduck = True
-        except Exception:
-            # Fallback: if detection fails, assume local
-            is_motherduck = False
-
-        # Decide chunk size: for MD or large datasets, use chunks to avoid long leases
-        if is_motherduck or total_rows > 100_000:
-            chunk_size = 50_000 if total_rows > 50_000 else 25_000
-            st.info(f"🚚 Импорт с пакетированием: {total_rows} строк, размер пакета {chunk_size}")
-            progress_bar = st.progress(0.0)
-            imported = 0
-            batch_idx = 0
-            while imported < total_rows:
-                batch_idx += 1
-                end = min(imported + chunk_size, total_rows)
-                chunk = df_to_import.iloc[imported:end].copy()
-                try:
-                    con.register('temp_df_to_import', chunk)
-                    con.execute(f'INSERT INTO "{table_name}" SELECT * FROM temp_df_to_import;')
-                    con.unregister('temp_df_to_import')
-                    imported = end
-                    progress_bar.progress(imported / total_rows)
-                    # Keep-alive ping between batches for long-running cloud sessions
-                    try:
-                        con.execute('SELECT 1;')
-                    except Exception:
-                        pass
-                except Exception as batch_err:
-                    return False, imported, f"Error importing data into table '{table_name}' on batch {batch_idx}: {batch_err}"
-
-            records_imported = imported
-        else:
-            # Single-shot import for small/local datasets
-            con.register('temp_df_to_import', df_to_import)
-            con.execute(f'INSERT INTO "{table_name}" SELECT * FROM temp_df_to_import;')
-            con.unregister('temp_df_to_import')
-            records_imported = total_rows
-
-        # 5. Recreate indexes for this table after successful import
-        try:
-            from .db_indexing import recreate_indexes_after_import
-            recreate_indexes_after_import(con, table_name, silent=False)
-        except ImportError:
-            # Модуль индексирования недоступен - не критично
-            pass
-        except Exception as e_index:
-            # Ошибка создания индексов не должна прерывать успешный импорт
-            st.warning(f"⚠️ Данные импортированы успешно, но не удалось создать индексы: {e_index}")
-
-        return True, records_imported, ""
-    except Exception as e_import:
-        return False, 0, f"Error importing data into table '{table_name}': {e_import}"
+def _is_motherduck_connection(con: duckdb.DuckDBPyConnection) -> bool:
+    """Detects if connected to MotherDuck (main database path starts with md:)."""
+    try:
+        db_info = con.execute("SELECT path FROM duckdb_databases() WHERE name = 'main'").fetchone()
+        return bool(db_info and isinstance(db_info[0], str) and db_info[0].startswith('md:'))
+    except Exception:
+        # Fallback: if detection fails, assume local
+        return False
+
+def _insert_import_frame(con: duckdb.DuckDBPyConnection, table_name: str, df_to_import: pd.DataFrame) -> None:
+    """Appends a prepared DataFrame (target column order) to the table."""
+    con.register('temp_df_to_import', df_to_import)
+    try:
+        con.execute(f'INSERT INTO "{table_name}" SELECT * FROM temp_df_to_import;')
+    finally:
+        con.unregister('temp_df_to_import')
+
+def _finalize_import(con: duckdb.DuckDBPyConnection, table_name: str, silent_indexes: bool = False) -> None:
+    """
+    Recreates indexes and derived lookup tables after a successful import.
+    Incremental imports keep existing indexes (DuckDB maintains them during the upsert),
+    so only missing ones are created there, without UI messages.
+    """
+    try:
+        from .db_indexing import recreate_indexes_after_import
+        recreate_indexes_after_import(con, table_name, silent=silent_indexes)
+    except ImportError:
+        # Модуль индексирования недоступен - не критично
+        pass
+    except Exception as e_index:
+        # Ошибка создания индексов не должна прерывать успешный импорт
+        st.warning(f"⚠️ Данные импортированы успешно, но не удалось создать индексы: {e_index}")
+
+    rebuild_derived_tables_after_import(con, table_name)
+
+def rebuild_derived_tables_after_import(con: duckdb.DuckDBPyConnection, table_name: str) -> None:
+    """
+    Rebuilds derived lookup tables (wb_barcodes_normalized, marketplace_links)
+    that depend on the just-imported table. Failures are reported but never fail the import:
+    readers fall back to computing the same data on the fly.
+    Also bumps the table's data version, which invalidates the WB candidate cache.
+    """
+    from .wb_candidate_cache import bump_data_version
+    bump_data_version(con, table_name)
+
+    if table_name == "wb_products":
+        from .wb_barcode_index import rebuild_wb_barcode_index
+        index_ok, index_rows, index_msg = rebuild_wb_barcode_index(con)
+        if index_ok:
+            st.info(f"🔗 Нормализованные штрихкоды WB обновлены: {index_rows} записей")
+        else:
+            st.warning(f"⚠️ {index_msg}")
+
+    from .marketplace_links import MARKETPLACE_LINKS_SOURCE_TABLES, rebuild_marketplace_links
+    if table_name in MARKETPLACE_LINKS_SOURCE_TABLES:
+        links_ok, links_rows, links_msg = rebuild_marketplace_links(con)
+        if links_ok:
+            st.info(f"🔗 Связи WB <-> Ozon обновлены: {links_rows} записей")
+        else:
+            st.warning(f"⚠️ {links_msg}")
 
 def import_dynamic_punta_table(
     con: duckdb.DuckDBPyConnection,
@@ -342,6 +795,9 @@ def import_dynamic_punta_table(
             # Ошибка создания индексов не должна прерывать успешный импорт
             st.warning(f"⚠️ Данные импортированы успешно, но не удалось создать индексы: {e_index}")
         
+        # 10. Rebuild derived data that depends on punta_table
+        rebuild_derived_tables_after_import(con, "punta_table")
+        
         return True, records_imported, ""
         
     except Exception as e:
@@ -376,7 +832,7 @@ def get_punta_table_columns(con: duckdb.DuckDBPyConnection) -> list[str]:
 
 # --- Database Statistics ---
 
-def get_db_stats(con: duckdb.DuckDBPyConnection) -> dict:
+def get_db_stats(con: duckdb.DuckDBPyConnection) -> dict:
     """
     Retrieves statistics from the database, such as table count, total records per table,
     and overall total records for managed tables, as well as DB file size.
@@ -390,13 +846,13 @@ def get_db_stats(con: duckdb.DuckDBPyConnection) -> dict:
             'error': 'No database connection.'
         }
 
-    stats = {
-        'table_count': 0,
-        'total_records': 0,
-        'db_file_size_mb': None,
-        'table_record_counts': {},
-        'db_size_method': None,
-    }
+    stats = {
+        'table_count': 0,
+        'total_records': 0,
+        'db_file_size_mb': None,
+        'table_record_counts': {},
+        'db_size_method': None,
+    }
 
     try:
         table_count_result = con.execute("SELECT COUNT(table_name) FROM information_schema.tables WHERE table_schema = 'main';").fetchone()
@@ -423,158 +879,158 @@ def get_db_stats(con: duckdb.DuckDBPyConnection) -> dict:
         else:
             stats['total_records'] = None
 
-        # Determine connection type (local vs MotherDuck)
-        is_motherduck = False
-        try:
-            db_info = con.execute("SELECT path FROM duckdb_databases() WHERE name = 'main'").fetchone()
-            if db_info and isinstance(db_info[0], str) and db_info[0].startswith('md:'):
-                is_motherduck = True
-        except Exception:
-            is_motherduck = False
-
-        if is_motherduck:
-            # Try precise size via DuckDB storage info (compressed bytes)
-            try:
-                row = con.execute("SELECT SUM(total_compressed_size) AS bytes FROM duckdb_storage_info()").fetchone()
-                if row and row[0] is not None:
-                    stats['db_file_size_mb'] = round(float(row[0]) / (1024 * 1024), 2)
-                    stats['db_size_method'] = 'md_storage_info'
-            except Exception:
-                pass
-
-            # Fallback: try PRAGMA database_size (may not be available on MD)
-            if stats['db_file_size_mb'] is None:
-                try:
-                    df = con.execute("PRAGMA database_size").fetchdf()
-                    # Heuristic: prefer columns that look like byte counts
-                    byte_cols = [c for c in df.columns if 'byte' in c.lower() or 'size' in c.lower()]
-                    total_bytes = 0
-                    if len(df.index) > 0:
-                        for col in byte_cols:
-                            try:
-                                val = float(df.iloc[0][col])
-                                if val > 0:
-                                    total_bytes = max(total_bytes, val)
-                            except Exception:
-                                pass
-                    if total_bytes > 0:
-                        stats['db_file_size_mb'] = round(total_bytes / (1024 * 1024), 2)
-                        stats['db_size_method'] = 'md_database_size_pragma'
-                except Exception:
-                    pass
-
-            # Final fallback: estimate by schema (row count * avg row width)
-            if stats['db_file_size_mb'] is None:
-                try:
-                    # Prefer managed tables list to limit scope
-                    managed = set(get_defined_table_names() or [])
-                    if managed:
-                        existing = con.execute(
-                            """
-                            SELECT table_name FROM information_schema.tables 
-                            WHERE table_schema = 'main' AND table_name IN (""" + 
-                            ",".join([f"'{t}'" for t in managed]) + ")"
-                        ).fetchall() or []
-                        candidate_tables = [t[0] for t in existing]
-                    else:
-                        candidate_tables = [t[0] for t in (con.execute("SELECT table_name FROM information_schema.tables WHERE table_schema = 'main'").fetchall() or [])]
-
-                    table_rows = {}
-                    for tbl in candidate_tables:
-                        try:
-                            row_cnt = con.execute(f'SELECT COUNT(*) FROM "{tbl}"').fetchone()[0]
-                        except Exception:
-                            row_cnt = 0
-                        table_rows[tbl] = int(row_cnt or 0)
-
-                    # Column type sizes (very rough)
-                    def _type_size(t: str) -> int:
-                        t = (t or '').upper()
-                        if 'BIGINT' in t or 'HUGEINT' in t:
-                            return 8
-                        if 'INTEGER' in t or 'INT32' in t or t == 'INT':
-                            return 4
-                        if 'SMALLINT' in t:
-                            return 2
-                        if 'TINYINT' in t or 'BOOLEAN' in t or 'BOOL' in t:
-                            return 1
-                        if 'DOUBLE' in t or 'FLOAT8' in t or 'TIMESTAMP' in t:
-                            return 8
-                        if 'REAL' in t or 'FLOAT' in t:
-                            return 4
-                        if 'DECIMAL' in t or 'NUMERIC' in t:
-                            return 8
-                        if 'DATE' in t or 'TIME' in t:
-                            return 4
-                        if 'UUID' in t:
-                            return 16
-                        if 'VARCHAR' in t or 'TEXT' in t:
-                            # Default avg length for text; refined below if possible
-                            return 32
-                        # Default fallback
-                        return 8
-
-                    total_bytes = 0
-                    def qident(name: str) -> str:
-                        return '"' + str(name).replace('"', '""') + '"'
-
-                    for tbl, row_cnt in table_rows.items():
-                        if row_cnt == 0:
-                            continue
-                        # Fetch columns and types
-                        cols = con.execute(
-                            f"""
-                            SELECT column_name, data_type
-                            FROM information_schema.columns
-                            WHERE table_schema='main' AND table_name = '{tbl}'
-                            ORDER BY ordinal_position
-                            """
-                        ).fetchall() or []
-
-                        # Estimate width
-                        width = 0
-                        text_cols = []
-                        for col_name, data_type in cols:
-                            sz = _type_size(str(data_type))
-                            width += sz
-                            if sz == 32:  # text placeholder
-                                text_cols.append(col_name)
-
-                        # Try refine text columns average length using a small sample (up to 10k rows)
-                        for col in text_cols:
-                            try:
-                                avg_len_row = con.execute(
-                                    f"SELECT AVG(length({qident(col)})) FROM (SELECT {qident(col)} FROM {qident(tbl)} WHERE {qident(col)} IS NOT NULL LIMIT 10000)"
-                                ).fetchone()
-                                avg_len = float(avg_len_row[0]) if avg_len_row and avg_len_row[0] is not None else 32.0
-                                # Replace default 32 with measured avg (cap to 256 to avoid extremes)
-                                width += max(0.0, min(256.0, avg_len) - 32.0)
-                            except Exception:
-                                pass
-
-                        # Add per-row overhead factor (~10%) and indexing/metadata (~10%)
-                        row_bytes = width * 1.1
-                        total_bytes += int(row_cnt * row_bytes * 1.1)
-
-                    if total_bytes > 0:
-                        stats['db_file_size_mb'] = round(total_bytes / (1024 * 1024), 2)
-                        stats['db_size_method'] = 'md_schema_estimate'
-                except Exception as e_est:
-                    print(f"DB size MD estimate failed: {e_est}")
-
-        else:
-            # Local file size
-            db_path = get_db_path() # From config_utils.py
-            if db_path and os.path.exists(db_path):
-                try:
-                    file_size_bytes = os.path.getsize(db_path)
-                    stats['db_file_size_mb'] = round(file_size_bytes / (1024 * 1024), 2)
-                    stats['db_size_method'] = 'local_file'
-                except Exception as e_size:
-                    print(f"Could not get database file size: {e_size}")
-                    stats['db_file_size_mb'] = f"Error: {e_size}"
-
-        return stats
+        # Determine connection type (local vs MotherDuck)
+        is_motherduck = False
+        try:
+            db_info = con.execute("SELECT path FROM duckdb_databases() WHERE name = 'main'").fetchone()
+            if db_info and isinstance(db_info[0], str) and db_info[0].startswith('md:'):
+                is_motherduck = True
+        except Exception:
+            is_motherduck = False
+
+        if is_motherduck:
+            # Try precise size via DuckDB storage info (compressed bytes)
+            try:
+                row = con.execute("SELECT SUM(total_compressed_size) AS bytes FROM duckdb_storage_info()").fetchone()
+                if row and row[0] is not None:
+                    stats['db_file_size_mb'] = round(float(row[0]) / (1024 * 1024), 2)
+                    stats['db_size_method'] = 'md_storage_info'
+            except Exception:
+                pass
+
+            # Fallback: try PRAGMA database_size (may not be available on MD)
+            if stats['db_file_size_mb'] is None:
+                try:
+                    df = con.execute("PRAGMA database_size").fetchdf()
+                    # Heuristic: prefer columns that look like byte counts
+                    byte_cols = [c for c in df.columns if 'byte' in c.lower() or 'size' in c.lower()]
+                    total_bytes = 0
+                    if len(df.index) > 0:
+                        for col in byte_cols:
+                            try:
+                                val = float(df.iloc[0][col])
+                                if val > 0:
+                                    total_bytes = max(total_bytes, val)
+                            except Exception:
+                                pass
+                    if total_bytes > 0:
+                        stats['db_file_size_mb'] = round(total_bytes / (1024 * 1024), 2)
+                        stats['db_size_method'] = 'md_database_size_pragma'
+                except Exception:
+                    pass
+
+            # Final fallback: estimate by schema (row count * avg row width)
+            if stats['db_file_size_mb'] is None:
+                try:
+                    # Prefer managed tables list to limit scope
+                    managed = set(get_defined_table_names() or [])
+                    if managed:
+                        existing = con.execute(
+                            """
+                            SELECT table_name FROM information_schema.tables 
+                            WHERE table_schema = 'main' AND table_name IN (""" + 
+                            ",".join([f"'{t}'" for t in managed]) + ")"
+                        ).fetchall() or []
+                        candidate_tables = [t[0] for t in existing]
+                    else:
+                        candidate_tables = [t[0] for t in (con.execute("SELECT table_name FROM information_schema.tables WHERE table_schema = 'main'").fetchall() or [])]
+
+                    table_rows = {}
+                    for tbl in candidate_tables:
+                        try:
+                            row_cnt = con.execute(f'SELECT COUNT(*) FROM "{tbl}"').fetchone()[0]
+                        except Exception:
+                            row_cnt = 0
+                        table_rows[tbl] = int(row_cnt or 0)
+
+                    # Column type sizes (very rough)
+                    def _type_size(t: str) -> int:
+                        t = (t or '').upper()
+                        if 'BIGINT' in t or 'HUGEINT' in t:
+                            return 8
+                        if 'INTEGER' in t or 'INT32' in t or t == 'INT':
+                            return 4
+                        if 'SMALLINT' in t:
+                            return 2
+                        if 'TINYINT' in t or 'BOOLEAN' in t or 'BOOL' in t:
+                            return 1
+                        if 'DOUBLE' in t or 'FLOAT8' in t or 'TIMESTAMP' in t:
+                            return 8
+                        if 'REAL' in t or 'FLOAT' in t:
+                            return 4
+                        if 'DECIMAL' in t or 'NUMERIC' in t:
+                            return 8
+                        if 'DATE' in t or 'TIME' in t:
+                            return 4
+                        if 'UUID' in t:
+                            return 16
+                        if 'VARCHAR' in t or 'TEXT' in t:
+                            # Default avg length for text; refined below if possible
+                            return 32
+                        # Default fallback
+                        return 8
+
+                    total_bytes = 0
+                    def qident(name: str) -> str:
+                        return '"' + str(name).replace('"', '""') + '"'
+
+                    for tbl, row_cnt in table_rows.items():
+                        if row_cnt == 0:
+                            continue
+                        # Fetch columns and types
+                        cols = con.execute(
+                            f"""
+                            SELECT column_name, data_type
+                            FROM information_schema.columns
+                            WHERE table_schema='main' AND table_name = '{tbl}'
+                            ORDER BY ordinal_position
+                            """
+                        ).fetchall() or []
+
+                        # Estimate width
+                        width = 0
+                        text_cols = []
+                        for col_name, data_type in cols:
+                            sz = _type_size(str(data_type))
+                            width += sz
+                            if sz == 32:  # text placeholder
+                                text_cols.append(col_name)
+
+                        # Try refine text columns average length using a small sample (up to 10k rows)
+                        for col in text_cols:
+                            try:
+                                avg_len_row = con.execute(
+                                    f"SELECT AVG(length({qident(col)})) FROM (SELECT {qident(col)} FROM {qident(tbl)} WHERE {qident(col)} IS NOT NULL LIMIT 10000)"
+                                ).fetchone()
+                                avg_len = float(avg_len_row[0]) if avg_len_row and avg_len_row[0] is not None else 32.0
+                                # Replace default 32 with measured avg (cap to 256 to avoid extremes)
+                                width += max(0.0, min(256.0, avg_len) - 32.0)
+                            except Exception:
+                                pass
+
+                        # Add per-row overhead factor (~10%) and indexing/metadata (~10%)
+                        row_bytes = width * 1.1
+                        total_bytes += int(row_cnt * row_bytes * 1.1)
+
+                    if total_bytes > 0:
+                        stats['db_file_size_mb'] = round(total_bytes / (1024 * 1024), 2)
+                        stats['db_size_method'] = 'md_schema_estimate'
+                except Exception as e_est:
+                    print(f"DB size MD estimate failed: {e_est}")
+
+        else:
+            # Local file size
+            db_path = get_db_path() # From config_utils.py
+            if db_path and os.path.exists(db_path):
+                try:
+                    file_size_bytes = os.path.getsize(db_path)
+                    stats['db_file_size_mb'] = round(file_size_bytes / (1024 * 1024), 2)
+                    stats['db_size_method'] = 'local_file'
+                except Exception as e_size:
+                    print(f"Could not get database file size: {e_size}")
+                    stats['db_file_size_mb'] = f"Error: {e_size}"
+
+        return stats
 
     except Exception as e:
         print(f"Error getting database stats: {e}")
@@ -600,13 +1056,14 @@ def get_all_db_tables(con: duckdb.DuckDBPyConnection) -> list[str]:
         if callable(st.error): st.error(msg)
         return []
 
-def apply_brand_filter(df: pd.DataFrame, table_name: str) -> pd.DataFrame:
+def apply_brand_filter(df: pd.DataFrame, table_name: str, verbose: bool = True) -> pd.DataFrame:
     """
     Применяет фильтр по брендам для таблицы oz_category_products.
     
     Args:
         df: DataFrame для фильтрации
         table_name: Название таблицы
+        verbose: Показывать сообщения о фильтрации (отключается для последующих пакетов потокового импорта)
     
     Returns:
         Отфильтрованный DataFrame
@@ -619,14 +1076,16 @@ def apply_brand_filter(df: pd.DataFrame, table_name: str) -> pd.DataFrame:
     brands_filter = config_utils.get_data_filter("oz_category_products_brands")
     
     if not brands_filter or brands_filter.strip() == "":
-        st.info("🔍 Фильтр брендов не установлен - загружаются все товары")
+        if verbose:
+            st.info("🔍 Фильтр брендов не установлен - загружаются все товары")
         return df
     
     # Разбираем список брендов
     allowed_brands = [brand.strip() for brand in brands_filter.split(";") if brand.strip()]
     
     if not allowed_brands:
-        st.info("🔍 Фильтр брендов пустой - загружаются все товары")
+        if verbose:
+            st.info("🔍 Фильтр брендов пустой - загружаются все товары")
         return df
     
     # Ищем колонку с брендом
@@ -649,6 +1108,8 @@ def apply_brand_filter(df: pd.DataFrame, table_name: str) -> pd.DataFrame:
     excluded_count = original_count - filtered_count
     
     # Отображаем результаты фильтрации
+    if not verbose:
+        return filtered_df
     if excluded_count > 0:
         st.success(f"🎯 Фильтр брендов применен: {original_count} → {filtered_count} записей")
         st.info(f"📋 Разрешенные бренды: {', '.join(allowed_brands)}")
@@ -803,4 +1264,4 @@ def migrate_oz_card_rating_schema(conn) -> bool:
         
     except Exception as e:
         st.error(f"❌ Ошибка при обновлении схемы: {e}")
-        return False 
+        return False 
@@ -70,6 +70,13 @@ PERFORMANCE_INDEXES = [
         priority=1,
         description="Аналитические запросы по vendor code"
     ),
+    IndexDefinition(
+        name="idx_wb_barcodes_normalized_barcode",
+        table="wb_barcodes_normalized",
+        columns=["barcode"],
+        priority=1,
+        description="JOIN нормализованных штрихкодов WB со штрихкодами Ozon"
+    ),
     
     # ПРИОРИТЕТ 2: Важные индексы
     IndexDefinition(
@@ -100,6 +107,27 @@ PERFORMANCE_INDEXES = [
         priority=2,
         description="Фильтрация Ozon товаров по бренду"
     ),
+    IndexDefinition(
+        name="idx_marketplace_links_wb_sku",
+        table="marketplace_links",
+        columns=["wb_sku"],
+        priority=2,
+        description="Связи WB -> Ozon из материализованной таблицы"
+    ),
+    IndexDefinition(
+        name="idx_marketplace_links_oz_sku",
+        table="marketplace_links",
+        columns=["oz_sku"],
+        priority=2,
+        description="Связи Ozon -> WB из материализованной таблицы"
+    ),
+    IndexDefinition(
+        name="idx_marketplace_links_oz_vendor_code",
+        table="marketplace_links",
+        columns=["oz_vendor_code"],
+        priority=2,
+        description="Поиск связей по vendor code Ozon"
+    ),
     # ДОБАВЛЕНО: индексы, рекомендованные для производительности
     IndexDefinition(
         name="idx_wb_prices_sku",
@@ -25,7 +25,8 @@ HARDCODED_SCHEMA = {
             {'target_col_name': 'oz_sku',             'sql_type': 'BIGINT',  'source_col_name': 'OZON id', 'notes': 'convert_to_bigint'},
             {'target_col_name': 'oz_vendor_code',     'sql_type': 'VARCHAR', 'source_col_name': 'Артикул', 'notes': None}
         ],
-        "pre_update_action": "DELETE FROM oz_orders;" # SQL to execute before import
+        "pre_update_action": "DELETE FROM oz_orders;", # SQL to execute before import
+        "natural_key": ['oz_order_number', 'oz_shipment_number', 'oz_sku'] # Natural key for incremental (upsert) import
     },
     "oz_products": {
         "description": "Товары Ozon",
@@ -50,7 +51,8 @@ HARDCODED_SCHEMA = {
             {'target_col_name': 'oz_fbo_stock',       'sql_type': 'INTEGER', 'source_col_name': 'Доступно к продаже по схеме FBO, шт.', 'notes': None},
             {'target_col_name': 'oz_actual_price',    'sql_type': 'DOUBLE',  'source_col_name': 'Текущая цена с учетом скидки, ₽', 'notes': "round_to_integer"}
         ],
-        "pre_update_action": "DELETE FROM oz_products;"
+        "pre_update_action": "DELETE FROM oz_products;",
+        "natural_key": ['oz_vendor_code']
     },
     "oz_barcodes": {
         "description": "Штрихкоды Ozon",
@@ -71,7 +73,8 @@ HARDCODED_SCHEMA = {
             {'target_col_name': 'oz_product_id',  'sql_type': 'BIGINT',  'source_col_name': 'Ozon Product ID', 'notes': 'convert_to_bigint'},
             {'target_col_name': 'oz_barcode',     'sql_type': 'VARCHAR', 'source_col_name': 'Штрихкод', 'notes': None}
         ],
-        "pre_update_action": "DELETE FROM oz_barcodes;"
+        "pre_update_action": "DELETE FROM oz_barcodes;",
+        "natural_key": ['oz_barcode', 'oz_product_id']
     },
     "oz_category_products": {
         "description": "Продукты по категориям Ozon (импорт шаблонов)",
@@ -214,7 +217,8 @@ HARDCODED_SCHEMA = {
             {'target_col_name': 'wb_full_price', 'sql_type': 'INTEGER', 'source_col_name': 'Текущая цена', 'notes': None},
             {'target_col_name': 'wb_discount',   'sql_type': 'INTEGER', 'source_col_name': 'Текущая скидка', 'notes': None}
         ],
-        "pre_update_action": "DELETE FROM wb_prices;"
+        "pre_update_action": "DELETE FROM wb_prices;",
+        "natural_key": ['wb_sku']
     },
     "punta_table": {
         "description": "Данные Punta из Google Sheets (универсальная схема)",
@@ -241,7 +245,8 @@ HARDCODED_SCHEMA = {
             {'target_col_name': 'rating', 'sql_type': 'DECIMAL(3,2)', 'source_col_name': 'Рейтинг (1)', 'notes': None},
             {'target_col_name': 'rev_number', 'sql_type': 'INTEGER', 'source_col_name': 'Кол-во отзывов', 'notes': None}
         ],
-        "pre_update_action": "DELETE FROM oz_card_rating;"
+        "pre_update_action": "DELETE FROM oz_card_rating;",
+        "natural_key": ['oz_sku']
     },
     "category_mapping": {
         "description": "Соответствие категорий между маркетплейсами",
@@ -2,6 +2,9 @@ import duckdb
 import streamlit as st
 import pandas as pd
 
+from .arrow_access import query_result, register_input
+from .wb_barcode_index import wb_barcodes_source
+
 # --- Cross-Marketplace Search Helper Functions ---
 
 def search_table_globally(
@@ -175,31 +178,17 @@ def get_normalized_wb_barcodes(con: duckdb.DuckDBPyConnection, wb_skus: list[str
             else: print(f"Error: {msg}")
             return pd.DataFrame()
         
-        wb_sku_filter = " AND p.wb_sku IN ({})".format(", ".join("?" * len(skus_for_query)))
+        wb_sku_filter = " WHERE n.wb_sku IN ({})".format(", ".join("?" * len(skus_for_query)))
         params = tuple(skus_for_query)
 
-    # Updated query: split barcodes via SQL and capture position using generate_series + list indexing
+    # Barcodes come from the materialized wb_barcodes_normalized table built on wb_products import
+    # (falls back to splitting wb_barcodes on the fly if the table has not been built yet)
     base_query = f"""
-    WITH arrs AS (
-        SELECT 
-            p.wb_sku,
-            string_split(p.wb_barcodes, ';') AS arr
-        FROM wb_products p
-        WHERE NULLIF(TRIM(p.wb_barcodes), '') IS NOT NULL{wb_sku_filter}
-    ),
-    expanded AS (
-        SELECT 
-            wb_sku,
-            idx AS barcode_position,
-            TRIM(arr[idx]) AS individual_barcode_wb
-        FROM arrs, generate_series(1, array_length(arr)) AS gs(idx)
-    )
     SELECT 
-        wb_sku,
-        individual_barcode_wb,
-        barcode_position
-    FROM expanded
-    WHERE NULLIF(TRIM(individual_barcode_wb), '') IS NOT NULL
+        n.wb_sku,
+        n.barcode AS individual_barcode_wb,
+        n.position AS barcode_position
+    FROM {wb_barcodes_source(con)} n{wb_sku_filter}
     """
     
     try:
@@ -249,8 +238,8 @@ def get_ozon_barcodes_and_identifiers(
     SELECT DISTINCT
         b.oz_barcode,
         p.oz_sku, 
-        p.oz_vendor_code AS product_oz_vendor_code, 
-        p.oz_product_id AS product_oz_product_id,
+        p.oz_vendor_code, 
+        p.oz_product_id,
         ROW_NUMBER() OVER (PARTITION BY p.oz_vendor_code ORDER BY b.oz_barcode) AS oz_barcode_position
     FROM oz_barcodes b
     LEFT JOIN oz_products p ON b.oz_product_id = p.oz_product_id
@@ -303,18 +292,11 @@ def get_ozon_barcodes_and_identifiers(
         return pd.DataFrame()
         
     try:
-        result_df = con.execute(base_query, params if params else None).fetchdf()
-        
-        # Standardize output column names for clarity
-        output_df = pd.DataFrame()
-        if not result_df.empty:
-            output_df['oz_barcode'] = result_df['oz_barcode']
-            output_df['oz_sku'] = result_df['oz_sku'] 
-            output_df['oz_vendor_code'] = result_df['product_oz_vendor_code'] 
-            output_df['oz_product_id'] = result_df['product_oz_product_id']
-            output_df['oz_barcode_position'] = result_df['oz_barcode_position']
-            return output_df.drop_duplicates()
-        return pd.DataFrame() # Return empty if result_df was empty
+        # Output columns are named in SQL; the columnar result is converted to pandas once
+        result = query_result(con, base_query, params)
+        if not result.empty:
+            return result.to_pandas().drop_duplicates()
+        return pd.DataFrame() # Return empty if result was empty
 
     except Exception as e:
         err_msg = f"Error fetching Ozon barcodes and identifiers: {e}"
@@ -411,9 +393,9 @@ def find_cross_marketplace_matches(
         return pd.DataFrame()
 
     # Register DataFrames with DuckDB
-    if not ozon_barcodes_df.empty: con.register('temp_ozon_barcodes_ids', ozon_barcodes_df)
-    if not wb_normalized_barcodes_df.empty: con.register('temp_wb_norm_barcodes', wb_normalized_barcodes_df)
-    if not input_barcodes_df.empty: con.register('temp_input_barcodes', input_barcodes_df)
+    if not ozon_barcodes_df.empty: register_input(con, 'temp_ozon_barcodes_ids', ozon_barcodes_df)
+    if not wb_normalized_barcodes_df.empty: register_input(con, 'temp_wb_norm_barcodes', wb_normalized_barcodes_df)
+    if not input_barcodes_df.empty: register_input(con, 'temp_input_barcodes', input_barcodes_df)
 
     select_clauses = []
     join_clauses = set()
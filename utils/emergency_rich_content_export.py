@@ -24,7 +24,7 @@ from typing import Optional, List, Dict, Any
 # Добавляем корневую директорию в путь для импорта мод��лей
 sys.path.append(str(Path(__file__).parent.parent))
 
-from utils.db_connection import connect_db
+from utils.db_connection_manager import get_cursor
 
 # Настройка логирования
 logging.basicConfig(
@@ -48,7 +48,7 @@ class EmergencyRichContentExporter:
         Args:
             db_path: Путь к базе данных (если None, используется стандартное подключение)
         """
-        self.db_conn = connect_db(db_path) if db_path else connect_db()
+        self.db_conn = get_cursor(read_only=True, target=db_path)
         if not self.db_conn:
             raise ConnectionError("Не удалось подключиться к базе данных")
         
@@ -586,9 +586,9 @@ class EmergencyRichContentExporter:
             return {}
     
     def close(self):
-        """Закрытие соединения с базой данных"""
+        """Освобождение курсора (общее подключение закрывается менеджером)"""
         if self.db_conn:
-            self.db_conn.close()
+            self.db_conn = None
             logger.info("🔌 Соединение с базой данных закрыто")
 
 
@@ -0,0 +1,189 @@
+"""
+Инкрементальный импорт отчетов: применение только изменений вместо DELETE и полной перезагрузки.
+
+Обычный импорт выполняет pre_update_action (DELETE FROM <table>), заново вставляет
+все строки и пересоздает индексы. Для таблиц с natural_key в HARDCODED_SCHEMA
+подготовленные строки сначала загружаются во временную таблицу (staging), а затем
+сравниваются с текущими строками по естественному ключу:
+- строки, ключа которых нет в отчете, удаляются
+- строки с тем же ключом обновляются, только если отличается hash() неключевых колонок
+- строки с новым ключом вставляются
+
+Все изменения выполняются в одной транзакции; индексы DuckDB поддерживаются
+при DML, поэтому их пересоздание не требуется. Если ключ не уникален (в отчете
+или в таблице), таблица перезагружается из staging целиком.
+Число вставленных, обновленных и удаленных строк записывается в import_history.
+
+Автор: DataFox SL Project
+Версия: 1.0.0
+"""
+
+import logging
+from typing import Dict, List, Optional
+
+import duckdb
+
+from .db_schema import get_table_columns_from_schema, get_table_schema_definition
+
+# Настройка логирования
+logger = logging.getLogger(__name__)
+
+IMPORT_HISTORY_TABLE = "import_history"
+
+
+def _quote_ident(name: str) -> str:
+    return '"' + name.replace('"', '""') + '"'
+
+
+def get_natural_key(table_name: str) -> Optional[List[str]]:
+    """Колонки естественного ключа таблицы из HARDCODED_SCHEMA (None - инкрементальный импорт недоступен)"""
+    schema = get_table_schema_definition(table_name)
+    if not schema or not schema.get("natural_key"):
+        return None
+    return list(schema["natural_key"])
+
+
+def staging_table_name(table_name: str) -> str:
+    return f"_staging_{table_name}"
+
+
+def create_staging_table(conn: duckdb.DuckDBPyConnection, table_name: str) -> str:
+    """
+    Создает пустую временную таблицу со структурой целевой таблицы.
+
+    Returns:
+        Имя временной таблицы
+    """
+    staging = staging_table_name(table_name)
+    conn.execute(
+        f"CREATE OR REPLACE TEMP TABLE {_quote_ident(staging)} AS "
+        f"SELECT * FROM {_quote_ident(table_name)} LIMIT 0"
+    )
+    return staging
+
+
+def drop_staging_table(conn: duckdb.DuckDBPyConnection, table_name: str) -> None:
+    try:
+        conn.execute(f"DROP TABLE IF EXISTS {_quote_ident(staging_table_name(table_name))}")
+    except Exception as e:
+        logger.warning(f"Не удалось удалить временную таблицу импорта {table_name}: {e}")
+
+
+def _has_duplicate_keys(conn: duckdb.DuckDBPyConnection, table: str, key_columns: List[str]) -> bool:
+    keys = ", ".join(_quote_ident(c) for c in key_columns)
+    return conn.execute(
+        f"SELECT 1 FROM {_quote_ident(table)} GROUP BY {keys} HAVING COUNT(*) > 1 LIMIT 1"
+    ).fetchone() is not None
+
+
+def _count(conn: duckdb.DuckDBPyConnection, query: str) -> int:
+    result = conn.execute(query).fetchone()
+    return int(result[0]) if result and result[0] is not None else 0
+
+
+def _record_import(conn: duckdb.DuckDBPyConnection, table_name: str, stats: Dict[str, int], mode: str) -> None:
+    try:
+        conn.execute(f"""
+            CREATE TABLE IF NOT EXISTS {IMPORT_HISTORY_TABLE} (
+                table_name VARCHAR NOT NULL,
+                mode VARCHAR NOT NULL,
+                inserted BIGINT,
+                updated BIGINT,
+                deleted BIGINT,
+                unchanged BIGINT,
+                imported_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        """)
+        conn.execute(f"""
+            INSERT INTO {IMPORT_HISTORY_TABLE} (table_name, mode, inserted, updated, deleted, unchanged)
+            VALUES (?, ?, ?, ?, ?, ?)
+        """, [table_name, mode, stats['inserted'], stats['updated'], stats['deleted'], stats['unchanged']])
+    except Exception as e:
+        logger.warning(f"Не удалось записать историю импорта {table_name}: {e}")
+
+
+def apply_incremental_import(
+    conn: duckdb.DuckDBPyConnection,
+    table_name: str,
+    key_columns: List[str]
+) -> Dict[str, int]:
+    """
+    Применяет содержимое staging-таблицы к целевой таблице по естественному ключу.
+
+    Args:
+        conn: Соединение с базой данных
+        table_name: Целевая таблица (staging заполнена строками отчета)
+        key_columns: Колонки естественного ключа
+
+    Returns:
+        Словарь с числом строк: inserted, updated, deleted, unchanged и признаком full_reload (0/1)
+    """
+    target = _quote_ident(table_name)
+    staging = _quote_ident(staging_table_name(table_name))
+    columns = [target_col for target_col, _, _, _ in get_table_columns_from_schema(table_name)]
+    value_columns = [c for c in columns if c not in key_columns]
+    key_match = " AND ".join(f"t.{_quote_ident(c)} IS NOT DISTINCT FROM s.{_quote_ident(c)}" for c in key_columns)
+    column_list = ", ".join(_quote_ident(c) for c in columns)
+
+    conn.execute("BEGIN TRANSACTION")
+    try:
+        existing_count = _count(conn, f"SELECT COUNT(*) FROM {target}")
+        staged_count = _count(conn, f"SELECT COUNT(*) FROM {staging}")
+
+        if _has_duplicate_keys(conn, staging_table_name(table_name), key_columns) or \
+                _has_duplicate_keys(conn, table_name, key_columns):
+            # Ключ не уникален - сопоставление строк неоднозначно, полная перезагрузка
+            logger.warning(f"Естественный ключ {key_columns} таблицы {table_name} не уникален, полная перезагрузка")
+            conn.execute(f"DELETE FROM {target}")
+            conn.execute(f"INSERT INTO {target} ({column_list}) SELECT {column_list} FROM {staging}")
+            stats = {'inserted': staged_count, 'updated': 0, 'deleted': existing_count, 'unchanged': 0, 'full_reload': 1}
+        else:
+            deleted = _count(conn, f"""
+                DELETE FROM {target} t
+                WHERE NOT EXISTS (SELECT 1 FROM {staging} s WHERE {key_match})
+            """)
+
+            updated = 0
+            if value_columns:
+                t_hash = ", ".join(f"t.{_quote_ident(c)}" for c in value_columns)
+                s_hash = ", ".join(f"s.{_quote_ident(c)}" for c in value_columns)
+                assignments = ", ".join(f"{_quote_ident(c)} = s.{_quote_ident(c)}" for c in value_columns)
+                updated = _count(conn, f"""
+                    UPDATE {target} t SET {assignments}
+                    FROM {staging} s
+                    WHERE {key_match} AND hash({t_hash}) <> hash({s_hash})
+                """)
+
+            inserted = _count(conn, f"""
+                INSERT INTO {target} ({column_list})
+                SELECT {column_list} FROM {staging} s
+                WHERE NOT EXISTS (SELECT 1 FROM {target} t WHERE {key_match})
+            """)
+
+            stats = {
+                'inserted': inserted,
+                'updated': updated,
+                'deleted': deleted,
+                'unchanged': staged_count - inserted - updated,
+                'full_reload': 0,
+            }
+        conn.execute("COMMIT")
+    except Exception:
+        try:
+            conn.execute("ROLLBACK")
+        except Exception:
+            pass
+        raise
+    finally:
+        drop_staging_table(conn, table_name)
+
+    _record_import(conn, table_name, stats, "full" if stats['full_reload'] else "incremental")
+    logger.info(
+        f"Инкрементальный импорт {table_name}: +{stats['inserted']} ~{stats['updated']} "
+        f"-{stats['deleted']} ={stats['unchanged']}"
+    )
+    return stats
+
+
+def has_changes(stats: Dict[str, int]) -> bool:
+    return bool(stats['inserted'] or stats['updated'] or stats['deleted'])
@@ -0,0 +1,327 @@
+"""
+Модуль материализованной таблицы связей WB <-> Ozon.
+
+CrossMarketplaceLinker._normalize_and_merge_barcodes на каждый вызов заново
+объединяет штрихкоды WB и Ozon и вычисляет флаг актуального штрихкода.
+Этот модуль один раз строит таблицу marketplace_links после импорта
+wb_products, oz_barcodes или oz_products. Флаги is_actual_oz_barcode и
+is_primary_barcode вычисляются оконными функциями DuckDB.
+
+Семантика флагов совпадает с _normalize_and_merge_barcodes:
+- is_actual_oz_barcode: штрихкод Ozon с максимальной позицией среди совпавших
+  со штрихкодами WB для данного oz_vendor_code
+- is_primary_barcode: для пары wb_sku + oz_vendor_code - актуальный штрихкод Ozon
+  с минимальной позицией в строке wb_barcodes
+
+В таблице флаги посчитаны по всем связям базы. При чтении с фильтром по SKU
+они пересчитываются по отфильтрованным строкам, как в _normalize_and_merge_barcodes,
+поэтому результаты совпадают с расчетом "на лету".
+
+Автор: DataFox SL Project
+Версия: 1.0.0
+"""
+
+import duckdb
+import pandas as pd
+import logging
+from typing import List, Optional, Tuple
+
+from .wb_barcode_index import wb_barcodes_source
+
+# Настройка логирования
+logger = logging.getLogger(__name__)
+
+MARKETPLACE_LINKS_TABLE = "marketplace_links"
+
+# Таблицы, после импорта которых связи пересобираются
+MARKETPLACE_LINKS_SOURCE_TABLES = ("wb_products", "oz_barcodes", "oz_products")
+
+# Вычисление флагов актуальности по связям из source с условием where_sql.
+# Оконные функции выполняются после WHERE, т.е. только по отобранным строкам.
+_LINK_FLAGS_SQL = """
+    SELECT
+        *,
+        COALESCE(
+            is_actual_oz_barcode AND barcode_position = MIN(
+                CASE WHEN is_actual_oz_barcode THEN barcode_position END
+            ) OVER (PARTITION BY wb_sku, oz_vendor_code),
+            FALSE
+        ) AS is_primary_barcode
+    FROM (
+        SELECT
+            l.wb_sku,
+            l.barcode,
+            l.barcode_position,
+            l.oz_sku,
+            l.oz_vendor_code,
+            l.oz_product_id,
+            l.oz_barcode_position,
+            l.oz_barcode_position = MAX(l.oz_barcode_position) OVER (
+                PARTITION BY l.oz_vendor_code
+            ) AS is_actual_oz_barcode
+        FROM {source} l
+        {where_sql}
+    ) flagged
+"""
+
+_MARKETPLACE_LINKS_SQL = """
+    WITH wb_side AS (
+        SELECT DISTINCT wb_sku, barcode, position AS barcode_position
+        FROM {wb_barcodes}
+    ),
+    oz_positions AS (
+        SELECT DISTINCT
+            TRIM(b.oz_barcode) AS barcode,
+            p.oz_sku,
+            p.oz_vendor_code,
+            p.oz_product_id,
+            ROW_NUMBER() OVER (PARTITION BY p.oz_vendor_code ORDER BY b.oz_barcode) AS oz_barcode_position
+        FROM oz_barcodes b
+        LEFT JOIN oz_products p ON b.oz_product_id = p.oz_product_id
+        WHERE p.oz_vendor_code IS NOT NULL
+    ),
+    oz_side AS (
+        SELECT *
+        FROM oz_positions
+        WHERE NULLIF(barcode, '') IS NOT NULL
+        QUALIFY ROW_NUMBER() OVER (
+            PARTITION BY barcode, oz_sku
+            ORDER BY oz_vendor_code, oz_product_id, oz_barcode_position
+        ) = 1
+    ),
+    linked AS (
+        SELECT
+            w.wb_sku,
+            w.barcode,
+            w.barcode_position,
+            o.oz_sku,
+            o.oz_vendor_code,
+            o.oz_product_id,
+            o.oz_barcode_position
+        FROM wb_side w
+        INNER JOIN oz_side o ON w.barcode = o.barcode
+    )
+    {flags}
+"""
+
+
+def marketplace_links_exists(conn: duckdb.DuckDBPyConnection) -> bool:
+    """
+    Проверяет, построена ли таблица marketplace_links.
+
+    Args:
+        conn: Соединение с базой данных
+
+    Returns:
+        True если таблица существует
+    """
+    try:
+        result = conn.execute("""
+            SELECT COUNT(*)
+            FROM information_schema.tables
+            WHERE table_name = ?
+        """, [MARKETPLACE_LINKS_TABLE]).fetchone()
+        return bool(result and result[0] > 0)
+    except Exception as e:
+        logger.warning(f"Ошибка проверки таблицы {MARKETPLACE_LINKS_TABLE}: {e}")
+        return False
+
+
+def rebuild_marketplace_links(conn: duckdb.DuckDBPyConnection) -> Tuple[bool, int, str]:
+    """
+    Пересоздает таблицу marketplace_links из wb_products, oz_barcodes и oz_products.
+
+    Args:
+        conn: Соединение с базой данных
+
+    Returns:
+        Tuple[success: bool, rows: int, message: str]
+    """
+    if not conn:
+        return False, 0, "Нет соединения с базой данных"
+
+    try:
+        existing = conn.execute("""
+            SELECT COUNT(*)
+            FROM information_schema.tables
+            WHERE table_name IN ('wb_products', 'oz_barcodes', 'oz_products')
+        """).fetchone()[0]
+        if existing < len(MARKETPLACE_LINKS_SOURCE_TABLES):
+            return False, 0, "Не все исходные таблицы для связей WB <-> Ozon существуют"
+
+        build_sql = _MARKETPLACE_LINKS_SQL.format(
+            wb_barcodes=wb_barcodes_source(conn),
+            flags=_LINK_FLAGS_SQL.format(source="linked", where_sql=""),
+        )
+        conn.execute(f"DROP TABLE IF EXISTS {MARKETPLACE_LINKS_TABLE}")
+        conn.execute(f"CREATE TABLE {MARKETPLACE_LINKS_TABLE} AS {build_sql}")
+
+        from .db_indexing import recreate_indexes_after_import
+        recreate_indexes_after_import(conn, MARKETPLACE_LINKS_TABLE, silent=True)
+
+        rows = conn.execute(f"SELECT COUNT(*) FROM {MARKETPLACE_LINKS_TABLE}").fetchone()[0]
+        message = f"✅ Таблица {MARKETPLACE_LINKS_TABLE} обновлена: {rows} связей"
+        logger.info(message)
+        return True, rows, message
+
+    except Exception as e:
+        message = f"❌ Ошибка построения {MARKETPLACE_LINKS_TABLE}: {e}"
+        logger.error(message)
+        return False, 0, message
+
+
+def ensure_marketplace_links(conn: duckdb.DuckDBPyConnection) -> bool:
+    """
+    Строит marketplace_links, если таблица отсутствует.
+    Используется при инициализации схемы БД.
+
+    Args:
+        conn: Соединение с базой данных
+
+    Returns:
+        True если таблица существует или успешно построена
+    """
+    if not conn:
+        return False
+    if marketplace_links_exists(conn):
+        return True
+    success, _, _ = rebuild_marketplace_links(conn)
+    return success
+
+
+def _build_filters(
+    wb_skus: Optional[List[str]],
+    oz_skus: Optional[List[str]],
+    oz_vendor_codes: Optional[List[str]],
+    alias: str = "l"
+) -> Tuple[Optional[str], list]:
+    """
+    Формирует WHERE-условия для выборки из marketplace_links.
+
+    Returns:
+        (where_sql или None если фильтр задан, но пуст после очистки, параметры)
+    """
+    conditions = []
+    params = []
+    for column, values, numeric in (
+        ("wb_sku", wb_skus, True),
+        ("oz_sku", oz_skus, True),
+        ("oz_vendor_code", oz_vendor_codes, False),
+    ):
+        if values is None:
+            continue
+        if numeric:
+            clean = [str(v).strip() for v in values if str(v).strip().isdigit()]
+        else:
+            clean = [str(v) for v in values if str(v).strip()]
+        if not clean:
+            return None, []
+        conditions.append(f"{alias}.{column} IN ({', '.join(['?'] * len(clean))})")
+        params.extend(clean)
+
+    where_sql = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+    return where_sql, params
+
+
+def get_marketplace_links(
+    conn: duckdb.DuckDBPyConnection,
+    wb_skus: Optional[List[str]] = None,
+    oz_skus: Optional[List[str]] = None,
+    oz_vendor_codes: Optional[List[str]] = None
+) -> pd.DataFrame:
+    """
+    Читает связи из marketplace_links в формате _normalize_and_merge_barcodes.
+    Флаги is_actual_oz_barcode и is_primary_barcode считаются по отфильтрованным связям.
+
+    Args:
+        conn: Соединение с базой данных
+        wb_skus: Фильтр по WB SKU
+        oz_skus: Фильтр по Ozon SKU
+        oz_vendor_codes: Фильтр по Ozon vendor codes
+
+    Returns:
+        DataFrame с колонками: wb_sku, barcode, barcode_position, oz_sku, oz_vendor_code,
+        oz_product_id, oz_barcode_position, is_actual_oz_barcode, is_primary_barcode
+        (wb_sku и oz_sku - строки)
+    """
+    where_sql, params = _build_filters(wb_skus, oz_skus, oz_vendor_codes)
+    if where_sql is None:
+        return pd.DataFrame()
+
+    flags_sql = _LINK_FLAGS_SQL.format(source=MARKETPLACE_LINKS_TABLE, where_sql=where_sql)
+    query = f"""
+        SELECT
+            CAST(l.wb_sku AS VARCHAR) AS wb_sku,
+            l.barcode,
+            l.barcode_position,
+            CAST(l.oz_sku AS VARCHAR) AS oz_sku,
+            l.oz_vendor_code,
+            l.oz_product_id,
+            l.oz_barcode_position,
+            l.is_actual_oz_barcode,
+            l.is_primary_barcode
+        FROM ({flags_sql}) l
+        ORDER BY l.wb_sku, l.oz_vendor_code, l.barcode_position
+    """
+    return conn.execute(query, params).fetchdf()
+
+
+def get_bidirectional_links_from_table(
+    conn: duckdb.DuckDBPyConnection,
+    wb_skus: Optional[List[str]] = None,
+    oz_skus: Optional[List[str]] = None,
+    include_product_details: bool = False
+) -> pd.DataFrame:
+    """
+    Возвращает по одной связи на пару wb_sku + oz_sku (предпочтительно по актуальному штрихкоду).
+    Актуальность штрихкода определяется по отфильтрованным связям.
+
+    Args:
+        conn: Соединение с базой данных
+        wb_skus: Фильтр по WB SKU
+        oz_skus: Фильтр по Ozon SKU
+        include_product_details: Добавить oz_brand, oz_product_status, oz_actual_price, oz_fbo_stock
+
+    Returns:
+        DataFrame с колонками: wb_sku, oz_sku, oz_vendor_code, oz_product_id, common_barcode
+        и полями oz_products если include_product_details=True
+    """
+    where_sql, params = _build_filters(wb_skus, oz_skus, None)
+    if where_sql is None:
+        return pd.DataFrame()
+
+    details_select = ""
+    details_join = ""
+    if include_product_details:
+        details_select = """,
+            op.oz_brand,
+            op.oz_product_status,
+            op.oz_actual_price,
+            op.oz_fbo_stock"""
+        # oz_sku в oz_products не уникален только при дублях импорта - берем одну строку
+        details_join = """
+        LEFT JOIN (
+            SELECT * FROM oz_products
+            QUALIFY ROW_NUMBER() OVER (PARTITION BY oz_sku ORDER BY oz_product_id) = 1
+        ) op ON op.oz_sku = links.oz_sku"""
+
+    flags_sql = _LINK_FLAGS_SQL.format(source=MARKETPLACE_LINKS_TABLE, where_sql=where_sql)
+    query = f"""
+        WITH links AS (
+            SELECT l.*
+            FROM ({flags_sql}) l
+            QUALIFY ROW_NUMBER() OVER (
+                PARTITION BY l.wb_sku, l.oz_sku
+                ORDER BY l.is_primary_barcode DESC, l.barcode_position, l.barcode
+            ) = 1
+        )
+        SELECT
+            CAST(links.wb_sku AS VARCHAR) AS wb_sku,
+            CAST(links.oz_sku AS VARCHAR) AS oz_sku,
+            links.oz_vendor_code,
+            links.oz_product_id,
+            links.barcode AS common_barcode{details_select}
+        FROM links{details_join}
+        ORDER BY links.wb_sku, links.oz_sku
+    """
+    return conn.execute(query, params).fetchdf()
@@ -22,6 +22,7 @@ from typing import List, Dict, Set, Tuple, Optional, Any
 from dataclasses import dataclass
 from utils.cross_marketplace_linker import CrossMarketplaceLinker
 from utils.db_search_helpers import get_normalized_wb_barcodes, get_ozon_barcodes_and_identifiers
+from utils.wb_barcode_index import wb_barcodes_source
 import time
 
 
@@ -214,30 +215,21 @@ class OzToWbCollector:
             )
         
         # ОПТИМИЗИРОВАННЫЙ АЛГОРИТМ: Заменяем медленные LIKE операции на быстрый JOIN
-        # 1. Разделяем все WB штрихкоды на отдельные записи
-        # 2. Делаем JOIN с OZ штрихкодами
-        barcode_matching_query = """
+        # 1. Берем WB штрихкоды из материализованной таблицы wb_barcodes_normalized
+        # 2. Делаем JOIN с OZ штрихкодами по индексу barcode
+        wb_barcodes_table = wb_barcodes_source(self.connection)
+        barcode_matching_query = f"""
         WITH oz_barcodes_list AS (
             SELECT DISTINCT actual_barcode
             FROM UNNEST(?) AS t(actual_barcode)
             WHERE actual_barcode IS NOT NULL AND TRIM(actual_barcode) != ''
-        ),
-        wb_barcodes_split AS (
-            SELECT 
-                wb_sku,
-                TRIM(barcode) as individual_barcode
-            FROM wb_products wb,
-            UNNEST(string_split(wb.wb_barcodes, ';')) AS t(barcode)
-            WHERE wb.wb_barcodes IS NOT NULL 
-              AND TRIM(wb.wb_barcodes) != ''
-              AND TRIM(barcode) != ''
         )
         SELECT DISTINCT 
             wbs.wb_sku,
             ozb.actual_barcode as matching_barcode
-        FROM wb_barcodes_split wbs
+        FROM {wb_barcodes_table} wbs
         INNER JOIN oz_barcodes_list ozb 
-            ON wbs.individual_barcode = ozb.actual_barcode
+            ON wbs.barcode = ozb.actual_barcode
         """
         
         # Этап 2: Подготовка поиска совпадений
@@ -259,17 +251,10 @@ class OzToWbCollector:
         
         # Этап 4: Поиск совпадений штрихкодов в WB (оптимизированный алгоритм)
         step4_start = time.time()
-        self._update_progress(4, 8, f"Оптимизированный поиск: разделение {wb_count:,} WB товаров на штрихкоды")
+        self._update_progress(4, 8, f"Оптимизированный поиск: штрихкоды {wb_count:,} WB товаров")
         
         # Сначала получаем количество индивидуальных WB штрихкодов для лучшего понимания сложности
-        wb_individual_count_query = """
-        SELECT COUNT(*) as individual_count
-        FROM wb_products wb,
-        UNNEST(string_split(wb.wb_barcodes, ';')) AS t(barcode)
-        WHERE wb.wb_barcodes IS NOT NULL 
-          AND TRIM(wb.wb_barcodes) != ''
-          AND TRIM(barcode) != ''
-        """
+        wb_individual_count_query = f"SELECT COUNT(*) as individual_count FROM {wb_barcodes_table}"
         wb_individual_count = self.connection.execute(wb_individual_count_query).fetchone()[0]
         debug_info['wb_individual_barcodes_count'] = wb_individual_count
         
@@ -13,14 +13,28 @@
 
 import json
 import logging
+import pandas as pd
 from dataclasses import dataclass, field
 from typing import List, Optional, Dict, Any, Tuple, Callable
 from enum import Enum
 import re
+import threading
 import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+import numpy as np
 
 # Импорт оптимизированного модуля связывания
 from .cross_marketplace_linker import CrossMarketplaceLinker
+from .db_connection_manager import ReadOnlyCursor
+from .vectorized_scoring import (
+    encode_categorical,
+    encode_source_value,
+    match_bonus,
+    match_mask,
+    present_mask,
+    top_k_indices,
+)
+from .wb_candidate_cache import get_data_version
 
 # Настройка логирования
 logger = logging.getLogger(__name__)
@@ -36,6 +50,10 @@ if not logger.handlers:
 # Константы
 RICH_CONTENT_VERSION = 0.3
 OZON_PRODUCT_BASE_URL = "https://www.ozon.ru/product/"
+# Максимум артикулов в кэше oz_sku генератора (при переполнении вытесняются самые старые)
+OZ_SKU_CACHE_MAX_SIZE = 100_000
+# Таблицы, из которых читается oz_sku: их импорт сбрасывает кэш
+OZ_SKU_SOURCE_TABLES = ("oz_products",)
 
 
 class ProcessingStatus(Enum):
@@ -203,6 +221,9 @@ class ScoringConfig:
     min_recommendations: int = 8
     min_score_threshold: float = 50.0
     
+    # Колоночный (векторный) расчет score для списков кандидатов
+    vectorized_scoring: bool = True
+    
     def __post_init__(self):
         """Валидация параметров конфигурации"""
         if self.base_score < 0:
@@ -441,6 +462,87 @@ class ProductDataCollector:
             logger.error(f"❌ Критическая ошибка при получении данных товара {oz_vendor_code}: {e}")
             return None
     
+    def get_full_product_info_bulk(self, oz_vendor_codes: List[str]) -> Dict[str, ProductInfo]:
+        """
+        Пакетное получение полной информации о товарах
+        Один запрос к oz_category_products/oz_products на весь список и одно
+        пакетное обогащение punta данными вместо запросов на каждый товар
+        
+        Args:
+            oz_vendor_codes: Список артикулов Ozon
+            
+        Returns:
+            Словарь {oz_vendor_code: ProductInfo} только для найденных товаров
+        """
+        result = {}
+        missing_codes = []
+        for vendor_code in dict.fromkeys(oz_vendor_codes):
+            if vendor_code in self._cache:
+                result[vendor_code] = self._cache[vendor_code]
+            else:
+                missing_codes.append(vendor_code)
+        
+        if not missing_codes:
+            return result
+        
+        logger.info(f"🗄️ ProductDataCollector: пакетная загрузка {len(missing_codes)} товаров "
+                    f"({len(result)} найдено в кэше)")
+        
+        try:
+            query_start = time.time()
+            placeholders = ', '.join(['?'] * len(missing_codes))
+            query = f"""
+            SELECT 
+                ocp.oz_vendor_code,
+                ocp.product_name,
+                ocp.type,
+                ocp.gender, 
+                ocp.oz_brand,
+                ocp.russian_size,
+                ocp.season,
+                ocp.color,
+                ocp.fastener_type,
+                ocp.main_photo_url,
+                COALESCE(op.oz_fbo_stock, 0) as oz_fbo_stock
+            FROM oz_category_products ocp
+            LEFT JOIN oz_products op ON ocp.oz_vendor_code = op.oz_vendor_code
+            WHERE ocp.oz_vendor_code IN ({placeholders})
+            """
+            rows = self.db_conn.execute(query, missing_codes).fetchall()
+            
+            loaded = {}
+            for row in rows:
+                # Как и fetchone() в get_full_product_info - берем первую строку на артикул
+                if row[0] in loaded:
+                    continue
+                loaded[row[0]] = ProductInfo(
+                    oz_vendor_code=row[0],
+                    product_name=row[1],
+                    type=row[2],
+                    gender=row[3],
+                    oz_brand=row[4],
+                    russian_size=row[5],
+                    season=row[6],
+                    color=row[7],
+                    fastener_type=row[8],
+                    main_photo_url=row[9],
+                    oz_fbo_stock=row[10]
+                )
+            
+            # Punta данные для всех найденных товаров одним обогащением
+            self.enrich_with_punta_data(list(loaded.values()))
+            
+            self._cache.update(loaded)
+            result.update(loaded)
+            
+            logger.info(f"✅ Пакетная загрузка завершена за {time.time() - query_start:.2f}с: "
+                        f"найдено {len(loaded)}/{len(missing_codes)}")
+            
+        except Exception as e:
+            logger.error(f"❌ Ошибка пакетной загрузки товаров: {e}")
+        
+        return result
+    
     def _get_punta_data_for_vendor_code(self, oz_vendor_code: str) -> Optional[Dict[str, Any]]:
         """
         Получение punta данных для конкретного oz_vendor_code через оптимизированный линкер
@@ -693,13 +795,9 @@ class ProductDataCollector:
                     'model_name': row[5]
                 }
             
-            # Создаем маппинг oz_vendor_code -> wb_sku
-            vendor_to_wb = {}
-            for _, row in linked_df.iterrows():
-                vendor_code = row['oz_vendor_code']
-                wb_sku = int(row['wb_sku'])
-                if vendor_code not in vendor_to_wb:
-                    vendor_to_wb[vendor_code] = wb_sku
+            # Создаем маппинг oz_vendor_code -> wb_sku (первая связь для каждого артикула)
+            first_links = linked_df.drop_duplicates(subset='oz_vendor_code', keep='first')
+            vendor_to_wb = dict(zip(first_links['oz_vendor_code'], first_links['wb_sku'].astype(int)))
             
             # Обогащаем товары
             enriched_count = 0
@@ -732,6 +830,150 @@ class ProductDataCollector:
         if hasattr(self.marketplace_linker, 'clear_cache'):
             self.marketplace_linker.clear_cache()
 
+class CandidateMatrix:
+    """
+    Колоночное представление списка кандидатов Ozon для векторного расчета score.
+    
+    Строится один раз на группу кандидатов и переиспользуется для всех исходных
+    товаров группы. Читает веса из переданного ScoringConfig, поэтому работает
+    с любым пресетом и наследниками (OptimizedScoringConfig и др.).
+    Результаты совпадают со скалярными RecommendationEngine.calculate_similarity_score
+    и _calculate_base_similarity_score.
+    """
+    
+    # Характеристики, сравниваемые без учета регистра: (атрибут, поле бонуса в конфиге)
+    BASE_FIELDS = (
+        ('color', 'color_match_bonus'),
+        ('fastener_type', 'fastener_match_bonus'),
+    )
+    PUNTA_FIELDS = (
+        ('material_short', 'material_match_bonus'),
+        ('model_name', 'model_match_bonus'),
+    )
+    
+    # Колодки в порядке приоритета (сравнение с учетом регистра)
+    LAST_FIELDS = (
+        ('mega_last', 'mega_last_bonus'),
+        ('best_last', 'best_last_bonus'),
+        ('new_last', 'new_last_bonus'),
+    )
+    
+    def __init__(self, candidates: List[ProductInfo]):
+        self.candidates = list(candidates)
+        self.size = len(self.candidates)
+        self.vendor_codes = np.asarray([c.oz_vendor_code for c in self.candidates], dtype=object)
+        
+        self.has_size = np.asarray([bool(c.russian_size) for c in self.candidates], dtype=bool)
+        self.season_codes, self._season_map = encode_categorical(c.season for c in self.candidates)
+        self._categorical = {
+            attr: encode_categorical((getattr(c, attr) for c in self.candidates), lowercase=True)
+            for attr, _ in self.BASE_FIELDS + self.PUNTA_FIELDS
+        }
+        self._lasts = {
+            attr: encode_categorical(getattr(c, attr) for c in self.candidates)
+            for attr, _ in self.LAST_FIELDS
+        }
+        self.stock = np.asarray(
+            [np.nan if c.oz_fbo_stock is None else c.oz_fbo_stock for c in self.candidates],
+            dtype=np.float64
+        )
+    
+    def _categorical_bonus(self, source: ProductInfo, attr: str, bonus: float) -> np.ndarray:
+        codes, mapping = self._categorical[attr]
+        source_code = encode_source_value(getattr(source, attr), mapping, lowercase=True)
+        return match_bonus(source_code, codes, bonus)
+    
+    def _size_scores(self, source: ProductInfo, config: ScoringConfig) -> np.ndarray:
+        """Векторный аналог _calculate_size_score"""
+        if not source.russian_size:
+            return np.full(self.size, float(config.size_mismatch_penalty))
+        return np.where(
+            self.has_size, float(config.exact_size_weight), float(config.size_mismatch_penalty)
+        )
+    
+    def _season_scores(self, source: ProductInfo, config: ScoringConfig) -> np.ndarray:
+        """Векторный аналог _calculate_season_score"""
+        source_code = encode_source_value(source.season, self._season_map)
+        present = present_mask(source_code, self.season_codes)
+        matched = match_mask(source_code, self.season_codes)
+        return np.where(
+            matched, float(config.season_match_bonus),
+            np.where(present, float(config.season_mismatch_penalty), 0.0)
+        )
+    
+    def _last_scores(self, source: ProductInfo, config: ScoringConfig) -> np.ndarray:
+        """Векторный аналог _calculate_last_score (приоритет mega > best > new)"""
+        scores = np.zeros(self.size)
+        assigned = np.zeros(self.size, dtype=bool)
+        for attr, bonus_field in self.LAST_FIELDS:
+            codes, mapping = self._lasts[attr]
+            matched = match_mask(encode_source_value(getattr(source, attr), mapping), codes) & ~assigned
+            scores[matched] = float(getattr(config, bonus_field))
+            assigned |= matched
+        return scores
+    
+    def _stock_scores(self, config: ScoringConfig) -> np.ndarray:
+        """Векторный аналог _calculate_stock_score"""
+        return np.where(
+            self.stock > config.stock_threshold_high, float(config.stock_high_bonus),
+            np.where(
+                self.stock > config.stock_threshold_medium, float(config.stock_medium_bonus),
+                np.where(self.stock > 0, float(config.stock_low_bonus), 0.0)
+            )
+        )
+    
+    def score(self, source: ProductInfo, config: ScoringConfig, include_punta: bool = True) -> np.ndarray:
+        """
+        Вычисление score исходного товара против всех кандидатов
+        
+        Порядок сложения и применения штрафа повторяет скалярные методы,
+        поэтому результаты совпадают с ними
+        
+        Args:
+            source: Исходный товар
+            config: Конфигурация оценки
+            include_punta: Учитывать punta данные (материал, колодки, модель).
+                False - аналог _calculate_base_similarity_score
+            
+        Returns:
+            Массив score (float64) в порядке кандидатов
+        """
+        scores = np.full(self.size, float(config.base_score))
+        scores += self._size_scores(source, config)
+        scores += self._season_scores(source, config)
+        scores += self._categorical_bonus(source, 'color', config.color_match_bonus)
+        
+        if include_punta:
+            scores += self._categorical_bonus(source, 'material_short', config.material_match_bonus)
+        scores += self._categorical_bonus(source, 'fastener_type', config.fastener_match_bonus)
+        
+        if include_punta:
+            last_scores = self._last_scores(source, config)
+            scores += last_scores
+            scores += self._categorical_bonus(source, 'model_name', config.model_match_bonus)
+            scores = np.where(last_scores == 0, scores * config.no_last_penalty, scores)
+        
+        scores += self._stock_scores(config)
+        return np.minimum(scores, config.max_score)
+    
+    def top_k(self, scores: np.ndarray, config: ScoringConfig, exclude_vendor_code: Optional[str] = None) -> np.ndarray:
+        """
+        Индексы лучших кандидатов: score >= min_score_threshold, не более max_recommendations
+        
+        Args:
+            scores: Score кандидатов из score()
+            config: Конфигурация оценки
+            exclude_vendor_code: Артикул, исключаемый из выдачи (сам исходный товар)
+            
+        Returns:
+            Индексы кандидатов по убыванию score
+        """
+        mask = scores >= config.min_score_threshold
+        if exclude_vendor_code is not None:
+            mask &= self.vendor_codes != exclude_vendor_code
+        return top_k_indices(scores, config.max_recommendations, mask)
+
+
 class RecommendationEngine:
     """Основной движок рекомендаций товаров"""
     
@@ -784,39 +1026,25 @@ class RecommendationEngine:
             logger.info(f"🧮 Вычисляем базовый score для {len(candidates)} кандидатов")
             step_start = time.time()
             
-            preliminary_recommendations = []
-            
-            for i, candidate in enumerate(candidates):
-                if i % 50 == 0:  # Логируем каждый 50-й кандидат
-                    logger.info(f"⏳ Обработано кандидатов: {i}/{len(candidates)}")
-                
-                # Базовый score без учета punta данных
-                base_score = self._calculate_base_similarity_score(source_product, candidate)
-                
-                # Фильтруем по минимальному порогу
-                if base_score >= self.config.min_score_threshold:
-                    match_details = self.get_match_details(source_product, candidate)
-                    
-                    recommendation = Recommendation(
-                        product_info=candidate,
-                        score=base_score,
-                        match_details=match_details
-                    )
-                    preliminary_recommendations.append(recommendation)
+            # Базовый score без учета punta данных, фильтруем по минимальному порогу
+            base_scores = self.calculate_similarity_scores(source_product, candidates, include_punta=False)
+            preliminary_products = [
+                candidate for candidate, base_score in zip(candidates, base_scores)
+                if base_score >= self.config.min_score_threshold
+            ]
             
             step_time = time.time() - step_start
-            logger.info(f"✅ Базовый scoring завершен за {step_time:.2f}с, прошли фильтр: {len(preliminary_recommendations)}")
+            logger.info(f"✅ Базовый scoring завершен за {step_time:.2f}с, прошли фильтр: {len(preliminary_products)}")
             
-            if not preliminary_recommendations:
+            if not preliminary_products:
                 logger.warning(f"❌ Нет рекомендаций после базовой фильтрации")
                 return []
             
             # Обогащаем ВСЕ кандидаты punta данными для правильного учета колодок и моделей
-            logger.info(f"🔗 Обогащение всех {len(preliminary_recommendations)} кандидатов punta данными")
+            logger.info(f"🔗 Обогащение всех {len(preliminary_products)} кандидатов punta данными")
             step_start = time.time()
             
-            all_products = [r.product_info for r in preliminary_recommendations]
-            enriched_products = self.data_collector.enrich_with_punta_data(all_products)
+            enriched_products = self.data_collector.enrich_with_punta_data(preliminary_products)
             
             step_time = time.time() - step_start
             logger.info(f"✅ Обогащение завершено за {step_time:.2f}с")
@@ -840,29 +1068,11 @@ class RecommendationEngine:
             logger.info(f"🔄 Пересчитываем score с учетом punta данных")
             step_start = time.time()
             
-            final_recommendations = []
-            for enriched_product in enriched_products:
-                # Полный score с учетом punta данных
-                final_score = self.calculate_similarity_score(source_product, enriched_product)
-                
-                # Повторная фильтрация с обновленным score
-                if final_score >= self.config.min_score_threshold:
-                    match_details = self.get_match_details(source_product, enriched_product)
-                    
-                    recommendation = Recommendation(
-                        product_info=enriched_product,
-                        score=final_score,
-                        match_details=match_details
-                    )
-                    final_recommendations.append(recommendation)
+            # Полный score с учетом punta данных, повторная фильтрация и отбор лучших
+            final_recommendations = self.select_recommendations(source_product, enriched_products)
             
             step_time = time.time() - step_start
-            logger.info(f"✅ Финальный scoring завершен за {step_time:.2f}с")
-            
-            # Финальная сортировка и ограничение количества
-            logger.info(f"📊 Финальная сортировка и ограничение до {self.config.max_recommendations} рекомендаций")
-            final_recommendations.sort(key=lambda r: r.score, reverse=True)
-            final_recommendations = final_recommendations[:self.config.max_recommendations]
+            logger.info(f"✅ Финальный scoring и отбор до {self.config.max_recommendations} рекомендаций завершены за {step_time:.2f}с")
             
             logger.info(f"🎉 Найдено {len(final_recommendations)} итоговых рекомендаций для товара {oz_vendor_code}")
             if final_recommendations:
@@ -960,6 +1170,69 @@ class RecommendationEngine:
         # Ограничиваем максимальным значением
         return min(score, self.config.max_score)
     
+    def calculate_similarity_scores(
+        self,
+        source: ProductInfo,
+        candidates,
+        include_punta: bool = True
+    ) -> np.ndarray:
+        """
+        Вычисление score схожести исходного товара со списком кандидатов
+        
+        При config.vectorized_scoring используется колоночный расчет CandidateMatrix,
+        иначе - скалярные методы для каждого кандидата
+        
+        Args:
+            source: Исходный товар
+            candidates: Список ProductInfo или готовая CandidateMatrix
+            include_punta: Полный score (calculate_similarity_score) или базовый
+                (_calculate_base_similarity_score)
+            
+        Returns:
+            Массив score в порядке кандидатов
+        """
+        if self.config.vectorized_scoring:
+            matrix = candidates if isinstance(candidates, CandidateMatrix) else CandidateMatrix(candidates)
+            return matrix.score(source, self.config, include_punta=include_punta)
+        
+        candidate_list = candidates.candidates if isinstance(candidates, CandidateMatrix) else candidates
+        score_func = self.calculate_similarity_score if include_punta else self._calculate_base_similarity_score
+        return np.asarray([score_func(source, c) for c in candidate_list], dtype=np.float64)
+    
+    def select_recommendations(
+        self,
+        source: ProductInfo,
+        candidates,
+        exclude_vendor_code: Optional[str] = None
+    ) -> List[Recommendation]:
+        """
+        Полный scoring кандидатов и отбор лучших рекомендаций
+        
+        Кандидаты ниже min_score_threshold отбрасываются, из оставшихся берутся
+        max_recommendations лучших (numpy.argpartition без полной сортировки).
+        Описание совпадений формируется только для отобранных.
+        
+        Args:
+            source: Исходный товар
+            candidates: Список ProductInfo (обогащенных punta данными) или CandidateMatrix
+            exclude_vendor_code: Артикул, исключаемый из выдачи
+            
+        Returns:
+            Список рекомендаций, отсортированный по убыванию score
+        """
+        matrix = candidates if isinstance(candidates, CandidateMatrix) else CandidateMatrix(candidates)
+        scores = self.calculate_similarity_scores(source, matrix)
+        
+        recommendations = []
+        for index in matrix.top_k(scores, self.config, exclude_vendor_code):
+            candidate = matrix.candidates[index]
+            recommendations.append(Recommendation(
+                product_info=candidate,
+                score=float(scores[index]),
+                match_details=self.get_match_details(source, candidate)
+            ))
+        return recommendations
+    
     def _calculate_size_score(self, source: ProductInfo, candidate: ProductInfo) -> float:
         """
         Вычисление score за размер
@@ -1156,6 +1429,89 @@ class RichContentGenerator:
     def __init__(self, config: ScoringConfig = None, db_conn=None):
         self.config = config or ScoringConfig()
         self.db_conn = db_conn
+        self._oz_sku_cache: Dict[str, Optional[str]] = {}  # oz_vendor_code -> oz_sku (None если не найден)
+        self._oz_sku_cache_version: Optional[int] = None  # версия данных OZ_SKU_SOURCE_TABLES для кэша
+        self._oz_sku_lock = threading.Lock()
+    
+    def refresh_oz_sku_cache(self) -> None:
+        """
+        Сбрасывает кэш oz_sku, если с его заполнения изменилась версия данных oz_products
+        (utils.wb_candidate_cache, увеличивается при каждом импорте).
+        Вызывается в начале каждой пакетной обработки.
+        """
+        if self.db_conn is None:
+            return
+        try:
+            version = get_data_version(self.db_conn, OZ_SKU_SOURCE_TABLES)
+        except Exception as e:
+            logger.warning(f"Не удалось проверить версию данных oz_products, кэш oz_sku сброшен: {e}")
+            version = None
+        with self._oz_sku_lock:
+            if version is None or version != self._oz_sku_cache_version:
+                self._oz_sku_cache.clear()
+            self._oz_sku_cache_version = version
+    
+    def _remember_oz_sku(self, oz_vendor_code: str, oz_sku: Optional[str]) -> None:
+        """Запись в кэш oz_sku с вытеснением самых старых записей сверх OZ_SKU_CACHE_MAX_SIZE"""
+        with self._oz_sku_lock:
+            self._oz_sku_cache.pop(oz_vendor_code, None)
+            while len(self._oz_sku_cache) >= OZ_SKU_CACHE_MAX_SIZE:
+                del self._oz_sku_cache[next(iter(self._oz_sku_cache))]
+            self._oz_sku_cache[oz_vendor_code] = oz_sku
+    
+    def preload_oz_skus(self, oz_vendor_codes: List[str]) -> None:
+        """
+        Пакетная загрузка oz_sku для списка артикулов одним запросом
+        После загрузки генерация JSON для этих товаров не обращается к БД
+        
+        Args:
+            oz_vendor_codes: Список артикулов Ozon
+        """
+        with self._oz_sku_lock:
+            missing_codes = [code for code in dict.fromkeys(oz_vendor_codes) if code not in self._oz_sku_cache]
+        if not missing_codes or self.db_conn is None:
+            return
+        
+        try:
+            placeholders = ', '.join(['?'] * len(missing_codes))
+            rows = self.db_conn.execute(f"""
+            SELECT oz_vendor_code, oz_sku 
+            FROM oz_products 
+            WHERE oz_vendor_code IN ({placeholders}) 
+            AND oz_sku IS NOT NULL
+            """, missing_codes).fetchall()
+            
+            found = {}
+            for vendor_code, oz_sku in rows:
+                if vendor_code not in found and oz_sku:
+                    found[vendor_code] = str(oz_sku)
+            
+            for vendor_code in missing_codes:
+                self._remember_oz_sku(vendor_code, found.get(vendor_code))
+                
+        except Exception as e:
+            logger.warning(f"Ошибка пакетной загрузки oz_sku: {e}")
+    
+    def _resolve_oz_sku(self, oz_vendor_code: str) -> Optional[str]:
+        """Получение oz_sku из кэша, при промахе - точечный запрос с кэшированием результата"""
+        with self._oz_sku_lock:
+            if oz_vendor_code in self._oz_sku_cache:
+                return self._oz_sku_cache[oz_vendor_code]
+        query = """
+        SELECT oz_sku 
+        FROM oz_products 
+        WHERE oz_vendor_code = ? 
+        AND oz_sku IS NOT NULL
+        """
+        result = self.db_conn.execute(query, [oz_vendor_code]).fetchone() if self.db_conn is not None else None
+        oz_sku = str(result[0]) if result and result[0] else None
+        self._remember_oz_sku(oz_vendor_code, oz_sku)
+        return oz_sku
+    
+    def clear_cache(self):
+        """Очистка кэша oz_sku"""
+        with self._oz_sku_lock:
+            self._oz_sku_cache.clear()
     
     def generate_rich_content_json(
         self, 
@@ -1179,6 +1535,9 @@ class RichContentGenerator:
                 logger.warning("Пустой список рекомендаций для генерации Rich Content")
                 return self._create_empty_content()
             
+            # oz_sku для всех блоков одним запросом (уже загруженные берутся из кэша)
+            self.preload_oz_skus([rec.product_info.oz_vendor_code for rec in recommendations])
+            
             # Выбираем метод генерации в зависимости от типа шаблона
             if template_type == "recommendations_carousel":
                 content_data = self._create_recommendations_carousel(recommendations)
@@ -1548,18 +1907,10 @@ class RichContentGenerator:
     def _get_ozon_product_url(self, oz_vendor_code: str) -> str:
         """Получение реальной ссылки на товар в Ozon"""
         try:
-            # Получаем oz_sku из таблицы oz_products
-            query = """
-            SELECT oz_sku 
-            FROM oz_products 
-            WHERE oz_vendor_code = ? 
-            AND oz_sku IS NOT NULL
-            """
+            oz_sku = self._resolve_oz_sku(oz_vendor_code)
             
-            result = self.db_conn.execute(query, [oz_vendor_code]).fetchone() if hasattr(self, 'db_conn') else None
-            
-            if result and result[0]:
-                return f"https://www.ozon.ru/product/{result[0]}"
+            if oz_sku:
+                return f"https://www.ozon.ru/product/{oz_sku}"
             else:
                 # Fallback на базовую структуру с oz_vendor_code
                 return f"https://www.ozon.ru/brand/shuzzi-149479977/"
@@ -1571,17 +1922,10 @@ class RichContentGenerator:
     def _get_ozon_sku(self, oz_vendor_code: str) -> str:
         """Получение oz_sku для товара"""
         try:
-            query = """
-            SELECT oz_sku 
-            FROM oz_products 
-            WHERE oz_vendor_code = ? 
-            AND oz_sku IS NOT NULL
-            """
-            
-            result = self.db_conn.execute(query, [oz_vendor_code]).fetchone() if hasattr(self, 'db_conn') else None
+            oz_sku = self._resolve_oz_sku(oz_vendor_code)
             
-            if result and result[0]:
-                return str(result[0])
+            if oz_sku:
+                return oz_sku
             else:
                 return oz_vendor_code  # Fallback на vendor_code
                 
@@ -1797,7 +2141,9 @@ class RichContentProcessor:
         self, 
         oz_vendor_codes: List[str], 
         progress_callback: Callable[[int, int, str], None] = None,
-        batch_size: int = 50
+        batch_size: int = 50,
+        max_workers: int = 1,
+        chunk_timeout: Optional[float] = None
     ) -> BatchResult:
         """
         Оптимизированная пакетная обработка списка товаров с batch-обогащением punta данными
@@ -1806,6 +2152,9 @@ class RichContentProcessor:
             oz_vendor_codes: Список артикулов для обработки
             progress_callback: Callback функция для отслеживания прогресса
             batch_size: Размер батча для обработки (по умолчанию 50)
+            max_workers: Количество батчей, обрабатываемых одновременно (1 - последовательно)
+            chunk_timeout: Максимальное время обработки одного батча в секундах
+                (только при max_workers > 1)
             
         Returns:
             Результат пакетной обработки
@@ -1815,15 +2164,21 @@ class RichContentProcessor:
         
         logger.info(f"🚀 Начинаем ОПТИМИЗИРОВАННУЮ пакетную обработку {total_items} товаров (batch_size={batch_size})")
         start_time = time.time()
+        self.content_generator.refresh_oz_sku_cache()
         
-        # Обрабатываем товары батчами
-        for batch_start in range(0, total_items, batch_size):
-            batch_end = min(batch_start + batch_size, total_items)
-            batch_codes = oz_vendor_codes[batch_start:batch_end]
-            
-            logger.info(f"📦 Обработка батча {batch_start//batch_size + 1}: товары {batch_start+1}-{batch_end}")
-            batch_results = self._process_batch_chunk(batch_codes, progress_callback, batch_start, total_items)
-            results.extend(batch_results)
+        if max_workers > 1:
+            results = self._process_chunks_parallel(
+                oz_vendor_codes, progress_callback, batch_size, max_workers, chunk_timeout
+            )
+        else:
+            # Обрабатываем товары батчами
+            for batch_start in range(0, total_items, batch_size):
+                batch_end = min(batch_start + batch_size, total_items)
+                batch_codes = oz_vendor_codes[batch_start:batch_end]
+                
+                logger.info(f"📦 Обработка батча {batch_start//batch_size + 1}: товары {batch_start+1}-{batch_end}")
+                batch_results = self._process_batch_chunk(batch_codes, progress_callback, batch_start, total_items)
+                results.extend(batch_results)
         
         total_time = time.time() - start_time
         logger.info(f"✅ ОПТИМИЗИРОВАННАЯ пакетная обработка завершена за {total_time:.1f}с")
@@ -1840,12 +2195,137 @@ class RichContentProcessor:
         logger.info(f"📊 Статистика: {batch_result.stats}")
         return batch_result
     
+    def _process_chunks_parallel(
+        self,
+        oz_vendor_codes: List[str],
+        progress_callback: Callable[[int, int, str], None],
+        batch_size: int,
+        max_workers: int,
+        chunk_timeout: Optional[float]
+    ) -> List[ProcessingResult]:
+        """
+        Параллельная обработка батчей в пуле потоков
+        
+        Каждый батч обрабатывается отдельным RichContentProcessor на собственном курсоре
+        только для чтения (запросы DuckDB выполняются параллельно). Прогресс сообщается
+        из вызывающего потока по мере завершения батчей, результаты собираются в исходном
+        порядке батчей. Лимит chunk_timeout проверяется для всех выполняющихся батчей:
+        батч, не уложившийся в него, прерывается (interrupt текущего запроса и флаг отмены,
+        который цикл батча проверяет между товарами), его товары получают статус ERROR.
+        
+        Returns:
+            Список результатов в порядке oz_vendor_codes
+        """
+        total_items = len(oz_vendor_codes)
+        chunks = [
+            (batch_start, oz_vendor_codes[batch_start:batch_start + batch_size])
+            for batch_start in range(0, total_items, batch_size)
+        ]
+        logger.info(f"🧵 Параллельная обработка {len(chunks)} батчей, потоков: {max_workers}")
+        
+        started_at: Dict[int, float] = {}
+        cursors: Dict[int, Any] = {}
+        cancel_events = [threading.Event() for _ in chunks]
+        
+        def run_chunk(index: int, batch_start: int, batch_codes: List[str]) -> List[ProcessingResult]:
+            cursor = self.db_conn.cursor()
+            if not isinstance(cursor, ReadOnlyCursor):
+                cursor = ReadOnlyCursor(cursor)
+            cursors[index] = cursor
+            started_at[index] = time.monotonic()
+            try:
+                worker = RichContentProcessor(cursor, self.config)
+                # Прогресс из рабочих потоков не передается (Streamlit требует основной поток)
+                return worker._process_batch_chunk(
+                    batch_codes, None, batch_start, total_items, cancel_event=cancel_events[index]
+                )
+            finally:
+                cursor.close()
+        
+        def cancel_chunk(index: int) -> None:
+            cancel_events[index].set()
+            cursor = cursors.get(index)
+            if cursor is not None:
+                try:
+                    cursor.interrupt()
+                except Exception:
+                    pass
+        
+        chunk_results: Dict[int, List[ProcessingResult]] = {}
+        processed_items = 0
+        executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="rich-content")
+        try:
+            pending = {
+                executor.submit(run_chunk, index, batch_start, batch_codes): index
+                for index, (batch_start, batch_codes) in enumerate(chunks)
+            }
+            
+            while pending:
+                done, _ = wait(pending, timeout=0.5, return_when=FIRST_COMPLETED)
+                finished = []
+                for future in done:
+                    index = pending[future]
+                    try:
+                        chunk_results[index] = future.result()
+                    except Exception as e:
+                        logger.error(f"❌ Ошибка обработки батча {index + 1}: {e}")
+                        chunk_results[index] = self._chunk_error_results(chunks[index][1], str(e))
+                    finished.append(future)
+                
+                if chunk_timeout is not None:
+                    now = time.monotonic()
+                    for future, index in pending.items():
+                        started = started_at.get(index)
+                        if future in done or started is None or now - started <= chunk_timeout:
+                            continue
+                        logger.error(f"⏱️ Батч {index + 1} превысил лимит {chunk_timeout}с и прерван")
+                        cancel_chunk(index)
+                        chunk_results[index] = self._chunk_error_results(
+                            chunks[index][1], f"Превышено время обработки батча ({chunk_timeout}с)"
+                        )
+                        finished.append(future)
+                
+                for future in finished:
+                    index = pending.pop(future)
+                    processed_items += len(chunks[index][1])
+                    if progress_callback:
+                        progress_callback(
+                            processed_items, total_items,
+                            f"Обработано батчей: {len(chunk_results)}/{len(chunks)}"
+                        )
+        finally:
+            # Незавершенные батчи (при исключении в вызывающем потоке) останавливаются
+            # по флагу отмены; ожидание занимает не дольше обработки одного товара
+            for index in range(len(chunks)):
+                if index not in chunk_results:
+                    cancel_chunk(index)
+            executor.shutdown(wait=True, cancel_futures=True)
+        
+        results = []
+        for index in range(len(chunks)):
+            results.extend(chunk_results[index])
+        return results
+    
+    def _chunk_error_results(self, oz_vendor_codes: List[str], error_message: str) -> List[ProcessingResult]:
+        """Результаты с ошибкой для всех товаров батча"""
+        return [
+            ProcessingResult(
+                oz_vendor_code=vendor_code,
+                status=ProcessingStatus.ERROR,
+                recommendations=[],
+                error_message=error_message,
+                processing_time=0.0
+            )
+            for vendor_code in oz_vendor_codes
+        ]
+    
     def _process_batch_chunk(
         self, 
         oz_vendor_codes: List[str], 
         progress_callback: Callable[[int, int, str], None] = None,
         offset: int = 0, 
-        total_items: int = 0
+        total_items: int = 0,
+        cancel_event: Optional[threading.Event] = None
     ) -> List[ProcessingResult]:
         """
         Обработка одного батча товаров с оптимизациями
@@ -1855,6 +2335,8 @@ class RichContentProcessor:
             progress_callback: Callback функция для отслеживания прогресса  
             offset: Смещение для правильного отображения прогресса
             total_items: Общее количество товаров
+            cancel_event: Флаг отмены, проверяется между группами и товарами;
+                после отмены возвращаются только уже готовые результаты
             
         Returns:
             Список результатов обработки батча
@@ -1866,12 +2348,14 @@ class RichContentProcessor:
         logger.info(f"📋 Получение информации о {batch_size} товарах...")
         step_start = time.time()
         
+        if progress_callback:
+            progress_callback(offset + batch_size, total_items, f"Загружаем {batch_size} товаров")
+        
+        # Один пакетный запрос на весь батч вместо запроса на каждый товар
+        loaded_products = self.recommendation_engine.data_collector.get_full_product_info_bulk(oz_vendor_codes)
         source_products = {}
-        for i, vendor_code in enumerate(oz_vendor_codes):
-            if progress_callback:
-                progress_callback(offset + i + 1, total_items, f"Загружаем {vendor_code}")
-            
-            product_info = self.recommendation_engine.data_collector.get_full_product_info(vendor_code)
+        for vendor_code in oz_vendor_codes:
+            product_info = loaded_products.get(vendor_code)
             if product_info:
                 source_products[vendor_code] = product_info
             else:
@@ -1896,6 +2380,9 @@ class RichContentProcessor:
         processed_count = 0
         
         for group_key, group_products in groups.items():
+            if cancel_event is not None and cancel_event.is_set():
+                logger.warning(f"⏹️ Обработка батча отменена, готово {len(batch_results)}/{batch_size}")
+                break
             type_name, gender, brand = group_key
             logger.info(f"🔍 Обработка группы: {type_name}/{gender}/{brand} ({len(group_products)} товаров)")
             
@@ -1909,18 +2396,26 @@ class RichContentProcessor:
                 if candidates:
                     logger.info(f"🔗 Пакетное обогащение {len(candidates)} кандидатов punta данными")
                     enriched_candidates = self.recommendation_engine.data_collector.enrich_with_punta_data(candidates)
+                    # oz_sku всех кандидатов группы - для генерации JSON без запросов к БД
+                    self.content_generator.preload_oz_skus([c.oz_vendor_code for c in enriched_candidates])
                 else:
                     enriched_candidates = []
+                # Колоночное представление кандидатов - одно на группу
+                group_matrix = CandidateMatrix(enriched_candidates)
                 
                 # Обрабатываем каждый товар группы
                 for vendor_code, source_product in group_products:
+                    if cancel_event is not None and cancel_event.is_set():
+                        break
                     try:
                         processed_count += 1
                         if progress_callback:
                             progress_callback(offset + processed_count, total_items, f"Обрабатываем {vendor_code}")
                         
                         # Ищем рекомендации среди уже обогащенных кандидатов
-                        recommendations = self._find_recommendations_from_candidates(source_product, enriched_candidates)
+                        recommendations = self._find_recommendations_from_candidates(
+                            source_product, enriched_candidates, group_matrix
+                        )
                         
                         if len(recommendations) < self.config.min_recommendations:
                             result = ProcessingResult(
@@ -1962,74 +2457,30 @@ class RichContentProcessor:
         
         return batch_results
     
-    def _find_recommendations_from_candidates(self, source_product: ProductInfo, candidates: List[ProductInfo]) -> List[Recommendation]:
+    def _find_recommendations_from_candidates(
+        self,
+        source_product: ProductInfo,
+        candidates: List[ProductInfo],
+        candidate_matrix: Optional[CandidateMatrix] = None
+    ) -> List[Recommendation]:
         """
         Поиск рекомендаций из уже обогащенного списка кандидатов
         
         Args:
             source_product: Исходный товар
             candidates: Список уже обогащенных кандидатов
+            candidate_matrix: Колоночное представление candidates, общее для группы
             
         Returns:
             Список рекомендаций
         """
-        recommendations = []
-        
-        for candidate in candidates:
-            # Исключаем сам товар
-            if candidate.oz_vendor_code == source_product.oz_vendor_code:
-                continue
-                
-            # Вычисляем полный score
-            score = self.recommendation_engine.calculate_similarity_score(source_product, candidate)
-            
-            # Фильтруем по минимальному порогу
-            if score >= self.config.min_score_threshold:
-                match_details = self.recommendation_engine.get_match_details(source_product, candidate)
-                
-                recommendation = Recommendation(
-                    product_info=candidate,
-                    score=score,
-                    match_details=match_details
-                )
-                recommendations.append(recommendation)
-        
-        # Сортируем по score и ограничиваем количество
-        recommendations.sort(key=lambda r: r.score, reverse=True)
-        return recommendations[:self.config.max_recommendations]
+        # Исключаем сам товар
+        return self.recommendation_engine.select_recommendations(
+            source_product,
+            candidate_matrix if candidate_matrix is not None else candidates,
+            exclude_vendor_code=source_product.oz_vendor_code
+        )
     
-    def save_rich_content_to_database(self, result: ProcessingResult) -> bool:
-        """
-        Сохранение Rich Content JSON в базу данных
-        
-        Args:
-            result: Результат обработки товара
-            
-        Returns:
-            True если сохранение успешно, False в случае ошибки
-        """
-        if not result.success or not result.rich_content_json:
-            logger.warning(f"Попытка сохранить неуспешный результат или пустой JSON для {result.oz_vendor_code}")
-            return False
-        
-        try:
-            # Обновляем поле rich_content_json в таблице oz_category_products
-            update_query = """
-            UPDATE oz_category_products 
-            SET rich_content_json = ?
-            WHERE oz_vendor_code = ?
-            """
-            
-            self.db_conn.execute(update_query, [result.rich_content_json, result.oz_vendor_code])
-            self.db_conn.commit()
-            
-            logger.info(f"✅ Rich Content JSON сохранен в БД для товара {result.oz_vendor_code}")
-            return True
-            
-        except Exception as e:
-            logger.error(f"❌ Ошибка сохранения Rich Content JSON для {result.oz_vendor_code}: {e}")
-            return False
-
     def process_batch(
         self, 
         oz_vendor_codes: List[str], 
@@ -2049,6 +2500,7 @@ class RichContentProcessor:
         total_items = len(oz_vendor_codes)
         
         logger.info(f"Начинаем пакетную обработку {total_items} товаров")
+        self.content_generator.refresh_oz_sku_cache()
         
         for i, vendor_code in enumerate(oz_vendor_codes):
             try:
@@ -2093,7 +2545,8 @@ class RichContentProcessor:
     
     def save_rich_content_to_database(self, processing_result: ProcessingResult) -> bool:
         """
-        Сохранение сгенерированного Rich Content в базу данных
+        Сохранение сгенерированного Rich Content одного товара в базу данных
+        (через save_rich_content_batch; для списка результатов вызывайте его напрямую)
         
         Args:
             processing_result: Результат обработки товара
@@ -2101,29 +2554,115 @@ class RichContentProcessor:
         Returns:
             True если сохранение успешно
         """
-        try:
-            if not processing_result.success:
-                logger.warning(f"Попытка сохранить неуспешный результат для {processing_result.oz_vendor_code}")
-                return False
-            
-            # Обновляем поле rich_content_json в таблице oz_category_products
-            update_query = """
-                UPDATE oz_category_products 
-                SET rich_content_json = ? 
-                WHERE oz_vendor_code = ?
-            """
+        if not processing_result.success or not processing_result.rich_content_json:
+            logger.warning(f"Попытка сохранить неуспешный результат или пустой JSON для {processing_result.oz_vendor_code}")
+            return False
+        
+        stats = self.save_rich_content_batch([processing_result])
+        if stats['success']:
+            logger.info(f"Rich Content сохранен для товара {processing_result.oz_vendor_code}")
+        return stats['success']
+    
+    def save_rich_content_batch(
+        self, 
+        results: List[ProcessingResult], 
+        chunk_size: int = 5000
+    ) -> Dict[str, Any]:
+        """
+        Пакетное сохранение Rich Content JSON в базу данных
+        Результаты загружаются во временную таблицу и применяются одним
+        UPDATE ... FROM на чанк внутри одной транзакции
+        
+        Args:
+            results: Результаты обработки товаров (неуспешные и пустые пропускаются)
+            chunk_size: Размер чанка для загрузки во временную таблицу
             
-            self.db_conn.execute(update_query, [
-                processing_result.rich_content_json,
-                processing_result.oz_vendor_code
-            ])
+        Returns:
+            Словарь со статистикой: success, total_results, staged, skipped,
+            updated_rows, chunks, stage_time, update_time, total_time, error
+        """
+        start_time = time.time()
+        
+        # При повторе артикула сохраняется последний результат, как при поштучных UPDATE
+        staged = {}
+        for result in results:
+            if result.success and result.rich_content_json:
+                staged[result.oz_vendor_code] = result.rich_content_json
+        
+        stats = {
+            'success': True,
+            'total_results': len(results),
+            'staged': len(staged),
+            'skipped': len(results) - len(staged),
+            'updated_rows': 0,
+            'chunks': 0,
+            'stage_time': 0.0,
+            'update_time': 0.0,
+            'total_time': 0.0,
+            'error': None
+        }
+        
+        if not staged:
+            logger.warning("Нет успешных результатов для сохранения Rich Content")
+            return stats
+        
+        staging_table = "rich_content_staging"
+        items = list(staged.items())
+        
+        try:
+            self.db_conn.execute("BEGIN TRANSACTION")
+            self.db_conn.execute(f"""
+                CREATE OR REPLACE TEMP TABLE {staging_table} (
+                    oz_vendor_code VARCHAR, 
+                    rich_content_json VARCHAR
+                )
+            """)
             
-            logger.info(f"Rich Content сохранен для товара {processing_result.oz_vendor_code}")
-            return True
+            for chunk_start in range(0, len(items), chunk_size):
+                chunk_df = pd.DataFrame(
+                    items[chunk_start:chunk_start + chunk_size],
+                    columns=['oz_vendor_code', 'rich_content_json']
+                )
+                
+                step_start = time.time()
+                self.db_conn.execute(f"DELETE FROM {staging_table}")
+                self.db_conn.register('rich_content_chunk_df', chunk_df)
+                try:
+                    self.db_conn.execute(f"INSERT INTO {staging_table} SELECT * FROM rich_content_chunk_df")
+                finally:
+                    self.db_conn.unregister('rich_content_chunk_df')
+                stats['stage_time'] += time.time() - step_start
+                
+                step_start = time.time()
+                updated = self.db_conn.execute(f"""
+                    UPDATE oz_category_products 
+                    SET rich_content_json = s.rich_content_json
+                    FROM {staging_table} s
+                    WHERE oz_category_products.oz_vendor_code = s.oz_vendor_code
+                """).fetchone()
+                stats['update_time'] += time.time() - step_start
+                stats['updated_rows'] += updated[0] if updated else 0
+                stats['chunks'] += 1
+            
+            self.db_conn.execute(f"DROP TABLE IF EXISTS {staging_table}")
+            self.db_conn.execute("COMMIT")
             
         except Exception as e:
-            logger.error(f"Ошибка сохранения Rich Content для {processing_result.oz_vendor_code}: {e}")
-            return False
+            try:
+                self.db_conn.execute("ROLLBACK")
+            except Exception:
+                pass
+            stats['success'] = False
+            stats['updated_rows'] = 0
+            stats['error'] = str(e)
+            logger.error(f"❌ Ошибка пакетного сохранения Rich Content: {e}")
+        
+        stats['total_time'] = time.time() - start_time
+        if stats['success']:
+            logger.info(f"✅ Rich Content сохранен пакетно: {stats['staged']} товаров, "
+                        f"обновлено строк {stats['updated_rows']}, чанков {stats['chunks']}, "
+                        f"за {stats['total_time']:.2f}с")
+        return stats
     
     def get_processing_statistics(self) -> Dict[str, Any]:
         """Получение статистики обработки из базы данных"""
@@ -0,0 +1,546 @@
+"""
+Потоковое чтение отчетов маркетплейсов пакетами строк.
+
+Страница импорта раньше читала каждый файл целиком в DataFrame и объединяла
+файлы папки через pd.concat - пиковая память росла вместе с размером папки.
+Функции модуля возвращают генераторы DataFrame ограниченного размера:
+- CSV: pandas.read_csv(chunksize=...)
+- XLSX: openpyxl в режиме read_only (лист читается потоково, без загрузки в память)
+
+Файлы папки (folder_xlsx) могут разбираться параллельно в пуле процессов
+(iter_folder_xlsx_batches_parallel): разбор XLSX в openpyxl ограничен GIL.
+Воркер сбрасывает пакеты файла во временные pickle-файлы, а основной процесс
+читает их по одному - в памяти каждого процесса находится не больше одного пакета.
+
+Пакеты передаются в db_crud.import_data_from_batches, который применяет к каждому
+пакету преобразования HARDCODED_SCHEMA и сразу дописывает его в таблицу.
+
+Нечитаемый файл (ошибка до первого пакета) передается в on_error и пропускается.
+Ошибка в файле, часть пакетов которого уже отдана, пропуском не исправить - такие
+ошибки пробрасываются как PartialFileReadError.
+
+Параметры чтения совпадают с read_params из HARDCODED_SCHEMA (sheet_name, header,
+skip_rows_after_header, dtype, delimiter). Для XLSX с поврежденной разметкой
+(ошибки stylesheet/XML) используется read_excel_with_fallback: такой файл читается
+целиком, но отдается теми же пакетами.
+
+Автор: DataFox SL Project
+Версия: 1.1.0
+"""
+
+import logging
+import multiprocessing
+import os
+import shutil
+import tempfile
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence
+
+import pandas as pd
+
+from .excel_utils import read_excel_with_fallback
+
+# Настройка логирования
+logger = logging.getLogger(__name__)
+
+# Размер пакета строк по умолчанию
+DEFAULT_BATCH_ROWS = 50_000
+
+# Сколько первых строк листа просматривается при поиске строки заголовков
+HEADER_SEARCH_ROWS = 20
+
+
+class PartialFileReadError(RuntimeError):
+    """Ошибка чтения файла, часть пакетов которого уже отдана"""
+
+
+def _iter_file_batches(
+    file_name: str,
+    batches: Iterator[pd.DataFrame],
+    on_error: Optional[Callable[[str, Exception], None]]
+) -> Iterator[pd.DataFrame]:
+    """
+    Пакеты одного файла: ошибка до первого пакета передается в on_error (файл пропускается),
+    ошибка после него - PartialFileReadError независимо от on_error.
+    """
+    started = False
+    try:
+        for batch in batches:
+            started = True
+            yield batch
+    except Exception as e:
+        if started:
+            raise PartialFileReadError(f"Файл '{file_name}' прочитан частично: {e}") from e
+        if on_error is None:
+            raise
+        on_error(file_name, e)
+
+
+def _normalize_header(value: Any) -> str:
+    return str(value).strip() if value is not None else ""
+
+
+def _make_columns(header_row: Sequence[Any]) -> List[str]:
+    """Имена колонок как у pandas.read_excel: пустые -> 'Unnamed: i', повторы -> 'name.1'"""
+    columns = []
+    seen: Dict[str, int] = {}
+    for i, value in enumerate(header_row):
+        name = _normalize_header(value) or f"Unnamed: {i}"
+        if name in seen:
+            seen[name] += 1
+            name = f"{name}.{seen[name]}"
+        else:
+            seen[name] = 0
+        columns.append(name)
+    return columns
+
+
+def _convert_cell(value: Any) -> Any:
+    """Значение ячейки как у pandas (openpyxl): целые float -> int, пустые строки -> None"""
+    if isinstance(value, float) and value.is_integer():
+        return int(value)
+    if isinstance(value, str) and value == "":
+        return None
+    return value
+
+
+def _apply_dtype(df: pd.DataFrame, dtype: Optional[Dict[str, Any]]) -> pd.DataFrame:
+    """Приведение колонок с dtype 'str' к строкам (NULL остаются NULL)"""
+    if not dtype:
+        return df
+    for column, column_type in dtype.items():
+        if column in df.columns and column_type in ('str', str, 'string', 'object'):
+            series = df[column]
+            df[column] = series.where(series.isna(), series.astype(str))
+    return df
+
+
+def _find_header_index(
+    rows: List[Sequence[Any]],
+    header: int,
+    expected_columns: Optional[List[str]]
+) -> int:
+    """
+    Индекс строки заголовков среди первых строк листа.
+
+    Если строка header не содержит всех expected_columns - ищется первая строка,
+    которая их содержит (как в read_excel_with_fallback).
+    """
+    if not expected_columns:
+        return header
+    expected = {_normalize_header(c) for c in expected_columns}
+    if header < len(rows) and expected.issubset({_normalize_header(v) for v in rows[header]}):
+        return header
+    for i, row in enumerate(rows):
+        if expected.issubset({_normalize_header(v) for v in row}):
+            return i
+    return header
+
+
+def iter_csv_batches(
+    source: Any,
+    read_params: Optional[Dict[str, Any]] = None,
+    batch_rows: int = DEFAULT_BATCH_ROWS
+) -> Iterator[pd.DataFrame]:
+    """
+    Читает CSV пакетами.
+
+    Args:
+        source: Путь к файлу или файловый объект
+        read_params: Параметры pandas.read_csv (delimiter, header, dtype ...)
+        batch_rows: Размер пакета строк
+
+    Yields:
+        DataFrame с исходными именами колонок
+    """
+    params = dict(read_params or {})
+    params.pop('skip_rows_after_header', None)
+    with pd.read_csv(source, chunksize=batch_rows, **params) as reader:
+        for chunk in reader:
+            yield chunk.reset_index(drop=True)
+
+
+def iter_xlsx_batches(
+    source: Any,
+    read_params: Optional[Dict[str, Any]] = None,
+    expected_columns: Optional[List[str]] = None,
+    batch_rows: int = DEFAULT_BATCH_ROWS
+) -> Iterator[pd.DataFrame]:
+    """
+    Читает лист XLSX пакетами через openpyxl в режиме read_only.
+
+    Args:
+        source: Путь к файлу или файловый объект
+        read_params: sheet_name, header (индекс строки заголовков), skip_rows_after_header, dtype
+        expected_columns: Исходные колонки схемы для поиска строки заголовков
+        batch_rows: Размер пакета строк
+
+    Yields:
+        DataFrame с исходными именами колонок (пустые строки листа пропускаются)
+    """
+    params = dict(read_params or {})
+    sheet_name = params.get('sheet_name', 0)
+    header = params.get('header', 0) or 0
+    skip_rows_after_header = params.get('skip_rows_after_header', 0) or 0
+    dtype = params.get('dtype')
+
+    try:
+        from openpyxl import load_workbook
+        workbook = load_workbook(source, read_only=True, data_only=True)
+    except Exception as e:
+        logger.warning(f"Потоковое чтение XLSX недоступно ({e}), чтение файла целиком")
+        yield from _iter_xlsx_fallback(source, params, expected_columns, batch_rows)
+        return
+
+    try:
+        if isinstance(sheet_name, str):
+            worksheet = workbook[sheet_name]
+        else:
+            worksheet = workbook.worksheets[sheet_name or 0]
+        rows = worksheet.iter_rows(values_only=True)
+
+        # Первые строки буферизуются для поиска заголовков
+        head_rows = []
+        for row in rows:
+            head_rows.append(row)
+            if len(head_rows) >= max(header + 1, HEADER_SEARCH_ROWS):
+                break
+        header_index = _find_header_index(head_rows, header, expected_columns)
+        if header_index >= len(head_rows):
+            return
+
+        columns = _make_columns(head_rows[header_index])
+        width = len(columns)
+        to_skip = skip_rows_after_header
+
+        def data_rows():
+            yield from head_rows[header_index + 1:]
+            yield from rows
+
+        batch = []
+        for row in data_rows():
+            if to_skip > 0:
+                to_skip -= 1
+                continue
+            values = [_convert_cell(v) for v in row[:width]]
+            if all(v is None for v in values):
+                continue
+            if len(values) < width:
+                values.extend([None] * (width - len(values)))
+            batch.append(values)
+            if len(batch) >= batch_rows:
+                yield _apply_dtype(pd.DataFrame(batch, columns=columns), dtype)
+                batch = []
+        if batch:
+            yield _apply_dtype(pd.DataFrame(batch, columns=columns), dtype)
+    finally:
+        workbook.close()
+
+
+def _iter_xlsx_fallback(
+    source: Any,
+    params: Dict[str, Any],
+    expected_columns: Optional[List[str]],
+    batch_rows: int
+) -> Iterator[pd.DataFrame]:
+    """Чтение файла целиком через read_excel_with_fallback и выдача теми же пакетами"""
+    skip_rows_after_header = params.pop('skip_rows_after_header', 0) or 0
+    if hasattr(source, 'seek'):
+        source.seek(0)
+    df = read_excel_with_fallback(
+        source,
+        expected_columns=expected_columns,
+        skip_rows_after_header=skip_rows_after_header,
+        **params,
+    )
+    if skip_rows_after_header > 0:
+        df = df.iloc[skip_rows_after_header:]
+    df = df.dropna(how='all').reset_index(drop=True)
+    for start in range(0, len(df), batch_rows):
+        yield df.iloc[start:start + batch_rows].reset_index(drop=True)
+
+
+def iter_report_batches(
+    source: Any,
+    file_type: str,
+    read_params: Optional[Dict[str, Any]] = None,
+    expected_columns: Optional[List[str]] = None,
+    batch_rows: int = DEFAULT_BATCH_ROWS
+) -> Iterator[pd.DataFrame]:
+    """
+    Пакеты одного файла отчета по его типу из HARDCODED_SCHEMA.
+
+    Args:
+        source: Путь к файлу или файловый объект
+        file_type: 'csv' или 'xlsx'
+
+    Yields:
+        DataFrame с исходными именами колонок
+    """
+    if file_type == "csv":
+        yield from iter_csv_batches(source, read_params, batch_rows)
+    elif file_type == "xlsx":
+        yield from iter_xlsx_batches(source, read_params, expected_columns, batch_rows)
+    else:
+        raise ValueError(f"Неподдерживаемый тип файла для потокового чтения: {file_type}")
+
+
+def iter_sources_batches(
+    sources: Sequence[Any],
+    file_type: str,
+    read_params: Optional[Dict[str, Any]] = None,
+    expected_columns: Optional[List[str]] = None,
+    batch_rows: int = DEFAULT_BATCH_ROWS,
+    on_error: Optional[Callable[[str, Exception], None]] = None
+) -> Iterator[pd.DataFrame]:
+    """
+    Пакеты нескольких файлов одного типа (пути или загруженные файлы) по очереди.
+
+    Args:
+        sources: Пути к файлам или файловые объекты
+        on_error: Вызывается с (имя файла, ошибка) для нечитаемого файла; файл пропускается.
+            Без on_error ошибка пробрасывается.
+
+    Yields:
+        DataFrame с исходными именами колонок
+
+    Raises:
+        PartialFileReadError: Файл сломан после того, как часть его пакетов уже отдана
+    """
+    for source in sources:
+        yield from _iter_file_batches(
+            getattr(source, 'name', os.path.basename(str(source))),
+            iter_report_batches(source, file_type, read_params, expected_columns, batch_rows),
+            on_error,
+        )
+
+
+def with_string_id_dtypes(table_name: str, read_params: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Параметры чтения XLSX с чтением идентификаторов как строк (защита от переполнения больших чисел).
+
+    Args:
+        table_name: Таблица из HARDCODED_SCHEMA
+        read_params: Исходные параметры чтения
+
+    Returns:
+        Копия параметров с дополненным dtype
+    """
+    params = dict(read_params)
+    dtype = dict(params.get('dtype') or {})
+    if table_name == "oz_barcodes":
+        dtype.update({
+            'Артикул': 'str',
+            'Ozon Product ID': 'str',
+            'Штрихкод': 'str'
+        })
+    elif "oz_" in table_name:
+        # For other Ozon tables, protect SKU and Product ID columns
+        dtype.update({
+            'OZON id': 'str',
+            'SKU': 'str',
+            'Ozon Product ID': 'str'
+        })
+    elif "wb_" in table_name:
+        # For Wildberries tables, protect SKU columns
+        dtype.update({
+            'Артикул WB': 'str'
+        })
+    params['dtype'] = dtype
+    return params
+
+
+def iter_folder_xlsx_batches(
+    folder_path: str,
+    read_params: Optional[Dict[str, Any]] = None,
+    expected_columns: Optional[List[str]] = None,
+    batch_rows: int = DEFAULT_BATCH_ROWS,
+    on_error: Optional[Callable[[str, Exception], None]] = None
+) -> Iterator[pd.DataFrame]:
+    """
+    Пакеты всех XLSX файлов папки - файлы читаются по очереди, без объединения в памяти.
+
+    Args:
+        folder_path: Папка с файлами
+        on_error: Вызывается с (имя файла, ошибка) для нечитаемого файла; файл пропускается.
+            Без on_error ошибка пробрасывается.
+
+    Yields:
+        DataFrame с исходными именами колонок
+
+    Raises:
+        PartialFileReadError: Файл сломан после того, как часть его пакетов уже отдана
+    """
+    for file_name in sorted(os.listdir(folder_path)):
+        if not file_name.endswith(".xlsx"):
+            continue
+        file_path = os.path.join(folder_path, file_name)
+        yield from _iter_file_batches(
+            file_name, iter_xlsx_batches(file_path, read_params, expected_columns, batch_rows), on_error
+        )
+
+
+def _select_schema_columns(df: pd.DataFrame, expected_columns: Optional[List[str]]) -> pd.DataFrame:
+    """Только колонки схемы (в порядке схемы), которые есть в файле"""
+    if not expected_columns:
+        return df
+    return df[[c for c in dict.fromkeys(expected_columns) if c in df.columns]]
+
+
+def _read_xlsx_file_worker(
+    file_path: str,
+    read_params: Optional[Dict[str, Any]],
+    expected_columns: Optional[List[str]],
+    batch_rows: int,
+    spill_dir: str
+) -> List[str]:
+    """
+    Задача воркера пула процессов: разбор одного XLSX файла.
+
+    Каждый пакет (только колонки схемы) записывается в отдельный pickle-файл в spill_dir,
+    поэтому воркер держит в памяти один пакет, а не весь файл. Возвращает пути пакетов
+    по порядку; при ошибке уже записанные пакеты удаляются. Ошибка после первого пакета
+    передается как PartialFileReadError - так же, как при последовательном чтении.
+    """
+    os.makedirs(spill_dir)
+    paths = []
+    try:
+        for batch in iter_xlsx_batches(file_path, read_params, expected_columns, batch_rows):
+            path = os.path.join(spill_dir, f"{len(paths):06d}.pkl")
+            _select_schema_columns(batch, expected_columns).to_pickle(path)
+            paths.append(path)
+    except Exception as e:
+        shutil.rmtree(spill_dir, ignore_errors=True)
+        if paths:
+            raise PartialFileReadError(f"Файл '{os.path.basename(file_path)}' прочитан частично: {e}") from e
+        raise
+    return paths
+
+
+def _iter_spilled_batches(paths: List[str]) -> Iterator[pd.DataFrame]:
+    """Пакеты, записанные воркером: читаются по одному, файл удаляется после чтения"""
+    for path in paths:
+        batch = pd.read_pickle(path)
+        os.remove(path)
+        yield batch
+
+
+def iter_folder_xlsx_batches_parallel(
+    folder_path: str,
+    read_params: Optional[Dict[str, Any]] = None,
+    expected_columns: Optional[List[str]] = None,
+    batch_rows: int = DEFAULT_BATCH_ROWS,
+    on_error: Optional[Callable[[str, Exception], None]] = None,
+    max_workers: Optional[int] = None,
+    on_file_done: Optional[Callable[[int, int], None]] = None
+) -> Iterator[pd.DataFrame]:
+    """
+    Пакеты всех XLSX файлов папки, разобранных параллельно в пуле процессов.
+
+    Файлы отдаются в порядке имен, как в iter_folder_xlsx_batches: файл, разобранный
+    раньше предыдущих, ждет своей очереди во временной папке. Поэтому порядок строк и
+    решение о пропуске нечитаемого файла не зависят от того, какой процесс закончил первым.
+    В работе одновременно не больше max_workers файлов. Воркер не передает файл
+    целиком: пакеты по batch_rows строк записываются во временную папку и читаются
+    основным процессом по одному. Память на файл ограничена одним пакетом в воркере
+    и одним в основном процессе (кроме XLSX с поврежденной разметкой - их
+    read_excel_with_fallback читает в воркере целиком). Если пул процессов
+    недоступен, оставшиеся файлы читаются последовательно.
+
+    Args:
+        folder_path: Папка с файлами
+        max_workers: Число процессов (по умолчанию - число ядер, не больше числа файлов)
+        on_error: Вызывается с (имя файла, ошибка) для нечитаемого файла; файл пропускается.
+            Без on_error ошибка пробрасывается.
+        on_file_done: Вызывается с (обработано файлов, всего файлов) после каждого файла
+
+    Yields:
+        DataFrame с колонками схемы, присутствующими в файле
+
+    Raises:
+        PartialFileReadError: Файл сломан после того, как часть его пакетов уже прочитана
+    """
+    file_names = [f for f in sorted(os.listdir(folder_path)) if f.endswith(".xlsx")]
+    total = len(file_names)
+    if total == 0:
+        return
+
+    done = 0
+    pending_names = list(file_names)
+
+    def file_done() -> None:
+        nonlocal done
+        done += 1
+        if on_file_done:
+            on_file_done(done, total)
+
+    workers = max(1, min(max_workers or os.cpu_count() or 1, total))
+    executor = None
+    if workers > 1:
+        try:
+            # spawn: дочерние процессы не наследуют открытые подключения DuckDB
+            executor = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"))
+            logger.info(f"🧵 Параллельное чтение папки: {total} файлов, {workers} процессов")
+        except Exception as e:
+            logger.warning(f"⚠️ Пул процессов недоступен, чтение последовательно: {e}")
+
+    if executor is not None:
+        # Выход из with: сначала завершается пул, затем удаляются непрочитанные пакеты
+        with tempfile.TemporaryDirectory(prefix="xlsx_batches_") as spill_root, executor:
+            # Отправленные в пул и еще не отданные файлы, в порядке имен
+            queue = []
+            pool_broken = False
+            while queue or (pending_names and not pool_broken):
+                running = sum(1 for _, future in queue if not future.done())
+                while not pool_broken and pending_names and running < workers:
+                    file_name = pending_names.pop(0)
+                    try:
+                        future = executor.submit(
+                            _read_xlsx_file_worker,
+                            os.path.join(folder_path, file_name),
+                            read_params,
+                            expected_columns,
+                            batch_rows,
+                            os.path.join(spill_root, file_name),
+                        )
+                    except (BrokenProcessPool, RuntimeError) as e:
+                        logger.warning(f"⚠️ Пул процессов остановлен, остальные файлы читаются последовательно: {e}")
+                        pending_names.insert(0, file_name)
+                        pool_broken = True
+                        break
+                    queue.append((file_name, future))
+                    running += 1
+                if not queue:
+                    break
+                if not queue[0][1].done():
+                    wait([future for _, future in queue if not future.done()], return_when=FIRST_COMPLETED)
+                    continue
+
+                file_name, future = queue.pop(0)
+                try:
+                    paths = future.result()
+                except BrokenProcessPool as e:
+                    # Файлы очереди не разобраны из-за сбоя пула - повтор в текущем процессе по порядку
+                    logger.warning(f"⚠️ Пул процессов остановлен ({file_name}), файлы будут прочитаны последовательно: {e}")
+                    pending_names[:0] = [file_name] + [name for name, _ in queue]
+                    queue.clear()
+                    pool_broken = True
+                    continue
+                except PartialFileReadError:
+                    raise
+                except Exception as e:
+                    if on_error is None:
+                        raise
+                    on_error(file_name, e)
+                    paths = []
+                yield from _iter_file_batches(file_name, _iter_spilled_batches(paths), on_error)
+                file_done()
+
+    # Последовательное чтение (один файл, пул недоступен или остановлен)
+    for file_name in pending_names:
+        batches = iter_xlsx_batches(os.path.join(folder_path, file_name), read_params, expected_columns, batch_rows)
+        yield from _iter_file_batches(
+            file_name, (_select_schema_columns(batch, expected_columns) for batch in batches), on_error
+        )
+        file_done()
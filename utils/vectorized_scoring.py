@@ -0,0 +1,146 @@
+"""
+Общие помощники для векторного (колоночного) расчета score рекомендаций.
+
+Строковые характеристики кандидатов (сезон, цвет, колодка и т.д.) кодируются
+один раз в целочисленные массивы. Сравнение с исходным товаром сводится к
+сравнению кода исходного значения с массивом кодов кандидатов.
+
+Коды повторяют семантику скалярных _calculate_*_score:
+- MISSING_CODE: пустое значение (None, '' - не проходит проверку `if not value`)
+- UNMATCHABLE_CODE: непустое значение, не равное ничему (например, NaN)
+- >= 0: индекс значения в словаре кандидатов
+
+Отбор лучших кандидатов (top_k_indices) использует numpy.argpartition вместо
+полной сортировки.
+
+Автор: DataFox SL Project
+Версия: 1.0.0
+"""
+
+import numpy as np
+from typing import Any, Dict, Iterable, Optional, Tuple
+
+MISSING_CODE = -1
+UNMATCHABLE_CODE = -2
+_SOURCE_UNKNOWN_CODE = -3
+
+
+def _lower(value: Any) -> Any:
+    """Приведение к нижнему регистру, как value.lower() в скалярных методах"""
+    return value.lower() if isinstance(value, str) else value
+
+
+def encode_categorical(
+    values: Iterable[Any],
+    lowercase: bool = False
+) -> Tuple[np.ndarray, Dict[Any, int]]:
+    """
+    Кодирует значения кандидатов в целочисленный массив.
+
+    Args:
+        values: Значения характеристики кандидатов
+        lowercase: Сравнение без учета регистра
+
+    Returns:
+        (массив кодов int32, словарь значение -> код)
+    """
+    mapping: Dict[Any, int] = {}
+    codes = []
+    for value in values:
+        if not value:
+            codes.append(MISSING_CODE)
+            continue
+        if value != value:  # NaN не равен ничему, включая себя
+            codes.append(UNMATCHABLE_CODE)
+            continue
+        key = _lower(value) if lowercase else value
+        code = mapping.get(key)
+        if code is None:
+            code = len(mapping)
+            mapping[key] = code
+        codes.append(code)
+    return np.asarray(codes, dtype=np.int32), mapping
+
+
+def encode_source_value(value: Any, mapping: Dict[Any, int], lowercase: bool = False) -> int:
+    """
+    Кодирует значение исходного товара словарем кандидатов.
+
+    Returns:
+        MISSING_CODE для пустого значения, код кандидатов или код, не совпадающий ни с одним
+    """
+    if not value:
+        return MISSING_CODE
+    if value != value:
+        return _SOURCE_UNKNOWN_CODE
+    key = _lower(value) if lowercase else value
+    return mapping.get(key, _SOURCE_UNKNOWN_CODE)
+
+
+def match_mask(source_code: int, codes: np.ndarray) -> np.ndarray:
+    """Маска кандидатов, у которых непустое значение совпадает с исходным"""
+    if source_code < 0:
+        return np.zeros(len(codes), dtype=bool)
+    return codes == source_code
+
+
+def present_mask(source_code: int, codes: np.ndarray) -> np.ndarray:
+    """Маска кандидатов, где значение заполнено и у исходного товара, и у кандидата"""
+    if source_code == MISSING_CODE:
+        return np.zeros(len(codes), dtype=bool)
+    return codes != MISSING_CODE
+
+
+def match_bonus(source_code: int, codes: np.ndarray, bonus: float) -> np.ndarray:
+    """Бонус за совпадение значения (0 при несовпадении или отсутствии значения)"""
+    return np.where(match_mask(source_code, codes), float(bonus), 0.0)
+
+
+def popcount(values: np.ndarray) -> np.ndarray:
+    """
+    Количество установленных битов в каждом элементе массива (битовые маски uint64).
+
+    Returns:
+        Массив int64 той же длины
+    """
+    values = np.ascontiguousarray(values, dtype=np.uint64)
+    if hasattr(np, 'bitwise_count'):  # numpy >= 2.0
+        return np.bitwise_count(values).astype(np.int64)
+    return np.unpackbits(values.view(np.uint8).reshape(-1, 8), axis=1).sum(axis=1).astype(np.int64)
+
+
+def top_k_indices(scores: np.ndarray, k: int, mask: Optional[np.ndarray] = None) -> np.ndarray:
+    """
+    Индексы k лучших score без полной сортировки всех кандидатов.
+
+    Отбор выполняется numpy.argpartition, сортируются только k отобранных.
+    Порядок совпадает с устойчивой сортировкой по убыванию score
+    (list.sort(key=..., reverse=True)): при равных score раньше идет кандидат
+    с меньшим индексом, в том числе на границе отбора.
+
+    Args:
+        scores: Массив score кандидатов
+        k: Количество лучших кандидатов
+        mask: Допустимые кандидаты (например, прошедшие порог score)
+
+    Returns:
+        Индексы кандидатов (int64), отсортированные по убыванию score
+    """
+    scores = np.asarray(scores, dtype=np.float64)
+    candidates = np.arange(len(scores)) if mask is None else np.flatnonzero(mask)
+    if k <= 0 or len(candidates) == 0:
+        return np.zeros(0, dtype=np.int64)
+
+    values = scores[candidates]
+    if len(candidates) > k:
+        # k-й по величине score; выше него - гарантированно в выборке
+        threshold = values[np.argpartition(-values, k - 1)[k - 1]]
+        above = values > threshold
+        at_threshold = np.flatnonzero(values == threshold)[:k - int(above.sum())]
+        selected = np.flatnonzero(above)
+        selected = np.sort(np.concatenate([selected, at_threshold]))
+        candidates = candidates[selected]
+        values = values[selected]
+
+    order = np.argsort(-values, kind='stable')
+    return candidates[order].astype(np.int64)
@@ -0,0 +1,153 @@
+"""
+Модуль материализованного индекса штрихкодов WB.
+
+В таблице wb_products штрихкоды хранятся строкой через ';' (поле wb_barcodes).
+Раньше каждый запрос связывания WB <-> Ozon заново выполнял
+UNNEST(string_split(wb_barcodes, ';')) по всей таблице. Этот модуль
+поддерживает производную таблицу wb_barcodes_normalized(wb_sku, barcode, position),
+которая строится при импорте wb_products и индексируется по barcode.
+
+Основные функции:
+- Пересборка таблицы
+- Проверка наличия таблицы
+- SQL-источник нормализованных штрихкодов с fallback на разбиение "на лету"
+
+Автор: DataFox SL Project
+Версия: 1.0.0
+"""
+
+import duckdb
+import logging
+from typing import Tuple
+
+# Настройка логирования
+logger = logging.getLogger(__name__)
+
+WB_BARCODES_NORMALIZED_TABLE = "wb_barcodes_normalized"
+
+# Разбиение wb_barcodes "на лету": используется для построения таблицы
+# и как fallback, если таблица ещё не построена.
+# position - позиция штрихкода в исходной строке wb_barcodes (1-indexed)
+_WB_BARCODES_SPLIT_SQL = """
+    SELECT
+        arrs.wb_sku,
+        TRIM(arrs.arr[gs.idx]) AS barcode,
+        gs.idx AS position
+    FROM (
+        SELECT wb_sku, string_split(wb_barcodes, ';') AS arr
+        FROM wb_products
+        WHERE NULLIF(TRIM(wb_barcodes), '') IS NOT NULL
+    ) arrs, generate_series(1, array_length(arrs.arr)) AS gs(idx)
+    WHERE NULLIF(TRIM(arrs.arr[gs.idx]), '') IS NOT NULL
+"""
+
+
+def wb_barcode_index_exists(conn: duckdb.DuckDBPyConnection) -> bool:
+    """
+    Проверяет, построена ли таблица wb_barcodes_normalized.
+
+    Args:
+        conn: Соединение с базой данных
+
+    Returns:
+        True если таблица существует
+    """
+    try:
+        result = conn.execute("""
+            SELECT COUNT(*)
+            FROM information_schema.tables
+            WHERE table_name = ?
+        """, [WB_BARCODES_NORMALIZED_TABLE]).fetchone()
+        return bool(result and result[0] > 0)
+    except Exception as e:
+        logger.warning(f"Ошибка проверки таблицы {WB_BARCODES_NORMALIZED_TABLE}: {e}")
+        return False
+
+
+def wb_barcodes_source(conn: duckdb.DuckDBPyConnection) -> str:
+    """
+    Возвращает SQL-источник нормализованных штрихкодов WB для подстановки во FROM/JOIN.
+
+    Источник всегда имеет колонки (wb_sku, barcode, position). Если материализованная
+    таблица существует - возвращается её имя, иначе подзапрос с разбиением "на лету".
+
+    Args:
+        conn: Соединение с базой данных
+
+    Returns:
+        Имя таблицы или подзапрос в скобках
+    """
+    if wb_barcode_index_exists(conn):
+        return WB_BARCODES_NORMALIZED_TABLE
+    return f"({_WB_BARCODES_SPLIT_SQL})"
+
+
+def rebuild_wb_barcode_index(conn: duckdb.DuckDBPyConnection) -> Tuple[bool, int, str]:
+    """
+    Пересоздает таблицу wb_barcodes_normalized из wb_products.
+
+    Таблица заменяется одним CREATE OR REPLACE: если построение не удалось,
+    прежняя версия таблицы остается на месте.
+
+    Args:
+        conn: Соединение с базой данных
+
+    Returns:
+        Tuple[success: bool, rows: int, message: str]
+    """
+    if not conn:
+        return False, 0, "Нет соединения с базой данных"
+
+    try:
+        conn.execute(f"""
+            CREATE OR REPLACE TABLE {WB_BARCODES_NORMALIZED_TABLE} AS
+            {_WB_BARCODES_SPLIT_SQL}
+        """)
+
+        # Индекс по barcode создается через общий механизм db_indexing
+        from .db_indexing import recreate_indexes_after_import
+        recreate_indexes_after_import(conn, WB_BARCODES_NORMALIZED_TABLE, silent=True)
+
+        rows = conn.execute(f"SELECT COUNT(*) FROM {WB_BARCODES_NORMALIZED_TABLE}").fetchone()[0]
+        message = f"✅ Таблица {WB_BARCODES_NORMALIZED_TABLE} обновлена: {rows} штрихкодов"
+        logger.info(message)
+        return True, rows, message
+
+    except Exception as e:
+        message = f"❌ Ошибка построения {WB_BARCODES_NORMALIZED_TABLE}: {e}"
+        logger.error(message)
+        return False, 0, message
+
+
+def ensure_wb_barcode_index(conn: duckdb.DuckDBPyConnection) -> bool:
+    """
+    Строит wb_barcodes_normalized, если таблица отсутствует, а wb_products уже есть.
+    Используется при инициализации схемы БД для баз, импортированных до появления индекса.
+
+    Args:
+        conn: Соединение с базой данных
+
+    Returns:
+        True если таблица существует или успешно построена
+    """
+    if not conn:
+        return False
+
+    if wb_barcode_index_exists(conn):
+        return True
+
+    try:
+        wb_products_exists = conn.execute("""
+            SELECT COUNT(*)
+            FROM information_schema.tables
+            WHERE table_name = 'wb_products'
+        """).fetchone()[0] > 0
+    except Exception as e:
+        logger.warning(f"Ошибка проверки таблицы wb_products: {e}")
+        return False
+
+    if not wb_products_exists:
+        return False
+
+    success, _, _ = rebuild_wb_barcode_index(conn)
+    return success
@@ -0,0 +1,221 @@
+"""
+Модуль постоянного кэша кандидатов WB рекомендаций.
+
+WBDataCollector._find_wb_candidates_by_criteria для каждой тройки
+(тип, пол, бренд) выполняет многоэтапный поиск кандидатов через связанные
+Ozon товары. Результат не зависит от исходного товара (он лишь исключается из
+списка), поэтому сохраняется в таблице wb_candidate_cache и переиспользуется
+между запусками и перерисовками страницы.
+
+Актуальность кэша определяется штампом версии данных: при импорте любой из
+таблиц CANDIDATE_CACHE_SOURCE_TABLES версия таблицы в data_versions
+увеличивается, а записи кэша с прежним штампом перестают использоваться.
+
+Основные функции:
+- Увеличение и чтение штампа версии данных
+- Чтение и запись кандидатов по тройке критериев
+- Очистка кэша
+
+Автор: DataFox SL Project
+Версия: 1.0.0
+"""
+
+import duckdb
+import json
+import logging
+from dataclasses import asdict, fields
+from typing import Optional, Sequence, Tuple
+
+# Настройка логирования
+logger = logging.getLogger(__name__)
+
+DATA_VERSIONS_TABLE = "data_versions"
+WB_CANDIDATE_CACHE_TABLE = "wb_candidate_cache"
+
+# Таблицы, от которых зависит набор кандидатов: товары и штрихкоды обеих площадок,
+# остатки WB (фильтр по наличию) и punta_table (обогащение)
+CANDIDATE_CACHE_SOURCE_TABLES = (
+    "wb_products",
+    "wb_prices",
+    "oz_category_products",
+    "oz_products",
+    "oz_barcodes",
+    "punta_table",
+)
+
+CriteriaKey = Tuple[str, str, str]
+
+
+def _table_exists(conn: duckdb.DuckDBPyConnection, table_name: str) -> bool:
+    result = conn.execute("""
+        SELECT COUNT(*)
+        FROM information_schema.tables
+        WHERE table_name = ?
+    """, [table_name]).fetchone()
+    return bool(result and result[0] > 0)
+
+
+def bump_data_version(conn: duckdb.DuckDBPyConnection, table_name: str) -> Optional[int]:
+    """
+    Увеличивает версию данных таблицы после импорта.
+    Для таблиц из CANDIDATE_CACHE_SOURCE_TABLES устаревшие записи кэша удаляются.
+
+    Args:
+        conn: Соединение с базой данных
+        table_name: Имя импортированной таблицы
+
+    Returns:
+        Новая версия таблицы или None при ошибке
+    """
+    try:
+        conn.execute(f"""
+            CREATE TABLE IF NOT EXISTS {DATA_VERSIONS_TABLE} (
+                table_name VARCHAR PRIMARY KEY,
+                version BIGINT NOT NULL,
+                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        """)
+        conn.execute(f"""
+            INSERT INTO {DATA_VERSIONS_TABLE} (table_name, version, updated_at)
+            VALUES (?, 1, CURRENT_TIMESTAMP)
+            ON CONFLICT (table_name) DO UPDATE SET
+                version = {DATA_VERSIONS_TABLE}.version + 1,
+                updated_at = EXCLUDED.updated_at
+        """, [table_name])
+        version = conn.execute(
+            f"SELECT version FROM {DATA_VERSIONS_TABLE} WHERE table_name = ?", [table_name]
+        ).fetchone()[0]
+
+        if table_name in CANDIDATE_CACHE_SOURCE_TABLES:
+            clear_wb_candidate_cache(conn)
+        return version
+    except Exception as e:
+        logger.warning(f"Не удалось обновить версию данных {table_name}: {e}")
+        return None
+
+
+def get_data_version(conn: duckdb.DuckDBPyConnection, table_names: Sequence[str]) -> int:
+    """
+    Штамп версии данных набора таблиц.
+
+    Сумма версий table_names: строго растет при импорте любой из них.
+
+    Returns:
+        Штамп версии (0, если версии еще не записывались)
+    """
+    if not _table_exists(conn, DATA_VERSIONS_TABLE):
+        return 0
+    placeholders = ', '.join(['?'] * len(table_names))
+    result = conn.execute(f"""
+        SELECT COALESCE(SUM(version), 0)
+        FROM {DATA_VERSIONS_TABLE}
+        WHERE table_name IN ({placeholders})
+    """, list(table_names)).fetchone()
+    return int(result[0]) if result else 0
+
+
+def get_candidate_data_version(conn: duckdb.DuckDBPyConnection) -> int:
+    """
+    Штамп версии данных, от которых зависит кэш кандидатов (CANDIDATE_CACHE_SOURCE_TABLES).
+
+    Returns:
+        Штамп версии (0, если версии еще не записывались)
+    """
+    return get_data_version(conn, CANDIDATE_CACHE_SOURCE_TABLES)
+
+
+def _serialize_candidates(candidates: list) -> str:
+    """Сериализация WBProductInfo в JSON (только поля конструктора)"""
+    if not candidates:
+        return "[]"
+    init_fields = [f.name for f in fields(candidates[0]) if f.init]
+    return json.dumps(
+        [{name: value for name, value in asdict(c).items() if name in init_fields} for c in candidates],
+        ensure_ascii=False,
+        # numpy-скаляры из DataFrame (цены, остатки) -> значения Python
+        default=lambda value: value.item() if hasattr(value, 'item') else str(value)
+    )
+
+
+def load_wb_candidates(conn: duckdb.DuckDBPyConnection, key: CriteriaKey) -> Optional[list]:
+    """
+    Читает кандидатов для тройки критериев, если запись соответствует текущей версии данных.
+
+    Args:
+        conn: Соединение с базой данных
+        key: (тип, пол, бренд)
+
+    Returns:
+        Список WBProductInfo или None, если записи нет или она устарела
+    """
+    from .wb_recommendations import WBProductInfo
+
+    try:
+        if not _table_exists(conn, WB_CANDIDATE_CACHE_TABLE):
+            return None
+        row = conn.execute(f"""
+            SELECT payload
+            FROM {WB_CANDIDATE_CACHE_TABLE}
+            WHERE type_val = ? AND gender_val = ? AND brand_val = ? AND data_version = ?
+        """, [*key, get_candidate_data_version(conn)]).fetchone()
+        if not row:
+            return None
+        return [WBProductInfo(**item) for item in json.loads(row[0])]
+    except Exception as e:
+        logger.warning(f"Ошибка чтения кэша кандидатов {key}: {e}")
+        return None
+
+
+def store_wb_candidates(conn: duckdb.DuckDBPyConnection, key: CriteriaKey, candidates: list) -> bool:
+    """
+    Сохраняет кандидатов для тройки критериев с текущим штампом версии данных.
+
+    Args:
+        conn: Соединение с базой данных (для курсора только для чтения запись пропускается)
+        key: (тип, пол, бренд)
+        candidates: Список WBProductInfo
+
+    Returns:
+        True если запись сохранена
+    """
+    try:
+        conn.execute(f"""
+            CREATE TABLE IF NOT EXISTS {WB_CANDIDATE_CACHE_TABLE} (
+                type_val VARCHAR,
+                gender_val VARCHAR,
+                brand_val VARCHAR,
+                data_version BIGINT,
+                candidates_count INTEGER,
+                payload VARCHAR,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                PRIMARY KEY (type_val, gender_val, brand_val)
+            )
+        """)
+        conn.execute(f"""
+            INSERT OR REPLACE INTO {WB_CANDIDATE_CACHE_TABLE}
+                (type_val, gender_val, brand_val, data_version, candidates_count, payload, created_at)
+            VALUES (?, ?, ?, ?, ?, ?, CURRENT_TIMESTAMP)
+        """, [*key, get_candidate_data_version(conn), len(candidates), _serialize_candidates(candidates)])
+        return True
+    except Exception as e:
+        logger.debug(f"Кэш кандидатов {key} не сохранен: {e}")
+        return False
+
+
+def clear_wb_candidate_cache(conn: duckdb.DuckDBPyConnection) -> bool:
+    """
+    Удаляет все записи кэша кандидатов.
+
+    Args:
+        conn: Соединение с базой данных
+
+    Returns:
+        True если очистка выполнена (или кэша нет)
+    """
+    try:
+        if _table_exists(conn, WB_CANDIDATE_CACHE_TABLE):
+            conn.execute(f"DELETE FROM {WB_CANDIDATE_CACHE_TABLE}")
+        return True
+    except Exception as e:
+        logger.warning(f"Ошибка очистки кэша кандидатов: {e}")
+        return False
@@ -0,0 +1,202 @@
+"""
+Параллельная загрузка изображений товаров WB с дисковым кэшем.
+
+Аналитический отчет с колонкой PHOTO_FROM_WB загружал изображения по одному:
+для каждой строки новый requests.get, конвертация WebP -> PNG во временный файл
+и вставка в ячейку. Время генерации отчета определялось суммой сетевых задержек.
+
+WBImageFetcher:
+- загружает изображения пулом потоков (max_workers) через общий requests.Session
+  с keep-alive, соединения к basket-*.wbbasket.ru переиспользуются
+- один раз уменьшает изображение до миниатюры (thumbnail_size) и сохраняет PNG
+  в дисковый кэш <cache_dir>/<wb_sku>.png
+- повторно использует файл кэша, пока он моложе ttl_seconds
+- принимает session и url_builder, поэтому в тестах работает с локальным сервером
+
+Пример использования:
+    fetcher = WBImageFetcher()
+    paths, errors = fetcher.fetch_many(['297266982', '12345678'])
+
+Автор: DataFox SL Project
+Версия: 1.0.0
+"""
+
+import logging
+import os
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from io import BytesIO
+from typing import Callable, Dict, Iterable, Optional, Tuple
+
+import requests
+from PIL import Image as PILImage
+
+from .wb_photo_service import create_session, get_wb_photo_url
+
+# Настройка логирования
+logger = logging.getLogger(__name__)
+
+DEFAULT_CACHE_DIR = os.path.join(tempfile.gettempdir(), "datafox_wb_images")
+DEFAULT_CACHE_TTL = 7 * 24 * 3600  # Фото товара меняется редко - неделя
+DEFAULT_MAX_WORKERS = 8
+# Ячейка отчета 64x64, миниатюра с запасом для масштабирования в Excel
+DEFAULT_THUMBNAIL_SIZE = (128, 128)
+
+
+def _cache_key(wb_sku: str) -> Optional[str]:
+    try:
+        return str(int(float(wb_sku)))
+    except (ValueError, TypeError):
+        return None
+
+
+class WBImageFetcher:
+    """Загрузка миниатюр изображений WB пулом потоков с дисковым кэшем по артикулу"""
+
+    def __init__(
+        self,
+        session: Optional[requests.Session] = None,
+        cache_dir: Optional[str] = None,
+        ttl_seconds: float = DEFAULT_CACHE_TTL,
+        max_workers: int = DEFAULT_MAX_WORKERS,
+        thumbnail_size: Tuple[int, int] = DEFAULT_THUMBNAIL_SIZE,
+        timeout: float = 30,
+        url_builder: Callable[[str], str] = get_wb_photo_url
+    ):
+        """
+        Args:
+            session: HTTP сессия (объект с методом get как у requests.Session); по умолчанию create_session()
+            cache_dir: Каталог дискового кэша миниатюр
+            ttl_seconds: Время жизни файла кэша в секундах
+            max_workers: Число потоков загрузки
+            thumbnail_size: Максимальный размер миниатюры (ширина, высота)
+            timeout: Таймаут запроса в секундах
+            url_builder: Функция wb_sku -> URL изображения
+        """
+        self.session = session or create_session(max_workers)
+        self.cache_dir = cache_dir or DEFAULT_CACHE_DIR
+        self.ttl_seconds = ttl_seconds
+        self.max_workers = max(1, max_workers)
+        self.thumbnail_size = thumbnail_size
+        self.timeout = timeout
+        self.url_builder = url_builder
+
+    def cache_path(self, wb_sku: str) -> Optional[str]:
+        """Путь к файлу кэша артикула (None для некорректного артикула)"""
+        key = _cache_key(wb_sku)
+        return os.path.join(self.cache_dir, f"{key}.png") if key else None
+
+    def get_cached(self, wb_sku: str) -> Optional[str]:
+        """Путь к актуальной миниатюре в кэше или None"""
+        path = self.cache_path(wb_sku)
+        if not path:
+            return None
+        try:
+            if time.time() - os.path.getmtime(path) <= self.ttl_seconds:
+                return path
+        except OSError:
+            pass
+        return None
+
+    def _make_thumbnail(self, content: bytes, path: str) -> None:
+        """Уменьшает изображение и атомарно записывает PNG в кэш"""
+        pil_image = PILImage.open(BytesIO(content))
+        if pil_image.mode not in ("RGB", "L"):
+            pil_image = pil_image.convert("RGB")
+        pil_image.thumbnail(self.thumbnail_size)
+
+        os.makedirs(self.cache_dir, exist_ok=True)
+        fd, temp_path = tempfile.mkstemp(suffix=".png", dir=self.cache_dir)
+        try:
+            with os.fdopen(fd, "wb") as temp_file:
+                pil_image.save(temp_file, "PNG", optimize=True)
+            os.replace(temp_path, path)
+        except Exception:
+            try:
+                os.unlink(temp_path)
+            except OSError:
+                pass
+            raise
+
+    def fetch(self, wb_sku: str) -> Tuple[Optional[str], str]:
+        """
+        Возвращает миниатюру артикула из кэша или загружает ее.
+
+        Returns:
+            Tuple: (путь к PNG или None, сообщение об ошибке)
+        """
+        cached = self.get_cached(wb_sku)
+        if cached:
+            return cached, ""
+
+        path = self.cache_path(wb_sku)
+        image_url = self.url_builder(wb_sku) if path else ""
+        if not image_url:
+            return None, "Не удалось сгенерировать URL"
+
+        try:
+            response = self.session.get(image_url, timeout=self.timeout)
+            response.raise_for_status()
+            content_type = response.headers.get('content-type', '')
+            if not content_type.startswith('image/'):
+                return None, f"URL не содержит изображение ({content_type})"
+            self._make_thumbnail(response.content, path)
+            return path, ""
+        except requests.exceptions.RequestException as e:
+            logger.warning(f"Ошибка загрузки изображения для WB_SKU {wb_sku}: {e}")
+            return None, f"Ошибка сети: {e}"
+        except Exception as e:
+            logger.warning(f"Ошибка обработки изображения для WB_SKU {wb_sku}: {e}")
+            return None, f"Ошибка обработки изображения: {e}"
+
+    def fetch_many(
+        self,
+        wb_skus: Iterable[str],
+        on_done: Optional[Callable[[int, int], None]] = None
+    ) -> Tuple[Dict[str, str], Dict[str, str]]:
+        """
+        Загружает миниатюры для списка артикулов параллельно (из кэша - без запросов).
+
+        Args:
+            wb_skus: Артикулы WB (повторы загружаются один раз)
+            on_done: Колбэк прогресса (обработано, всего)
+
+        Returns:
+            Tuple: (wb_sku -> путь к PNG, wb_sku -> сообщение об ошибке)
+        """
+        unique_skus = list(dict.fromkeys(wb_skus))
+        paths: Dict[str, str] = {}
+        errors: Dict[str, str] = {}
+
+        to_download = []
+        for wb_sku in unique_skus:
+            cached = self.get_cached(wb_sku)
+            if cached:
+                paths[wb_sku] = cached
+            else:
+                to_download.append(wb_sku)
+
+        total = len(unique_skus)
+        done = len(paths)
+        if on_done and done:
+            on_done(done, total)
+        if not to_download:
+            return paths, errors
+
+        logger.info(f"Загрузка {len(to_download)} изображений WB ({len(paths)} из кэша)")
+        with ThreadPoolExecutor(max_workers=min(self.max_workers, len(to_download)),
+                                thread_name_prefix="wb-images") as executor:
+            futures = {executor.submit(self.fetch, wb_sku): wb_sku for wb_sku in to_download}
+            for future in as_completed(futures):
+                wb_sku = futures[future]
+                path, error = future.result()
+                if path:
+                    paths[wb_sku] = path
+                else:
+                    errors[wb_sku] = error
+                done += 1
+                if on_done:
+                    on_done(done, total)
+
+        return paths, errors
@@ -12,15 +12,65 @@ Wildberries Photo Service Module
     
     # Проверить доступность фото
     is_available = validate_wb_photo_url('297266982')
+    
+    # Проверить много артикулов параллельно (с кэшем результатов в БД)
+    results = validate_wb_photo_urls_batch(['297266982', '12345678'], conn=db_conn)
 """
 
 import requests
-from typing import Optional, Tuple
+import numpy as np
+import pandas as pd
+from bisect import bisect_left
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+from urllib.parse import urlsplit
+import threading
 import logging
 
 # Настройка логирования
 logger = logging.getLogger(__name__)
 
+# Верхние границы (включительно) значения wb_sku // 100000 для томов basket-01 ... basket-24;
+# большие значения относятся к basket-25
+VOLUME_UPPER_BOUNDS = (
+    143, 287, 431, 719, 1007, 1061, 1115, 1169, 1313, 1601, 1655, 1919,
+    2045, 2189, 2405, 2621, 2837, 3053, 3269, 3485, 3701, 3917, 4133, 4349,
+)
+VOLUME_BOUNDS_ARRAY = np.array(VOLUME_UPPER_BOUNDS, dtype=np.int64)
+
+WB_PHOTO_CACHE_TABLE = "wb_photo_url_cache"
+DEFAULT_VALIDATION_TTL = 24 * 3600
+DEFAULT_VALIDATION_WORKERS = 32
+# Одновременных запросов к одному basket-*.wbbasket.ru
+DEFAULT_MAX_PER_HOST = 8
+
+REQUEST_HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36',
+    'Accept': 'image/webp,image/apng,image/*,*/*;q=0.8',
+    'Accept-Language': 'ru-RU,ru;q=0.9,en;q=0.8',
+    'Accept-Encoding': 'gzip, deflate, br',
+    'Connection': 'keep-alive',
+}
+
+
+def create_session(pool_size: int = DEFAULT_MAX_PER_HOST) -> requests.Session:
+    """
+    Создает requests.Session с keep-alive и пулом соединений.
+    
+    Args:
+        pool_size (int): Число соединений, сохраняемых для одного хоста
+        
+    Returns:
+        requests.Session: Сессия с заголовками браузера
+    """
+    session = requests.Session()
+    adapter = requests.adapters.HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    session.headers.update(REQUEST_HEADERS)
+    return session
+
 def get_wb_photo_url(wb_sku: str) -> str:
     """
     Генерирует прямую ссылку на изображение товара WB по артикулу.
@@ -74,56 +124,44 @@ def _get_volume_number(b: int) -> str:
     Returns:
         str: Номер тома в формате "01"-"25"
     """
-    if b <= 143:
-        return "01"
-    elif b <= 287:
-        return "02"
-    elif b <= 431:
-        return "03"
-    elif b <= 719:
-        return "04"
-    elif b <= 1007:
-        return "05"
-    elif b <= 1061:
-        return "06"
-    elif b <= 1115:
-        return "07"
-    elif b <= 1169:
-        return "08"
-    elif b <= 1313:
-        return "09"
-    elif b <= 1601:
-        return "10"
-    elif b <= 1655:
-        return "11"
-    elif b <= 1919:
-        return "12"
-    elif b <= 2045:
-        return "13"
-    elif b <= 2189:
-        return "14"
-    elif b <= 2405:
-        return "15"
-    elif b <= 2621:
-        return "16"
-    elif b <= 2837:
-        return "17"
-    elif b <= 3053:
-        return "18"
-    elif b <= 3269:
-        return "19"
-    elif b <= 3485:
-        return "20"
-    elif b <= 3701:
-        return "21"
-    elif b <= 3917:
-        return "22"
-    elif b <= 4133:
-        return "23"
-    elif b <= 4349:
-        return "24"
-    else:
-        return "25"
+    return f"{bisect_left(VOLUME_UPPER_BOUNDS, b) + 1:02d}"
+
+def get_wb_photo_urls(wb_skus: Iterable) -> List[str]:
+    """
+    Генерирует ссылки на изображения для списка артикулов WB за один вызов.
+    
+    Векторный вариант get_wb_photo_url: номера томов определяются через
+    numpy.searchsorted по VOLUME_UPPER_BOUNDS для всех артикулов сразу.
+    
+    Args:
+        wb_skus (Iterable): Артикулы WB (список, Series или массив; строки или числа)
+        
+    Returns:
+        List[str]: Ссылки в порядке артикулов; пустая строка для некорректного артикула
+        
+    Example:
+        >>> get_wb_photo_urls(['297266982', 'abc'])
+        ['https://basket-18.wbbasket.ru/vol2972/part297266/297266982/images/tm/1.webp', '']
+    """
+    values = pd.Series(list(wb_skus) if not isinstance(wb_skus, pd.Series) else wb_skus.to_numpy(), dtype=object)
+    numbers = pd.to_numeric(values.astype(str).str.strip(), errors='coerce').to_numpy(dtype=np.float64)
+    valid = np.isfinite(numbers)
+    # Значения вне диапазона int64 переполнили бы astype - их строит get_wb_photo_url
+    in_range = valid & (np.abs(numbers) < 2.0 ** 63)
+    
+    a = np.trunc(numbers[in_range]).astype(np.int64)
+    b = a // 100000
+    c = a // 1000
+    volumes = np.searchsorted(VOLUME_BOUNDS_ARRAY, b, side='left') + 1
+    
+    urls = np.full(len(values), "", dtype=object)
+    urls[in_range] = [
+        f"https://basket-{vol:02d}.wbbasket.ru/vol{vol_b}/part{part_c}/{sku}/images/tm/1.webp"
+        for vol, vol_b, part_c, sku in zip(volumes.tolist(), b.tolist(), c.tolist(), a.tolist())
+    ]
+    for i in np.flatnonzero(valid & ~in_range):
+        urls[i] = get_wb_photo_url(values.iloc[i])
+    return urls.tolist()
 
 def validate_wb_photo_url(wb_sku: str, timeout: int = 10) -> Tuple[bool, str]:
     """
@@ -242,6 +280,151 @@ def get_wb_photo_info(wb_sku: str, validate: bool = True, timeout: int = 10) ->
     
     return result
 
+def _is_definitive_status(status_code: int) -> bool:
+    """Ответ, который можно кэшировать: 200 или 4xx, кроме 408 и 429 (временные ошибки, как и 5xx)"""
+    return status_code == 200 or (400 <= status_code < 500 and status_code not in (408, 429))
+
+def _photo_check_result(status_code: int, content_type: str, url: str) -> Tuple[bool, str]:
+    """Результат проверки в формате validate_wb_photo_url по статусу и content-type ответа"""
+    if status_code != 200:
+        return False, f"HTTP {status_code}"
+    if not (content_type or '').startswith('image/'):
+        return False, f"URL не содержит изображение (content-type: {content_type})"
+    return True, url
+
+def _load_cached_checks(conn, wb_skus: list, ttl_seconds: float) -> Dict[str, Tuple[str, int, str]]:
+    """Непросроченные результаты проверок из WB_PHOTO_CACHE_TABLE: wb_sku -> (url, status_code, content_type)"""
+    try:
+        table_exists = conn.execute(
+            "SELECT COUNT(*) FROM information_schema.tables WHERE table_name = ?", [WB_PHOTO_CACHE_TABLE]
+        ).fetchone()[0]
+        if not table_exists:
+            return {}
+        rows = conn.execute(f"""
+            SELECT wb_sku, url, status_code, content_type
+            FROM {WB_PHOTO_CACHE_TABLE}
+            WHERE list_contains(?, wb_sku) AND checked_at >= ?
+        """, [wb_skus, datetime.now() - timedelta(seconds=ttl_seconds)]).fetchall()
+        return {row[0]: (row[1], row[2], row[3]) for row in rows if _is_definitive_status(row[2])}
+    except Exception as e:
+        logger.warning(f"Ошибка чтения кэша проверок фото WB: {e}")
+        return {}
+
+def _store_checks(conn, checks: Dict[str, Tuple[str, int, str]]) -> None:
+    """Сохраняет результаты проверок (status, content-type, checked_at) в WB_PHOTO_CACHE_TABLE"""
+    try:
+        conn.execute(f"""
+            CREATE TABLE IF NOT EXISTS {WB_PHOTO_CACHE_TABLE} (
+                wb_sku VARCHAR PRIMARY KEY,
+                url VARCHAR,
+                status_code INTEGER,
+                content_type VARCHAR,
+                checked_at TIMESTAMP
+            )
+        """)
+        checked_at = datetime.now()
+        conn.executemany(f"""
+            INSERT OR REPLACE INTO {WB_PHOTO_CACHE_TABLE} (wb_sku, url, status_code, content_type, checked_at)
+            VALUES (?, ?, ?, ?, ?)
+        """, [[wb_sku, url, status_code, content_type, checked_at]
+              for wb_sku, (url, status_code, content_type) in checks.items()])
+    except Exception as e:
+        logger.warning(f"Не удалось сохранить кэш проверок фото WB: {e}")
+
+def validate_wb_photo_urls_batch(
+    wb_skus: Iterable[str],
+    conn=None,
+    ttl_seconds: float = DEFAULT_VALIDATION_TTL,
+    max_workers: int = DEFAULT_VALIDATION_WORKERS,
+    max_per_host: int = DEFAULT_MAX_PER_HOST,
+    timeout: int = 10,
+    session: Optional[requests.Session] = None,
+    url_builder: Optional[Callable[[str], str]] = None
+) -> Dict[str, Tuple[bool, str]]:
+    """
+    Проверяет доступность изображений для списка артикулов WB.
+    
+    HEAD запросы выполняются параллельно через общую сессию с keep-alive,
+    не более max_per_host одновременно к одному хосту CDN. Если передано
+    соединение с БД, ответы (status, content-type, checked_at) сохраняются в
+    таблицу wb_photo_url_cache, и повторная проверка в пределах ttl_seconds
+    не выполняет запросов. Кэшируются только окончательные ответы (200 и 4xx);
+    сетевые ошибки, таймауты, 408, 429 и 5xx проверяются заново при следующем вызове.
+    
+    Args:
+        wb_skus (Iterable[str]): Артикулы товаров WB
+        conn: Соединение DuckDB для кэша результатов (None - без кэша)
+        ttl_seconds (float): Время жизни результата проверки в кэше
+        max_workers (int): Общее число потоков проверки
+        max_per_host (int): Максимум одновременных запросов к одному хосту
+        timeout (int): Таймаут запроса в секундах
+        session: HTTP сессия (объект с методом head как у requests.Session)
+        url_builder: Функция wb_sku -> URL изображения (по умолчанию get_wb_photo_urls для всего списка)
+        
+    Returns:
+        Dict[str, Tuple[bool, str]]: wb_sku -> (доступно, URL или сообщение об ошибке)
+        
+    Example:
+        >>> results = validate_wb_photo_urls_batch(['297266982', '12345678'], conn=db_conn)
+        >>> available = [sku for sku, (ok, _) in results.items() if ok]
+    """
+    unique_skus = [str(wb_sku) for wb_sku in dict.fromkeys(wb_skus)]
+    results: Dict[str, Tuple[bool, str]] = {}
+    urls: Dict[str, str] = {}
+    built_urls = get_wb_photo_urls(unique_skus) if url_builder is None else [url_builder(s) for s in unique_skus]
+    for wb_sku, url in zip(unique_skus, built_urls):
+        if url:
+            urls[wb_sku] = url
+        else:
+            results[wb_sku] = (False, "Не удалось сгенерировать URL")
+    
+    if conn is not None and urls:
+        for wb_sku, (url, status_code, content_type) in _load_cached_checks(conn, list(urls), ttl_seconds).items():
+            if urls.get(wb_sku) == url:
+                results[wb_sku] = _photo_check_result(status_code, content_type, url)
+                del urls[wb_sku]
+    
+    if not urls:
+        return results
+    
+    session = session or create_session(max_per_host)
+    host_limits: Dict[str, threading.BoundedSemaphore] = {}
+    host_limits_lock = threading.Lock()
+    
+    def check(url: str) -> Tuple[Optional[int], str, str]:
+        host = urlsplit(url).netloc
+        with host_limits_lock:
+            limit = host_limits.setdefault(host, threading.BoundedSemaphore(max_per_host))
+        with limit:
+            try:
+                response = session.head(url, timeout=timeout)
+                return response.status_code, response.headers.get('content-type', ''), ''
+            except requests.exceptions.Timeout:
+                return None, '', f"Таймаут запроса ({timeout}s)"
+            except requests.exceptions.RequestException as e:
+                return None, '', f"Ошибка сети: {str(e)}"
+            except Exception as e:
+                return None, '', f"Неожиданная ошибка: {str(e)}"
+    
+    logger.info(f"Проверка {len(urls)} изображений WB ({len(unique_skus) - len(urls)} из кэша)")
+    checks: Dict[str, Tuple[str, int, str]] = {}
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(urls))),
+                            thread_name_prefix="wb-photo-check") as executor:
+        responses = executor.map(check, urls.values())
+        for (wb_sku, url), (status_code, content_type, error) in zip(urls.items(), responses):
+            if status_code is None:
+                logger.warning(f"WB_SKU {wb_sku}: {error}")
+                results[wb_sku] = (False, error)
+                continue
+            if _is_definitive_status(status_code):
+                checks[wb_sku] = (url, status_code, content_type)
+            results[wb_sku] = _photo_check_result(status_code, content_type, url)
+    
+    if conn is not None and checks:
+        _store_checks(conn, checks)
+    
+    return results
+
 # Функции для совместимости с существующим кодом
 def get_wb_image_url(wb_sku: str) -> str:
     """
@@ -15,17 +15,33 @@
 
 import json
 import logging
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
 from dataclasses import dataclass, field
 from typing import List, Optional, Dict, Any, Tuple, Callable
 from enum import Enum
 import re
 import time
+import numpy as np
 import pandas as pd
 
 # Импорт модулей для связывания
 from .cross_marketplace_linker import CrossMarketplaceLinker
+from .arrow_access import query_result
 from .data_cleaning import DataCleaningUtils
 from .manual_recommendations_manager import ManualRecommendationsManager
+from .wb_barcode_index import wb_barcodes_source
+from .wb_candidate_cache import load_wb_candidates, store_wb_candidates
+from .vectorized_scoring import (
+    MISSING_CODE,
+    encode_categorical,
+    encode_source_value,
+    match_bonus,
+    match_mask,
+    popcount,
+    present_mask,
+)
 
 # Настройка логирования
 logger = logging.getLogger(__name__)
@@ -42,6 +58,11 @@ if not logger.handlers:
 WB_RECOMMENDATIONS_VERSION = 1.0
 DEFAULT_RECOMMENDATIONS_COUNT = 20
 
+# Допустимый диапазон размеров обуви; размер N хранится в битовой маске битом N - WB_MIN_SIZE
+WB_MIN_SIZE = 10
+WB_MAX_SIZE = 60
+WB_SIZE_MASK_WIDTH = WB_MAX_SIZE - WB_MIN_SIZE + 1
+
 
 class WBProcessingStatus(Enum):
     """Статусы обработки WB товара"""
@@ -94,11 +115,17 @@ class WBProductInfo:
     linked_oz_skus: List[str] = field(default_factory=list)
     enrichment_source: str = "none"  # "ozon", "punta", "none"
     
+    # Битовая маска размеров и их количество (вычисляются из wb_sizes в __post_init__)
+    size_mask: int = field(default=0, init=False, repr=False, compare=False)
+    size_count: int = field(default=0, init=False, repr=False, compare=False)
+    
     def __post_init__(self):
         """Нормализация данных после создания"""
         # Нормализация размеров
         if self.wb_sizes:
             self.wb_sizes = self._normalize_sizes(self.wb_sizes)
+        self.size_mask = self._encode_size_mask(self.wb_sizes)
+        self.size_count = len(self.wb_sizes) if self.wb_sizes else 0
         
         # Нормализация брендов
         if self.wb_brand:
@@ -115,12 +142,20 @@ class WBProductInfo:
         for size in sizes:
             try:
                 size_int = int(size)
-                if 10 <= size_int <= 60:  # Разумные пределы для размеров обуви
+                if WB_MIN_SIZE <= size_int <= WB_MAX_SIZE:  # Разумные пределы для размеров обуви
                     normalized.append(size_int)
             except (ValueError, TypeError):
                 continue
         return sorted(list(set(normalized)))
     
+    @staticmethod
+    def _encode_size_mask(sizes: List[int]) -> int:
+        """Кодирование нормализованных размеров в битовую маску"""
+        mask = 0
+        for size in sizes or []:
+            mask |= 1 << (size - WB_MIN_SIZE)
+        return mask
+    
     def _normalize_brand(self, brand: str) -> str:
         """Нормализация названия бренда"""
         if not brand:
@@ -144,25 +179,17 @@ class WBProductInfo:
     
     def has_size_overlap(self, other: 'WBProductInfo') -> bool:
         """Проверка пересечения размеров с другим товаром"""
-        if not self.wb_sizes or not other.wb_sizes:
-            return False
-        return bool(set(self.wb_sizes) & set(other.wb_sizes))
+        return bool(self.size_mask & other.size_mask)
     
     def calculate_size_overlap_percentage(self, other: 'WBProductInfo') -> float:
-        """Вычисление процента пересечения размеров"""
-        if not self.wb_sizes or not other.wb_sizes:
-            return 0.0
-        
-        self_sizes = set(self.wb_sizes)
-        other_sizes = set(other.wb_sizes)
-        
-        intersection = self_sizes & other_sizes
-        if not intersection:
+        """Вычисление процента пересечения размеров (popcount пересечения битовых масок)"""
+        common = self.size_mask & other.size_mask
+        if not common:
             return 0.0
         
         # Используем минимум от двух товаров для справедливого сравнения
-        union_size = min(len(self_sizes), len(other_sizes))
-        return len(intersection) / union_size
+        union_size = min(self.size_count, other.size_count)
+        return common.bit_count() / union_size
     
     def get_effective_brand(self) -> str:
         """Получение эффективного бренда (приоритет обогащенному)"""
@@ -293,6 +320,14 @@ class WBScoringConfig:
     min_recommendations: int = 5  # Минимальное количество для предупреждения, но не блокировки
     min_score_threshold: float = 40.0  # Снижен порог для увеличения количества рекомендаций
     
+    # Колоночный (векторный) расчет score для списков кандидатов
+    vectorized_scoring: bool = True
+    
+    # Параллельная обработка групп в process_batch_optimized (ProcessPoolExecutor)
+    parallel_processing: bool = False
+    parallel_workers: Optional[int] = None  # None - по числу ядер
+    parallel_chunk_size: int = 200  # Максимум товаров группы в одной задаче воркера
+    
     @classmethod
     def get_preset(cls, preset_name: str) -> 'WBScoringConfig':
         """Получение предустановленных конфигураций"""
@@ -337,6 +372,157 @@ class WBScoringConfig:
         return presets[preset_name]
 
 
+class WBCandidateMatrix:
+    """
+    Колоночное представление списка кандидатов для векторного расчета score.
+    
+    Строится один раз на группу кандидатов и переиспользуется для всех исходных
+    товаров группы. Результаты совпадают со скалярным
+    WBRecommendationEngine.calculate_similarity_score.
+    """
+    
+    # Характеристики, сравниваемые без учета регистра: (атрибут, поле бонуса в конфиге)
+    CASE_INSENSITIVE_FIELDS = (
+        ('enriched_color', 'color_match_bonus'),
+        ('punta_material_short', 'material_match_bonus'),
+        ('enriched_fastener_type', 'fastener_match_bonus'),
+        ('punta_heel_type', 'heel_type_match_bonus'),
+        ('punta_sole_type', 'sole_type_match_bonus'),
+        ('punta_heel_up_type', 'heel_up_type_match_bonus'),
+        ('punta_lacing_type', 'lacing_type_match_bonus'),
+        ('punta_nose_type', 'nose_type_match_bonus'),
+    )
+    
+    # Колодки в порядке приоритета (сравнение с учетом регистра)
+    LAST_FIELDS = (
+        ('punta_mega_last', 'mega_last_bonus'),
+        ('punta_best_last', 'best_last_bonus'),
+        ('punta_new_last', 'new_last_bonus'),
+    )
+    
+    def __init__(self, candidates: List['WBProductInfo']):
+        self.candidates = list(candidates)
+        self.size = len(self.candidates)
+        self.wb_skus = np.asarray([c.wb_sku for c in self.candidates], dtype=object)
+        
+        # Размеры: битовые маски WBProductInfo.size_mask и количество размеров
+        self.size_masks = np.asarray([c.size_mask for c in self.candidates], dtype=np.uint64)
+        self.size_counts = np.asarray([c.size_count for c in self.candidates], dtype=np.int64)
+        
+        # Категориальные характеристики
+        self.season_codes, self._season_map = encode_categorical(c.enriched_season for c in self.candidates)
+        self._categorical = {
+            attr: encode_categorical((getattr(c, attr) for c in self.candidates), lowercase=True)
+            for attr, _ in self.CASE_INSENSITIVE_FIELDS
+        }
+        self._lasts = {
+            attr: encode_categorical(getattr(c, attr) for c in self.candidates)
+            for attr, _ in self.LAST_FIELDS
+        }
+        
+        # Числовые характеристики
+        self.stock = np.asarray([c.wb_fbo_stock for c in self.candidates], dtype=np.float64)
+        self.price = np.asarray(
+            [c.wb_full_price if c.wb_full_price else np.nan for c in self.candidates], dtype=np.float64
+        )
+        self.enrichment = np.asarray([c.get_enrichment_score() for c in self.candidates], dtype=np.float64)
+    
+    def _size_scores(self, source: 'WBProductInfo', config: 'WBScoringConfig') -> np.ndarray:
+        """Векторный аналог _calculate_size_score"""
+        scores = np.full(self.size, float(config.size_mismatch_penalty))
+        if not source.wb_sizes:
+            return scores
+        
+        intersection = popcount(self.size_masks & np.uint64(source.size_mask))
+        has_overlap = intersection > 0
+        if not has_overlap.any():
+            return scores
+        
+        overlap = np.zeros(self.size)
+        overlap[has_overlap] = (
+            intersection[has_overlap] / np.minimum(source.size_count, self.size_counts[has_overlap])
+        )
+        low_scores = np.trunc(config.close_size_weight * overlap * 2)
+        overlap_scores = np.where(
+            overlap >= 0.8, float(config.exact_size_weight),
+            np.where(overlap >= 0.4, float(config.close_size_weight), low_scores)
+        )
+        return np.where(has_overlap, overlap_scores, scores)
+    
+    def _season_scores(self, source: 'WBProductInfo', config: 'WBScoringConfig') -> np.ndarray:
+        """Векторный аналог _calculate_season_score"""
+        source_code = encode_source_value(source.enriched_season, self._season_map)
+        present = present_mask(source_code, self.season_codes)
+        matched = match_mask(source_code, self.season_codes)
+        return np.where(
+            matched, float(config.season_match_bonus),
+            np.where(present, float(config.season_mismatch_penalty), 0.0)
+        )
+    
+    def _last_scores(self, source: 'WBProductInfo', config: 'WBScoringConfig') -> np.ndarray:
+        """Векторный аналог _calculate_last_score (приоритет mega > best > new)"""
+        scores = np.zeros(self.size)
+        assigned = np.zeros(self.size, dtype=bool)
+        for attr, bonus_field in self.LAST_FIELDS:
+            codes, mapping = self._lasts[attr]
+            matched = match_mask(encode_source_value(getattr(source, attr), mapping), codes) & ~assigned
+            scores[matched] = float(getattr(config, bonus_field))
+            assigned |= matched
+        return scores
+    
+    def score(self, source: 'WBProductInfo', config: 'WBScoringConfig') -> np.ndarray:
+        """
+        Вычисление score исходного товара против всех кандидатов
+        
+        Порядок сложения и применения штрафа повторяет calculate_similarity_score,
+        поэтому результаты совпадают со скалярным расчетом
+        
+        Args:
+            source: Исходный товар
+            config: Конфигурация оценки
+            
+        Returns:
+            Массив score (float64) в порядке кандидатов
+        """
+        scores = np.full(self.size, float(config.base_score))
+        scores += self._size_scores(source, config)
+        scores += self._season_scores(source, config)
+        for attr, bonus_field in self.CASE_INSENSITIVE_FIELDS:
+            codes, mapping = self._categorical[attr]
+            source_code = encode_source_value(getattr(source, attr), mapping, lowercase=True)
+            scores += match_bonus(source_code, codes, getattr(config, bonus_field))
+        
+        last_scores = self._last_scores(source, config)
+        scores += last_scores
+        scores = np.where(last_scores == 0, scores * config.no_last_penalty, scores)
+        
+        # Остатки
+        scores += np.where(
+            self.stock > config.stock_threshold_high, float(config.stock_high_bonus),
+            np.where(
+                self.stock > config.stock_threshold_medium, float(config.stock_medium_bonus),
+                np.where(self.stock > 0, float(config.stock_low_bonus), 0.0)
+            )
+        )
+        
+        # Цена
+        if source.wb_full_price:
+            with np.errstate(invalid='ignore'):
+                price_diff = np.abs(self.price - source.wb_full_price) / source.wb_full_price
+            scores += np.where(
+                ~np.isnan(self.price) & (price_diff <= config.price_diff_threshold),
+                float(config.price_similarity_bonus), 0.0
+            )
+        
+        # Качество обогащения
+        scores += np.where(
+            self.enrichment >= config.enrichment_quality_threshold,
+            float(config.enrichment_quality_bonus), 0.0
+        )
+        
+        return np.minimum(scores, config.max_score)
+
+
 @dataclass
 class WBProcessingResult:
     """Результат обработки WB товара"""
@@ -372,10 +558,12 @@ class WBBatchResult:
 class WBDataCollector:
     """Класс для сбора и обогащения данных WB товаров"""
     
-    def __init__(self, db_conn):
+    def __init__(self, db_conn, use_candidate_cache: bool = True):
         self.db_conn = db_conn
         self.linker = CrossMarketplaceLinker(db_conn)
         self._cache = {}
+        # Постоянный кэш кандидатов по тройке (тип, пол, бренд), см. wb_candidate_cache
+        self.use_candidate_cache = use_candidate_cache
     
     def get_wb_product_info(self, wb_sku: str) -> Optional[WBProductInfo]:
         """
@@ -702,18 +890,46 @@ class WBDataCollector:
             return []
     
     def _find_wb_candidates_by_criteria(self, type_val: str, gender_val: str, brand_val: str, exclude_wb_sku: str) -> List[WBProductInfo]:
+        """
+        Поиск WB кандидатов по критериям с постоянным кэшем
+        
+        Набор кандидатов для тройки (тип, пол, бренд) хранится в wb_candidate_cache
+        и действителен до следующего импорта исходных таблиц; исходный товар
+        исключается из результата после чтения
+        """
+        key = (type_val, gender_val, brand_val)
+        candidates = load_wb_candidates(self.db_conn, key) if self.use_candidate_cache else None
+        
+        if candidates is not None:
+            logger.info(f"⚡ Кандидаты для {type_val}/{gender_val}/{brand_val} взяты из кэша: {len(candidates)}")
+        else:
+            try:
+                candidates = self._discover_wb_candidates(type_val, gender_val, brand_val)
+            except Exception as e:
+                logger.error(f"❌ Ошибка ОПТИМИЗИРОВАННОГО поиска кандидатов: {e}")
+                logger.error(f"❌ Детали ошибки: {type(e).__name__}: {str(e)}")
+                return []
+            if self.use_candidate_cache:
+                store_wb_candidates(self.db_conn, key, candidates)
+        
+        exclude_wb_sku = str(exclude_wb_sku)
+        return [c for c in candidates if c.wb_sku != exclude_wb_sku]
+    
+    def _discover_wb_candidates(self, type_val: str, gender_val: str, brand_val: str) -> List[WBProductInfo]:
         """
         ОПТИМИЗИРОВАННЫЙ поиск WB кандидатов по критериям через связанные Ozon товары
-        Алгоритм из Rich Content OZ: разделение сложного запроса на быстрые этапы
+        Поиск и базовые данные - один set-based запрос, обогащение - пакетное
         """
         logger.info(f"🔍 ОПТИМИЗИРОВАННЫЙ поиск WB кандидатов: тип={type_val}, пол={gender_val}, бренд={brand_val}")
         
-        try:
-            # ЭТАП 1: Быстрый поиск OZ товаров по критериям (БЕЗ штрихкодов)
-            logger.info(f"📊 Этап 1: Поиск OZ товаров по критериям...")
-            step1_start = time.time()
-            
-            oz_candidates_query = """
+        # ЭТАПЫ 1-4: один параметризованный запрос вместо запроса на каждого кандидата.
+        # OZ товары с остатками -> их штрихкоды -> WB товары с этими штрихкодами ->
+        # базовые данные WB (первая строка на wb_sku, все размеры) с фильтром по остаткам WB
+        logger.info(f"📊 Этапы 1-4: Поиск WB товаров с остатками через штрихкоды OZ товаров...")
+        step1_start = time.time()
+        
+        wb_candidates_query = f"""
+        WITH oz_candidates AS (
             SELECT DISTINCT ocp.oz_vendor_code
             FROM oz_category_products ocp
             LEFT JOIN oz_products op ON ocp.oz_vendor_code = op.oz_vendor_code
@@ -721,142 +937,97 @@ class WBDataCollector:
             AND ocp.gender = ?
             AND ocp.oz_brand = ?
             AND COALESCE(op.oz_fbo_stock, 0) > 0
-            """
-            
-            oz_candidates_df = self.db_conn.execute(oz_candidates_query, [type_val, gender_val, brand_val]).fetchdf()
-            step1_time = time.time() - step1_start
-            logger.info(f"📊 Этап 1 завершен за {step1_time:.2f}с, найдено OZ товаров: {len(oz_candidates_df)}")
-            
-            if oz_candidates_df.empty:
-                logger.warning(f"⚠️ Не найдено OZ товаров для критериев: {type_val}, {gender_val}, {brand_val}")
-                return []
-            
-            # ЭТАП 2: Получение штрихкодов для найденных OZ товаров
-            logger.info(f"📊 Этап 2: Получение штрихкодов для {len(oz_candidates_df)} OZ товаров...")
-            step2_start = time.time()
-            
-            oz_vendor_codes = oz_candidates_df['oz_vendor_code'].tolist()
-            vendor_codes_str = ','.join(['?' for _ in oz_vendor_codes])
-            
-            oz_barcodes_query = f"""
+        ),
+        oz_barcodes_list AS (
             SELECT DISTINCT ozb.oz_barcode
             FROM oz_barcodes ozb
-            WHERE ozb.oz_vendor_code IN ({vendor_codes_str})
-            AND ozb.oz_barcode IS NOT NULL
+            INNER JOIN oz_candidates oc ON ozb.oz_vendor_code = oc.oz_vendor_code
+            WHERE ozb.oz_barcode IS NOT NULL
             AND TRIM(ozb.oz_barcode) != ''
-            """
-            
-            oz_barcodes_df = self.db_conn.execute(oz_barcodes_query, oz_vendor_codes).fetchdf()
-            step2_time = time.time() - step2_start
-            logger.info(f"📊 Этап 2 завершен за {step2_time:.2f}с, найдено штрихкодов: {len(oz_barcodes_df)}")
-            
-            if oz_barcodes_df.empty:
-                logger.warning(f"⚠️ Не найдено штрихкодов для OZ товаров")
-                return []
-            
-            # ЭТАП 3: Оптимизированный поиск WB товаров по штрихкодам (без LIKE)
-            logger.info(f"📊 Этап 3: Оптимизированный поиск WB товаров по {len(oz_barcodes_df)} штрихкодам...")
-            step3_start = time.time()
-            
-            # Используем технику из OzToWbCollector - разделяем WB штрихкоды и делаем JOIN
-            oz_barcodes = oz_barcodes_df['oz_barcode'].tolist()
-            barcodes_str = ','.join(['?' for _ in oz_barcodes])
-            
-            wb_matching_query = f"""
-            WITH oz_barcodes_list AS (
-                SELECT DISTINCT barcode as oz_barcode
-                FROM UNNEST([{','.join([f"'{bc}'" for bc in oz_barcodes])}]) AS t(barcode)
-                WHERE barcode IS NOT NULL AND TRIM(barcode) != ''
-            ),
-            wb_barcodes_split AS (
-                SELECT 
-                    wb.wb_sku,
-                    TRIM(bc.barcode) as individual_barcode
-                FROM wb_products wb,
-                UNNEST(string_split(wb.wb_barcodes, ';')) AS bc(barcode)
-                WHERE wb.wb_barcodes IS NOT NULL 
-                  AND TRIM(wb.wb_barcodes) != ''
-                  AND TRIM(bc.barcode) != ''
-                  AND wb.wb_sku != '{exclude_wb_sku}'
-            )
+        ),
+        matched_wb AS (
             SELECT DISTINCT wbs.wb_sku
-            FROM wb_barcodes_split wbs
-            INNER JOIN oz_barcodes_list ozb ON wbs.individual_barcode = ozb.oz_barcode
-            """
-            
-            wb_candidates_df = self.db_conn.execute(wb_matching_query).fetchdf()
-            step3_time = time.time() - step3_start
-            logger.info(f"📊 Этап 3 завершен за {step3_time:.2f}с, найдено WB кандидатов: {len(wb_candidates_df)}")
-            
-            if wb_candidates_df.empty:
-                logger.warning(f"⚠️ Не найдено WB товаров по штрихкодам")
-                return []
-            
-            # ЭТАП 4: Фильтрация по остаткам WB и создание базовых объектов (БЕЗ полного обогащения)
-            logger.info(f"📊 Этап 4: Фильтрация по остаткам и создание базовых объектов...")
-            step4_start = time.time()
-            
-            candidates = []
-            processed_count = 0
-            
-            for _, row in wb_candidates_df.iterrows():
-                wb_sku = str(row['wb_sku'])
-                
-                if processed_count % 20 == 0:  # Логируем каждый 20-й кандидат
-                    logger.info(f"⏳ Обработано базовых кандидатов: {processed_count}/{len(wb_candidates_df)}")
-                
-                # Получаем только базовые данные WB (быстро)
-                wb_base_data = self._get_wb_base_data(wb_sku)
-                if not wb_base_data:
-                    continue
-                
-                # Проверяем остатки
-                if wb_base_data.get('wb_fbo_stock', 0) <= 0:
-                    continue
-                
-                # Создаем базовый объект БЕЗ обогащения (быстро)
-                candidate = WBProductInfo(
-                    wb_sku=wb_sku,
-                    wb_category=wb_base_data.get('wb_category'),
-                    wb_brand=wb_base_data.get('wb_brand'),
-                    wb_sizes=wb_base_data.get('wb_sizes', []),
-                    wb_barcodes=wb_base_data.get('wb_barcodes'),
-                    wb_fbo_stock=wb_base_data.get('wb_fbo_stock', 0),
-                    wb_full_price=wb_base_data.get('wb_full_price'),
-                    wb_discount=wb_base_data.get('wb_discount')
-                )
-                
-                candidates.append(candidate)
-                processed_count += 1
-            
-            step4_time = time.time() - step4_start
-            logger.info(f"📊 Этап 4 завершен за {step4_time:.2f}с, создано базовых объектов: {len(candidates)}")
-            
-            # ЭТАП 5: Обогащение только топ кандидатов (оптимизация из Rich Content OZ)
-            if candidates:
-                logger.info(f"📊 Этап 5: Обогащение кандидатов Ozon и Punta данными...")
-                step5_start = time.time()
-                
-                # 🚀 ОПТИМИЗАЦИЯ: Пакетное обогащение вместо индивидуального
-                logger.info(f"🚀 Используем пакетное обогащение для ускорения...")
-                enriched_candidates = self._batch_enrich_candidates(candidates)
-                
-                step5_time = time.time() - step5_start
-                logger.info(f"📊 Этап 5 завершен за {step5_time:.2f}с, обогащено: {len(enriched_candidates)} кандидатов")
-                
-                total_time = time.time() - step1_start
-                logger.info(f"🎉 ОПТИМИЗИРОВАННЫЙ поиск завершен за {total_time:.2f}с, найдено: {len(enriched_candidates)} кандидатов")
-                logger.info(f"📊 Времена этапов: OZ={step1_time:.2f}с, штрихкоды={step2_time:.2f}с, WB={step3_time:.2f}с, базовые={step4_time:.2f}с, обогащение={step5_time:.2f}с")
-                
-                return enriched_candidates
-            else:
-                logger.warning(f"⚠️ Не найдено валидных кандидатов после фильтрации")
-                return []
-            
-        except Exception as e:
-            logger.error(f"❌ Ошибка ОПТИМИЗИРОВАННОГО поиска кандидатов: {e}")
-            logger.error(f"❌ Детали ошибки: {type(e).__name__}: {str(e)}")
+            FROM {wb_barcodes_source(self.db_conn)} wbs
+            INNER JOIN oz_barcodes_list ozb ON wbs.barcode = ozb.oz_barcode
+        ),
+        wb_base AS (
+            SELECT
+                wb.wb_sku,
+                wb.wb_category,
+                wb.wb_brand,
+                wb.wb_barcodes,
+                COALESCE(wp.wb_fbo_stock, 0) as wb_fbo_stock,
+                wp.wb_full_price,
+                wp.wb_discount
+            FROM wb_products wb
+            INNER JOIN matched_wb m ON wb.wb_sku = m.wb_sku
+            LEFT JOIN wb_prices wp ON wb.wb_sku = wp.wb_sku
+            QUALIFY ROW_NUMBER() OVER (
+                PARTITION BY wb.wb_sku
+                ORDER BY wb.wb_barcodes, wp.wb_fbo_stock DESC NULLS LAST
+            ) = 1
+        ),
+        wb_sizes AS (
+            SELECT wb.wb_sku, LIST(DISTINCT wb.wb_size ORDER BY wb.wb_size) as wb_sizes
+            FROM wb_products wb
+            INNER JOIN matched_wb m ON wb.wb_sku = m.wb_sku
+            WHERE wb.wb_size IS NOT NULL
+            GROUP BY wb.wb_sku
+        )
+        SELECT
+            CAST(b.wb_sku AS VARCHAR) as wb_sku,
+            b.wb_category,
+            b.wb_brand,
+            b.wb_barcodes,
+            b.wb_fbo_stock,
+            b.wb_full_price,
+            b.wb_discount,
+            COALESCE(s.wb_sizes, []) as wb_sizes
+        FROM wb_base b
+        LEFT JOIN wb_sizes s ON b.wb_sku = s.wb_sku
+        WHERE b.wb_fbo_stock > 0
+        ORDER BY b.wb_sku
+        """
+        
+        rows = self.db_conn.execute(wb_candidates_query, [type_val, gender_val, brand_val]).fetchall()
+        
+        # Создаем базовые объекты БЕЗ обогащения (быстро)
+        candidates = [
+            WBProductInfo(
+                wb_sku=wb_sku,
+                wb_category=wb_category,
+                wb_brand=wb_brand,
+                wb_sizes=list(wb_sizes),
+                wb_barcodes=wb_barcodes,
+                wb_fbo_stock=wb_fbo_stock,
+                wb_full_price=wb_full_price,
+                wb_discount=wb_discount
+            )
+            for wb_sku, wb_category, wb_brand, wb_barcodes, wb_fbo_stock, wb_full_price, wb_discount, wb_sizes in rows
+        ]
+        
+        step1_time = time.time() - step1_start
+        logger.info(f"📊 Этапы 1-4 завершены за {step1_time:.2f}с, создано базовых объектов: {len(candidates)}")
+        
+        if not candidates:
+            logger.warning(f"⚠️ Не найдено WB товаров с остатками для критериев: {type_val}, {gender_val}, {brand_val}")
             return []
+        
+        # ЭТАП 5: Обогащение кандидатов (оптимизация из Rich Content OZ)
+        logger.info(f"📊 Этап 5: Обогащение кандидатов Ozon и Punta данными...")
+        step5_start = time.time()
+        
+        # 🚀 ОПТИМИЗАЦИЯ: Пакетное обогащение вместо индивидуального
+        enriched_candidates = self._batch_enrich_candidates(candidates)
+        
+        step5_time = time.time() - step5_start
+        logger.info(f"📊 Этап 5 завершен за {step5_time:.2f}с, обогащено: {len(enriched_candidates)} кандидатов")
+        
+        total_time = time.time() - step1_start
+        logger.info(f"🎉 ОПТИМИЗИРОВАННЫЙ поиск завершен за {total_time:.2f}с, найдено: {len(enriched_candidates)} кандидатов")
+        logger.info(f"📊 Времена этапов: поиск={step1_time:.2f}с, обогащение={step5_time:.2f}с")
+        
+        return enriched_candidates
     
     def _batch_enrich_candidates(self, candidates: List[WBProductInfo]) -> List[WBProductInfo]:
         """
@@ -1159,14 +1330,9 @@ class WBRecommendationEngine:
             step_start = time.time()
             
             recommendations = []
+            scores = self.calculate_similarity_scores(source_product, candidates)
             
-            for i, candidate in enumerate(candidates):
-                if i % 20 == 0:  # Логируем каждый 20-й кандидат
-                    logger.info(f"⏳ Обработано кандидатов: {i}/{len(candidates)}")
-                
-                # Вычисляем score
-                score = self.calculate_similarity_score(source_product, candidate)
-                
+            for candidate, score in zip(candidates, scores.tolist()):
                 # Фильтруем по минимальному порогу
                 if score >= self.config.min_score_threshold:
                     match_details = self.get_match_details(source_product, candidate)
@@ -1189,11 +1355,9 @@ class WBRecommendationEngine:
                 fallback_threshold = max(20.0, self.config.min_score_threshold - 20.0)
                 logger.info(f"🔄 Fallback: снижаем порог до {fallback_threshold}")
                 
-                for candidate in candidates:
+                for candidate, score in zip(candidates, scores.tolist()):
                     if len(recommendations) >= self.config.max_recommendations:
                         break
-                        
-                    score = self.calculate_similarity_score(source_product, candidate)
                     
                     # Проверяем, что кандидат еще не добавлен
                     if (score >= fallback_threshold and 
@@ -1281,8 +1445,7 @@ class WBRecommendationEngine:
                 base_score = 50  # Базовый score для fallback
                 
                 # Бонус за совпадение размерной сетки
-                if (source_product.wb_sizes and candidate_info.wb_sizes and 
-                    set(source_product.wb_sizes) & set(candidate_info.wb_sizes)):
+                if source_product.has_size_overlap(candidate_info):
                     base_score += 20
                 
                 # Бонус за близкую цену
@@ -1379,6 +1542,29 @@ class WBRecommendationEngine:
         # Ограничиваем максимальным значением
         return min(score, self.config.max_score)
     
+    def calculate_similarity_scores(self, source: WBProductInfo, candidates) -> np.ndarray:
+        """
+        Вычисление score схожести исходного товара со списком кандидатов
+        
+        При config.vectorized_scoring используется колоночный расчет WBCandidateMatrix,
+        иначе - скалярный calculate_similarity_score для каждого кандидата
+        
+        Args:
+            source: Исходный товар
+            candidates: Список WBProductInfo или готовая WBCandidateMatrix
+            
+        Returns:
+            Массив score в порядке кандидатов
+        """
+        if self.config.vectorized_scoring:
+            matrix = candidates if isinstance(candidates, WBCandidateMatrix) else WBCandidateMatrix(candidates)
+            return matrix.score(source, self.config)
+        
+        candidate_list = candidates.candidates if isinstance(candidates, WBCandidateMatrix) else candidates
+        return np.asarray(
+            [self.calculate_similarity_score(source, c) for c in candidate_list], dtype=np.float64
+        )
+    
     def _calculate_size_score(self, source: WBProductInfo, candidate: WBProductInfo) -> float:
         """Вычисление score за размеры на основе пересечения диапазонов"""
         if not source.wb_sizes or not candidate.wb_sizes:
@@ -1817,6 +2003,41 @@ class WBRecommendationEngine:
         return stub
 
 
+def _rank_wb_products_worker(
+    config: WBScoringConfig,
+    products: List[WBProductInfo],
+    candidates: List[WBProductInfo]
+) -> List[Tuple[Optional[WBProcessingStatus], List[Tuple[int, float, str]], float, Optional[str]]]:
+    """
+    Задача воркера ProcessPoolExecutor для параллельной обработки групп.
+    
+    Выполняет алгоритмическую часть обработки товаров группы без обращений к БД.
+    Рекомендации возвращаются индексами в списке кандидатов, чтобы не пересылать
+    обратно копии WBProductInfo.
+    
+    Returns:
+        Для каждого товара: (статус досрочного завершения или None,
+        [(индекс кандидата, score, match_details)], время обработки, текст ошибки или None)
+    """
+    processor = WBRecommendationProcessor(None, config)
+    matrix = WBCandidateMatrix(candidates) if config.vectorized_scoring else None
+    candidate_index = {id(candidate): index for index, candidate in enumerate(candidates)}
+    
+    results = []
+    for product in products:
+        start_time = time.time()
+        try:
+            early_status, recommendations = processor._rank_with_candidates(product, candidates, matrix)
+            ranked = [
+                (candidate_index[id(r.product_info)], r.score, r.match_details)
+                for r in recommendations
+            ]
+            results.append((early_status, ranked, time.time() - start_time, None))
+        except Exception as e:
+            results.append((WBProcessingStatus.ERROR, [], time.time() - start_time, str(e)))
+    return results
+
+
 class WBRecommendationProcessor:
     """Главный класс-оркестратор для обработки WB рекомендаций"""
     
@@ -2065,45 +2286,17 @@ class WBRecommendationProcessor:
             logger.info("📊 ЭТАП 7: Обработка товаров по группам...")
             
             processing_start = time.time()
-            processed_count = 0
             
-            for group_key, products_in_group in product_groups.items():
-                logger.info(f"🔄 Обрабатываем группу {group_key}: {len(products_in_group)} товаров")
-                
-                # Для группы находим кандидатов один раз
-                group_candidates = self._find_group_candidates(group_key, enriched_products)
-                
-                # Обрабатываем каждый товар в группе с общими кандидатами
-                for product in products_in_group:
-                    try:
-                        result = self._process_single_with_candidates(product, group_candidates)
-                        processed_items.append(result)
-                        
-                        if result.success:
-                            success_count += 1
-                        else:
-                            error_count += 1
-                            
-                        processed_count += 1
-                        
-                        # Обновляем прогресс
-                        if progress_callback:
-                            progress = 50 + int((processed_count / len(wb_skus)) * 50)  # 50-100%
-                            progress_callback(progress, 100, f"Обработано {processed_count}/{len(wb_skus)}")
-                            
-                    except Exception as e:
-                        logger.error(f"❌ Ошибка обработки WB товара {product.wb_sku}: {e}")
-                        error_result = WBProcessingResult(
-                            wb_sku=product.wb_sku,
-                            status=WBProcessingStatus.ERROR,
-                            recommendations=[],
-                            processing_time=0,
-                            enrichment_info={},
-                            error_message=str(e)
-                        )
-                        processed_items.append(error_result)
-                        error_count += 1
-                        processed_count += 1
+            if self.config.parallel_processing:
+                processed_items = self._process_groups_parallel(
+                    product_groups, enriched_products, len(wb_skus), progress_callback
+                )
+            else:
+                processed_items = self._process_groups_serial(
+                    product_groups, enriched_products, len(wb_skus), progress_callback
+                )
+            success_count = sum(1 for result in processed_items if result.success)
+            error_count = len(processed_items) - success_count
             
             processing_time = time.time() - processing_start
             logger.info(f"✅ Обработка товаров завершена за {processing_time:.2f}с")
@@ -2159,11 +2352,11 @@ class WBRecommendationProcessor:
             WHERE wb.wb_sku IN ({placeholders})
             """
             
-            result_df = self.db_conn.execute(query, wb_skus).fetchdf()
+            result = query_result(self.db_conn, query, wb_skus)
             
             # Группируем по wb_sku для обработки размеров
             wb_data_cache = {}
-            for _, row in result_df.iterrows():
+            for row in result.iter_rows():
                 wb_sku = str(row['wb_sku'])
                 
                 if wb_sku not in wb_data_cache:
@@ -2402,97 +2595,272 @@ class WBRecommendationProcessor:
             logger.error(f"❌ Ошибка поиска кандидатов для группы {group_key}: {e}")
             return []
 
-    def _process_single_with_candidates(self, source_product: WBProductInfo, candidates: List[WBProductInfo]) -> WBProcessingResult:
-        """Обработка одного товара с заранее найденными кандидатами"""
-        start_time = time.time()
+    def _process_groups_serial(
+        self,
+        product_groups: Dict[str, List[WBProductInfo]],
+        enriched_products: Dict[str, WBProductInfo],
+        total_items: int,
+        progress_callback: Optional[Callable] = None
+    ) -> List[WBProcessingResult]:
+        """Обработка групп товаров в текущем процессе (ЭТАП 7 process_batch_optimized)"""
+        processed_items = []
+        processed_count = 0
         
-        try:
-            if not source_product.has_enriched_data():
-                return WBProcessingResult(
-                    wb_sku=source_product.wb_sku,
-                    status=WBProcessingStatus.NO_DATA,
-                    recommendations=[],
-                    processing_time=time.time() - start_time,
-                    enrichment_info={}
-                )
+        for group_key, products_in_group in product_groups.items():
+            logger.info(f"🔄 Обрабатываем группу {group_key}: {len(products_in_group)} товаров")
             
-            # Исключаем сам товар из кандидатов
-            filtered_candidates = [c for c in candidates if c.wb_sku != source_product.wb_sku]
+            # Для группы находим кандидатов один раз
+            group_candidates = self._find_group_candidates(group_key, enriched_products)
+            # Колоночное представление кандидатов тоже строится один раз на группу
+            group_matrix = WBCandidateMatrix(group_candidates) if self.config.vectorized_scoring else None
             
-            if not filtered_candidates:
-                return WBProcessingResult(
-                    wb_sku=source_product.wb_sku,
-                    status=WBProcessingStatus.NO_SIMILAR,
-                    recommendations=[],
-                    processing_time=time.time() - start_time,
-                    enrichment_info={}
-                )
-            
-            # Вычисляем score для всех кандидатов
-            recommendations = []
-            
-            for candidate in filtered_candidates:
-                # Вычисляем similarity score
-                score = self.recommendation_engine.calculate_similarity_score(source_product, candidate)
+            # Обрабатываем каждый товар в группе с общими кандидатами
+            for product in products_in_group:
+                try:
+                    result = self._process_single_with_candidates(product, group_candidates, group_matrix)
+                except Exception as e:
+                    logger.error(f"❌ Ошибка обработки WB товара {product.wb_sku}: {e}")
+                    result = self._error_result(product.wb_sku, str(e))
+                processed_items.append(result)
+                processed_count += 1
                 
-                # Фильтруем по минимальному score
-                if score >= self.config.min_score_threshold:
-                    match_details = self.recommendation_engine.get_match_details(source_product, candidate)
-                    
-                    recommendation = WBRecommendation(
-                        product_info=candidate,
-                        score=score,
-                        match_details=match_details
-                    )
-                    recommendations.append(recommendation)
-            
-            # Сортируем по убыванию score
-            recommendations.sort(key=lambda x: x.score, reverse=True)
-            
-            # ВАЖНО: Интеграция с ручными рекомендациями (как в стандартном алгоритме)
-            logger.debug(f"🔄 ОПТИМИЗИРОВАННЫЙ: Интеграция ручных рекомендаций для {source_product.wb_sku}")
-            final_recommendations = self.recommendation_engine._merge_with_manual_recommendations(
-                source_product.wb_sku, recommendations
-            )
-            
-            # Определяем статус на основе итоговых рекомендаций
-            total_time = time.time() - start_time
+                # Обновляем прогресс
+                if progress_callback:
+                    progress = 50 + int((processed_count / total_items) * 50)  # 50-100%
+                    progress_callback(progress, 100, f"Обработано {processed_count}/{total_items}")
+        
+        return processed_items
+    
+    def _process_groups_parallel(
+        self,
+        product_groups: Dict[str, List[WBProductInfo]],
+        enriched_products: Dict[str, WBProductInfo],
+        total_items: int,
+        progress_callback: Optional[Callable] = None
+    ) -> List[WBProcessingResult]:
+        """
+        Обработка групп товаров в пуле процессов (ЭТАП 7 process_batch_optimized)
+        
+        Каждая группа (большие - частями по parallel_chunk_size) вместе со своими
+        кандидатами отправляется воркеру _rank_wb_products_worker. Воркер считает
+        score и сортирует рекомендации без обращений к БД; слияние с ручными
+        рекомендациями выполняется здесь, в основном процессе.
+        Порядок результатов совпадает с последовательной обработкой. Задачи, которые
+        не удалось выполнить в пуле, обрабатываются в текущем процессе.
+        """
+        tasks = []
+        chunk_size = max(1, self.config.parallel_chunk_size)
+        for group_key, products_in_group in product_groups.items():
+            group_candidates = self._find_group_candidates(group_key, enriched_products)
+            for offset in range(0, len(products_in_group), chunk_size):
+                tasks.append((products_in_group[offset:offset + chunk_size], group_candidates))
+        
+        if not tasks:
+            return []
+        
+        task_results: List[Optional[List[WBProcessingResult]]] = [None] * len(tasks)
+        processed_count = 0
+        
+        def complete_task(index: int, worker_results: Optional[list]) -> None:
+            nonlocal processed_count
+            products, candidates = tasks[index]
+            task_results[index] = self._complete_worker_results(products, candidates, worker_results)
+            processed_count += len(products)
+            if progress_callback:
+                progress = 50 + int((processed_count / total_items) * 50)  # 50-100%
+                progress_callback(progress, 100, f"Обработано {processed_count}/{total_items}")
+        
+        max_workers = max(1, min(self.config.parallel_workers or os.cpu_count() or 1, len(tasks)))
+        logger.info(f"🧵 Параллельная обработка: {len(tasks)} задач, {max_workers} процессов")
+        
+        try:
+            # spawn: дочерние процессы не наследуют открытые подключения DuckDB
+            with ProcessPoolExecutor(
+                max_workers=max_workers, mp_context=multiprocessing.get_context("spawn")
+            ) as executor:
+                futures = {
+                    executor.submit(_rank_wb_products_worker, self.config, products, candidates): index
+                    for index, (products, candidates) in enumerate(tasks)
+                }
+                for future in as_completed(futures):
+                    index = futures[future]
+                    try:
+                        worker_results = future.result()
+                    except Exception as e:
+                        logger.warning(f"⚠️ Задача {index} не выполнена в пуле процессов: {e}")
+                        worker_results = None
+                    complete_task(index, worker_results)
+        except Exception as e:
+            logger.warning(f"⚠️ Пул процессов недоступен, продолжаем в текущем процессе: {e}")
+        
+        # Задачи без результата (ошибка пула) обрабатываются последовательно
+        for index, results in enumerate(task_results):
+            if results is None:
+                complete_task(index, None)
+        
+        return [result for results in task_results for result in results]
+    
+    def _complete_worker_results(
+        self,
+        products: List[WBProductInfo],
+        candidates: List[WBProductInfo],
+        worker_results: Optional[list]
+    ) -> List[WBProcessingResult]:
+        """
+        Сборка WBProcessingResult из ответа _rank_wb_products_worker
+        
+        Если worker_results is None, задача обрабатывается в текущем процессе.
+        """
+        if worker_results is None:
+            matrix = WBCandidateMatrix(candidates) if self.config.vectorized_scoring else None
+            return [self._process_single_with_candidates(p, candidates, matrix) for p in products]
+        
+        results = []
+        for product, (early_status, ranked, elapsed, error_message) in zip(products, worker_results):
+            start_time = time.time() - elapsed
+            if error_message is not None:
+                results.append(self._error_result(product.wb_sku, error_message, elapsed))
+                continue
             
-            if not final_recommendations:
-                return WBProcessingResult(
-                    wb_sku=source_product.wb_sku,
-                    status=WBProcessingStatus.NO_SIMILAR,
-                    recommendations=[],
-                    processing_time=total_time,
-                    enrichment_info={}
-                )
-            elif len(final_recommendations) < self.config.min_recommendations:
-                return WBProcessingResult(
-                    wb_sku=source_product.wb_sku,
-                    status=WBProcessingStatus.INSUFFICIENT_RECOMMENDATIONS,
-                    recommendations=final_recommendations,
-                    processing_time=total_time,
-                    enrichment_info={"count": len(final_recommendations)}
-                )
-            else:
-                return WBProcessingResult(
-                    wb_sku=source_product.wb_sku,
-                    status=WBProcessingStatus.SUCCESS,
-                    recommendations=final_recommendations,
-                    processing_time=total_time,
-                    enrichment_info={"count": len(final_recommendations)}
+            recommendations = [
+                WBRecommendation(product_info=candidates[index], score=score, match_details=match_details)
+                for index, score, match_details in ranked
+            ]
+            try:
+                results.append(
+                    self._complete_with_candidates(product, early_status, recommendations, start_time)
                 )
+            except Exception as e:
+                results.append(self._error_result(product.wb_sku, str(e), time.time() - start_time))
+        return results
+    
+    def _error_result(self, wb_sku: str, error_message: str, processing_time: float = 0) -> WBProcessingResult:
+        """Результат обработки товара с ошибкой"""
+        return WBProcessingResult(
+            wb_sku=wb_sku,
+            status=WBProcessingStatus.ERROR,
+            recommendations=[],
+            processing_time=processing_time,
+            enrichment_info={},
+            error_message=error_message
+        )
+    
+    def _rank_with_candidates(
+        self,
+        source_product: WBProductInfo,
+        candidates: List[WBProductInfo],
+        candidate_matrix: Optional[WBCandidateMatrix] = None
+    ) -> Tuple[Optional[WBProcessingStatus], List[WBRecommendation]]:
+        """
+        Алгоритмическая часть обработки товара: score, фильтр и сортировка (без обращений к БД)
+        
+        Returns:
+            (статус досрочного завершения или None, рекомендации по убыванию score)
+        """
+        if not source_product.has_enriched_data():
+            return WBProcessingStatus.NO_DATA, []
+        
+        # Исключаем сам товар из кандидатов
+        is_other = [c.wb_sku != source_product.wb_sku for c in candidates]
+        
+        if not any(is_other):
+            return WBProcessingStatus.NO_SIMILAR, []
+        
+        # Вычисляем score для всех кандидатов
+        recommendations = []
+        scores = self.recommendation_engine.calculate_similarity_scores(
+            source_product, candidate_matrix if candidate_matrix is not None else candidates
+        )
+        
+        for candidate, score, keep in zip(candidates, scores.tolist(), is_other):
+            # Фильтруем по минимальному score
+            if keep and score >= self.config.min_score_threshold:
+                match_details = self.recommendation_engine.get_match_details(source_product, candidate)
                 
-        except Exception as e:
-            total_time = time.time() - start_time
+                recommendation = WBRecommendation(
+                    product_info=candidate,
+                    score=score,
+                    match_details=match_details
+                )
+                recommendations.append(recommendation)
+        
+        # Сортируем по убыванию score
+        recommendations.sort(key=lambda x: x.score, reverse=True)
+        return None, recommendations
+    
+    def _complete_with_candidates(
+        self,
+        source_product: WBProductInfo,
+        early_status: Optional[WBProcessingStatus],
+        recommendations: List[WBRecommendation],
+        start_time: float
+    ) -> WBProcessingResult:
+        """Слияние с ручными рекомендациями и определение статуса обработки товара"""
+        if early_status is not None:
             return WBProcessingResult(
                 wb_sku=source_product.wb_sku,
-                status=WBProcessingStatus.ERROR,
+                status=early_status,
+                recommendations=[],
+                processing_time=time.time() - start_time,
+                enrichment_info={}
+            )
+        
+        # ВАЖНО: Интеграция с ручными рекомендациями (как в стандартном алгоритме)
+        logger.debug(f"🔄 ОПТИМИЗИРОВАННЫЙ: Интеграция ручных рекомендаций для {source_product.wb_sku}")
+        final_recommendations = self.recommendation_engine._merge_with_manual_recommendations(
+            source_product.wb_sku, recommendations
+        )
+        
+        # Определяем статус на основе итоговых рекомендаций
+        total_time = time.time() - start_time
+        
+        if not final_recommendations:
+            return WBProcessingResult(
+                wb_sku=source_product.wb_sku,
+                status=WBProcessingStatus.NO_SIMILAR,
                 recommendations=[],
                 processing_time=total_time,
-                enrichment_info={},
-                error_message=str(e)
+                enrichment_info={}
+            )
+        elif len(final_recommendations) < self.config.min_recommendations:
+            return WBProcessingResult(
+                wb_sku=source_product.wb_sku,
+                status=WBProcessingStatus.INSUFFICIENT_RECOMMENDATIONS,
+                recommendations=final_recommendations,
+                processing_time=total_time,
+                enrichment_info={"count": len(final_recommendations)}
             )
+        else:
+            return WBProcessingResult(
+                wb_sku=source_product.wb_sku,
+                status=WBProcessingStatus.SUCCESS,
+                recommendations=final_recommendations,
+                processing_time=total_time,
+                enrichment_info={"count": len(final_recommendations)}
+            )
+    
+    def _process_single_with_candidates(
+        self, 
+        source_product: WBProductInfo, 
+        candidates: List[WBProductInfo],
+        candidate_matrix: Optional[WBCandidateMatrix] = None
+    ) -> WBProcessingResult:
+        """
+        Обработка одного товара с заранее найденными кандидатами
+        
+        candidate_matrix - колоночное представление тех же кандидатов, построенное
+        один раз на группу (если не передано, строится при расчете score)
+        """
+        start_time = time.time()
+        
+        try:
+            early_status, recommendations = self._rank_with_candidates(
+                source_product, candidates, candidate_matrix
+            )
+            return self._complete_with_candidates(source_product, early_status, recommendations, start_time)
+                
+        except Exception as e:
+            return self._error_result(source_product.wb_sku, str(e), time.time() - start_time)
     
     def set_manual_recommendations_manager(self, manual_manager: Optional[ManualRecommendationsManager]):
         """
@@ -135,6 +135,12 @@ def render_scoring_config() -> Optional[WBScoringConfig]:
             config.exact_size_weight = st.slider(
                 "Точный размер:", 0, 200, config.exact_size_weight
             )
+        
+        config.parallel_processing = st.checkbox(
+            "Параллельная обработка групп",
+            value=config.parallel_processing,
+            help="Распределяет группы товаров по ядрам процессора (для больших пакетов)"
+        )
     
     UILogger.log_ui_action("Config rendered", f"preset={preset}")
     return config